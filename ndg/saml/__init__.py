@@ -15,8 +15,14 @@ class Config(object):
     @type use_lxml: bool
     @cvar use_lxml: Controls whether lxml.etree should be imported instead of
     etree. lxml is required for XPath expressions with conditions.
+    @type use_lxml_backend: bool
+    @cvar use_lxml_backend: Controls whether lxml specific code is used to
+    build and parse SAML and SOAP elements when lxml is in use - see
+    ndg.saml.xml.lxml_backend.  None is taken as True.  Set it before
+    ndg.saml.xml.etree is imported.
     """
     use_lxml = None
+    use_lxml_backend = None
 
 def importElementTreeAndCElementTree():
     """Imports ElementTree and cElementTree, or the lxml ElementTree API,
@@ -11,40 +11,239 @@ __copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
 __contact__ = "Philip.Kershaw@stfc.ac.uk"
 __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "Philip.Kershaw@stfc.ac.uk"
+from keyword import iskeyword
+
 from ndg.saml.common.xml import SAMLConstants, QName
+
+
+# Default of _from_fields keywords which are only set if given
+_MISSING = object()
  
 
 class SAMLObject(object):
     """Base class for all SAML types
     
+    Objects created with the default element name share one read-only QName
+    for their class.  A QName is only allocated for an object when the
+    namespace, local name or prefix is overridden on initialisation.
+    
+    Deserialisers make objects from values they have already checked with
+    _from_fields.  This writes the slots directly instead of going through
+    the property setters.  Setters which do more than check the value type
+    are still called; they are listed in _VALIDATED_FIELDS.
+    
     :cvar DEFAULT_ELEMENT_LOCAL_NAME: default XML element name - derived classes
     must specify 
     :type DEFAULT_ELEMENT_LOCAL_NAME: None
+    :cvar DEFAULT_NAMESPACE_URI: default namespace for the XML element
+    :type DEFAULT_NAMESPACE_URI: string
+    :cvar DEFAULT_NAMESPACE_PREFIX: default prefix for the namespace
+    :type DEFAULT_NAMESPACE_PREFIX: string
+    :cvar _VALIDATED_FIELDS: properties whose setters alter or restrict the
+    value beyond its type, for example by normalising it
+    :type _VALIDATED_FIELDS: tuple
     :ivar __qname: qualified name for XML element
     :type __qname: ndg.saml.common.xml.QName
     """
     DEFAULT_ELEMENT_LOCAL_NAME = None
+    DEFAULT_NAMESPACE_URI = SAMLConstants.SAML20_NS
+    DEFAULT_NAMESPACE_PREFIX = SAMLConstants.SAML20_PREFIX
+    _VALIDATED_FIELDS = ()
     __slots__ = ('__qname',)
     
+    # Shared default QName for each class, set by _getDefaultQName
+    _defaultQNames = {}
+    
+    # Slots written by _from_fields for each class, set by _getTrustedFields
+    _trustedFields = {}
+    
     def __init__(self,
-                 namespaceURI=SAMLConstants.SAML20_NS, 
+                 namespaceURI=None, 
                  elementLocalName=None, 
-                 namespacePrefix=SAMLConstants.SAML20_PREFIX):
+                 namespacePrefix=None):
         '''
-        :param namespaceURI: the namespace the element is in
-        :type namespaceURI: basestring
+        :param namespaceURI: the namespace the element is in, defaults to
+        DEFAULT_NAMESPACE_URI
+        :type namespaceURI: NoneType/basestring
         :param elementLocalName: the local name of the XML element this Object 
         represents, defaults to DEFAULT_ELEMENT_LOCAL_NAME.  Ensure that this
         is set to a valid string in derived classes rather the None base class
         setting
         :type elementLocalName: NoneType/basestring
-        :param namespacePrefix: the prefix for the given namespace
-        :type namespacePrefix: basestring
+        :param namespacePrefix: the prefix for the given namespace, defaults
+        to DEFAULT_NAMESPACE_PREFIX
+        :type namespacePrefix: NoneType/basestring
         '''
+        if (namespaceURI is None and elementLocalName is None and 
+            namespacePrefix is None):
+            self.__qname = self.__class__._getDefaultQName()
+            return
+        
+        if namespaceURI is None:
+            namespaceURI = self.__class__.DEFAULT_NAMESPACE_URI
+            
         if elementLocalName is None:
             elementLocalName = self.__class__.DEFAULT_ELEMENT_LOCAL_NAME
             
+        if namespacePrefix is None:
+            namespacePrefix = self.__class__.DEFAULT_NAMESPACE_PREFIX
+            
         self.__qname = QName(namespaceURI, elementLocalName, namespacePrefix)
+        
+    @classmethod
+    def _getDefaultQName(cls):
+        """Get the QName shared by objects of this class created with the
+        default element name
+        
+        :return: interned qualified name
+        :rtype: ndg.saml.common.xml.QName
+        """
+        try:
+            return SAMLObject._defaultQNames[cls]
+        except KeyError:
+            qname = QName.intern(cls.DEFAULT_NAMESPACE_URI, 
+                                 cls.DEFAULT_ELEMENT_LOCAL_NAME,
+                                 cls.DEFAULT_NAMESPACE_PREFIX)
+            return SAMLObject._defaultQNames.setdefault(cls, qname)
+            
+    @classmethod
+    def _getTrustedFields(cls):
+        '''Get the slots that _from_fields writes for this class
+        
+        :return: the attribute name of the slot for each property which may
+        be written directly, and the function making objects from keywords.
+        None if objects of this class have an instance dictionary so that 
+        they are initialised as normal
+        :rtype: tuple / NoneType
+        '''
+        try:
+            return SAMLObject._trustedFields[cls]
+        except KeyError:
+            pass
+        
+        prototype = cls()
+        if hasattr(prototype, '__dict__'):
+            return SAMLObject._trustedFields.setdefault(cls, None)
+        
+        # As for collections.namedtuple, the function making objects is 
+        # generated so that slots are written with plain attribute access.
+        # Keywords default to the values of a newly initialised object
+        attrNames = {}
+        namespace = {'cls': cls, 'new': cls.__new__, 'MISSING': _MISSING}
+        params = []
+        body = []
+        validated = []
+        for klass in cls.__mro__:
+            slotNames = klass.__dict__.get('__slots__', ())
+            if isinstance(slotNames, str):
+                slotNames = (slotNames,)
+                
+            for slotName in slotNames:
+                if slotName in ('__dict__', '__weakref__'):
+                    continue
+                
+                # Ugly hack to allow for derived classes setting private 
+                # member variables
+                if slotName.startswith('__'):
+                    name = slotName[2:]
+                    attrName = '_%s%s' % (klass.__name__.lstrip('_'), 
+                                          slotName)
+                else:
+                    name = attrName = slotName
+                    
+                try:
+                    value = getattr(prototype, attrName)
+                except AttributeError:
+                    continue
+                
+                default = 'default%d' % len(namespace)
+                namespace[default] = value
+                
+                # Lists are copied for each object
+                if isinstance(value, list):
+                    default += '.copy()'
+                    
+                if (name in attrNames or name in validated or 
+                    not name.isidentifier() or iskeyword(name)):
+                    body.append('samlObject.%s = %s' % (attrName, default))
+                    
+                elif name in cls._VALIDATED_FIELDS:
+                    validated.append(name)
+                    params.append('%s=MISSING' % name)
+                    body.append('samlObject.%s = %s' % (attrName, default))
+                    
+                elif isinstance(value, list):
+                    # Items given are added to a copy of the default so that
+                    # the list keeps its type and the item checks it makes
+                    attrNames[name] = attrName
+                    params.append('%s=MISSING' % name)
+                    body += ['samlObject.%s = %s' % (attrName, default),
+                             'if %s is not MISSING:' % name,
+                             '    list.extend(samlObject.%s, %s)' % (attrName,
+                                                                   name)]
+                else:
+                    attrNames[name] = attrName
+                    params.append('%s=%s' % (name, default))
+                    body.append('samlObject.%s = %s' % (attrName, name))
+        
+        # Validated values are set through their setters once the slots are
+        # all set, in the order given in _VALIDATED_FIELDS
+        for name in cls._VALIDATED_FIELDS:
+            if name in validated:
+                body += ['if %s is not MISSING:' % name,
+                         '    samlObject.%s = %s' % (name, name)]
+                
+        source = ['def _from_fields(*, %s):' % ', '.join(params),
+                  '    samlObject = new(cls)']
+        source += ['    ' + line for line in body]
+        source.append('    return samlObject')
+        exec('\n'.join(source), namespace)
+        return SAMLObject._trustedFields.setdefault(cls, 
+                                        (attrNames, namespace['_from_fields']))
+        
+    @classmethod
+    def _getFieldAttrName(cls, name):
+        '''Get the attribute to write a checked value of a property to
+        
+        :param name: property name
+        :type name: basestring
+        :return: the slot for the property or the property itself if its 
+        setter must be called
+        :rtype: basestring
+        '''
+        trustedFields = cls._getTrustedFields()
+        if trustedFields is None:
+            return name
+        
+        return trustedFields[0].get(name, name)
+    
+    @classmethod
+    def _from_fields(cls, **fields):
+        '''Make an object from values which have been checked already, for 
+        use by deserialisers.  Values are written to the slots directly
+        except for those in _VALIDATED_FIELDS which are set through their 
+        property setters in that order.  Other slots take the values of a 
+        newly initialised object, with lists copied.  Items given for a list
+        are added to a copy of its default so that it keeps its type.
+        
+        :param fields: values keyed by property name
+        :type fields: dict
+        :return: new object
+        :rtype: ndg.saml.common.SAMLObject derived type
+        :raise TypeError: a keyword is not a property of this class
+        '''
+        try:
+            trustedFields = SAMLObject._trustedFields[cls]
+        except KeyError:
+            trustedFields = cls._getTrustedFields()
+            
+        if trustedFields is None:
+            samlObject = cls()
+            for name, value in fields.items():
+                setattr(samlObject, name, value)
+            return samlObject
+        
+        return trustedFields[1](**fields)
             
     @property
     def qname(self):
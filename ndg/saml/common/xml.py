@@ -360,15 +360,59 @@ class SAMLConstants(XMLConstants):
     # SAML 2.0 profile for XACML protocol QName prefix
     SAML2_XACML_PROTOCOL_PREFIX = "xacml-samlp"
 
+# Clark notation names split by splitClarkName.  The table is bounded so that
+# documents with arbitrary element names can't grow it without limit
+_CLARK_NAME_TABLE_MAX_SIZE = 4096
+_clarkNameTable = {}
+
+
+def splitClarkName(name):
+    """Split an ElementTree style {namespace URI}local name.  Results are
+    kept in a table so that repeated names are split with a dictionary lookup
+    
+    :param name: name in Clark notation
+    :type name: basestring
+    :return: namespace URI, empty if the name has none, and local name
+    :rtype: tuple
+    """
+    try:
+        return _clarkNameTable[name]
+    except KeyError:
+        pass
+    
+    if name[:1] == '{':
+        namespaceURI, _, localPart = name[1:].rpartition('}')
+    else:
+        namespaceURI, localPart = '', name
+        
+    value = (namespaceURI, localPart)
+    if len(_clarkNameTable) < _CLARK_NAME_TABLE_MAX_SIZE:
+        _clarkNameTable[name] = value
+    return value
+
+
 class QName(object):
     """XML Qualified Name
+    
+    Use QName.intern for names used repeatedly such as element names of
+    SAML types.  It returns one read-only instance for each name with its
+    Clark notation precomputed.
+    
     :ivar __namespaceURI: the namespace the element is in
     :type __namespaceURI: basestring
     :ivar __localPart: the local name of the XML element 
     :type __localPart: basestring
     :ivar __prefix: the prefix for the given namespace
     :type __prefix: basestring
+    :ivar __clarkName: name in {namespace URI}local name form for interned
+    names, None otherwise
+    :type __clarkName: basestring / NoneType
     """ 
+    __slots__ = ('__namespaceURI', '__localPart', '__prefix', '__clarkName')
+    
+    # Interned instances keyed by namespace URI, local part and prefix.  Names
+    # are expected to be defined in code so the table is not bounded
+    _internTable = {}
 
     def __init__(self, namespaceURI, localPart, prefix):
         '''
@@ -379,9 +423,59 @@ class QName(object):
         :param prefix: the prefix for the given namespace
         :type prefix: basestring
         '''
+        self.__clarkName = None
         self.namespaceURI = namespaceURI
         self.localPart = localPart
         self.prefix = prefix
+        
+    @classmethod
+    def intern(cls, namespaceURI, localPart, prefix):
+        """Get the canonical instance for a name
+        
+        :param namespaceURI: the namespace the element is in
+        :type namespaceURI: basestring
+        :param localPart: the local name of the XML element 
+        :type localPart: basestring
+        :param prefix: the prefix for the given namespace
+        :type prefix: basestring
+        :return: read-only qualified name
+        :rtype: ndg.saml.common.xml.QName
+        """
+        key = (namespaceURI, localPart, prefix)
+        try:
+            return cls._internTable[key]
+        except KeyError:
+            pass
+        
+        qname = cls(namespaceURI, localPart, prefix)
+        qname.__clarkName = "{%s}%s" % (namespaceURI, localPart)
+        return cls._internTable.setdefault(key, qname)
+    
+    def _checkWritable(self):
+        """:raise AttributeError: this is an interned instance"""
+        if self.__clarkName is not None:
+            raise AttributeError("Interned QName %r is read-only" % 
+                                 self.__clarkName)
+        
+    def _getInterned(self):
+        """:return: True if this is an interned, read-only instance
+        :rtype: bool
+        """
+        return self.__clarkName is not None
+    
+    interned = property(_getInterned, None, None, "Interned instance")
+    
+    def _getClarkName(self):
+        """Get name in Clark notation as used for ElementTree tags
+        :return: {namespace URI}local name
+        :rtype: string
+        """
+        if self.__clarkName is not None:
+            return self.__clarkName
+        return "{%s}%s" % (self.__namespaceURI, self.__localPart)
+    
+    clarkName = property(_getClarkName, None, None, 
+                         "Name in {namespace URI}local name form")
     
     def _getPrefix(self):
         """Get prefix
@@ -396,6 +490,7 @@ class QName(object):
         :type value: string
         :raise TypeError: invalid input value type
         """
+        self._checkWritable()
         if not isinstance(value, str):
             raise TypeError('Expected string type for "prefix"; got %r' %
                             type(value))
@@ -416,6 +511,7 @@ class QName(object):
         :type value: string
         :raise TypeError: invalid input value type
         """
+        self._checkWritable()
         if not isinstance(value, str):
             raise TypeError('Expected string type for "localPart"; got %r' %
                             type(value))
@@ -436,6 +532,7 @@ class QName(object):
         :type value: string
         :raise TypeError: invalid input value type
         """
+        self._checkWritable()
         if not isinstance(value, str):
             raise TypeError('Expected string type for "namespaceURI"; got %r' %
                             type(value))
@@ -444,6 +541,18 @@ class QName(object):
     namespaceURI = property(_getNamespaceURI, _setNamespaceURI, None, 
                             "Namespace URI")
 
+    def __reduce__(self):
+        '''Enable pickling.  Interned names are restored as the interned
+        instance for the name
+
+        :return: callable and arguments to recreate this object
+        :rtype: tuple
+        '''
+        args = (self.__namespaceURI, self.__localPart, self.__prefix)
+        if self.__clarkName is not None:
+            return (self.__class__.intern, args)
+        return (self.__class__, args)
+
     def __eq__(self, qname):
         """Enable equality check for QName
         :type qname: saml.common.xml.QName
@@ -455,6 +564,9 @@ class QName(object):
         """
         if not isinstance(qname, QName):
             raise TypeError('Expecting %r; got %r' % (QName, type(qname)))
+        
+        if qname is self:
+            return True
                             
         return (self.prefix, self.namespaceURI, self.localPart) == \
                (qname.prefix, qname.namespaceURI, qname.localPart)
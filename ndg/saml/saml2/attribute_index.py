@@ -0,0 +1,464 @@
+"""SAML 2.0 attribute index - compact on-disk subject to attributes mapping for
+use by attribute authority query interfaces.  The index file is memory mapped
+read-only so that a single copy of its pages in the OS page cache is shared
+between all the worker processes of an application server.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import logging
+log = logging.getLogger(__name__)
+import os
+import csv
+import json
+import math
+import mmap
+import struct
+from array import array
+from hashlib import blake2b
+
+
+class AttributeIndexError(Exception):
+    """Error reading or writing an attribute index file"""
+
+
+def _hashKey(key):
+    """Hash a key to a pair of 64-bit integers.  Python's built-in hash is
+    randomised per process so can't be used for a file shared between
+    processes
+
+    :param key: key to hash
+    :type key: bytes
+    :return: two independent 64-bit hash values
+    :rtype: tuple
+    """
+    return struct.unpack('<QQ', blake2b(key, digest_size=16).digest())
+
+
+class BloomFilter(object):
+    """Bloom filter - probabilistic set membership test.  A negative result
+    is definite so that lookups for keys not in a set can be answered
+    without further searching.  Bit positions are derived from two hash
+    values with double hashing
+
+    :ivar __bits: bit array
+    :type __bits: bytearray / mmap.mmap
+    :ivar __offset: offset of the bit array in __bits
+    :type __offset: int
+    :ivar __nBits: number of bits
+    :type __nBits: int
+    :ivar __nHashes: number of bits set for each key
+    :type __nHashes: int
+    """
+    __slots__ = ('__bits', '__offset', '__nBits', '__nHashes')
+
+    def __init__(self, nBits, nHashes, bits=None, offset=0):
+        """
+        :param nBits: number of bits in the filter
+        :type nBits: int
+        :param nHashes: number of bits set for each key
+        :type nHashes: int
+        :param bits: existing bit array e.g. a memory mapped index file.  If
+        omitted a new empty filter is created
+        :type bits: bytearray / mmap.mmap / NoneType
+        :param offset: offset of the filter in bits
+        :type offset: int
+        """
+        if nBits < 1 or nHashes < 1:
+            raise ValueError('Bloom filter size and number of hashes must be '
+                             'greater than zero')
+        self.__nBits = nBits
+        self.__nHashes = nHashes
+        self.__offset = offset
+        if bits is None:
+            self.__bits = bytearray(self.__class__.nBytes(nBits))
+        else:
+            self.__bits = bits
+
+    @staticmethod
+    def nBytes(nBits):
+        """Size in bytes of a filter of the given number of bits
+
+        :param nBits: number of bits
+        :type nBits: int
+        :return: number of bytes
+        :rtype: int
+        """
+        return (nBits + 7) // 8
+
+    @staticmethod
+    def optimalSize(nKeys, falsePositiveRate):
+        """Calculate number of bits and hashes for a filter holding the given
+        number of keys with the given false positive rate
+
+        :param nKeys: number of keys to be added
+        :type nKeys: int
+        :param falsePositiveRate: acceptable false positive rate, 0 to 1
+        :type falsePositiveRate: float
+        :return: number of bits and number of hashes
+        :rtype: tuple
+        """
+        if not 0. < falsePositiveRate < 1.:
+            raise ValueError('Expecting false positive rate between 0 and 1; '
+                             'got %r' % falsePositiveRate)
+
+        nKeys = max(nKeys, 1)
+        nBits = int(math.ceil(-nKeys * math.log(falsePositiveRate) /
+                              math.log(2)**2))
+        nHashes = max(int(round(nBits / nKeys * math.log(2))), 1)
+        return nBits, nHashes
+
+    @property
+    def bits(self):
+        """Bit array
+
+        :return: bit array
+        :rtype: bytearray / mmap.mmap
+        """
+        return self.__bits
+
+    def _positions(self, hashes):
+        h1, h2 = hashes
+        nBits = self.__nBits
+        for i in range(self.__nHashes):
+            yield (h1 + i * h2) % nBits
+
+    def add(self, hashes):
+        """Add a key
+
+        :param hashes: key hash values from _hashKey
+        :type hashes: tuple
+        """
+        bits = self.__bits
+        offset = self.__offset
+        for position in self._positions(hashes):
+            bits[offset + (position >> 3)] |= 1 << (position & 7)
+
+    def mightContain(self, hashes):
+        """Test for a key
+
+        :param hashes: key hash values from _hashKey
+        :type hashes: tuple
+        :return: False if the key is definitely not in the set, True if it
+        may be
+        :rtype: bool
+        """
+        bits = self.__bits
+        offset = self.__offset
+        for position in self._positions(hashes):
+            if not bits[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+
+        return True
+
+
+class AttributeIndex(object):
+    """Read-only memory mapped index of subject to attributes.  Lookups are
+    O(1): a Bloom filter test answers most queries for unknown subjects, and
+    known subjects are found by probing an open addressed hash table of
+    record offsets.
+
+    File layout, all integers little endian:
+
+    * header: magic, number of entries, number of hash table slots, Bloom
+      filter bits and hashes
+    * Bloom filter bit array
+    * hash table of 64-bit record offsets, zero for an empty slot
+    * records: 32-bit subject length, subject, 32-bit value length, JSON
+      encoded attribute name to list of values mapping, all UTF-8
+
+    Create index files with AttributeIndex.write or from a CSV or JSON file
+    with AttributeIndex.build.
+
+    :cvar MAGIC: file type identifier
+    :type MAGIC: bytes
+    :cvar DEFAULT_FALSE_POSITIVE_RATE: default Bloom filter false positive
+    rate
+    :type DEFAULT_FALSE_POSITIVE_RATE: float
+    :cvar CSV_FIELDNAMES: column names for CSV input files.  Each row gives
+    one value of one attribute for a subject
+    :type CSV_FIELDNAMES: tuple
+    """
+    MAGIC = b'NDGSAMLATTRIDX1\0'
+    HEADER_FMT = '<16sQQQQ'
+    HEADER_SIZE = struct.calcsize(HEADER_FMT)
+    OFFSET_FMT = '<Q'
+    OFFSET_SIZE = struct.calcsize(OFFSET_FMT)
+    LENGTH_FMT = '<I'
+    LENGTH_SIZE = struct.calcsize(LENGTH_FMT)
+
+    DEFAULT_FALSE_POSITIVE_RATE = 0.01
+    CSV_FIELDNAMES = ('subject', 'name', 'value')
+
+    __slots__ = ('__filePath', '__mmap', '__nEntries', '__nSlots',
+                 '__tableOffset', '__bloomFilter')
+
+    def __init__(self, filePath):
+        """
+        :param filePath: path to index file
+        :type filePath: basestring
+        :raise AttributeIndexError: file is not a valid index file
+        """
+        cls = self.__class__
+        self.__filePath = filePath
+        self.__mmap = None
+
+        with open(filePath, 'rb') as indexFile:
+            try:
+                self.__mmap = mmap.mmap(indexFile.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise AttributeIndexError('Error mapping attribute index file '
+                                          '%r: %s' % (filePath, e))
+
+        if len(self.__mmap) < cls.HEADER_SIZE:
+            self.close()
+            raise AttributeIndexError('Attribute index file %r is truncated' %
+                                      filePath)
+
+        (magic, self.__nEntries, self.__nSlots, nBits,
+         nHashes) = struct.unpack_from(cls.HEADER_FMT, self.__mmap, 0)
+        if magic != cls.MAGIC:
+            self.close()
+            raise AttributeIndexError('File %r is not an attribute index file' %
+                                      filePath)
+
+        self.__bloomFilter = BloomFilter(nBits, nHashes, bits=self.__mmap,
+                                         offset=cls.HEADER_SIZE)
+        self.__tableOffset = cls.HEADER_SIZE + BloomFilter.nBytes(nBits)
+
+    def close(self):
+        """Unmap the index file"""
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *arg):
+        self.close()
+
+    def __len__(self):
+        return self.__nEntries
+
+    @property
+    def filePath(self):
+        """Index file path
+
+        :return: file path
+        :rtype: basestring
+        """
+        return self.__filePath
+
+    @property
+    def bloomFilter(self):
+        """Bloom filter for subjects in the index
+
+        :return: Bloom filter
+        :rtype: ndg.saml.saml2.attribute_index.BloomFilter
+        """
+        return self.__bloomFilter
+
+    def _findRecord(self, key):
+        """Find the offset of the value for the given key
+
+        :param key: UTF-8 encoded subject
+        :type key: bytes
+        :return: offset of value length field or None if not found
+        :rtype: int / NoneType
+        """
+        cls = self.__class__
+        hashes = _hashKey(key)
+        if not self.__bloomFilter.mightContain(hashes):
+            return None
+
+        mm = self.__mmap
+        mask = self.__nSlots - 1
+        slot = hashes[0] & mask
+        keyLen = len(key)
+
+        while True:
+            (offset, ) = struct.unpack_from(cls.OFFSET_FMT, mm,
+                                self.__tableOffset + slot * cls.OFFSET_SIZE)
+            if offset == 0:
+                return None
+
+            (recordKeyLen, ) = struct.unpack_from(cls.LENGTH_FMT, mm, offset)
+            keyOffset = offset + cls.LENGTH_SIZE
+            if (recordKeyLen == keyLen and
+                mm[keyOffset:keyOffset + keyLen] == key):
+                return keyOffset + keyLen
+
+            slot = (slot + 1) & mask
+
+    def __contains__(self, subject):
+        return self._findRecord(subject.encode('utf-8')) is not None
+
+    def lookup(self, subject):
+        """Get the attributes for a subject
+
+        :param subject: subject identifier
+        :type subject: basestring
+        :return: attribute name to list of values mapping or None if the
+        subject is not in the index
+        :rtype: dict / NoneType
+        """
+        offset = self._findRecord(subject.encode('utf-8'))
+        if offset is None:
+            return None
+
+        cls = self.__class__
+        (valueLen, ) = struct.unpack_from(cls.LENGTH_FMT, self.__mmap, offset)
+        offset += cls.LENGTH_SIZE
+        return json.loads(self.__mmap[offset:offset + valueLen])
+
+    @classmethod
+    def write(cls, filePath, items, nEntries,
+              falsePositiveRate=DEFAULT_FALSE_POSITIVE_RATE):
+        """Write an index file.  Records are streamed to the file so that
+        only the hash table and Bloom filter are held in memory
+
+        :param filePath: path for new index file
+        :type filePath: basestring
+        :param items: subject, attributes pairs.  Attributes are a mapping of
+        attribute name to a list of values
+        :type items: iterable
+        :param nEntries: number of items
+        :type nEntries: int
+        :param falsePositiveRate: Bloom filter false positive rate
+        :type falsePositiveRate: float
+        """
+        # Power of two table size with load factor of at most 0.5 to keep
+        # probe sequences short
+        nSlots = 2
+        while nSlots < 2 * nEntries:
+            nSlots <<= 1
+        mask = nSlots - 1
+
+        nBits, nHashes = BloomFilter.optimalSize(nEntries, falsePositiveRate)
+        bloomFilter = BloomFilter(nBits, nHashes)
+        table = array('Q', bytes(nSlots * cls.OFFSET_SIZE))
+
+        tableOffset = cls.HEADER_SIZE + BloomFilter.nBytes(nBits)
+        dataOffset = tableOffset + nSlots * cls.OFFSET_SIZE
+
+        nWritten = 0
+        with open(filePath, 'wb') as indexFile:
+            indexFile.seek(dataOffset)
+            offset = dataOffset
+
+            for subject, attributes in items:
+                if nWritten == nEntries:
+                    raise AttributeIndexError('More than the expected %d '
+                                              'entries passed' % nEntries)
+                key = subject.encode('utf-8')
+                hashes = _hashKey(key)
+
+                slot = hashes[0] & mask
+                while table[slot] != 0:
+                    slot = (slot + 1) & mask
+                table[slot] = offset
+                bloomFilter.add(hashes)
+
+                value = json.dumps(attributes, separators=(',', ':'),
+                                   ensure_ascii=False).encode('utf-8')
+                record = b''.join((struct.pack(cls.LENGTH_FMT, len(key)), key,
+                                   struct.pack(cls.LENGTH_FMT, len(value)),
+                                   value))
+                indexFile.write(record)
+                offset += len(record)
+                nWritten += 1
+
+            if array('Q', [1]).tobytes() != struct.pack(cls.OFFSET_FMT, 1):
+                table.byteswap()
+
+            indexFile.seek(0)
+            indexFile.write(struct.pack(cls.HEADER_FMT, cls.MAGIC, nWritten,
+                                        nSlots, nBits, nHashes))
+            indexFile.write(bloomFilter.bits)
+            indexFile.write(table.tobytes())
+
+        log.debug("Written attribute index %r with %d entries", filePath,
+                  nWritten)
+
+    @classmethod
+    def readCSV(cls, csvFilePath):
+        """Read subject attributes from a CSV file with a header row naming
+        the columns given in CSV_FIELDNAMES.  Each row is one value of one
+        attribute for a subject
+
+        :param csvFilePath: CSV file path
+        :type csvFilePath: basestring
+        :return: subject to attribute name to list of values mapping
+        :rtype: dict
+        """
+        subjects = {}
+        with open(csvFilePath, newline='', encoding='utf-8') as csvFile:
+            reader = csv.DictReader(csvFile)
+            missing = set(cls.CSV_FIELDNAMES) - set(reader.fieldnames or ())
+            if missing:
+                raise AttributeIndexError('CSV file %r has no column(s) %s' %
+                                          (csvFilePath,
+                                           ', '.join(sorted(missing))))
+            subject, name, value = cls.CSV_FIELDNAMES
+            for row in reader:
+                attributes = subjects.setdefault(row[subject], {})
+                attributes.setdefault(row[name], []).append(row[value])
+
+        return subjects
+
+    @classmethod
+    def readJSON(cls, jsonFilePath):
+        """Read subject attributes from a JSON file containing an object
+        mapping each subject to an object of attribute name to value or list
+        of values
+
+        :param jsonFilePath: JSON file path
+        :type jsonFilePath: basestring
+        :return: subject to attribute name to list of values mapping
+        :rtype: dict
+        """
+        with open(jsonFilePath, encoding='utf-8') as jsonFile:
+            subjects = json.load(jsonFile)
+
+        if not isinstance(subjects, dict):
+            raise AttributeIndexError('Expecting JSON object in %r' %
+                                      jsonFilePath)
+
+        for attributes in subjects.values():
+            for name, values in list(attributes.items()):
+                if not isinstance(values, list):
+                    attributes[name] = [values]
+
+        return subjects
+
+    @classmethod
+    def build(cls, sourceFilePath, filePath,
+              falsePositiveRate=DEFAULT_FALSE_POSITIVE_RATE):
+        """Build an index file from a CSV or JSON file.  The format is set
+        from the file extension
+
+        :param sourceFilePath: CSV or JSON file path
+        :type sourceFilePath: basestring
+        :param filePath: path for new index file
+        :type filePath: basestring
+        :param falsePositiveRate: Bloom filter false positive rate
+        :type falsePositiveRate: float
+        """
+        extension = os.path.splitext(sourceFilePath)[1].lower()
+        if extension == '.csv':
+            subjects = cls.readCSV(sourceFilePath)
+        elif extension == '.json':
+            subjects = cls.readJSON(sourceFilePath)
+        else:
+            raise AttributeIndexError('Expecting .csv or .json file for '
+                                      'attribute index source; got %r' %
+                                      sourceFilePath)
+
+        cls.write(filePath, subjects.items(), len(subjects),
+                  falsePositiveRate=falsePositiveRate)
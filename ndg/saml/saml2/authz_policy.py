@@ -0,0 +1,297 @@
+"""SAML 2.0 authorisation decision policy - resource URI prefix based access
+rules for use by authorisation decision query interfaces
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import logging
+log = logging.getLogger(__name__)
+import sys
+from configparser import ConfigParser
+
+from ndg.saml.saml2.core import Action, AuthzDecisionQuery, DecisionType
+
+
+class AuthzDecisionPolicyConfigError(Exception):
+    """Error with authorisation decision policy configuration"""
+
+
+class ResourceTrieNode(object):
+    """Node in the resource URI trie of AuthzDecisionPolicy.  There is a node
+    for each URI path segment.
+
+    :ivar children: path segment to child node mapping
+    :type children: dict
+    :ivar rules: action to required attributes mapping for rules set
+    explicitly for this resource.  None if no rule has been set
+    :type rules: dict / NoneType
+    :ivar effectiveRules: action to required attributes mapping applying at
+    this node, combining rules set here with those inherited from parent
+    nodes.  Set when the policy is compiled
+    :type effectiveRules: dict / NoneType
+    """
+    __slots__ = ('children', 'rules', 'effectiveRules')
+
+    def __init__(self):
+        self.children = {}
+        self.rules = None
+        self.effectiveRules = None
+
+
+class AuthzDecisionPolicy(object):
+    """Authorisation decision policy.  Each rule sets the actions allowed on
+    resources under a given URI and the subject attributes needed to carry
+    them out.  Rules are compiled into a trie keyed by URI path segment so
+    that the time taken to make a decision depends on the depth of the
+    resource URI rather than the number of rules.
+
+    Policy files use INI format with a section for each rule e.g.
+
+    [data]
+    resource = http://localhost/dap/data/
+    actions = GET HEAD
+    attributes =
+        urn:esg:sitea:grouprole siteagroup:default
+
+    "actions" lists the action values allowed, or "*" for any action.
+    "actionNamespace" may be set, the default is the GHPP namespace for HTTP
+    methods.  "attributes" lists attribute name and value pairs separated by
+    white space, one per line.  A subject holding any one of them is allowed
+    access.  If omitted, access is allowed to any subject.
+
+    The most specific rule for an action applies.  Actions not set at the
+    most specific resource are inherited from rules set for parent URIs
+    unless a rule for "*" is set there.
+    Access to resources covered by a rule for actions not allowed by any
+    applying rule is denied.  If no rule covers a resource, the decision is
+    indeterminate.
+
+    :cvar ANY_ACTION: action value matching all actions
+    :type ANY_ACTION: string
+    """
+    RESOURCE_OPTNAME = 'resource'
+    ACTIONS_OPTNAME = 'actions'
+    ACTION_NAMESPACE_OPTNAME = 'actionNamespace'
+    ATTRIBUTES_OPTNAME = 'attributes'
+    ANY_ACTION = '*'
+
+    __slots__ = ('__root', '__compiled', '__safeNormalizationChars')
+
+    def __init__(self, safeNormalizationChars='/%'):
+        """
+        :param safeNormalizationChars: characters not to be quoted when
+        normalising resource URIs.  This should match the setting for
+        queries - see AuthzDecisionQuery
+        :type safeNormalizationChars: string
+        """
+        self.__root = ResourceTrieNode()
+        self.__compiled = True
+        self.__safeNormalizationChars = safeNormalizationChars
+
+    @classmethod
+    def fromConfigFile(cls, filePath):
+        """Load a policy from an INI format file
+
+        :param filePath: path to policy file
+        :type filePath: basestring
+        :return: authorisation decision policy
+        :rtype: ndg.saml.saml2.authz_policy.AuthzDecisionPolicy
+        :raise AuthzDecisionPolicyConfigError: error reading the file or
+        invalid rule
+        """
+        cfg = ConfigParser(interpolation=None)
+        if not cfg.read(filePath):
+            raise AuthzDecisionPolicyConfigError('Error reading '
+                                                 'authorisation decision '
+                                                 'policy file %r' % filePath)
+        policy = cls()
+        for ruleName in cfg.sections():
+            for optName in (cls.RESOURCE_OPTNAME, cls.ACTIONS_OPTNAME):
+                if not cfg.has_option(ruleName, optName):
+                    raise AuthzDecisionPolicyConfigError('No %r option set '
+                                                         'for rule %r in '
+                                                         'policy file %r' %
+                                                (optName, ruleName, filePath))
+
+            attributes = []
+            for line in cfg.get(ruleName, cls.ATTRIBUTES_OPTNAME,
+                                fallback='').splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    name, value = line.split(None, 1)
+                except ValueError:
+                    raise AuthzDecisionPolicyConfigError('Expecting attribute '
+                                                         'name and value for '
+                                                         'rule %r in policy '
+                                                         'file %r; got %r' %
+                                                (ruleName, filePath, line))
+                attributes.append((name, value.strip()))
+
+            policy.addRule(cfg.get(ruleName, cls.RESOURCE_OPTNAME),
+                           cfg.get(ruleName, cls.ACTIONS_OPTNAME).split(),
+                           attributes=attributes or None,
+                           actionNamespace=cfg.get(ruleName,
+                                                   cls.ACTION_NAMESPACE_OPTNAME,
+                                                   fallback=Action.GHPP_NS_URI))
+        policy.compile()
+        return policy
+
+    def _tokenise(self, resource):
+        """Split a resource URI into trie keys: scheme and network location
+        followed by each non-empty path segment.  HTTP(S) URIs are normalised
+        as for AuthzDecisionQuery.resource
+
+        :param resource: resource URI
+        :type resource: basestring
+        :return: trie keys
+        :rtype: list
+        """
+        if resource.startswith('http://') or resource.startswith('https://'):
+            resource = AuthzDecisionQuery.normalizeResourceURI(resource,
+                                                self.__safeNormalizationChars)
+
+        # Drop query and fragment - rules apply to paths
+        resource = resource.split('?', 1)[0].split('#', 1)[0]
+
+        scheme, sep, rest = resource.partition('://')
+        if sep:
+            location, _, path = rest.partition('/')
+            tokens = [scheme + sep + location]
+        else:
+            path = resource
+            tokens = []
+
+        tokens += [segment for segment in path.split('/') if segment]
+        return tokens
+
+    def addRule(self, resource, actions, attributes=None,
+                actionNamespace=Action.GHPP_NS_URI):
+        """Add a rule.  Call compile once all rules have been added
+
+        :param resource: resource URI.  The rule applies to this URI and all
+        those below it
+        :type resource: basestring
+        :param actions: action values allowed or ANY_ACTION
+        :type actions: iterable
+        :param attributes: attribute name, value pairs.  A subject holding
+        any one of them is allowed.  If None, any subject is allowed
+        :type attributes: iterable / NoneType
+        :param actionNamespace: namespace for actions
+        :type actionNamespace: basestring
+        """
+        if not isinstance(resource, str):
+            raise TypeError('Expecting string type for "resource"; got %r' %
+                            type(resource))
+
+        node = self.__root
+        for token in self._tokenise(resource):
+            node = node.children.setdefault(sys.intern(token),
+                                            ResourceTrieNode())
+        if node.rules is None:
+            node.rules = {}
+
+        if attributes is not None:
+            attributes = frozenset([(sys.intern(name), value)
+                                    for name, value in attributes])
+
+        for action in actions:
+            key = (actionNamespace, action)
+            if key in node.rules:
+                # Combine with any existing rule for the same action: any
+                # subject allowed by either is allowed
+                existing = node.rules[key]
+                if existing is None or attributes is None:
+                    node.rules[key] = None
+                else:
+                    node.rules[key] = existing | attributes
+            else:
+                node.rules[key] = attributes
+
+        self.__compiled = False
+
+    def compile(self):
+        """Set the effective rules for each node in the trie so that a
+        decision can be made from the deepest node matching a resource
+        """
+        stack = [(self.__root, None)]
+        while stack:
+            node, inheritedRules = stack.pop()
+            if node.rules is None:
+                node.effectiveRules = inheritedRules
+            elif inheritedRules is None:
+                node.effectiveRules = dict(node.rules)
+            else:
+                # A rule for any action overrides all inherited rules for
+                # actions in the same namespace
+                anyActionNamespaces = set([
+                    namespace for namespace, action in node.rules
+                    if action == self.__class__.ANY_ACTION])
+                node.effectiveRules = dict([
+                    (key, attributes)
+                    for key, attributes in inheritedRules.items()
+                    if key[0] not in anyActionNamespaces])
+                node.effectiveRules.update(node.rules)
+
+            for child in node.children.values():
+                stack.append((child, node.effectiveRules))
+
+        self.__compiled = True
+
+    def evaluate(self, resource, actions, subjectAttributes):
+        """Make an authorisation decision
+
+        :param resource: resource URI
+        :type resource: basestring
+        :param actions: (namespace, value) pairs for the actions requested
+        :type actions: iterable
+        :param subjectAttributes: attribute name to list of values mapping
+        for the subject
+        :type subjectAttributes: dict
+        :return: permit only if all the actions are allowed.  Indeterminate
+        if no actions are given
+        :rtype: ndg.saml.saml2.core.DecisionType
+        """
+        if not self.__compiled:
+            self.compile()
+
+        # Walk down to the most specific node covering the resource
+        node = self.__root
+        rules = node.effectiveRules
+        for token in self._tokenise(resource):
+            node = node.children.get(token)
+            if node is None:
+                break
+            rules = node.effectiveRules
+
+        if rules is None:
+            return DecisionType.INDETERMINATE
+
+        nActions = 0
+        for nActions, (namespace, action) in enumerate(actions, 1):
+            try:
+                attributes = rules[(namespace, action)]
+            except KeyError:
+                try:
+                    attributes = rules[(namespace, self.__class__.ANY_ACTION)]
+                except KeyError:
+                    return DecisionType.DENY
+
+            if attributes is None:
+                continue
+
+            for name, value in attributes:
+                if value in subjectAttributes.get(name, ()):
+                    break
+            else:
+                return DecisionType.DENY
+
+        # A query must ask for at least one action to be permitted
+        if nActions == 0:
+            return DecisionType.INDETERMINATE
+
+        return DecisionType.PERMIT
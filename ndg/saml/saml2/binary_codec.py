@@ -0,0 +1,566 @@
+"""Compact binary format for caching SAML objects
+
+Objects of the core types are encoded as tuples of their field values in
+the order given by a versioned schema, with child objects as nested tuples.
+Each distinct string is written to a payload once and referenced where it
+is repeated.  Strings are interned so that payloads decoded in the same
+process share them.  Payloads are framed with marshal so that writing and
+reading the tuples and strings is done in C.  The functions encoding and
+decoding each type are generated from the schema, and objects are made
+without running their initialisers or property setters.
+
+Payloads are intended for in-process, shared-memory and on-disk caches.  A
+payload written with a different schema version or which fails its checksum
+is rejected with BinaryCodecError which callers should treat as a cache 
+miss.  Values of
+types outside the schema, for example custom AttributeValue types and XACML
+statements, are pickled within the payload so payloads must only be read
+from trusted stores.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import marshal
+import pickle
+import struct
+import sys
+from zlib import crc32
+from datetime import datetime, timedelta
+
+from ndg.saml.common import SAMLObject, SAMLVersion
+from ndg.saml.common.xml import QName
+from ndg.saml.utils import TypedList
+from ndg.saml.saml2.core import (Attribute, AttributeStatement,
+                                 AuthzDecisionStatement, XSStringAttributeValue,
+                                 DecisionType, Subject, AbstractNameIDType,
+                                 NameID, Issuer, Response, StatusResponseType,
+                                 Status, StatusCode, StatusMessage, Action,
+                                 Assertion, Conditions)
+
+
+class BinaryCodecError(Exception):
+    """Error encoding or decoding the binary format"""
+
+
+# Field value kinds
+(_STRING, _BOOL, _QNAME, _DATETIME, _VERSION, _DECISION, _OBJECT,
+ _LIST) = range(8)
+
+# Version of the schema below.  Any change to the types, their fields, the
+# constants or the payload framing requires a new version
+SCHEMA_VERSION = 2
+
+# Types encoded field by field.  A type's code is its position.  Fields are
+# given as the class defining the slot, the slot name and the kind of value.
+# Every slot of a type must be listed as a field or as transient and the
+# element name must be a field.  Transient slots are set to None when
+# decoding
+_TYPES = (
+    (Response, (
+        (SAMLObject, '__qname', _QNAME),
+        (StatusResponseType, '__version', _VERSION),
+        (StatusResponseType, '__id', _STRING),
+        (StatusResponseType, '__inResponseTo', _STRING),
+        (StatusResponseType, '__issueInstant', _DATETIME),
+        (StatusResponseType, '__destination', _STRING),
+        (StatusResponseType, '__consent', _STRING),
+        (StatusResponseType, '__issuer', _OBJECT),
+        (StatusResponseType, '__status', _OBJECT),
+        (StatusResponseType, '__extensions', _OBJECT),
+        (Response, '__indexedChildren', _LIST),
+    ), ()),
+    (Assertion, (
+        (SAMLObject, '__qname', _QNAME),
+        (Assertion, '__version', _VERSION),
+        (Assertion, '__issueInstant', _DATETIME),
+        (Assertion, '__id', _STRING),
+        (Assertion, '__issuer', _OBJECT),
+        (Assertion, '__subject', _OBJECT),
+        (Assertion, '__conditions', _OBJECT),
+        (Assertion, '__advice', _OBJECT),
+        (Assertion, '__statements', _LIST),
+        (Assertion, '__authnStatements', _LIST),
+        (Assertion, '__authzDecisionStatements', _LIST),
+        (Assertion, '__attributeStatements', _LIST),
+    ), (
+        (Assertion, '__source'),
+    )),
+    (AttributeStatement, (
+        (SAMLObject, '__qname', _QNAME),
+        (AttributeStatement, '__attributes', _LIST),
+        (AttributeStatement, '__encryptedAttributes', _LIST),
+    ), ()),
+    (Attribute, (
+        (SAMLObject, '__qname', _QNAME),
+        (Attribute, '__name', _STRING),
+        (Attribute, '__nameFormat', _STRING),
+        (Attribute, '__friendlyName', _STRING),
+        (Attribute, '__attributeValues', _LIST),
+    ), ()),
+    (XSStringAttributeValue, (
+        (SAMLObject, '__qname', _QNAME),
+        (XSStringAttributeValue, '__value', _STRING),
+    ), ()),
+    (AuthzDecisionStatement, (
+        (SAMLObject, '__qname', _QNAME),
+        (AuthzDecisionStatement, '__resource', _STRING),
+        (AuthzDecisionStatement, '__decision', _DECISION),
+        (AuthzDecisionStatement, '__actions', _LIST),
+        (AuthzDecisionStatement, '__evidence', _OBJECT),
+        (AuthzDecisionStatement, '__normalizeResource', _BOOL),
+        (AuthzDecisionStatement, '__safeNormalizationChars', _STRING),
+    ), ()),
+    (Action, (
+        (SAMLObject, '__qname', _QNAME),
+        (Action, 'default_namespace', _STRING),
+        (Action, '__namespace', _STRING),
+        (Action, '__value', _STRING),
+        (Action, '__actionTypes', _OBJECT),
+    ), ()),
+    (Subject, (
+        (SAMLObject, '__qname', _QNAME),
+        (Subject, '__baseID', _OBJECT),
+        (Subject, '__nameID', _OBJECT),
+        (Subject, '__encryptedID', _OBJECT),
+        (Subject, '__subjectConfirmations', _LIST),
+    ), ()),
+    (NameID, (
+        (SAMLObject, '__qname', _QNAME),
+        (AbstractNameIDType, '__name', _STRING),
+        (AbstractNameIDType, '__nameQualifier', _STRING),
+        (AbstractNameIDType, '__spNameQualifier', _STRING),
+        (AbstractNameIDType, '__format', _STRING),
+        (AbstractNameIDType, '__spProvidedID', _STRING),
+        (AbstractNameIDType, '__value', _STRING),
+    ), ()),
+    (Issuer, (
+        (SAMLObject, '__qname', _QNAME),
+        (AbstractNameIDType, '__name', _STRING),
+        (AbstractNameIDType, '__nameQualifier', _STRING),
+        (AbstractNameIDType, '__spNameQualifier', _STRING),
+        (AbstractNameIDType, '__format', _STRING),
+        (AbstractNameIDType, '__spProvidedID', _STRING),
+        (AbstractNameIDType, '__value', _STRING),
+    ), ()),
+    (Status, (
+        (SAMLObject, '__qname', _QNAME),
+        (Status, '__statusCode', _OBJECT),
+        (Status, '__statusMessage', _OBJECT),
+        (Status, '__statusDetail', _OBJECT),
+    ), ()),
+    (StatusCode, (
+        (SAMLObject, '__qname', _QNAME),
+        (StatusCode, '__value', _STRING),
+        (StatusCode, '__childStatusCode', _OBJECT),
+    ), ()),
+    (StatusMessage, (
+        (SAMLObject, '__qname', _QNAME),
+        (StatusMessage, '__value', _STRING),
+    ), ()),
+    (Conditions, (
+        (SAMLObject, '__qname', _QNAME),
+        (Conditions, '__notBefore', _DATETIME),
+        (Conditions, '__notOnOrAfter', _DATETIME),
+        (Conditions, '__conditions', _LIST),
+    ), ()),
+)
+
+# Values of object fields which are shared rather than copied.  Each is
+# encoded as its position
+_CONSTANTS = (
+    Action.ACTION_TYPES,
+)
+
+# Decisions are decoded to the shared instance for their value
+_DECISIONS = {
+    None: None,
+    DecisionType.PERMIT_STR: DecisionType.PERMIT,
+    DecisionType.DENY_STR: DecisionType.DENY,
+    DecisionType.INDETERMINATE_STR: DecisionType.INDETERMINATE,
+}
+
+# Timestamps are encoded as microseconds since the epoch
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Payload header: magic bytes followed by the schema version.  The header is
+# followed by a CRC-32 checksum of the body so that corrupt or partly 
+# written payloads are rejected rather than decoded
+_MAGIC = b'NSB'
+_HEADER = _MAGIC + bytes((SCHEMA_VERSION,))
+_HEADER_SIZE = len(_HEADER)
+_CHECKSUM = struct.Struct('<I')
+_BODY_OFFSET = _HEADER_SIZE + _CHECKSUM.size
+
+# Format of the marshal framing.  Version 4 is read by all supported Python
+# versions
+_MARSHAL_VERSION = 4
+
+
+def _mangle(samlClass, slotName):
+    """Get the attribute name of a slot
+
+    @type samlClass: type
+    @param samlClass: class defining the slot
+    @type slotName: basestring
+    @param slotName: slot name as declared
+    @rtype: basestring
+    @return: attribute name
+    """
+    if slotName.startswith('__'):
+        return '_%s%s' % (samlClass.__name__.lstrip('_'), slotName)
+    return slotName
+
+
+def _getSlotNames(samlClass):
+    """Get the attribute names of all the slots of a class
+
+    @type samlClass: type
+    @param samlClass: SAML class
+    @rtype: set
+    @return: attribute names
+    """
+    slotNames = set()
+    for klass in samlClass.__mro__:
+        for slotName in klass.__dict__.get('__slots__', ()):
+            slotNames.add(_mangle(klass, slotName))
+    return slotNames
+
+
+class _Encoder(object):
+    """Encode one payload
+
+    @type strings: dict
+    @ivar strings: interned string for each string encoded.  Repeated
+    strings are encoded as the same object so that marshal writes them once
+    """
+    __slots__ = ('strings',)
+
+    # Encoding function for each type, set by _compile
+    ENCODERS = {}
+
+    # Position of each constant by its id
+    CONSTANT_CODES = dict([(id(constant), code)
+                           for code, constant in enumerate(_CONSTANTS)])
+
+    def __init__(self):
+        self.strings = {None: None}
+
+    def addString(self, value):
+        """Add a string not encoded before
+
+        @type value: basestring
+        @param value: string
+        @rtype: basestring
+        @return: interned string
+        @raise BinaryCodecError: value is not a string
+        """
+        if not isinstance(value, str):
+            raise BinaryCodecError('Expecting string type; got %r' %
+                                   type(value))
+
+        string = self.strings[value] = sys.intern(value)
+        return string
+
+    def encodeObject(self, value):
+        """Encode an object of any type or None
+
+        @param value: object
+        @type value: object
+        @rtype: tuple / bytes / int / NoneType
+        @return: fields of an object of a schema type, a pickle or the code
+        of a constant
+        @raise BinaryCodecError: value could not be pickled
+        """
+        if value is None:
+            return None
+
+        encode = self.__class__.ENCODERS.get(value.__class__)
+        if encode is not None:
+            return encode(self, value)
+
+        code = self.__class__.CONSTANT_CODES.get(id(value))
+        if code is not None:
+            return code
+
+        try:
+            return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            raise BinaryCodecError('Error pickling %r type value: %s' %
+                                   (type(value), e))
+
+
+# Decoding function for each type code, set by _compile
+_DECODERS = []
+
+
+def _decodeObject(encoded):
+    """Decode an object of any type or None
+
+    @type encoded: tuple / bytes / int / NoneType
+    @param encoded: encoded object
+    @rtype: object
+    @return: object decoded
+    """
+    if encoded.__class__ is tuple:
+        return _DECODERS[encoded[0]](encoded)
+
+    if encoded is None:
+        return None
+
+    if encoded.__class__ is int:
+        return _CONSTANTS[encoded]
+
+    return pickle.loads(encoded)
+
+
+def _decodeItems(value):
+    """Decode the items of a list
+
+    @type value: tuple
+    @param value: encoded items
+    @rtype: list
+    @return: items
+    """
+    items = []
+    append = items.append
+    for encoded in value:
+        if encoded.__class__ is tuple:
+            append(_DECODERS[encoded[0]](encoded))
+        else:
+            append(_decodeObject(encoded))
+    return items
+
+
+def _makeListDecoder(prototype):
+    """Make the function decoding a list field.  The list made has the type
+    of the list the field is initialised to.  Items are not checked against
+    the type of a TypedList again
+
+    @type prototype: list
+    @param prototype: list the field is initialised to
+    @rtype: callable
+    @return: decoding function
+    """
+    if prototype.__class__ is list:
+        return _decodeItems
+
+    if prototype.__class__ is not TypedList:
+        raise TypeError('Expecting list or TypedList type for list field; '
+                        'got %r' % type(prototype))
+
+    # Made without running the initialiser.  TypedList keeps its item type
+    # in the instance dictionary
+    state = prototype.__dict__
+    newList = TypedList.__new__
+    def decodeList(value):
+        items = newList(TypedList)
+        items.__dict__.update(state)
+        if value:
+            list.extend(items, _decodeItems(value))
+        return items
+
+    return decodeList
+
+
+def _encodeDatetime(value):
+    """Convert a timestamp to microseconds since the epoch.  Time zone aware
+    values are converted to naive UTC as they are for XML
+
+    @type value: datetime.datetime / NoneType
+    @param value: timestamp
+    @rtype: int / NoneType
+    @return: microseconds since the epoch
+    """
+    if value is None:
+        return None
+
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return (value - _EPOCH) // _MICROSECOND
+
+
+# Source of the statements encoding a field from the value of its slot,
+# "value", to "fieldN" for each kind of field
+_ENCODE_SOURCE = {
+    _STRING: (
+        'value = samlObject.{attrName}',
+        'field{n} = getString(value)',
+        'if field{n} is None and value is not None:',
+        '    field{n} = encoder.addString(value)'),
+    _BOOL: (
+        'field{n} = samlObject.{attrName}',),
+    _QNAME: (
+        'value = samlObject.{attrName}',
+        'if value is defaultQName:',
+        '    field{n} = None',
+        'else:',
+        '    field{n} = (value.namespaceURI, value.localPart, '
+        'value.prefix)'),
+    _DATETIME: (
+        'field{n} = encodeDatetime(samlObject.{attrName})',),
+    _VERSION: (
+        'value = samlObject.{attrName}',
+        'if value is not None:',
+        '    value = value._SAMLVersion__version',
+        'field{n} = value'),
+    _DECISION: (
+        'value = samlObject.{attrName}',
+        'if value is not None:',
+        '    value = value.value',
+        'field{n} = value'),
+    _OBJECT: (
+        'field{n} = encodeObject(samlObject.{attrName})',),
+    _LIST: (
+        'field{n} = tuple(map(encodeObject, samlObject.{attrName}))',),
+}
+
+# Source of the statements setting a slot from an encoded field, "fieldN",
+# for each kind of field
+_DECODE_SOURCE = {
+    _STRING: (
+        'samlObject.{attrName} = field{n}',),
+    _BOOL: (
+        'samlObject.{attrName} = field{n}',),
+    _QNAME: (
+        'if field{n} is None:',
+        '    samlObject.{attrName} = defaultQName',
+        'else:',
+        '    samlObject.{attrName} = QName(*field{n})'),
+    _DATETIME: (
+        'if field{n} is not None:',
+        '    field{n} = EPOCH + timedelta(microseconds=field{n})',
+        'samlObject.{attrName} = field{n}'),
+    _VERSION: (
+        'if field{n} is not None:',
+        '    field{n} = SAMLVersion(field{n})',
+        'samlObject.{attrName} = field{n}'),
+    _DECISION: (
+        'samlObject.{attrName} = DECISIONS[field{n}]',),
+    _OBJECT: (
+        'samlObject.{attrName} = decodeObject(field{n})',),
+    _LIST: (
+        'samlObject.{attrName} = decodeList{n}(field{n})',),
+}
+
+
+def _compile():
+    """Make the encoding and decoding functions for the types of the
+    schema.  As for collections.namedtuple, their source is generated so
+    that slots are read and written with plain attribute access rather than
+    a loop over descriptors, which is several times slower"""
+    for code, (samlClass, fields, transient) in enumerate(_TYPES):
+        attrNames = [_mangle(slotClass, slotName)
+                     for slotClass, slotName, _ in fields]
+        transientNames = [_mangle(slotClass, slotName)
+                          for slotClass, slotName in transient]
+
+        missing = _getSlotNames(samlClass).difference(attrNames,
+                                                      transientNames)
+        if missing:
+            raise TypeError('Slots %r of %r are not in the schema' %
+                            (sorted(missing), samlClass))
+
+        namespace = {
+            'samlClass': samlClass,
+            'new': samlClass.__new__,
+            'defaultQName': samlClass._getDefaultQName(),
+            'QName': QName,
+            'SAMLVersion': SAMLVersion,
+            'EPOCH': _EPOCH,
+            'timedelta': timedelta,
+            'DECISIONS': _DECISIONS,
+            'encodeDatetime': _encodeDatetime,
+            'decodeObject': _decodeObject,
+        }
+        prototype = samlClass()
+
+        encodeSource = ['def encode(encoder, samlObject):',
+                        '    getString = encoder.strings.get',
+                        '    encodeObject = encoder.encodeObject']
+        decodeSource = ['def decode(encoded):',
+                        '    (_, %s) = encoded' % ', '.join(
+                            ['field%d' % n for n in range(len(fields))]),
+                        '    samlObject = new(samlClass)']
+
+        for n, ((_, _, kind), attrName) in enumerate(zip(fields, attrNames)):
+            encodeSource += ['    ' + line.format(n=n, attrName=attrName)
+                             for line in _ENCODE_SOURCE[kind]]
+            decodeSource += ['    ' + line.format(n=n, attrName=attrName)
+                             for line in _DECODE_SOURCE[kind]]
+            if kind == _LIST:
+                namespace['decodeList%d' % n] = _makeListDecoder(
+                                                getattr(prototype, attrName))
+
+        encodeSource.append('    return (%d, %s)' % (code, ', '.join(
+                            ['field%d' % n for n in range(len(fields))])))
+        decodeSource += ['    samlObject.%s = None' % attrName
+                         for attrName in transientNames]
+        decodeSource.append('    return samlObject')
+
+        exec('\n'.join(encodeSource + [''] + decodeSource), namespace)
+        _Encoder.ENCODERS[samlClass] = namespace['encode']
+        _DECODERS.append(namespace['decode'])
+
+_compile()
+
+
+def dumps(samlObject):
+    """Encode a SAML object
+
+    @type samlObject: ndg.saml.common.SAMLObject
+    @param samlObject: object to encode.  Objects of types outside the
+    schema are pickled
+    @rtype: bytes
+    @return: payload
+    @raise BinaryCodecError: a value could not be encoded
+    """
+    try:
+        encoded = _Encoder().encodeObject(samlObject)
+    except TypeError as e:
+        # Unhashable value in a string field
+        raise BinaryCodecError('Error encoding payload: %s' % e)
+
+    try:
+        body = marshal.dumps(encoded, _MARSHAL_VERSION)
+    except ValueError as e:
+        raise BinaryCodecError('Error encoding payload: %s' % e)
+    
+    return _HEADER + _CHECKSUM.pack(crc32(body)) + body
+
+
+def loads(data):
+    """Decode a SAML object
+
+    @type data: bytes
+    @param data: payload made by dumps.  Payloads may contain pickles so
+    they must be read from a trusted source only
+    @rtype: ndg.saml.common.SAMLObject
+    @return: object decoded
+    @raise BinaryCodecError: data is not a payload of this schema version 
+    or is corrupt
+    """
+    if data[:_HEADER_SIZE] != _HEADER:
+        if data[:len(_MAGIC)] == _MAGIC and len(data) > len(_MAGIC):
+            raise BinaryCodecError('Payload schema version %d is not '
+                                   'supported; expecting version %d' %
+                                   (data[len(_MAGIC)], SCHEMA_VERSION))
+        raise BinaryCodecError('Data is not a SAML binary payload')
+
+    body = memoryview(data)[_BODY_OFFSET:]
+    if (len(data) < _BODY_OFFSET or 
+        _CHECKSUM.unpack_from(data, _HEADER_SIZE)[0] != crc32(body)):
+        raise BinaryCodecError('Payload checksum does not match: the data is '
+                               'corrupt or truncated')
+        
+    # Any error decoding is reported in the same way so that callers can 
+    # treat it as a cache miss.  This includes errors unpickling values
+    try:
+        return _decodeObject(marshal.loads(body))
+    except Exception as e:
+        raise BinaryCodecError('Error decoding payload: %s: %s' % 
+                               (type(e).__name__, e))
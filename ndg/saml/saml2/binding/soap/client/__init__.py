@@ -16,7 +16,9 @@ from configparser import ConfigParser
 
 from ndg.saml.common import SAMLObject
 
+from ndg.saml.utils import str2Bool
 from ndg.saml.utils.factory import importModuleObject
+from ndg.saml.xml.pullparser import SAMLPullParser
 from ndg.soap import SOAPEnvelopeBase
 from ndg.soap.etree import SOAPEnvelope
 from ndg.soap.client import SOAPClient, SOAPRequest
@@ -34,12 +36,14 @@ class SOAPBinding:
     RESPONSE_ENVELOPE_CLASS_OPTNAME = 'responseEnvelopeClass'
     SERIALISE_OPTNAME = 'serialise'
     DESERIALISE_OPTNAME = 'deserialise'  
+    PULL_PARSE_OPTNAME = 'pullParse'
     
     CONFIG_FILE_OPTNAMES = (
         REQUEST_ENVELOPE_CLASS_OPTNAME,
         RESPONSE_ENVELOPE_CLASS_OPTNAME,
         SERIALISE_OPTNAME,
-        DESERIALISE_OPTNAME
+        DESERIALISE_OPTNAME,
+        PULL_PARSE_OPTNAME
     )
     
     PRIVATE_ATTR_PREFIX = "__"
@@ -56,12 +60,14 @@ class SOAPBinding:
                  responseEnvelopeClass=SOAPEnvelope,
                  serialise=None,
                  deserialise=None,
-                 handlers=()):
+                 handlers=(),
+                 pullParse=False):
         '''Create SAML SOAP Client - Nb. serialisation functions must be set
         before send()ing the request'''
         self.__client = None
         self.__serialise = None
         self.__deserialise = None
+        self.pullParse = pullParse
         
         if serialise is not None:
             self.serialise = serialise
@@ -117,6 +123,26 @@ class SOAPBinding:
                            doc="callable to de-serialise response from XML "
                                "type")
 
+    def _getPullParse(self):
+        return self.__pullParse
+
+    def _setPullParse(self, value):
+        if isinstance(value, bool):
+            self.__pullParse = value
+            
+        elif isinstance(value, str):
+            self.__pullParse = str2Bool(value)
+        else:
+            raise TypeError('Expecting bool or string type for "pullParse"; '
+                            'got %r instead' % type(value))
+
+    pullParse = property(_getPullParse, _setPullParse,
+                         doc="Set to True to build the SAML response object "
+                             "directly from the HTTP response stream with "
+                             "ndg.saml.xml.pullparser.SAMLPullParser instead "
+                             "of parsing the SOAP envelope into an element "
+                             "tree and calling deserialise")
+
     def _getRequestEnvelopeClass(self):
         return self.__requestEnvelopeClass
 
@@ -149,7 +175,7 @@ class SOAPBinding:
     client = property(_getClient, _setClient, 
                       doc="SOAP Client object")   
 
-    def send(self, samlObj, uri=None, request=None):
+    def send(self, samlObj, uri=None, request=None, **deserialiseKw):
         '''Make an request/query to a remote SAML service
         
         :type samlObj: saml.common.SAMLObject
@@ -159,12 +185,16 @@ class SOAPBinding:
         :type request: ndg.security.common.soap.SOAPRequest
         :param request: SOAP request object to which query will be attached
         defaults to ndg.security.common.soap.client.SOAPRequest
+        :type deserialiseKw: dict
+        :param deserialiseKw: keywords for the deserialise function or for 
+        the pull parser if pullParse is set e.g. attributeProjection to parse
+        only the attributes needed from a response
         '''
         if self.serialise is None:
             raise AttributeError('No "serialise" method set to serialise the '
                                  'request')
 
-        if self.deserialise is None:
+        if self.deserialise is None and not self.pullParse:
             raise AttributeError('No "deserialise" method set to deserialise '
                                  'the response')
            
@@ -185,13 +215,22 @@ class SOAPBinding:
         # Attach query to SOAP body
         request.envelope.body.elem.append(samlElem)
             
+        if self.pullParse:
+            response = self.client.send(request, parse=False)
+            try:
+                return SAMLPullParser.parseSOAPEnvelope(response.fileObject,
+                                                        **deserialiseKw)
+            finally:
+                response.fileObject.close()
+            
         response = self.client.send(request)
         
         if len(response.envelope.body.elem) != 1:
             raise SOAPBindingInvalidResponse("Expecting single child element "
                                              "is SOAP body")
             
-        response = self.deserialise(response.envelope.body.elem[0])
+        response = self.deserialise(response.envelope.body.elem[0],
+                                    **deserialiseKw)
         
         return response
 
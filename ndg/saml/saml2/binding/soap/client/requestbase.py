@@ -217,6 +217,9 @@ class RequestBaseSOAPBinding(SOAPBinding):
         :type request: ndg.security.common.soap.UrlLib2SOAPRequest
         :param request: SOAP request object to which query will be attached
         defaults to ndg.security.common.soap.client.UrlLib2SOAPRequest
+        :type kw: dict
+        :param kw: other keywords are passed to the response deserialise 
+        function.  See SOAPBinding.send
         '''
         self._validateQueryParameters(query)
         self._initSend(query)
@@ -0,0 +1,198 @@
+"""WSGI SAML package for a SAML 2.0 Attribute Authority query interface
+backed by a memory mapped attribute index
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.saml2.core import (Attribute, AttributeStatement, StatusCode,
+                                 XSStringAttributeValue)
+from ndg.saml.saml2.attribute_index import AttributeIndex
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterfacebase import (
+    QueryInterfaceMiddlewareBase, QueryInterfaceMiddlewareConfigError)
+
+
+class AttributeAuthorityMiddleware(QueryInterfaceMiddlewareBase):
+    """Attribute Authority query interface.  Answers SAML Attribute Queries
+    from an attribute index file.
+
+    Build the index file offline with AttributeIndex.build from a CSV or JSON
+    file.  The index is memory mapped read-only so that its pages are shared
+    between the worker processes of a pre-forking server such as gunicorn
+
+    :cvar DEFAULT_NAME_FORMAT: name format for attributes returned where none
+    was set for the attribute in the query
+    :type DEFAULT_NAME_FORMAT: basestring
+    """
+    INDEX_FILEPATH_OPTNAME = 'indexFilePath'
+    VALID_QUERY_ISSUERS_OPTNAME = 'validQueryIssuers'
+
+    CONFIG_FILE_OPTNAMES = QueryInterfaceMiddlewareBase.CONFIG_FILE_OPTNAMES + (
+        INDEX_FILEPATH_OPTNAME,
+        VALID_QUERY_ISSUERS_OPTNAME
+    )
+
+    DEFAULT_NAME_FORMAT = SAMLConstants.XSD_NS + "#" + \
+                                        XSStringAttributeValue.TYPE_LOCAL_NAME
+
+    def __init__(self, app):
+        ''':type app: callable following WSGI interface
+        :param app: next middleware application in the chain
+        '''
+        super(AttributeAuthorityMiddleware, self).__init__(app)
+        self.__index = None
+        self.__validQueryIssuers = None
+
+    def initialise(self, global_conf, prefix='', **app_conf):
+        '''
+        :type global_conf: dict
+        :param global_conf: PasteDeploy global configuration dictionary
+        :type prefix: basestring
+        :param prefix: prefix for configuration items
+        :type app_conf: dict
+        :param app_conf: PasteDeploy application specific configuration
+        dictionary
+        '''
+        super(AttributeAuthorityMiddleware, self).initialise(global_conf,
+                                                             prefix=prefix,
+                                                             **app_conf)
+        if self.index is None:
+            raise QueryInterfaceMiddlewareConfigError('No %r option set' %
+                                (prefix + self.__class__.INDEX_FILEPATH_OPTNAME))
+
+    def _getIndex(self):
+        return self.__index
+
+    def _setIndex(self, value):
+        if not isinstance(value, AttributeIndex):
+            raise TypeError('Expecting %r type for "index" attribute; got %r' %
+                            (AttributeIndex, type(value)))
+        self.__index = value
+
+    index = property(_getIndex, _setIndex,
+                     doc="Attribute index queries are answered from")
+
+    def _setIndexFilePath(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "indexFilePath" '
+                            'attribute; got %r' % type(value))
+        self.index = AttributeIndex(value)
+
+    indexFilePath = property(fset=_setIndexFilePath,
+                             doc="Set the attribute index from a file path")
+
+    def _getValidQueryIssuers(self):
+        return self.__validQueryIssuers
+
+    def _setValidQueryIssuers(self, value):
+        if isinstance(value, str):
+            # Issuer names may contain spaces and commas so use one name per
+            # line in config files
+            value = [name.strip() for name in value.splitlines()
+                     if name.strip()]
+
+        if value is None:
+            self.__validQueryIssuers = None
+        else:
+            self.__validQueryIssuers = frozenset(value)
+
+    validQueryIssuers = property(_getValidQueryIssuers,
+                                 _setValidQueryIssuers,
+                                 doc="Names of issuers which may query this "
+                                     "authority.  If None, any issuer may")
+
+    def queryInterface(self, query, response):
+        """Attribute Query interface called by
+        ndg.saml.saml2.binding.soap.server.wsgi.queryinterface.SOAPQueryInterfaceMiddleware
+
+        :type query: ndg.saml.saml2.core.AttributeQuery
+        :param query: SAML attribute query
+        :type response: ndg.saml.saml2.core.Response
+        :param response: SAML response to populate
+        :return: response
+        :rtype: ndg.saml.saml2.core.Response
+        """
+        if (self.__validQueryIssuers is not None and
+            (query.issuer is None or
+             query.issuer.value not in self.__validQueryIssuers)):
+            response.status.statusCode.value = StatusCode.REQUEST_DENIED_URI
+            response.status.statusMessage.value = 'Invalid issuer'
+            return response
+
+        subjectNameID = query.subject.nameID
+        subjectAttributes = self.__index.lookup(subjectNameID.value)
+        if subjectAttributes is None:
+            response.status.statusCode.value = StatusCode.UNKNOWN_PRINCIPAL_URI
+            response.status.statusMessage.value = 'Unknown user'
+            return response
+
+        attributeStatement = AttributeStatement()
+
+        # No attributes in the query means return all of them
+        if len(query.attributes) == 0:
+            for name, values in subjectAttributes.items():
+                attributeStatement.attributes.append(
+                                            self._createAttribute(name, values))
+        else:
+            for queryAttribute in query.attributes:
+                values = subjectAttributes.get(queryAttribute.name)
+                if values is None:
+                    response.status.statusCode.value = \
+                                        StatusCode.INVALID_ATTR_NAME_VALUE_URI
+                    response.status.statusMessage.value = (
+                                    'Attribute %r is not available for this '
+                                    'subject' % queryAttribute.name)
+                    return response
+
+                attributeStatement.attributes.append(self._createAttribute(
+                                                queryAttribute.name, values,
+                                                queryAttribute.nameFormat,
+                                                queryAttribute.friendlyName))
+
+        # The schema requires an attribute statement to have at least one
+        # attribute so a subject with none gets no assertion
+        if len(attributeStatement.attributes) > 0:
+            assertion = self._createAssertion(response,
+                                              subjectNameID=subjectNameID)
+            assertion.attributeStatements.append(attributeStatement)
+            response.assertions.append(assertion)
+
+        response.status.statusCode.value = StatusCode.SUCCESS_URI
+
+        return response
+
+    @classmethod
+    def _createAttribute(cls, name, values, nameFormat=None,
+                         friendlyName=None):
+        """Make a SAML attribute with string values
+
+        :type name: basestring
+        :param name: attribute name
+        :type values: list
+        :param values: attribute values
+        :type nameFormat: basestring / NoneType
+        :param nameFormat: attribute name format
+        :type friendlyName: basestring / NoneType
+        :param friendlyName: attribute friendly name
+        :return: new attribute
+        :rtype: ndg.saml.saml2.core.Attribute
+        """
+        attribute = Attribute()
+        attribute.name = name
+        attribute.nameFormat = nameFormat or cls.DEFAULT_NAME_FORMAT
+        if friendlyName is not None:
+            attribute.friendlyName = friendlyName
+
+        for value in values:
+            attributeValue = XSStringAttributeValue()
+            attributeValue.value = value
+            attribute.attributeValues.append(attributeValue)
+
+        return attribute
@@ -0,0 +1,151 @@
+"""WSGI SAML package for a SAML 2.0 Authorisation Decision query interface
+using a resource URI based authorisation decision policy
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+
+from ndg.saml.saml2.core import AuthzDecisionStatement, Action, StatusCode
+from ndg.saml.saml2.authz_policy import AuthzDecisionPolicy
+from ndg.saml.saml2.attribute_index import AttributeIndex
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterfacebase import (
+    QueryInterfaceMiddlewareBase, QueryInterfaceMiddlewareConfigError)
+
+
+class AuthzDecisionMiddleware(QueryInterfaceMiddlewareBase):
+    """Authorisation Decision query interface.  Answers SAML Authorisation
+    Decision Queries from a policy file of resource URIs, actions and the
+    subject attributes required - see
+    ndg.saml.saml2.authz_policy.AuthzDecisionPolicy.  Configure
+    SOAPQueryInterfaceMiddleware to deserialise AuthzDecisionQuery elements.
+
+    Subject attributes are looked up in an attribute index file - see
+    ndg.saml.saml2.attribute_index.AttributeIndex.  If none is set, only rules
+    with no required attributes allow access.
+    """
+    POLICY_FILEPATH_OPTNAME = 'policyFilePath'
+    ATTRIBUTE_INDEX_FILEPATH_OPTNAME = 'attributeIndexFilePath'
+
+    CONFIG_FILE_OPTNAMES = QueryInterfaceMiddlewareBase.CONFIG_FILE_OPTNAMES + (
+        POLICY_FILEPATH_OPTNAME,
+        ATTRIBUTE_INDEX_FILEPATH_OPTNAME
+    )
+
+    def __init__(self, app):
+        ''':type app: callable following WSGI interface
+        :param app: next middleware application in the chain
+        '''
+        super(AuthzDecisionMiddleware, self).__init__(app)
+        self.__policy = None
+        self.__attributeIndex = None
+
+    def initialise(self, global_conf, prefix='', **app_conf):
+        '''
+        :type global_conf: dict
+        :param global_conf: PasteDeploy global configuration dictionary
+        :type prefix: basestring
+        :param prefix: prefix for configuration items
+        :type app_conf: dict
+        :param app_conf: PasteDeploy application specific configuration
+        dictionary
+        '''
+        super(AuthzDecisionMiddleware, self).initialise(global_conf,
+                                                        prefix=prefix,
+                                                        **app_conf)
+        if self.policy is None:
+            raise QueryInterfaceMiddlewareConfigError('No %r option set' %
+                        (prefix + self.__class__.POLICY_FILEPATH_OPTNAME))
+
+    def _getPolicy(self):
+        return self.__policy
+
+    def _setPolicy(self, value):
+        if not isinstance(value, AuthzDecisionPolicy):
+            raise TypeError('Expecting %r type for "policy" attribute; got %r' %
+                            (AuthzDecisionPolicy, type(value)))
+        self.__policy = value
+
+    policy = property(_getPolicy, _setPolicy,
+                      doc="Policy authorisation decisions are made from")
+
+    def _setPolicyFilePath(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "policyFilePath" '
+                            'attribute; got %r' % type(value))
+        self.policy = AuthzDecisionPolicy.fromConfigFile(value)
+
+    policyFilePath = property(fset=_setPolicyFilePath,
+                              doc="Set the policy from a file path")
+
+    def _getAttributeIndex(self):
+        return self.__attributeIndex
+
+    def _setAttributeIndex(self, value):
+        if not isinstance(value, (AttributeIndex, type(None))):
+            raise TypeError('Expecting %r type for "attributeIndex" attribute; '
+                            'got %r' % (AttributeIndex, type(value)))
+        self.__attributeIndex = value
+
+    attributeIndex = property(_getAttributeIndex, _setAttributeIndex,
+                              doc="Index of subject attributes")
+
+    def _setAttributeIndexFilePath(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "attributeIndexFilePath"'
+                            ' attribute; got %r' % type(value))
+        self.attributeIndex = AttributeIndex(value)
+
+    attributeIndexFilePath = property(fset=_setAttributeIndexFilePath,
+                                      doc="Set the attribute index from a "
+                                          "file path")
+
+    def queryInterface(self, query, response):
+        """Authorisation Decision Query interface called by
+        ndg.saml.saml2.binding.soap.server.wsgi.queryinterface.SOAPQueryInterfaceMiddleware
+
+        :type query: ndg.saml.saml2.core.AuthzDecisionQuery
+        :param query: SAML authorisation decision query
+        :type response: ndg.saml.saml2.core.Response
+        :param response: SAML response to populate
+        :return: response
+        :rtype: ndg.saml.saml2.core.Response
+        """
+        subjectNameID = query.subject.nameID
+
+        subjectAttributes = None
+        if self.__attributeIndex is not None:
+            subjectAttributes = self.__attributeIndex.lookup(
+                                                        subjectNameID.value)
+        if subjectAttributes is None:
+            subjectAttributes = {}
+
+        decision = self.__policy.evaluate(query.resource,
+                                          [(action.namespace, action.value)
+                                           for action in query.actions],
+                                          subjectAttributes)
+
+        log.debug("Authorisation decision for subject %r, resource %r: %s",
+                  subjectNameID.value, query.resource, decision)
+
+        authzDecisionStatement = AuthzDecisionStatement()
+        authzDecisionStatement.decision = decision
+        authzDecisionStatement.resource = query.resource
+        for queryAction in query.actions:
+            action = Action()
+            action.namespace = queryAction.namespace
+            action.value = queryAction.value
+            authzDecisionStatement.actions.append(action)
+
+        assertion = self._createAssertion(response,
+                                          subjectNameID=subjectNameID)
+        assertion.authzDecisionStatements.append(authzDecisionStatement)
+        response.assertions.append(assertion)
+        response.status.statusCode.value = StatusCode.SUCCESS_URI
+
+        return response
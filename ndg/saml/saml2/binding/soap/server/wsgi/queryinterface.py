@@ -11,22 +11,28 @@ __license__ = "BSD - see LICENSE file in top-level package directory"
 import logging
 log = logging.getLogger(__name__)
 import traceback
+from inspect import signature
 from io import StringIO
+from itertools import chain
 from uuid import uuid4
 from datetime import datetime, timedelta
 
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
 from ndg.soap.server.wsgi.middleware import SOAPMiddleware
 from ndg.soap.etree import SOAPEnvelope
 
 from ndg.saml.utils import str2Bool
 from ndg.saml.utils.factory import importModuleObject
 from ndg.saml.xml import UnknownAttrProfile
-from ndg.saml.xml.etree import QName
+from ndg.saml.xml.pullparser import SAMLPullParser
 from ndg.saml.common import SAMLVersion
 from ndg.saml.utils import SAMLDateTime
 from ndg.saml.saml2.core import (Response, Status, StatusCode, StatusMessage, 
                                  Issuer) 
 from ndg.saml.saml2.binding.soap import SOAPBindingInvalidResponse
+from ndg.saml.saml2.release_policy import AttributeReleasePolicy
 
 try:
     from ndg.saml.saml2.xacml_profile import XACMLAuthzDecisionQuery
@@ -35,6 +41,8 @@ except ImportError as e:
     from warnings import warn
     warn('Error importing XACML packages - disabling SAML XACML profile ' + \
          'support.  (Error is: %s)' % e)
+    etree_xacml_profile = None
+    
     class XACMLAuthzDecisionQuery(object):
         """XACML Authz Decision Query substitute"""
         DEFAULT_ELEMENT_LOCAL_NAME = 'XACMLAuthzDecisionQuery'
@@ -51,9 +59,205 @@ class SOAPQueryInterfaceMiddlewareConfigError(Exception):
 class QueryIssueInstantInvalid(SOAPBindingInvalidResponse):
     """Invalid timestamp for incoming query"""
     
+
+class QueryTypeRegistration(object):
+    """Entry in the query type dispatch registry of 
+    SOAPQueryInterfaceMiddleware.  It binds together everything needed to
+    process a given query element type so that a request can be dispatched
+    with a single dictionary lookup on the element tag
+    
+    :ivar deserialise: callable to parse the query element into a SAML query
+    object
+    :type deserialise: callable
+    :ivar validate: callable taking the SAML query and response to check the
+    query before it is passed to the query interface.  If it accepts a third
+    argument, it is also passed the settings for the mount point the query 
+    was received on
+    :type validate: callable
+    :ivar validateTakesMountPoint: True if validate is passed the mount point
+    :type validateTakesMountPoint: bool
+    :ivar queryInterfaceKeyName: environ key for the query interface callable
+    which processes this query type.  If None, the query interface key name 
+    for the mount point the request was received on is used
+    :type queryInterfaceKeyName: basestring / NoneType
+    """
+    __slots__ = ('deserialise', 'validate', 'validateTakesMountPoint', 
+                 'queryInterfaceKeyName')
+    
+    def __init__(self, deserialise, validate, queryInterfaceKeyName):
+        if not callable(deserialise):
+            raise TypeError('Expecting callable for "deserialise"; got %r' % 
+                            deserialise)
+            
+        if not callable(validate):
+            raise TypeError('Expecting callable for "validate"; got %r' % 
+                            validate)
+            
+        if not isinstance(queryInterfaceKeyName, (str, type(None))):
+            raise TypeError('Expecting string or None type for '
+                            '"queryInterfaceKeyName" got %r' % 
+                            queryInterfaceKeyName)
+            
+        self.deserialise = deserialise
+        self.validate = validate
+        self.validateTakesMountPoint = self._takesMountPoint(validate)
+        self.queryInterfaceKeyName = queryInterfaceKeyName
+        
+    @staticmethod
+    def _takesMountPoint(validate):
+        """Check whether a validator can be passed the mount point as well as
+        the query and response
+        
+        :type validate: callable
+        :param validate: validator
+        :return: True if validate accepts three positional arguments
+        :rtype: bool
+        """
+        try:
+            signature(validate).bind(None, None, None)
+        except TypeError:
+            return False
+        except ValueError:
+            # No signature available e.g. for some builtins
+            return False
+        
+        return True
+        
+    
+    
+class QueryInterfaceMountPoint(object):
+    """Settings for a single path served by SOAPQueryInterfaceMiddleware.  A
+    single middleware instance can serve a table of these, one for each 
+    tenant e.g. virtual organisation, each with its own issuer and query 
+    interface.
+    
+    :cvar CONFIG_FILE_OPTNAMES: settings which can be made for each mount 
+    point in the middleware configuration
+    :type CONFIG_FILE_OPTNAMES: tuple
+    """
+    CONFIG_FILE_OPTNAMES = (
+        'mountPath',
+        'queryInterfaceKeyName',
+        'samlVersion',
+        'issuerName',
+        'issuerFormat',
+        'clockSkewTolerance'
+    )
+    
+    __slots__ = (
+        '__mountPath',
+        '__queryInterfaceKeyName',
+        '__samlVersion',
+        '__clockSkewTolerance',
+        '__issuerProxy'
+    )
+    
+    def __init__(self, **settings):
+        ''':type settings: dict
+        :param settings: initial settings, keywords correspond to 
+        CONFIG_FILE_OPTNAMES
+        '''
+        self.__mountPath = None
+        self.__queryInterfaceKeyName = None
+        self.__samlVersion = SAMLVersion.VERSION_20
+        self.__clockSkewTolerance = timedelta(seconds=0.)
+        self.__issuerProxy = Issuer()
+        
+        for name, val in list(settings.items()):
+            if name not in QueryInterfaceMountPoint.CONFIG_FILE_OPTNAMES:
+                raise AttributeError('Invalid mount point setting %r' % name)
+            
+            if val is not None:
+                setattr(self, name, val)
+        
+    def _getMountPath(self):
+        return self.__mountPath
+    
+    def _setMountPath(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "mountPath" attribute; '
+                            'got %r' % value)
+            
+        self.__mountPath = value
+            
+    mountPath = property(fget=_getMountPath,
+                         fset=_setMountPath,
+                         doc='URL path for this mount point equivalent to '
+                             'environ[\'PATH_INFO\']')
     
-class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
-    """Implementation of SAML 2.0 SOAP Binding for Query/Request Binding
+    def _getQueryInterfaceKeyName(self):
+        return self.__queryInterfaceKeyName
+
+    def _setQueryInterfaceKeyName(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "queryInterfaceKeyName"'
+                            ' got %r' % value)
+            
+        self.__queryInterfaceKeyName = value
+
+    queryInterfaceKeyName = property(fget=_getQueryInterfaceKeyName, 
+                                     fset=_setQueryInterfaceKeyName, 
+                                     doc="environ key name for the query "
+                                         "interface for this mount point")
+
+    def _getSamlVersion(self):
+        return self.__samlVersion
+
+    def _setSamlVersion(self, value):
+        if not isinstance(value, (str, tuple)):
+            raise TypeError('Expecting string or tuple type for "samlVersion";'
+                            ' got %r' % type(value)) 
+        self.__samlVersion = value
+
+    samlVersion = property(_getSamlVersion, _setSamlVersion, None, 
+                           "SAML Version to enforce for incoming queries")
+    
+    def _getClockSkewTolerance(self):
+        return self.__clockSkewTolerance
+
+    def _setClockSkewTolerance(self, value):
+        if isinstance(value, timedelta):
+            self.__clockSkewTolerance = value
+            
+        elif isinstance(value, (float, int)):
+            self.__clockSkewTolerance = timedelta(seconds=value)
+            
+        elif isinstance(value, str):
+            self.__clockSkewTolerance = timedelta(seconds=float(value))
+        else:
+            raise TypeError('Expecting timedelta, float, int, long or string '
+                            'type for "clockSkewTolerance"; got %r' % 
+                            type(value))  
+                
+    clockSkewTolerance = property(fget=_getClockSkewTolerance, 
+                                  fset=_setClockSkewTolerance, 
+                                  doc="Tolerance of +/- n seconds to allow for "
+                                      "clock skew when checking the "
+                                      "timestamps of client queries")
+    
+    def _getIssuerFormat(self):
+        return self.__issuerProxy.format
+
+    def _setIssuerFormat(self, value):
+        self.__issuerProxy.format = value
+
+    issuerFormat = property(_getIssuerFormat, _setIssuerFormat, 
+                            doc="Issuer format")
+
+    def _getIssuerName(self):
+        return self.__issuerProxy.value
+
+    def _setIssuerName(self, value):
+        self.__issuerProxy.value = value
+
+    issuerName = property(_getIssuerName, _setIssuerName, 
+                          doc="Name of issuer of SAML Query Response")
+    
+    
+class SOAPQueryInterfaceMiddleware(SOAPMiddleware, QueryInterfaceMountPoint):
+    """Implementation of SAML 2.0 SOAP Binding for Query/Request Binding.  The
+    middleware's own settings are the default mount point so the mount point
+    settings and their validation are inherited from QueryInterfaceMountPoint
     
     :type PATH_OPTNAME: basestring
     :cvar PATH_OPTNAME: name of app_conf option for specifying a path or paths
@@ -64,6 +268,24 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
     :type DEFAULT_QUERY_INTERFACE_KEYNAME: basestring
     :param DEFAULT_QUERY_INTERFACE_KEYNAME: default key name for referencing
     SAML query interface in environ
+    :type MOUNT_POINTS_OPTNAME: basestring
+    :cvar MOUNT_POINTS_OPTNAME: app_conf option name for a list of names of 
+    mount points served by this middleware in addition to mountPath.  Settings
+    for each are made with options of the form 
+    "mountPoint.<name>.<setting>" where setting is one of 
+    QueryInterfaceMountPoint.CONFIG_FILE_OPTNAMES.  Settings not made are 
+    taken from the middleware level settings
+    :type MOUNT_POINT_OPTPREFIX: basestring
+    :cvar MOUNT_POINT_OPTPREFIX: app_conf option prefix for mount point
+    settings
+    :type DEFAULT_STREAM_RESPONSE_BUFFER_SIZE: int
+    :cvar DEFAULT_STREAM_RESPONSE_BUFFER_SIZE: default size in bytes up to 
+    which a streamed response is buffered and returned with a Content-length 
+    header
+    :type STREAM_RESPONSE_MARKER: basestring
+    :cvar STREAM_RESPONSE_MARKER: text of XML comment used to locate the point
+    in the serialised SOAP envelope at which to insert the SAML assertions
+    when streaming the response
     """
     log = logging.getLogger('SOAPQueryInterfaceMiddleware')
     PATH_OPTNAME = "mountPath"
@@ -80,6 +302,18 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
     ISSUER_NAME_OPTNAME = 'issuerName'
     ISSUER_FORMAT_OPTNAME = 'issuerFormat'
     CLOCK_SKEW_TOLERANCE_OPTNAME = 'clockSkewTolerance'
+    MOUNT_POINTS_OPTNAME = 'mountPoints'
+    MOUNT_POINT_OPTPREFIX = 'mountPoint.'
+    SERIALISE_ASSERTION_OPTNAME = 'serialiseAssertion'
+    STREAM_RESPONSE_OPTNAME = 'streamResponse'
+    STREAM_RESPONSE_BUFFER_SIZE_OPTNAME = 'streamResponseBufferSize'
+    PULL_PARSE_OPTNAME = 'pullParse'
+    ATTRIBUTE_RELEASE_POLICY_FILEPATH_OPTNAME = \
+                                        'attributeReleasePolicyFilePath'
+    
+    DEFAULT_SERIALISE_ASSERTION = 'ndg.saml.xml.etree:AssertionElementTree.toXML'
+    DEFAULT_STREAM_RESPONSE_BUFFER_SIZE = 64 * 1024
+    STREAM_RESPONSE_MARKER = 'ndg.saml.assertions'
     
     CONFIG_FILE_OPTNAMES = (
         PATH_OPTNAME,
@@ -93,38 +327,52 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         SAML_VERSION_OPTNAME,
         ISSUER_NAME_OPTNAME,
         ISSUER_FORMAT_OPTNAME,
-        CLOCK_SKEW_TOLERANCE_OPTNAME
+        CLOCK_SKEW_TOLERANCE_OPTNAME,
+        SERIALISE_ASSERTION_OPTNAME,
+        STREAM_RESPONSE_OPTNAME,
+        STREAM_RESPONSE_BUFFER_SIZE_OPTNAME,
+        PULL_PARSE_OPTNAME,
+        ATTRIBUTE_RELEASE_POLICY_FILEPATH_OPTNAME
     )
     
     def __init__(self, app):
         ''':type app: callable following WSGI interface
         :param app: next middleware application in the chain 
         '''     
-        super(SOAPQueryInterfaceMiddleware, self).__init__()
+        # PATH_INFO -> mount point settings so that dispatch is a single dict
+        # lookup.  The middleware settings are the default mount point and 
+        # are kept in step with changes to mountPath
+        self.__mountPoints = {}
+        
+        cls = SOAPQueryInterfaceMiddleware
+        super(SOAPQueryInterfaceMiddleware, self).__init__(
+                    mountPath='/',
+                    queryInterfaceKeyName=cls.DEFAULT_QUERY_INTERFACE_KEYNAME)
         
         self._app = app
         
         # Set defaults
-        cls = SOAPQueryInterfaceMiddleware
-        self.__queryInterfaceKeyName = cls.DEFAULT_QUERY_INTERFACE_KEYNAME
-        self.__mountPath = '/'
         self.__requestEnvelopeClass = None
         self.__responseEnvelopeClass = None
         self.__serialise = None
         self.__deserialise = None
         self.__deserialiseXacmlProfile = None
         self.__issuer = None
-        self.__clockSkewTolerance = timedelta(seconds=0.)
         self.__verifyTimeConditions = True
         self.__verifySAMLVersion = True
-        self.__samlVersion = SAMLVersion.VERSION_20
+        self.__serialiseAssertion = None
+        self.__streamResponse = False
+        self.__streamResponseBufferSize = \
+                                    cls.DEFAULT_STREAM_RESPONSE_BUFFER_SIZE
+        self.__pullParse = False
+        self.__attributeReleasePolicy = None
         
-        # Proxy object for SAML Response Issuer attributes.  By generating a 
-        # proxy the Response objects inherent attribute validation can be 
-        # applied to Issuer related config parameters before they're assigned to
-        # the response issuer object generated in the authorisation decision 
-        # query response
-        self.__issuerProxy = Issuer()
+        # Query element tag -> QueryTypeRegistration.  Populated at 
+        # initialisation so that per request dispatch is a single dict lookup
+        self.__queryTypeRegistry = {}
+        self.__defaultQueryType = None
+        
+        self.addMountPoint(self)
       
     def initialise(self, global_conf, prefix='', **app_conf):
         '''
@@ -137,7 +385,8 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         dictionary
         '''
         # Override where set in config
-        for name in SOAPQueryInterfaceMiddleware.CONFIG_FILE_OPTNAMES:
+        cls = SOAPQueryInterfaceMiddleware
+        for name in cls.CONFIG_FILE_OPTNAMES:
             val = app_conf.get(prefix + name)
             if val is not None:
                 setattr(self, name, val)
@@ -150,6 +399,149 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
             raise AttributeError('No "deserialise" method set to parse the '
                                  'SAML request to this middleware.')
             
+        if self.streamResponse and self.serialiseAssertion is None:
+            self.serialiseAssertion = cls.DEFAULT_SERIALISE_ASSERTION
+            
+        self._initQueryTypeRegistry()
+        
+        # Additional mount points - if any are set, only serve the middleware
+        # level mount path if it has been explicitly configured
+        mountPointNames = app_conf.get(prefix + cls.MOUNT_POINTS_OPTNAME, '')
+        mountPointNames = mountPointNames.replace(',', ' ').split()
+        
+        if (prefix + cls.PATH_OPTNAME not in app_conf and 
+            len(mountPointNames) > 0):
+            # The middleware settings are the default mount point.  They're
+            # read from this object so that they reflect any later changes 
+            self._removeMountPoint(self)
+        
+        for mountPointName in mountPointNames:
+            optPrefix = prefix + cls.MOUNT_POINT_OPTPREFIX + mountPointName + '.'
+            settings = {}
+            for name in QueryInterfaceMountPoint.CONFIG_FILE_OPTNAMES:
+                settings[name] = app_conf.get(optPrefix + name, 
+                                              getattr(self, name))
+                
+            self.addMountPoint(QueryInterfaceMountPoint(**settings))
+            
+    def addMountPoint(self, mountPoint):
+        """Add a path to be served by this middleware
+        
+        :type mountPoint: QueryInterfaceMountPoint / 
+        SOAPQueryInterfaceMiddleware
+        :param mountPoint: settings for the path: mountPath, 
+        queryInterfaceKeyName, samlVersion, issuerName, issuerFormat and 
+        clockSkewTolerance
+        :raise SOAPQueryInterfaceMiddlewareConfigError: mount path has already
+        been added
+        """
+        mountPath = mountPoint.mountPath
+        if not isinstance(mountPath, str):
+            raise TypeError('Expecting string type for "mountPath" attribute; '
+                            'got %r' % mountPath)
+            
+        # Check all the paths first so that none are added on error
+        paths = (mountPath, mountPath + '/')
+        for path in paths:
+            if path in self.__mountPoints:
+                raise SOAPQueryInterfaceMiddlewareConfigError(
+                                    'Mount path %r is already set' % path)
+            
+        for path in paths:
+            self.__mountPoints[path] = mountPoint
+            
+    def _removeMountPoint(self, mountPoint):
+        """Stop serving the paths of a mount point
+        
+        :type mountPoint: QueryInterfaceMountPoint / 
+        SOAPQueryInterfaceMiddleware
+        :param mountPoint: mount point added with addMountPoint
+        :return: True if the mount point was served
+        :rtype: bool
+        """
+        paths = [path for path, pathMountPoint in self.__mountPoints.items()
+                 if pathMountPoint is mountPoint]
+        for path in paths:
+            del self.__mountPoints[path]
+            
+        return len(paths) > 0
+        
+    @property
+    def mountPoints(self):
+        """PATH_INFO to mount point settings mapping
+        
+        :return: mount points
+        :rtype: dict
+        """
+        return self.__mountPoints
+        
+    def _initQueryTypeRegistry(self):
+        """Build the query type dispatch registry from the configured 
+        deserialisers.  Any one-off global set-up needed for a query type is
+        made here rather than on each request
+        """
+        # Catch all for query elements with no explicit registration - this 
+        # preserves the behaviour of passing any query to "deserialise"
+        self.__defaultQueryType = QueryTypeRegistration(self.deserialise,
+                                                        self._validateQuery,
+                                                        None)
+        
+        # Register the type handled by the default deserialiser where it can 
+        # be determined from the *ElementTree class it's bound to 
+        queryClass = getattr(self.deserialise, '__self__', None)
+        qname = getattr(queryClass, 'DEFAULT_ELEMENT_NAME', None)
+        if qname is not None:
+            self.registerQueryType(qname, self.deserialise)
+            
+        if (self.deserialiseXacmlProfile is not None and 
+            etree_xacml_profile is not None):
+            # Set up additional ElementTree parsing for XACML profile
+            etree_xacml_profile.setElementTreeMap()
+            self.registerQueryType(XACMLAuthzDecisionQuery.DEFAULT_ELEMENT_NAME,
+                                   self.deserialiseXacmlProfile)
+            
+    def registerQueryType(self, qname, deserialise, validate=None,
+                          queryInterfaceKeyName=None):
+        """Register a handler for a given query element type.  
+        
+        :type qname: ndg.saml.common.xml.QName / basestring
+        :param qname: qualified name of query element or its ElementTree tag
+        string in Clark notation e.g. "{namespace}localName"
+        :type deserialise: callable
+        :param deserialise: callable to parse the query element into a SAML 
+        query object
+        :type validate: callable / NoneType
+        :param validate: callable taking the SAML query and response to check
+        the query.  Validators which accept a third argument are also passed 
+        the settings for the mount point the query was received on.  Defaults
+        to the standard issue instant and SAML version checks
+        :type queryInterfaceKeyName: basestring / NoneType
+        :param queryInterfaceKeyName: environ key for the query interface for 
+        this query type.  Defaults to the queryInterfaceKeyName setting of the 
+        mount point the query is received on
+        """
+        if isinstance(qname, str):
+            tag = qname
+        else:
+            tag = qname.clarkName
+            
+        if validate is None:
+            validate = self._validateQuery
+            
+        self.__queryTypeRegistry[tag] = QueryTypeRegistration(
+                                                        deserialise,
+                                                        validate,
+                                                        queryInterfaceKeyName)
+        
+    @property
+    def queryTypeRegistry(self):
+        """Query element tag to query type registration mapping
+        
+        :return: query type registry
+        :rtype: dict
+        """
+        return self.__queryTypeRegistry
+            
     def _getSerialise(self):
         return self.__serialise
 
@@ -166,6 +558,125 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
     serialise = property(_getSerialise, _setSerialise, 
                          doc="callable to serialise request into XML type")
 
+    def _getSerialiseAssertion(self):
+        return self.__serialiseAssertion
+
+    def _setSerialiseAssertion(self, value):
+        if isinstance(value, str):
+            self.__serialiseAssertion = importModuleObject(value)
+            
+        elif callable(value):
+            self.__serialiseAssertion = value
+        else:
+            raise TypeError('Expecting callable for "serialiseAssertion"; got '
+                            '%r' % value)
+
+    serialiseAssertion = property(_getSerialiseAssertion, 
+                                  _setSerialiseAssertion, 
+                                  doc="callable to serialise an individual "
+                                      "assertion into XML type or UTF-8 "
+                                      "encoded bytes.  This is used for "
+                                      "streaming responses")
+    
+    def _getStreamResponse(self):
+        return self.__streamResponse
+
+    def _setStreamResponse(self, value):
+        if isinstance(value, bool):
+            self.__streamResponse = value
+            
+        elif isinstance(value, str):
+            self.__streamResponse = str2Bool(value)
+        else:
+            raise TypeError('Expecting bool or string type for '
+                            '"streamResponse"; got %r instead' % type(value))
+
+    streamResponse = property(_getStreamResponse, 
+                              _setStreamResponse, 
+                              doc='Set to True to return the response as an '
+                                  'iterable yielding the serialised '
+                                  'assertions one at a time instead of '
+                                  'serialising the complete response '
+                                  'envelope before it is returned')
+    
+    def _getStreamResponseBufferSize(self):
+        return self.__streamResponseBufferSize
+
+    def _setStreamResponseBufferSize(self, value):
+        if isinstance(value, str):
+            value = int(value)
+            
+        elif not isinstance(value, int):
+            raise TypeError('Expecting int or string type for '
+                            '"streamResponseBufferSize"; got %r instead' % 
+                            type(value))
+            
+        self.__streamResponseBufferSize = value
+
+    streamResponseBufferSize = property(_getStreamResponseBufferSize, 
+                                        _setStreamResponseBufferSize, 
+                                        doc='Streamed responses up to this '
+                                            'size in bytes are buffered and '
+                                            'sent with a Content-length '
+                                            'header.  Larger responses are '
+                                            'sent without so that the server '
+                                            'uses chunked transfer encoding')
+
+    def _getPullParse(self):
+        return self.__pullParse
+
+    def _setPullParse(self, value):
+        if isinstance(value, bool):
+            self.__pullParse = value
+            
+        elif isinstance(value, str):
+            self.__pullParse = str2Bool(value)
+        else:
+            raise TypeError('Expecting bool or string type for "pullParse"; '
+                            'got %r instead' % type(value))
+
+    pullParse = property(_getPullParse, 
+                         _setPullParse, 
+                         doc='Set to True to build SAML query objects '
+                             'directly from the request with '
+                             'ndg.saml.xml.pullparser.SAMLPullParser instead '
+                             'of parsing the SOAP envelope into an element '
+                             'tree.  Query types the pull parser has no '
+                             'handler for are passed to their registered '
+                             'deserialiser')
+
+    def _getAttributeReleasePolicy(self):
+        return self.__attributeReleasePolicy
+
+    def _setAttributeReleasePolicy(self, value):
+        if not isinstance(value, (AttributeReleasePolicy, type(None))):
+            raise TypeError('Expecting %r or None type for '
+                            '"attributeReleasePolicy"; got %r instead' % 
+                            (AttributeReleasePolicy, type(value)))
+            
+        self.__attributeReleasePolicy = value
+
+    attributeReleasePolicy = property(_getAttributeReleasePolicy, 
+                                      _setAttributeReleasePolicy, 
+                                      doc='Policy restricting the attributes '
+                                          'returned in responses according '
+                                          'to the issuer of the query.  If '
+                                          'None, no restriction is applied')
+    
+    def _setAttributeReleasePolicyFilePath(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for '
+                            '"attributeReleasePolicyFilePath"; got %r instead' %
+                            type(value))
+        
+        self.__attributeReleasePolicy = AttributeReleasePolicy.fromConfigFile(
+                                                                        value)
+
+    attributeReleasePolicyFilePath = property(
+                                    fset=_setAttributeReleasePolicyFilePath, 
+                                    doc='Set to load the attribute release '
+                                        'policy from the given file')
+
     def _getDeserialise(self):
         return self.__deserialise
 
@@ -216,33 +727,6 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
                       fset=_setIssuer, 
                       doc="Name of issuing authority")
 
-    def _getIssuerFormat(self):
-        if self.__issuerProxy is None:
-            return None
-        else:
-            return self.__issuerProxy.format
-
-    def _setIssuerFormat(self, value):
-        if self.__issuerProxy is None:
-            self.__issuerProxy = Issuer()
-            
-        self.__issuerProxy.format = value
-
-    issuerFormat = property(_getIssuerFormat, _setIssuerFormat, 
-                            doc="Issuer format")
-
-    def _getIssuerName(self):
-        if self.__issuerProxy is None:
-            return None
-        else:
-            return self.__issuerProxy.value
-
-    def _setIssuerName(self, value):
-        self.__issuerProxy.value = value
-
-    issuerName = property(_getIssuerName, _setIssuerName, 
-                          doc="Name of issuer of SAML Query Response")
-
     def _getVerifyTimeConditions(self):
         return self.__verifyTimeConditions
 
@@ -284,45 +768,6 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
                                      'Version set in the "samlVersion" '
                                      'attribute')
         
-    def _getClockSkewTolerance(self):
-        return self.__clockSkewTolerance
-
-    def _setClockSkewTolerance(self, value):
-        if isinstance(value, timedelta):
-            self.__clockSkewTolerance = value
-            
-        elif isinstance(value, (float, int)):
-            self.__clockSkewTolerance = timedelta(seconds=value)
-            
-        elif isinstance(value, str):
-            self.__clockSkewTolerance = timedelta(seconds=float(value))
-        else:
-            raise TypeError('Expecting timedelta, float, int, long or string '
-                            'type for "clockSkewTolerance"; got %r' % 
-                            type(value))  
-                
-    clockSkewTolerance = property(fget=_getClockSkewTolerance, 
-                                  fset=_setClockSkewTolerance, 
-                                  doc="Set a tolerance of +/- n seconds to "
-                                      "allow for clock skew when checking the "
-                                      "timestamps of client queries")
-
-    def _getSamlVersion(self):
-        return self.__samlVersion
-
-    def _setSamlVersion(self, value):
-        if not isinstance(value, str):
-            raise TypeError('Expecting string type for "samlVersion"; got %r' % 
-                            type(value)) 
-        self.__samlVersion = value
-
-    samlVersion = property(_getSamlVersion, _setSamlVersion, None, 
-                           "SAML Version to enforce for incoming queries.  "
-                           "Defaults to version 2.0")
-        
-    def _getMountPath(self):
-        return self.__mountPath
-    
     def _setMountPath(self, value):
         '''
         :type value: basestring
@@ -331,14 +776,22 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         environ['PATH_INFO']
         :raise TypeError: incorrect input type
         '''
+        setMountPath = super(SOAPQueryInterfaceMiddleware, self)._setMountPath
+        mountPath = self.mountPath
+        setMountPath(value)
         
-        if not isinstance(value, str):
-            raise TypeError('Expecting string type for "mountPath" attribute; '
-                            'got %r' % value)
-            
-        self.__mountPath = value
+        # Move the default mount point if it is served
+        if not self._removeMountPoint(self):
+            return
+        
+        try:
+            self.addMountPoint(self)
+        except SOAPQueryInterfaceMiddlewareConfigError:
+            setMountPath(mountPath)
+            self.addMountPoint(self)
+            raise
             
-    mountPath = property(fget=_getMountPath,
+    mountPath = property(fget=QueryInterfaceMountPoint._getMountPath,
                          fset=_setMountPath,
                          doc='URL path to mount this application equivalent to '
                              'environ[\'PATH_INFO\'] (Nb. doesn\'t '
@@ -365,21 +818,36 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         
         return app
     
-    def _getQueryInterfaceKeyName(self):
-        return self.__queryInterfaceKeyName
+    def warmUp(self):
+        """Make a dry run serialisation of a response for each mount point so
+        that one-off set-up costs - lazy imports, namespace maps and the like
+        - are met before the first request.  Call after initialise.  In a
+        pre-forking server, call in the master process so that the workers
+        share the result copy-on-write
+        """
+        for mountPoint in set(self.__mountPoints.values()):
+            samlResponse = self._initResponse(mountPoint=mountPoint)
+            samlResponse.inResponseTo = samlResponse.id
 
-    def _setQueryInterfaceKeyName(self, value):
-        if not isinstance(value, str):
-            raise TypeError('Expecting string type for "queryInterfaceKeyName"'
-                            ' got %r' % value)
-            
-        self.__queryInterfaceKeyName = value
+            if self.streamResponse:
+                response = b''.join(
+                                self._serialiseResponseChunks(samlResponse))
+            else:
+                soapResponse = SOAPEnvelope()
+                soapResponse.create()
+                soapResponse.body.elem.append(self.serialise(samlResponse))
+                response = soapResponse.serialize()
+
+            # Parse the result back so that the request path is exercised too
+            if self.pullParse:
+                SAMLPullParser.parseSOAPEnvelope(response)
+            else:
+                soapRequest = SOAPEnvelope()
+                soapRequest.parse(StringIO(response.decode()))
+
+            log.debug("SOAPQueryInterfaceMiddleware.warmUp: serialised dry "
+                      "run response for mount path %r", mountPoint.mountPath)
 
-    queryInterfaceKeyName = property(fget=_getQueryInterfaceKeyName, 
-                                     fset=_setQueryInterfaceKeyName, 
-                                     doc="environ key name for Attribute Query "
-                                         "interface")
-    
     def __call__(self, environ, start_response):
         """Check for and parse a SOAP SAML Attribute Query and return a
         SAML Response
@@ -391,7 +859,8 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         """
     
         # Ignore non-matching path
-        if environ['PATH_INFO'] not in (self.mountPath, self.mountPath + '/'):
+        mountPoint = self.__mountPoints.get(environ['PATH_INFO'])
+        if mountPoint is None:
             return self._app(environ, start_response)
           
         # Ignore non-POST requests
@@ -421,13 +890,21 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
             
         soapRequestTxt = soapRequestStream.read(contentLength)
         
-        # Parse into a SOAP envelope object
-        soapRequest = SOAPEnvelope()
-        
+        samlQuery = None
+        unknownAttrProfileError = None
         try:
-            soapRequest.parse(StringIO(soapRequestTxt.decode()))
+            if self.pullParse:
+                # Build the query object directly from the parser events
+                samlQuery, queryTag, unknownAttrProfileError = \
+                                            self._pullParseQuery(soapRequestTxt)
+            else:
+                # Parse into a SOAP envelope object
+                soapRequest = SOAPEnvelope()
+                soapRequest.parse(StringIO(soapRequestTxt.decode()))
+                queryElem = soapRequest.body.elem[0]
+                queryTag = queryElem.tag
         except Exception as e:
-            response = b'Invalid SAML SOAP query: {}'.format(e)
+            response = ('Invalid SAML SOAP query: %s' % e).encode()
             start_response("400 Bad Request",
                            [('Content-length', str(len(response))),
                             ('Content-type', 'text/html')])
@@ -435,21 +912,23 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         
         log.debug("SOAPQueryInterfaceMiddleware.__call__: received SAML "
                   "SOAP Query: %s", soapRequestTxt)
-       
-        queryElem = soapRequest.body.elem[0]
         
         # Create a response with basic attributes if provided in the 
         # initialisation config
-        samlResponse = self._initResponse()
+        samlResponse = self._initResponse(mountPoint=mountPoint)
         
+        queryType = self.__queryTypeRegistry.get(queryTag, 
+                                                 self.__defaultQueryType)
+        if queryType is None:
+            raise SOAPQueryInterfaceMiddlewareConfigError(
+                                    'No query types registered: check that '
+                                    'this middleware has been initialised')
         try:
-            queryType = QName.getLocalPart(queryElem.tag)
-            if queryType == XACMLAuthzDecisionQuery.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Set up additional ElementTree parsing for XACML profile.
-                etree_xacml_profile.setElementTreeMap()
-                samlQuery = self.deserialiseXacmlProfile(queryElem)
-            else:
-                samlQuery = self.deserialise(queryElem)
+            if unknownAttrProfileError is not None:
+                raise unknownAttrProfileError
+            
+            if samlQuery is None:
+                samlQuery = queryType.deserialise(queryElem)
 
         except UnknownAttrProfile as e:
             log.exception("%r raised parsing incoming query: %s" % 
@@ -458,25 +937,41 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
                                             StatusCode.UNKNOWN_ATTR_PROFILE_URI
         else:   
             # Check for Query Interface in environ
-            queryInterface = environ.get(self.queryInterfaceKeyName,
-                                         NotImplemented)
+            queryInterfaceKeyName = (queryType.queryInterfaceKeyName or 
+                                     mountPoint.queryInterfaceKeyName)
+            queryInterface = environ.get(queryInterfaceKeyName, NotImplemented)
             if queryInterface == NotImplemented:
                 raise SOAPQueryInterfaceMiddlewareConfigError(
                                 'No query interface %r key found in environ' %
-                                self.queryInterfaceKeyName)
+                                queryInterfaceKeyName)
                 
             elif not callable(queryInterface):
                 raise SOAPQueryInterfaceMiddlewareConfigError(
                     'Query interface %r set in %r environ key is not callable' %
-                    (queryInterface, self.queryInterfaceKeyName))
+                    (queryInterface, queryInterfaceKeyName))
             
             # Basic validation
-            self._validateQuery(samlQuery, samlResponse)
+            if queryType.validateTakesMountPoint:
+                queryType.validate(samlQuery, samlResponse, mountPoint)
+            else:
+                queryType.validate(samlQuery, samlResponse)
             
             samlResponse.inResponseTo = samlQuery.id
             
             # Call query interface        
             queryInterface(samlQuery, samlResponse)
+            
+            if self.attributeReleasePolicy is not None:
+                if samlQuery.issuer is not None:
+                    issuerName = samlQuery.issuer.value
+                else:
+                    issuerName = None
+                    
+                self.attributeReleasePolicy.filterResponse(issuerName, 
+                                                           samlResponse)
+            
+        if self.streamResponse:
+            return self._streamResponse(samlResponse, start_response)
         
         # Convert to ElementTree representation to enable attachment to SOAP
         # response body
@@ -497,74 +992,200 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
                         ('Content-type', 'text/xml')])
         return [response]
     
-    def _validateQuery(self, query, response):
+    def _pullParseQuery(self, soapRequestTxt):
+        """Parse a SOAP request with the pull parser.  Query types with no
+        pull parser handler e.g. XACML profile queries are passed to their
+        registered deserialiser
+        
+        :type soapRequestTxt: bytes
+        :param soapRequestTxt: SOAP request
+        :return: SAML query, query element tag and UnknownAttrProfile 
+        exception raised parsing the query if any.  The query type for the 
+        tag determines how this exception is handled
+        :rtype: tuple
+        """
+        fallbackParsers = dict([
+            (tag, queryType.deserialise)
+            for tag, queryType in self.__queryTypeRegistry.items()
+        ])
+        parser = SAMLPullParser(soapEnvelope=True, 
+                                fallbackParsers=fallbackParsers)
+        try:
+            parser.feed(soapRequestTxt)
+            return parser.close(), parser.payloadTag, None
+        
+        except UnknownAttrProfile as e:
+            return None, parser.payloadTag, e
+    
+    def _streamResponse(self, samlResponse, start_response):
+        """Return the SOAP response as an iterable of serialised fragments.  
+        Responses up to streamResponseBufferSize bytes are returned as a 
+        single buffered chunk with a Content-length header.  For larger 
+        responses, the header is omitted and the remaining assertions are 
+        serialised as the server consumes the iterable.  The WSGI server 
+        applies chunked transfer encoding for this case.
+        
+        :type samlResponse: ndg.saml.saml2.core.Response
+        :param samlResponse: SAML response to return
+        :type start_response: function
+        :param start_response: standard WSGI start response function
+        :return: WSGI response iterable
+        :rtype: iterable
+        """
+        chunks = self._serialiseResponseChunks(samlResponse)
+        
+        buffered = []
+        bufferedSize = 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            bufferedSize += len(chunk)
+            if bufferedSize > self.streamResponseBufferSize:
+                log.debug("SOAPQueryInterfaceMiddleware._streamResponse: "
+                          "response exceeds %d bytes, streaming remaining "
+                          "content", self.streamResponseBufferSize)
+                start_response("200 OK", [('Content-type', 'text/xml')])
+                return chain(buffered, chunks)
+            
+        start_response("200 OK",
+                       [('Content-length', str(bufferedSize)),
+                        ('Content-type', 'text/xml')])
+        return [b''.join(buffered)]
+        
+    def _serialiseResponseChunks(self, samlResponse):
+        """Generator to serialise the SOAP response in fragments: the SOAP
+        envelope up to and including the SAML Response Issuer and Status, 
+        each Assertion in turn and finally the closing tags.  The 
+        concatenation of the fragments is a well formed SOAP envelope.  Each
+        assertion declares the namespaces it uses on its own root element.
+        
+        :type samlResponse: ndg.saml.saml2.core.Response
+        :param samlResponse: SAML response to serialise
+        :return: generator yielding serialised fragments
+        :rtype: generator
+        """
+        # Serialise the response without its assertions and mark the point
+        # at which they would go
+        assertions = samlResponse.assertions[:]
+        del samlResponse.assertions[:]
+        try:
+            samlResponseElem = self.serialise(samlResponse)
+        finally:
+            samlResponse.assertions.extend(assertions)
+            
+        marker = self.__class__.STREAM_RESPONSE_MARKER
+        samlResponseElem.append(ElementTree.Comment(marker))
+        
+        soapResponse = SOAPEnvelope()
+        soapResponse.create()
+        soapResponse.body.elem.append(samlResponseElem)
+        
+        envelope = soapResponse.serialize()
+        prefix, suffix = envelope.split(('<!--%s-->' % marker).encode(), 1)
+        
+        yield prefix
+        
+        for assertion in assertions:
+            assertionElem = self.serialiseAssertion(assertion)
+            
+            # Writers such as ndg.saml.xml.writer.SAMLWriter.toBytes return
+            # the serialised assertion directly
+            if isinstance(assertionElem, bytes):
+                yield assertionElem
+            else:
+                yield SOAPEnvelope._serialize(assertionElem)
+            
+        yield suffix
+        
+    def _validateQuery(self, query, response, mountPoint=None):
         """Checking incoming query issue instant and version
         :type query: saml.saml2.core.SubjectQuery 
         :param query: SAML subject query to be checked
         :type: saml.saml2.core.Response
         :param: SAML Response 
+        :type mountPoint: QueryInterfaceMountPoint / NoneType
+        :param mountPoint: settings for the path the query was received on.
+        Defaults to the settings for this middleware
         """
-        self._verifyQueryTimeConditions(query, response)
-        self._verifyQuerySAMLVersion(query, response)
+        self._verifyQueryTimeConditions(query, response, mountPoint=mountPoint)
+        self._verifyQuerySAMLVersion(query, response, mountPoint=mountPoint)
         
-    def _verifyQueryTimeConditions(self, query, response):
+    def _verifyQueryTimeConditions(self, query, response, mountPoint=None):
         """Checking incoming query issue instant
         :type query: saml.saml2.core.SubjectQuery 
         :param query: SAML subject query to be checked
         :type: saml.saml2.core.Response
         :param: SAML Response 
+        :type mountPoint: QueryInterfaceMountPoint / NoneType
+        :param mountPoint: settings for the path the query was received on.
+        Defaults to the settings for this middleware
         :raise QueryIssueInstantInvalid: for invalid issue instant
         """
         if not self.verifyTimeConditions: 
             log.debug("Skipping verification of SAML query time conditions")
             return
+        
+        if mountPoint is None:
+            mountPoint = self
               
         utcNow = datetime.utcnow() 
-        nowPlusSkew = utcNow + self.clockSkewTolerance
+        nowPlusSkew = utcNow + mountPoint.clockSkewTolerance
         
         if query.issueInstant > nowPlusSkew:
             msg = ('SAML Attribute Query issueInstant [%s] is after '
                    'the clock time [%s] (skewed +%s)' % 
                    (query.issueInstant, 
                     SAMLDateTime.toString(nowPlusSkew),
-                    self.clockSkewTolerance))
+                    mountPoint.clockSkewTolerance))
              
             samlRespError = QueryIssueInstantInvalid(msg)
             samlRespError.response = response
             raise samlRespError
             
-    def _verifyQuerySAMLVersion(self, query, response):
+    def _verifyQuerySAMLVersion(self, query, response, mountPoint=None):
         """Checking incoming query issue SAML version
         
         :type query: saml.saml2.core.SubjectQuery 
         :param query: SAML subject query to be checked
         :type: saml.saml2.core.Response
         :param: SAML Response 
+        :type mountPoint: QueryInterfaceMountPoint / NoneType
+        :param mountPoint: settings for the path the query was received on.
+        Defaults to the settings for this middleware
         """
         if not self.verifySAMLVersion:
             log.debug("Skipping verification of SAML query version")
             return
         
-        if query.version < self.samlVersion:
+        if mountPoint is None:
+            mountPoint = self
+        
+        samlVersion = mountPoint.samlVersion
+        if query.version < samlVersion:
             log.debug("Query SAML version %r is lower than the supported "
-                      "value %r", query.version, self.samlVersion)
+                      "value %r", query.version, samlVersion)
             response.status.statusCode.value = \
                                         StatusCode.REQUEST_VERSION_TOO_LOW_URI
         
-        elif query.version > self.samlVersion:
+        elif query.version > samlVersion:
             log.debug("Query SAML version %r is higher than the supported "
-                      "value %r", query.version, self.samlVersion)
+                      "value %r", query.version, samlVersion)
             response.status.statusCode.value = \
                                         StatusCode.REQUEST_VERSION_TOO_HIGH_URI
             
         
-    def _initResponse(self):
+    def _initResponse(self, mountPoint=None):
         """Create a SAML Response object with basic settings if any have been
         provided at initialisation of this class - see initialise
         
+        :type mountPoint: QueryInterfaceMountPoint / NoneType
+        :param mountPoint: settings for the path the query was received on.
+        Defaults to the settings for this middleware
         :return: SAML response object
         :rtype: ndg.saml.saml2.core.Response
         """
+        if mountPoint is None:
+            mountPoint = self
+            
         samlResponse = Response()
         utcNow = datetime.utcnow()
         
@@ -572,12 +1193,12 @@ class SOAPQueryInterfaceMiddleware(SOAPMiddleware):
         samlResponse.id = str(uuid4())
         samlResponse.issuer = Issuer()
         
-        if self.issuerName is not None:
-            samlResponse.issuer.value = self.issuerName
+        if mountPoint.issuerName is not None:
+            samlResponse.issuer.value = mountPoint.issuerName
         
-        if self.issuerFormat is not None:
+        if mountPoint.issuerFormat is not None:
             # TODO: Check SAML 2.0 spec says issuer format must be omitted??
-            samlResponse.issuer.format = self.issuerFormat
+            samlResponse.issuer.format = mountPoint.issuerFormat
         
         # Initialise to success status but reset on error
         samlResponse.status = Status()
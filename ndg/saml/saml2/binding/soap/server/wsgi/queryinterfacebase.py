@@ -0,0 +1,217 @@
+"""WSGI SAML package - base class for middleware providing SAML 2.0 query
+interfaces to SOAPQueryInterfaceMiddleware
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+from uuid import uuid4
+from datetime import timedelta
+
+from ndg.saml.common import SAMLVersion
+from ndg.saml.saml2.core import Assertion, Subject, NameID, Issuer, Conditions
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterface import \
+    SOAPQueryInterfaceMiddleware
+
+
+class QueryInterfaceMiddlewareConfigError(Exception):
+    """Query interface middleware configuration problem"""
+
+
+class QueryInterfaceMiddlewareBase(object):
+    """Base class for middleware which answers SAML queries.  Add to a
+    middleware stack ahead of
+    ndg.saml.saml2.binding.soap.server.wsgi.queryinterface.SOAPQueryInterfaceMiddleware.
+    This middleware sets its queryInterface method in environ and the SOAP
+    query interface middleware calls it to populate the SAML response.
+    Derived classes implement queryInterface and extend CONFIG_FILE_OPTNAMES
+    with their own settings.
+
+    :cvar DEFAULT_ASSERTION_LIFETIME: default validity for assertions issued
+    :type DEFAULT_ASSERTION_LIFETIME: float
+    """
+    QUERY_INTERFACE_KEYNAME_OPTNAME = \
+                SOAPQueryInterfaceMiddleware.QUERY_INTERFACE_KEYNAME_OPTNAME
+    ISSUER_NAME_OPTNAME = 'issuerName'
+    ISSUER_FORMAT_OPTNAME = 'issuerFormat'
+    ASSERTION_LIFETIME_OPTNAME = 'assertionLifetime'
+
+    CONFIG_FILE_OPTNAMES = (
+        QUERY_INTERFACE_KEYNAME_OPTNAME,
+        ISSUER_NAME_OPTNAME,
+        ISSUER_FORMAT_OPTNAME,
+        ASSERTION_LIFETIME_OPTNAME
+    )
+
+    DEFAULT_ASSERTION_LIFETIME = 60*60*8.
+
+    def __init__(self, app):
+        ''':type app: callable following WSGI interface
+        :param app: next middleware application in the chain
+        '''
+        self._app = app
+        self.__queryInterfaceKeyName = \
+                SOAPQueryInterfaceMiddleware.DEFAULT_QUERY_INTERFACE_KEYNAME
+        self.__issuerName = None
+        self.__issuerFormat = Issuer.X509_SUBJECT
+        self.__assertionLifetime = timedelta(
+                            seconds=self.__class__.DEFAULT_ASSERTION_LIFETIME)
+
+    def initialise(self, global_conf, prefix='', **app_conf):
+        '''
+        :type global_conf: dict
+        :param global_conf: PasteDeploy global configuration dictionary
+        :type prefix: basestring
+        :param prefix: prefix for configuration items
+        :type app_conf: dict
+        :param app_conf: PasteDeploy application specific configuration
+        dictionary
+        '''
+        for name in self.__class__.CONFIG_FILE_OPTNAMES:
+            val = app_conf.get(prefix + name)
+            if val is not None:
+                setattr(self, name, val)
+
+        if self.issuerName is None:
+            raise QueryInterfaceMiddlewareConfigError('No %r option set' %
+                                (prefix + self.__class__.ISSUER_NAME_OPTNAME))
+
+    @classmethod
+    def filter_app_factory(cls, app, global_conf, **app_conf):
+        """Set-up using a Paste app factory pattern.
+
+        :type app: callable following WSGI interface
+        :param app: next middleware application in the chain
+        :type global_conf: dict
+        :param global_conf: PasteDeploy global configuration dictionary
+        :type app_conf: dict
+        :param app_conf: PasteDeploy application specific configuration
+        dictionary
+        """
+        app = cls(app)
+        app.initialise(global_conf, **app_conf)
+
+        return app
+
+    def _getQueryInterfaceKeyName(self):
+        return self.__queryInterfaceKeyName
+
+    def _setQueryInterfaceKeyName(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "queryInterfaceKeyName"'
+                            ' got %r' % value)
+
+        self.__queryInterfaceKeyName = value
+
+    queryInterfaceKeyName = property(fget=_getQueryInterfaceKeyName,
+                                     fset=_setQueryInterfaceKeyName,
+                                     doc="environ key name for the query "
+                                         "interface")
+
+    def _getIssuerName(self):
+        return self.__issuerName
+
+    def _setIssuerName(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "issuerName" '
+                            'attribute; got %r' % type(value))
+        self.__issuerName = value
+
+    issuerName = property(_getIssuerName, _setIssuerName,
+                          doc="Name of issuer of assertions returned")
+
+    def _getIssuerFormat(self):
+        return self.__issuerFormat
+
+    def _setIssuerFormat(self, value):
+        if not isinstance(value, str):
+            raise TypeError('Expecting string type for "issuerFormat" '
+                            'attribute; got %r' % type(value))
+        self.__issuerFormat = value
+
+    issuerFormat = property(_getIssuerFormat, _setIssuerFormat,
+                            doc="Format of issuer name of assertions returned")
+
+    def _getAssertionLifetime(self):
+        return self.__assertionLifetime
+
+    def _setAssertionLifetime(self, value):
+        if isinstance(value, (int, float)):
+            self.__assertionLifetime = timedelta(seconds=value)
+
+        elif isinstance(value, str):
+            self.__assertionLifetime = timedelta(seconds=float(value))
+
+        elif isinstance(value, timedelta):
+            self.__assertionLifetime = value
+        else:
+            raise TypeError('Expecting timedelta, float, int or string type '
+                            'for "assertionLifetime"; got %r' % type(value))
+
+    assertionLifetime = property(_getAssertionLifetime,
+                                 _setAssertionLifetime,
+                                 doc="Validity period for assertions issued")
+
+    def __call__(self, environ, start_response):
+        """Set the query interface callable in environ and call the next
+        middleware
+
+        :type environ: dict
+        :param environ: WSGI environment variables dictionary
+        :type start_response: function
+        :param start_response: standard WSGI start response function
+        """
+        environ[self.__queryInterfaceKeyName] = self.queryInterface
+        return self._app(environ, start_response)
+
+    def queryInterface(self, query, response):
+        """Query interface called by SOAPQueryInterfaceMiddleware.  Derived
+        classes must implement this method
+
+        :type query: ndg.saml.saml2.core.RequestAbstractType
+        :param query: SAML query
+        :type response: ndg.saml.saml2.core.Response
+        :param response: SAML response to populate
+        :return: response
+        :rtype: ndg.saml.saml2.core.Response
+        """
+        raise NotImplementedError()
+
+    def _createAssertion(self, response, subjectNameID=None):
+        """Make an assertion to add to a response with issuer and validity
+        conditions set from the settings of this middleware
+
+        :type response: ndg.saml.saml2.core.Response
+        :param response: SAML response the assertion is for
+        :type subjectNameID: ndg.saml.saml2.core.NameID / NoneType
+        :param subjectNameID: query subject to copy into the assertion, if
+        any
+        :return: new assertion
+        :rtype: ndg.saml.saml2.core.Assertion
+        """
+        assertion = Assertion()
+        assertion.version = SAMLVersion(SAMLVersion.VERSION_20)
+        assertion.id = str(uuid4())
+        assertion.issueInstant = response.issueInstant
+
+        assertion.issuer = Issuer()
+        assertion.issuer.value = self.__issuerName
+        assertion.issuer.format = self.__issuerFormat
+
+        assertion.conditions = Conditions()
+        assertion.conditions.notBefore = assertion.issueInstant
+        assertion.conditions.notOnOrAfter = (assertion.conditions.notBefore +
+                                             self.__assertionLifetime)
+
+        if subjectNameID is not None:
+            assertion.subject = Subject()
+            assertion.subject.nameID = NameID()
+            assertion.subject.nameID.format = subjectNameID.format
+            assertion.subject.nameID.value = subjectNameID.value
+
+        return assertion
@@ -0,0 +1,151 @@
+"""WSGI SAML package for a SAML 2.0 profile for XACML v2.0 Authorisation
+Decision query interface using an embedded XACML Policy Decision Point.
+Requires ndg_xacml - install with the xacml_profile extra
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+
+from ndg.saml.saml2.core import StatusCode
+from ndg.saml.saml2.xacml_profile import XACMLAuthzDecisionStatement
+from ndg.saml.saml2.xacml_pdp import IndexedPDP
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterfacebase import (
+    QueryInterfaceMiddlewareBase, QueryInterfaceMiddlewareConfigError)
+
+
+class XACMLAuthzDecisionMiddleware(QueryInterfaceMiddlewareBase):
+    """XACML Authorisation Decision query interface.  Evaluates the XACML
+    context request of XACMLAuthzDecisionQuery elements in process with
+    ndg.saml.saml2.xacml_pdp.IndexedPDP rather than forwarding them to a
+    separate PDP.  Configure SOAPQueryInterfaceMiddleware to deserialise
+    XACMLAuthzDecisionQuery elements.
+
+    Policies are loaded when the middleware is initialised, so once for each
+    worker process.
+    """
+    POLICY_FILEPATHS_OPTNAME = 'policyFilePaths'
+    DECISION_CACHE_SIZE_OPTNAME = 'decisionCacheSize'
+
+    CONFIG_FILE_OPTNAMES = QueryInterfaceMiddlewareBase.CONFIG_FILE_OPTNAMES + (
+        POLICY_FILEPATHS_OPTNAME,
+        DECISION_CACHE_SIZE_OPTNAME
+    )
+
+    def __init__(self, app):
+        ''':type app: callable following WSGI interface
+        :param app: next middleware application in the chain
+        '''
+        super(XACMLAuthzDecisionMiddleware, self).__init__(app)
+        self.__pdp = None
+        self.__policyFilePaths = None
+        self.__decisionCacheSize = IndexedPDP.DEFAULT_CACHE_SIZE
+
+    def initialise(self, global_conf, prefix='', **app_conf):
+        '''
+        :type global_conf: dict
+        :param global_conf: PasteDeploy global configuration dictionary
+        :type prefix: basestring
+        :param prefix: prefix for configuration items
+        :type app_conf: dict
+        :param app_conf: PasteDeploy application specific configuration
+        dictionary
+        '''
+        super(XACMLAuthzDecisionMiddleware, self).initialise(global_conf,
+                                                             prefix=prefix,
+                                                             **app_conf)
+        if self.pdp is None:
+            if not self.__policyFilePaths:
+                raise QueryInterfaceMiddlewareConfigError('No %r option set' %
+                        (prefix + self.__class__.POLICY_FILEPATHS_OPTNAME))
+
+            self.pdp = IndexedPDP.fromPolicyFiles(self.__policyFilePaths,
+                                        cacheSize=self.__decisionCacheSize)
+
+    def _getPdp(self):
+        return self.__pdp
+
+    def _setPdp(self, value):
+        if not isinstance(value, IndexedPDP):
+            raise TypeError('Expecting %r type for "pdp" attribute; got %r' %
+                            (IndexedPDP, type(value)))
+        self.__pdp = value
+
+    pdp = property(_getPdp, _setPdp,
+                   doc="Policy Decision Point queries are evaluated with")
+
+    def _getPolicyFilePaths(self):
+        return self.__policyFilePaths
+
+    def _setPolicyFilePaths(self, value):
+        if isinstance(value, str):
+            value = value.split()
+
+        elif not isinstance(value, (list, tuple)):
+            raise TypeError('Expecting string, list or tuple type for '
+                            '"policyFilePaths"; got %r' % type(value))
+
+        self.__policyFilePaths = list(value)
+
+    policyFilePaths = property(_getPolicyFilePaths, _setPolicyFilePaths,
+                               doc="XACML policy file paths.  Set as a white "
+                                   "space separated string in config files")
+
+    def _getDecisionCacheSize(self):
+        return self.__decisionCacheSize
+
+    def _setDecisionCacheSize(self, value):
+        if isinstance(value, str):
+            value = int(value)
+
+        elif not isinstance(value, int):
+            raise TypeError('Expecting int or string type for '
+                            '"decisionCacheSize"; got %r' % type(value))
+
+        self.__decisionCacheSize = value
+
+    decisionCacheSize = property(_getDecisionCacheSize,
+                                 _setDecisionCacheSize,
+                                 doc="Maximum number of cached decisions.  "
+                                     "Zero disables caching")
+
+    def queryInterface(self, query, response):
+        """XACML Authorisation Decision Query interface called by
+        ndg.saml.saml2.binding.soap.server.wsgi.queryinterface.SOAPQueryInterfaceMiddleware
+
+        :type query: ndg.saml.saml2.xacml_profile.XACMLAuthzDecisionQuery
+        :param query: SAML XACML authorisation decision query
+        :type response: ndg.saml.saml2.core.Response
+        :param response: SAML response to populate
+        :return: response
+        :rtype: ndg.saml.saml2.core.Response
+        """
+        xacmlContextRequest = query.xacmlContextRequest
+        if xacmlContextRequest is None:
+            response.status.statusCode.value = StatusCode.REQUESTER_URI
+            response.status.statusMessage.value = ('No XACML context request '
+                                                   'set in query')
+            return response
+
+        xacmlContextResponse = self.__pdp.evaluate(xacmlContextRequest)
+
+        log.debug("XACML authorisation decision for query %r: %s", query.id,
+                  xacmlContextResponse.results[0].decision)
+
+        xacmlAuthzDecisionStatement = XACMLAuthzDecisionStatement()
+        xacmlAuthzDecisionStatement.xacmlContextResponse = xacmlContextResponse
+        if query.returnContext:
+            xacmlAuthzDecisionStatement.xacmlContextRequest = \
+                                                            xacmlContextRequest
+
+        assertion = self._createAssertion(response)
+        assertion.statements.append(xacmlAuthzDecisionStatement)
+        response.assertions.append(assertion)
+        response.status.statusCode.value = StatusCode.SUCCESS_URI
+
+        return response
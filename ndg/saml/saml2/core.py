@@ -60,17 +60,17 @@ class Attribute(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Attribute"
 
     # Default element name. 
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type. 
     TYPE_LOCAL_NAME = "AttributeType"
 
     # QName of the XSI type. 
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # Name of the Name attribute. 
     NAME_ATTRIB_NAME = "Name"
@@ -241,17 +241,17 @@ class Statement(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Statement"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type
     TYPE_LOCAL_NAME = "StatementAbstractType"
 
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
     
             
 class AttributeStatement(Statement):
@@ -277,17 +277,17 @@ class AttributeStatement(Statement):
     DEFAULT_ELEMENT_LOCAL_NAME = "AttributeStatement"
     
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME, 
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME, 
+                                        SAMLConstants.SAML20_PREFIX)
     
     # Local name of the XSI type. 
     TYPE_LOCAL_NAME = "AttributeStatementType" 
         
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME, 
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME, 
+                             SAMLConstants.SAML20_PREFIX)
     
     __slots__ = ('__attributes', '__encryptedAttributes')
     
@@ -345,17 +345,17 @@ class SubjectLocality(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "SubjectLocality"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type
     TYPE_LOCAL_NAME = "SubjectLocalityType"
 
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
     
     __slots__ = ('__address', '__dns_name')
     
@@ -416,17 +416,17 @@ class AuthnStatement(Statement):
     DEFAULT_ELEMENT_LOCAL_NAME = "AuthnStatement"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type
     TYPE_LOCAL_NAME = "AuthnStatementType"
 
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # AuthnInstant attribute name
     AUTHN_INSTANT_ATTRIB_NAME = "AuthnInstant"
@@ -808,17 +808,17 @@ class AuthzDecisionStatement(Statement):
     DEFAULT_ELEMENT_LOCAL_NAME = "AuthzDecisionStatement"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type
     TYPE_LOCAL_NAME = "AuthzDecisionStatementType"
 
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # Resource attribute name
     RESOURCE_ATTRIB_NAME = "Resource"
@@ -826,6 +826,9 @@ class AuthzDecisionStatement(Statement):
     # Decision attribute name
     DECISION_ATTRIB_NAME = "Decision"
     
+    # Resource URIs are normalised when set
+    _VALIDATED_FIELDS = ('resource',)
+    
     __slots__ = (
         '__resource', 
         '__decision', 
@@ -960,28 +963,8 @@ class AuthzDecisionStatement(Statement):
         
         if (self.normalizeResource and 
             value.startswith('http://') or value.startswith('https://')):
-            # Normalise the path, set the host name to lower case and remove 
-            # port redundant numbers 80 and 443
-            splitResult = urlsplit(value)
-            uriComponents = list(splitResult)
-            
-            # hostname attribute is lowercase
-            uriComponents[1] = splitResult.hostname
-            
-            if splitResult.port is not None:
-                isHttpWithStdPort = (splitResult.port == 80 and 
-                                     splitResult.scheme == 'http')
-                
-                isHttpsWithStdPort = (splitResult.port == 443 and
-                                      splitResult.scheme == 'https')
-                
-                if not isHttpWithStdPort and not isHttpsWithStdPort:
-                    uriComponents[1] += ":%d" % splitResult.port
-            
-            uriComponents[2] = urllib.parse.quote(splitResult.path, 
-                                            self.safeNormalizationChars)
-            
-            self.__resource = urlunsplit(uriComponents)
+            self.__resource = AuthzDecisionQuery.normalizeResourceURI(value,
+                                                self.safeNormalizationChars)
         else:
             self.__resource = value
     
@@ -1094,17 +1077,17 @@ class Subject(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Subject"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "SubjectType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
     
     __slots__ = (
         '__baseID',
@@ -1497,17 +1480,17 @@ class Issuer(AbstractNameIDType):
     DEFAULT_ELEMENT_LOCAL_NAME = "Issuer"
 
     # Default element name. 
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type. 
     TYPE_LOCAL_NAME = "IssuerType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX) 
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX) 
     
     __slots__ = ()
 
@@ -1528,17 +1511,17 @@ class NameID(AbstractNameIDType):
     DEFAULT_ELEMENT_LOCAL_NAME = "NameID"
 
     # Default element name. 
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type. 
     TYPE_LOCAL_NAME = "NameIDType"
 
     # QName of the XSI type. 
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
     
     __slots__ = ()
     
@@ -1571,17 +1554,17 @@ class Conditions(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Conditions"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "ConditionsType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # NotBefore attribute name.
     NOT_BEFORE_ATTRIB_NAME = "NotBefore"
@@ -1721,17 +1704,17 @@ class Advice(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Advice"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type
     TYPE_LOCAL_NAME = "AdviceType"
 
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     __slots__ = ()
     
@@ -1822,22 +1805,25 @@ class Assertion(SAMLObject):
     :type __authzDecisionStatements: ndg.saml.utils.TypedList
     :ivar __attributeStatements: asserted attribute statements
     :type __attributeStatements: ndg.saml.utils.TypedList
+    :ivar __source: representation this assertion was parsed from, kept on
+    request by the XML parser so that it can be re-used
+    :type __source: object / NoneType
     """   
      
     # Element local name.
     DEFAULT_ELEMENT_LOCAL_NAME = "Assertion"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "AssertionType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # Version attribute name.
     VERSION_ATTRIB_NAME = "Version"
@@ -1859,12 +1845,14 @@ class Assertion(SAMLObject):
         '__statements',
         '__authnStatements',
         '__authzDecisionStatements',
-        '__attributeStatements'
+        '__attributeStatements',
+        '__source'
     )
     
     def __init__(self):
         # Base class initialisation
         super(Assertion, self).__init__()
+        self.__source = None
         
         self.__version = None
         self.__issueInstant = None
@@ -1895,8 +1883,31 @@ class Assertion(SAMLObject):
                 attrName = "_Assertion" + attrName
                 
             _dict[attrName] = getattr(self, attrName)
-            
+        
+        # The representation parsed from is not part of the assertion's state
+        _dict['_Assertion__source'] = None
         return _dict   
+    
+    def _getParsedSource(self):
+        '''
+        :return: representation this assertion was parsed from or None if it
+        was not kept
+        :rtype: object / NoneType
+        '''
+        return self.__source
+    
+    def _setParsedSource(self, value):
+        '''
+        :param value: representation this assertion was parsed from.  Set by
+        the XML parser.  Set to None to discard it
+        :type value: object / NoneType
+        '''
+        self.__source = value
+        
+    parsedSource = property(fget=_getParsedSource,
+                            fset=_setParsedSource,
+                            doc="Representation this assertion was parsed "
+                                "from")
                  
     def _get_version(self):
         '''
@@ -2108,9 +2119,9 @@ class AttributeValue(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "AttributeValue"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
     __slots__ = ()
 
 
@@ -2130,9 +2141,9 @@ class XSStringAttributeValue(AttributeValue):
     TYPE_LOCAL_NAME = "string"
         
     # QName of the XSI type
-    TYPE_NAME = QName(SAMLConstants.XSD_NS, 
-                      TYPE_LOCAL_NAME, 
-                      SAMLConstants.XSD_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.XSD_NS, 
+                             TYPE_LOCAL_NAME, 
+                             SAMLConstants.XSD_PREFIX)
     
     DEFAULT_FORMAT = "%s#%s" % (SAMLConstants.XSD_NS, TYPE_LOCAL_NAME)
   
@@ -2206,17 +2217,17 @@ class StatusDetail(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "StatusDetail"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "StatusDetailType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
     
     __slots__ = ('__unknownChildren', )
     
@@ -2291,9 +2302,9 @@ class StatusMessage(SAMLObject):
     '''
 
     DEFAULT_ELEMENT_LOCAL_NAME = "StatusMessage"
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
     
     __slots__ = ('__value', )
     
@@ -2412,17 +2423,17 @@ class StatusCode(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "StatusCode"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "StatusCodeType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     # Local Name of the Value attribute.
     VALUE_ATTRIB_NAME = "Value"
@@ -2607,17 +2618,17 @@ class Status(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Status"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "StatusType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     __slots__ = (
         '__statusCode', 
@@ -2797,17 +2808,17 @@ class Action(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Action"
 
     # Default element name. 
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
 
     # Local name of the XSI type. 
     TYPE_LOCAL_NAME = "ActionType"
 
     # QName of the XSI type 
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20_PREFIX)
 
     # Name of the Namespace attribute. 
     NAMESPACE_ATTRIB_NAME = "Namespace"
@@ -2894,6 +2905,9 @@ class Action(SAMLObject):
     # declared
     ALL_ACTION_TYPES = tuple(set(itertools.chain(*list(ACTION_TYPES.values()))))
     
+    # Namespaces and values are checked against the action types when set
+    _VALIDATED_FIELDS = ('actionTypes', 'namespace', 'value')
+    
     __slots__ = (
         'default_namespace',
         '__namespace', 
@@ -2979,7 +2993,7 @@ class Action(SAMLObject):
             raise TypeError('Expecting string type for "namespace" '
                             'attribute; got %r' % type(value))
             
-        if value not in list(self.__actionTypes.keys()):
+        if value not in self.__actionTypes:
             raise AttributeError('"namespace" action type %r not recognised. '
                                  'It must be one of these action types: %r' % 
                                  (value, list(self.__actionTypes.keys())))
@@ -3098,9 +3112,9 @@ class RequestAbstractType(SAMLObject):
     TYPE_LOCAL_NAME = "RequestAbstractType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     # ID attribute name.
     ID_ATTRIB_NAME = "ID"
@@ -3445,17 +3459,17 @@ class AttributeQuery(SubjectQuery):
     DEFAULT_ELEMENT_LOCAL_NAME = "AttributeQuery"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "AttributeQueryType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     __slots__ = ('__attributes',)
     
@@ -3536,9 +3550,9 @@ class AssertionURIRef(Evidentiary):
     DEFAULT_ELEMENT_LOCAL_NAME = "AssertionURIRef"
 
     # Default element name
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
     
     def __init__(self, **kw):
         '''Create assertion URI reference
@@ -3612,9 +3626,9 @@ class AssertionIDRef(Evidentiary):
     DEFAULT_ELEMENT_LOCAL_NAME = "AssertionIDRef"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
     
     __slots__ = ("__assertionID",)
     
@@ -3686,9 +3700,9 @@ class EncryptedElementType(SAMLObject):
     TYPE_LOCAL_NAME = "EncryptedElementType"
         
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME, 
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME, 
+                             SAMLConstants.SAML20_PREFIX)
     
     __slots__ = ()
     
@@ -3724,9 +3738,9 @@ class EncryptedAssertion(EncryptedElementType, Evidentiary):
     DEFAULT_ELEMENT_LOCAL_NAME = "EncryptedAssertion"
 
     # Default element name. 
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20_PREFIX) 
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX) 
     __slots__ = ()
       
     
@@ -3750,17 +3764,17 @@ class Evidence(SAMLObject):
     DEFAULT_ELEMENT_LOCAL_NAME = "Evidence"
     
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME, 
-                                 SAMLConstants.SAML20_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME, 
+                                        SAMLConstants.SAML20_PREFIX)
     
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "EvidenceType" 
         
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20_NS, 
-                      TYPE_LOCAL_NAME, 
-                      SAMLConstants.SAML20_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20_NS, 
+                             TYPE_LOCAL_NAME, 
+                             SAMLConstants.SAML20_PREFIX)
 
     __slots__ = ('__values',)
     
@@ -3889,21 +3903,24 @@ class AuthzDecisionQuery(SubjectQuery):
     DEFAULT_ELEMENT_LOCAL_NAME = "AuthzDecisionQuery"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20P_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "AuthzDecisionQueryType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     # Resource attribute name.
     RESOURCE_ATTRIB_NAME = "Resource"
     
+    # Resource URIs are normalised when set
+    _VALIDATED_FIELDS = ('resource',)
+    
     __slots__ = (
        '__resource',
        '__evidence',
@@ -4032,34 +4049,49 @@ class AuthzDecisionQuery(SubjectQuery):
         
         if (self.normalizeResource and 
             value.startswith('http://') or value.startswith('https://')):
-            # Normalise the path, set the host name to lower case and remove 
-            # port redundant numbers 80 and 443
-            splitResult = urlsplit(value)
-            uriComponents = list(splitResult)
-            
-            # hostname attribute is lowercase
-            uriComponents[1] = splitResult.hostname
-            
-            if splitResult.port is not None:
-                isHttpWithStdPort = (splitResult.port == 80 and 
-                                     splitResult.scheme == 'http')
-                
-                isHttpsWithStdPort = (splitResult.port == 443 and
-                                      splitResult.scheme == 'https')
-                
-                if not isHttpWithStdPort and not isHttpsWithStdPort:
-                    uriComponents[1] += ":%d" % splitResult.port
-            
-            uriComponents[2] = urllib.parse.quote(splitResult.path, 
-                                            self.safeNormalizationChars)
-            
-            self.__resource = urlunsplit(uriComponents)
+            self.__resource = AuthzDecisionQuery.normalizeResourceURI(value,
+                                                self.safeNormalizationChars)
         else:
             self.__resource = value
     
     resource = property(fget=_getResource, fset=_setResource,
                         doc="Resource for which authorisation is requested")
     
+    @staticmethod
+    def normalizeResourceURI(value, safeNormalizationChars='/%'):
+        '''Normalise an HTTP or HTTPS resource URI: normalise the path, set 
+        the host name to lower case and remove redundant port numbers 80 and 
+        443.  This is the normalisation applied when the resource property is
+        set so use it to compare other URIs with resource settings
+        
+        :param value: HTTP or HTTPS URI
+        :type value: basestring
+        :param safeNormalizationChars: characters not to be quoted in the path
+        :type safeNormalizationChars: string
+        :return: normalised URI
+        :rtype: basestring
+        '''
+        splitResult = urlsplit(value)
+        uriComponents = list(splitResult)
+        
+        # hostname attribute is lowercase
+        uriComponents[1] = splitResult.hostname
+        
+        if splitResult.port is not None:
+            isHttpWithStdPort = (splitResult.port == 80 and 
+                                 splitResult.scheme == 'http')
+            
+            isHttpsWithStdPort = (splitResult.port == 443 and
+                                  splitResult.scheme == 'https')
+            
+            if not isHttpWithStdPort and not isHttpsWithStdPort:
+                uriComponents[1] += ":%d" % splitResult.port
+        
+        uriComponents[2] = urllib.parse.quote(splitResult.path, 
+                                              safeNormalizationChars)
+        
+        return urlunsplit(uriComponents)
+    
     @property
     def actions(self):
         '''The actions for which authorisation is requested
@@ -4176,9 +4208,9 @@ class StatusResponseType(SAMLObject):
     TYPE_LOCAL_NAME = "StatusResponseType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML20P_PREFIX)
 
     # ID attribute name
     ID_ATTRIB_NAME = "ID"
@@ -4505,17 +4537,17 @@ class Response(StatusResponseType):
     DEFAULT_ELEMENT_LOCAL_NAME = "Response"
     
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML20P_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME, 
-                                 SAMLConstants.SAML20P_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                                        DEFAULT_ELEMENT_LOCAL_NAME, 
+                                        SAMLConstants.SAML20P_PREFIX)
     
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "ResponseType"
         
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML20P_NS, 
-                      TYPE_LOCAL_NAME, 
-                      SAMLConstants.SAML20P_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML20P_NS, 
+                             TYPE_LOCAL_NAME, 
+                             SAMLConstants.SAML20P_PREFIX)
     
     __slots__ = ('__indexedChildren',)
     
@@ -4547,11 +4579,26 @@ class Response(StatusResponseType):
             
         return _dict
         
-    @property
-    def assertions(self): 
+    def _getAssertions(self): 
         """Assertions contained in this response
         
         :return: list of assertion for this response
         :rtype: list
         """
         return self.__indexedChildren
+    
+    def _setAssertions(self, value):
+        """Set the assertions for this response
+        
+        :param value: list of assertions.  The list is used as is so that
+        list types which make their items on demand can be set
+        :type value: list
+        :raise TypeError: incorrect input type
+        """
+        if not isinstance(value, list):
+            raise TypeError('Expecting list type for "assertions"; got %r' %
+                            type(value))
+        self.__indexedChildren = value
+        
+    assertions = property(_getAssertions, _setAssertions, None, 
+                          "Assertions contained in this response")
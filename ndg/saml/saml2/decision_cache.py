@@ -0,0 +1,149 @@
+"""SAML 2.0 authorisation - base class for Policy Decision Points which cache
+decisions.  Independent of any particular policy language
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+from ndg.saml.utils import LRUCache
+
+
+class DecisionCachingPDPBase(object):
+    """Policy Decision Point which caches the decisions it makes keyed on a
+    canonical form of the attributes of the request.  Only decisions are
+    cached: a new response is created for every request so that no
+    response is shared between callers.
+
+    Requests are XACML context style objects: subjects, resources, action
+    and environment each hold a list of attributes with attributeId,
+    dataType, issuer and attributeValues.  Requests including resource
+    content are not cached.
+
+    Derived classes implement _decide and _createResponse.
+
+    :cvar DEFAULT_CACHE_SIZE: default maximum number of cached decisions
+    :type DEFAULT_CACHE_SIZE: int
+    """
+    DEFAULT_CACHE_SIZE = 1024
+
+    __slots__ = ('__cache',)
+
+    def __init__(self, cacheSize=DEFAULT_CACHE_SIZE):
+        """
+        :param cacheSize: maximum number of cached decisions.  Set to zero to
+        disable caching
+        :type cacheSize: int
+        """
+        if cacheSize:
+            self.__cache = LRUCache(cacheSize)
+        else:
+            self.__cache = None
+
+    @property
+    def cache(self):
+        """Decision cache
+
+        :return: cache or None if caching is disabled
+        :rtype: ndg.saml.utils.LRUCache / NoneType
+        """
+        return self.__cache
+
+    def clearCache(self):
+        """Discard all cached decisions e.g. because policies have changed
+        """
+        if self.__cache is not None:
+            self.__cache.clear()
+
+    @staticmethod
+    def _canonicalAttributes(requestChild):
+        if requestChild is None:
+            return ()
+
+        return tuple(sorted([
+            (attribute.attributeId,
+             attribute.dataType,
+             attribute.issuer or '',
+             tuple(sorted([str(attributeValue.value)
+                           for attributeValue in attribute.attributeValues])))
+            for attribute in requestChild.attributes]))
+
+    @classmethod
+    def canonicalRequestKey(cls, request):
+        """Make a cache key from the attributes of a request.  Key ordering
+        of subjects, resources and attributes is not significant
+
+        :param request: request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: key or None if the request can't be cached because it
+        includes resource content
+        :rtype: tuple / NoneType
+        """
+        for resource in request.resources:
+            if resource.resourceContent is not None:
+                return None
+
+        subjects = tuple(sorted([
+            (subject.subjectCategory or '', cls._canonicalAttributes(subject))
+            for subject in request.subjects]))
+        resources = tuple(sorted([cls._canonicalAttributes(resource)
+                                  for resource in request.resources]))
+
+        return (subjects, resources,
+                cls._canonicalAttributes(request.action),
+                cls._canonicalAttributes(request.environment))
+
+    def _decide(self, request):
+        """Evaluate policy for a request
+
+        :param request: request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: decision
+        :rtype: ndg.xacml.core.context.result.Decision
+        """
+        raise NotImplementedError()
+
+    def _createResponse(self, decision):
+        """Create a response for a decision
+
+        :param decision: decision
+        :type decision: ndg.xacml.core.context.result.Decision
+        :return: response
+        :rtype: ndg.xacml.core.context.response.Response
+        """
+        raise NotImplementedError()
+
+    def decide(self, request):
+        """Get the decision for a request, from the cache if possible
+
+        :param request: request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: decision
+        :rtype: ndg.xacml.core.context.result.Decision
+        """
+        key = None
+        if self.__cache is not None:
+            key = self.__class__.canonicalRequestKey(request)
+            if key is not None:
+                decision = self.__cache.get(key)
+                if decision is not None:
+                    return decision
+
+        decision = self._decide(request)
+
+        if key is not None:
+            self.__cache.set(key, decision)
+
+        return decision
+
+    def evaluate(self, request):
+        """Make an access control decision
+
+        :param request: request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: new response for this request
+        :rtype: ndg.xacml.core.context.response.Response
+        """
+        return self._createResponse(self.decide(request))
@@ -0,0 +1,216 @@
+"""SAML 2.0 attribute release policy - control which attributes may be released
+to a given query issuer
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import logging
+log = logging.getLogger(__name__)
+import sys
+from configparser import ConfigParser
+
+from ndg.saml.saml2.core import Response
+
+
+class AttributeReleasePolicyConfigError(Exception):
+    """Error with attribute release policy configuration"""
+
+
+class AttributeReleasePolicy(object):
+    """Attribute release policy.  For each query issuer, a set of the
+    attribute names which may be released to it.  Policies are compiled into
+    frozensets of interned names so that filtering is a set membership test or
+    intersection per attribute rather than a search through lists.
+
+    Policy files use INI format with a section for each issuer name and an
+    "attributes" option listing the names of the attributes which may be
+    released to it, separated by white space e.g.
+
+    [/O=Site A/CN=Authorisation Service]
+    attributes =
+        urn:esg:first:name
+        urn:esg:last:name
+
+    A section named "*" sets the attributes which may be released to issuers
+    not otherwise listed.  If this is omitted, no attributes are released to
+    them.
+
+    :cvar ANY_ISSUER: name for policy which applies to issuers with no
+    explicit entry
+    :type ANY_ISSUER: string
+    :cvar ATTRIBUTES_OPTNAME: policy file option name for attributes list
+    :type ATTRIBUTES_OPTNAME: string
+
+    :ivar __policies: issuer name to releasable attribute names mapping
+    :type __policies: dict
+    :ivar __defaultPolicy: releasable attribute names for issuers with no
+    explicit entry
+    :type __defaultPolicy: frozenset
+    """
+    ANY_ISSUER = '*'
+    ATTRIBUTES_OPTNAME = 'attributes'
+
+    __slots__ = ('__policies', '__defaultPolicy')
+
+    def __init__(self, policies=None):
+        """
+        :param policies: mapping of issuer name to iterable of releasable
+        attribute names.  Use ANY_ISSUER as the key to set a default
+        :type policies: dict / NoneType
+        """
+        self.__policies = {}
+        self.__defaultPolicy = frozenset()
+
+        if policies is not None:
+            for issuerName, attributeNames in list(policies.items()):
+                self.setPolicy(issuerName, attributeNames)
+
+    @classmethod
+    def fromConfigFile(cls, filePath):
+        """Load a policy from an INI format file
+
+        :param filePath: path to policy file
+        :type filePath: basestring
+        :return: attribute release policy
+        :rtype: ndg.saml.saml2.release_policy.AttributeReleasePolicy
+        :raise AttributeReleasePolicyConfigError: error reading the file or
+        section with no attributes option
+        """
+        cfg = ConfigParser(interpolation=None)
+        if not cfg.read(filePath):
+            raise AttributeReleasePolicyConfigError('Error reading attribute '
+                                                    'release policy file %r' %
+                                                    filePath)
+        policy = cls()
+        for issuerName in cfg.sections():
+            if not cfg.has_option(issuerName, cls.ATTRIBUTES_OPTNAME):
+                raise AttributeReleasePolicyConfigError('No %r option set '
+                                                        'for issuer %r in '
+                                                        'policy file %r' %
+                                                (cls.ATTRIBUTES_OPTNAME,
+                                                 issuerName, filePath))
+
+            attributeNames = cfg.get(issuerName, cls.ATTRIBUTES_OPTNAME)
+            policy.setPolicy(issuerName, attributeNames.split())
+
+        return policy
+
+    def setPolicy(self, issuerName, attributeNames):
+        """Set the attributes which may be released to a given issuer
+
+        :param issuerName: issuer name or ANY_ISSUER to set the policy for
+        issuers with no explicit entry
+        :type issuerName: basestring
+        :param attributeNames: names of attributes which may be released
+        :type attributeNames: iterable
+        """
+        if not isinstance(issuerName, str):
+            raise TypeError('Expecting string type for "issuerName"; got %r' %
+                            type(issuerName))
+
+        names = frozenset([sys.intern(name) for name in attributeNames])
+        if issuerName == self.__class__.ANY_ISSUER:
+            self.__defaultPolicy = names
+        else:
+            self.__policies[sys.intern(issuerName)] = names
+
+    def releasableAttributeNames(self, issuerName):
+        """Get the names of the attributes which may be released to the given
+        issuer
+
+        :param issuerName: issuer name.  If None, the default policy applies
+        :type issuerName: basestring / NoneType
+        :return: releasable attribute names
+        :rtype: frozenset
+        """
+        return self.__policies.get(issuerName, self.__defaultPolicy)
+
+    def filterAttributeNames(self, issuerName, attributeNames):
+        """Filter a set of attribute names to those which may be released to
+        the given issuer
+
+        :param issuerName: issuer name
+        :type issuerName: basestring / NoneType
+        :param attributeNames: attribute names
+        :type attributeNames: iterable
+        :return: names which may be released
+        :rtype: frozenset
+        """
+        return self.releasableAttributeNames(issuerName).intersection(
+                                                                attributeNames)
+
+    def filterAttributes(self, issuerName, attributes):
+        """Filter attributes to those which may be released to the given
+        issuer e.g. the attributes requested in an attribute query
+
+        :param issuerName: issuer name
+        :type issuerName: basestring / NoneType
+        :param attributes: attributes to filter
+        :type attributes: iterable of ndg.saml.saml2.core.Attribute
+        :return: attributes which may be released in their original order
+        :rtype: list
+        """
+        releasable = self.releasableAttributeNames(issuerName)
+        return [attribute for attribute in attributes
+                if attribute.name in releasable]
+
+    def filterResponse(self, issuerName, response):
+        """Remove attributes from the attribute statements of a response which
+        may not be released to the given issuer.  The response is updated in
+        place.  The schema requires an attribute statement to have at least 
+        one attribute so statements left empty are removed, as are assertions
+        left with no statements
+
+        :param issuerName: name of issuer of the query the response is for
+        :type issuerName: basestring / NoneType
+        :param response: SAML response
+        :type response: ndg.saml.saml2.core.Response
+        :return: number of attributes removed
+        :rtype: int
+        """
+        if not isinstance(response, Response):
+            raise TypeError('Expecting %r type for "response"; got %r' %
+                            (Response, type(response)))
+
+        releasable = self.releasableAttributeNames(issuerName)
+        nRemoved = 0
+        emptiedAssertions = []
+        for assertion in response.assertions:
+            emptiedStatements = []
+            for attributeStatement in assertion.attributeStatements:
+                attributes = attributeStatement.attributes
+                released = [attribute for attribute in attributes
+                            if attribute.name in releasable]
+
+                if len(released) < len(attributes):
+                    nRemoved += len(attributes) - len(released)
+                    attributes[:] = released
+                    if len(released) == 0:
+                        emptiedStatements.append(id(attributeStatement))
+                        
+            if emptiedStatements:
+                assertion.attributeStatements[:] = [
+                    attributeStatement 
+                    for attributeStatement in assertion.attributeStatements
+                    if id(attributeStatement) not in emptiedStatements]
+                
+                if (len(assertion.attributeStatements) == 0 and
+                    len(assertion.authzDecisionStatements) == 0 and
+                    len(assertion.authnStatements) == 0 and
+                    len(assertion.statements) == 0):
+                    emptiedAssertions.append(id(assertion))
+                    
+        if emptiedAssertions:
+            response.assertions[:] = [assertion 
+                                      for assertion in response.assertions
+                                      if id(assertion) not in emptiedAssertions]
+
+        if nRemoved:
+            log.debug("Release policy removed %d attribute(s) from response "
+                      "to issuer %r", nRemoved, issuerName)
+
+        return nRemoved
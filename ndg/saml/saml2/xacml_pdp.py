@@ -0,0 +1,238 @@
+"""SAML 2.0 profile for XACML v2.0 - embedded XACML Policy Decision Point for
+use by XACML authorisation decision query interfaces.  Requires ndg_xacml -
+install with the xacml_profile extra
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import logging
+log = logging.getLogger(__name__)
+
+from ndg.xacml.core import Identifiers
+from ndg.xacml.core.context.pdp import PDP
+from ndg.xacml.core.context.response import Response
+from ndg.xacml.core.context.result import Result, Decision
+from ndg.xacml.core.context.exceptions import XacmlContextError
+from ndg.xacml.parsers.etree.factory import ReaderFactory
+
+from ndg.saml.saml2.decision_cache import DecisionCachingPDPBase
+
+
+class IndexedPDP(DecisionCachingPDPBase):
+    """XACML Policy Decision Point for a list of policies indexed by the
+    resource and action identifiers in their targets.  Only the policies
+    whose targets could match a request are evaluated.  Decisions from the
+    policies evaluated are combined with the deny overrides algorithm.
+
+    Decisions are cached by DecisionCachingPDPBase.
+
+    :cvar EQUAL_MATCH_IDS: target match functions for which the match value
+    can be used as an index key
+    :type EQUAL_MATCH_IDS: tuple
+    """
+    EQUAL_MATCH_IDS = (
+        'urn:oasis:names:tc:xacml:1.0:function:string-equal',
+        'urn:oasis:names:tc:xacml:1.0:function:anyURI-equal'
+    )
+
+    __slots__ = (
+        '__policies',
+        '__anyResource',
+        '__byResource',
+        '__anyAction',
+        '__byAction'
+    )
+
+    def __init__(self, policies=None,
+                 cacheSize=DecisionCachingPDPBase.DEFAULT_CACHE_SIZE):
+        """
+        :param policies: XACML policies or policy sets
+        :type policies: iterable / NoneType
+        :param cacheSize: maximum number of cached decisions.  Set to zero to
+        disable caching
+        :type cacheSize: int
+        """
+        super(IndexedPDP, self).__init__(cacheSize=cacheSize)
+        self.__policies = []
+        self.__anyResource = set()
+        self.__byResource = {}
+        self.__anyAction = set()
+        self.__byAction = {}
+
+        if policies is not None:
+            for policy in policies:
+                self.addPolicy(policy)
+
+    @classmethod
+    def fromPolicyFiles(cls, policyFilePaths, **kw):
+        """Create PDP loading policies from files
+
+        :param policyFilePaths: policy file paths
+        :type policyFilePaths: iterable
+        :param kw: keywords to __init__
+        :type kw: dict
+        :return: PDP
+        :rtype: ndg.saml.saml2.xacml_pdp.IndexedPDP
+        """
+        return cls([PDP.fromPolicySource(filePath, ReaderFactory).policy
+                    for filePath in policyFilePaths], **kw)
+
+    @property
+    def policies(self):
+        """Policies in the order they were added
+
+        :return: policies
+        :rtype: list
+        """
+        return self.__policies
+
+    @classmethod
+    def _targetKeys(cls, targetChildren, attributeId):
+        """Get the values of attributeId the target resources or actions of a
+        policy match
+
+        :param targetChildren: resources or actions of a policy target
+        :type targetChildren: list
+        :param attributeId: attribute identifier to get values for
+        :type attributeId: string
+        :return: attribute values or None if the target can match any value
+        :rtype: set / NoneType
+        """
+        if len(targetChildren) == 0:
+            return None
+
+        keys = set()
+        for targetChild in targetChildren:
+            # Matches within a target resource or action all have to be
+            # satisfied so any one equality match can be used for the key
+            key = None
+            for match in targetChild.matches:
+                if (match.matchId in cls.EQUAL_MATCH_IDS and
+                    match.attributeValue is not None and
+                    match.attributeDesignator is not None and
+                    match.attributeDesignator.attributeId == attributeId):
+                    key = match.attributeValue.value
+                    break
+
+            if key is None:
+                return None
+
+            keys.add(key)
+
+        return keys
+
+    def addPolicy(self, policy):
+        """Add a policy or policy set and index it
+
+        :param policy: XACML policy or policy set
+        :type policy: ndg.xacml.core.policybase.PolicyBase
+        """
+        i = len(self.__policies)
+        self.__policies.append(policy)
+
+        if policy.target is None:
+            resourceKeys = actionKeys = None
+        else:
+            resourceKeys = self.__class__._targetKeys(policy.target.resources,
+                                        Identifiers.Resource.RESOURCE_ID)
+            actionKeys = self.__class__._targetKeys(policy.target.actions,
+                                        Identifiers.Action.ACTION_ID)
+
+        if resourceKeys is None:
+            self.__anyResource.add(i)
+        else:
+            for key in resourceKeys:
+                self.__byResource.setdefault(key, set()).add(i)
+
+        if actionKeys is None:
+            self.__anyAction.add(i)
+        else:
+            for key in actionKeys:
+                self.__byAction.setdefault(key, set()).add(i)
+
+        self.clearCache()
+
+    @staticmethod
+    def _attributeValues(requestChildren, attributeId):
+        values = set()
+        for requestChild in requestChildren:
+            for attribute in requestChild.attributes:
+                if attribute.attributeId == attributeId:
+                    values.update([attributeValue.value
+                                   for attributeValue in
+                                   attribute.attributeValues])
+        return values
+
+    def candidatePolicies(self, request):
+        """Get the policies which could apply to a request
+
+        :param request: XACML request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: policies in the order they were added
+        :rtype: list
+        """
+        resourceCandidates = set(self.__anyResource)
+        for resourceId in self._attributeValues(request.resources,
+                                            Identifiers.Resource.RESOURCE_ID):
+            resourceCandidates.update(self.__byResource.get(resourceId, ()))
+
+        actionCandidates = set(self.__anyAction)
+        if request.action is not None:
+            for actionId in self._attributeValues([request.action],
+                                            Identifiers.Action.ACTION_ID):
+                actionCandidates.update(self.__byAction.get(actionId, ()))
+
+        return [self.__policies[i]
+                for i in sorted(resourceCandidates & actionCandidates)]
+
+    def _decide(self, request):
+        """Evaluate the candidate policies for a request
+
+        :param request: XACML request context
+        :type request: ndg.xacml.core.context.request.Request
+        :return: decision
+        :rtype: ndg.xacml.core.context.result.Decision
+        """
+        decisions = []
+        for policy in self.candidatePolicies(request):
+            try:
+                decision = policy.evaluate(request)
+            except XacmlContextError:
+                log.exception('Error evaluating policy %r', policy.ident)
+                decision = Decision.INDETERMINATE
+
+            if decision == Decision.DENY:
+                decisions = [decision]
+                break
+
+            decisions.append(decision)
+
+        # Deny overrides
+        if Decision.DENY in decisions:
+            decision = Decision.DENY
+        elif Decision.PERMIT in decisions:
+            decision = Decision.PERMIT
+        elif Decision.INDETERMINATE in decisions:
+            decision = Decision.INDETERMINATE
+        else:
+            decision = Decision.NOT_APPLICABLE
+
+        return decision
+
+    def _createResponse(self, decision):
+        """Create an XACML response with a single result
+
+        :param decision: decision
+        :type decision: ndg.xacml.core.context.result.Decision
+        :return: XACML response
+        :rtype: ndg.xacml.core.context.response.Response
+        """
+        response = Response()
+        result = Result.createInitialised(decision=Decision.NOT_APPLICABLE)
+        result.decision = decision
+        response.results.append(result)
+        return response
@@ -42,17 +42,18 @@ class XACMLAuthzDecisionQuery(RequestAbstractType):
     DEFAULT_ELEMENT_LOCAL_NAME = "XACMLAuthzDecisionQuery"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML2_XACML_PROTOCOL_NS, 
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML2_XACML_PROTOCOL_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(
+                            SAMLConstants.SAML2_XACML_PROTOCOL_NS,
+                            DEFAULT_ELEMENT_LOCAL_NAME,
+                            SAMLConstants.SAML2_XACML_PROTOCOL_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "XACMLAuthzDecisionQueryType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML2_XACML_PROTOCOL_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML2_XACML_PROTOCOL_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML2_XACML_PROTOCOL_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML2_XACML_PROTOCOL_PREFIX)
 
     # InputContextOnly attribute name
     INPUT_CONTEXT_ONLY_ATTRIB_NAME = "InputContextOnly"
@@ -212,17 +213,23 @@ class XACMLAuthzDecisionStatement(Statement):
     DEFAULT_ELEMENT_LOCAL_NAME = "XACMLAuthzDecisionStatement"
 
     # Default element name.
-    DEFAULT_ELEMENT_NAME = QName(SAMLConstants.SAML2_XACML_ASSERTION_NS,
-                                 DEFAULT_ELEMENT_LOCAL_NAME,
-                                 SAMLConstants.SAML2_XACML_ASSERTION_PREFIX)
+    DEFAULT_ELEMENT_NAME = QName.intern(
+                            SAMLConstants.SAML2_XACML_ASSERTION_NS,
+                            DEFAULT_ELEMENT_LOCAL_NAME,
+                            SAMLConstants.SAML2_XACML_ASSERTION_PREFIX)
 
     # Local name of the XSI type.
     TYPE_LOCAL_NAME = "XACMLAuthzDecisionStatementType"
 
     # QName of the XSI type.
-    TYPE_NAME = QName(SAMLConstants.SAML2_XACML_ASSERTION_NS, 
-                      TYPE_LOCAL_NAME,
-                      SAMLConstants.SAML2_XACML_ASSERTION_PREFIX)
+    TYPE_NAME = QName.intern(SAMLConstants.SAML2_XACML_ASSERTION_NS, 
+                             TYPE_LOCAL_NAME,
+                             SAMLConstants.SAML2_XACML_ASSERTION_PREFIX)
+
+    # Namespace for the element name of instances
+    DEFAULT_NAMESPACE_URI = SAMLConstants.SAML2_XACML_ASSERTION_NS
+    DEFAULT_NAMESPACE_PREFIX = SAMLConstants.SAML2_XACML_ASSERTION_PREFIX
+    
     __slots__ = (
         '__xacmlContextRequest',
         '__xacmlContextResponse'
@@ -231,9 +238,7 @@ class XACMLAuthzDecisionStatement(Statement):
     def __init__(self):
         '''Create new authorisation decision statement
         '''
-        super(XACMLAuthzDecisionStatement, self).__init__(
-                    namespaceURI=SAMLConstants.SAML2_XACML_ASSERTION_NS, 
-                    namespacePrefix=SAMLConstants.SAML2_XACML_ASSERTION_PREFIX)
+        super(XACMLAuthzDecisionStatement, self).__init__()
         self.__xacmlContextRequest = None
         self.__xacmlContextResponse = None
 
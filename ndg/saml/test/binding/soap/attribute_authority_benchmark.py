@@ -0,0 +1,143 @@
+'''ndg.saml.test.binding.soap.attribute_authority_benchmark - measure query
+rate and memory use per worker process for the index backed Attribute
+Authority query interface
+
+Run with:
+
+python -m ndg.saml.test.binding.soap.attribute_authority_benchmark \
+    --subjects 1000000 --workers 4
+
+Each worker is forked in the same way as a gunicorn worker and answers
+attribute queries for random subjects, a proportion of them unknown, for a
+fixed period.  Resident memory is reported split into anonymous and file
+backed pages.  File backed pages of the memory mapped index are shared
+between workers.
+'''
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import multiprocessing
+from datetime import datetime
+
+from ndg.saml.saml2.core import Response, Status, StatusCode, StatusMessage
+from ndg.saml.saml2.attribute_index import AttributeIndex
+from ndg.saml.saml2.binding.soap.server.wsgi.attributeauthority import \
+    AttributeAuthorityMiddleware
+from ndg.saml.test.utils import SAMLUtil
+
+SUBJECT_FMT = 'https://openid.localhost/user%d'
+
+
+def _subjects(nSubjects):
+    for i in range(nSubjects):
+        yield SUBJECT_FMT % i, {
+            'urn:esg:first:name': ['First%d' % i],
+            'urn:esg:last:name': ['Last%d' % i],
+            'urn:esg:email:address': ['user%d@somewhere' % i]
+        }
+
+
+def _memoryUsage():
+    """Resident memory of this process in kB from /proc - Linux only"""
+    usage = {}
+    with open('/proc/self/status') as statusFile:
+        for line in statusFile:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'RssAnon', 'RssFile'):
+                usage[name] = int(value.split()[0])
+    return usage
+
+
+def _worker(indexFilePath, nSubjects, duration, unknownRate, results):
+    app = AttributeAuthorityMiddleware.filter_app_factory(None, {},
+                            indexFilePath=indexFilePath,
+                            issuerName='/O=NDG/CN=Benchmark Attribute Authority')
+    samlUtil = SAMLUtil()
+    samlUtil.firstName = ''
+    samlUtil.lastName = ''
+    query = samlUtil.buildAttributeQuery('/O=Site A/CN=Benchmark', '')
+
+    nQueries = 0
+    nUnknown = 0
+    end = time.time() + duration
+    while time.time() < end:
+        if random.random() < unknownRate:
+            query.subject.nameID.value = 'unknown%d' % random.randrange(
+                                                                    nSubjects)
+        else:
+            query.subject.nameID.value = SUBJECT_FMT % random.randrange(
+                                                                    nSubjects)
+        response = Response()
+        response.issueInstant = datetime.utcnow()
+        response.status = Status()
+        response.status.statusCode = StatusCode()
+        response.status.statusMessage = StatusMessage()
+        app.queryInterface(query, response)
+        if (response.status.statusCode.value ==
+            StatusCode.UNKNOWN_PRINCIPAL_URI):
+            nUnknown += 1
+        nQueries += 1
+
+    results.put((os.getpid(), nQueries / duration, nUnknown, _memoryUsage()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subjects', type=int, default=1000000,
+                        help='number of subjects in the index')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of worker processes')
+    parser.add_argument('--duration', type=float, default=10.,
+                        help='seconds to run queries for in each worker')
+    parser.add_argument('--unknown-rate', type=float, default=0.1,
+                        help='proportion of queries for unknown subjects')
+    args = parser.parse_args()
+
+    tmpDir = tempfile.mkdtemp()
+    try:
+        indexFilePath = os.path.join(tmpDir, 'attributes.idx')
+        start = time.time()
+        AttributeIndex.write(indexFilePath, _subjects(args.subjects),
+                             args.subjects)
+        print('Built index of %d subjects in %.1f s (%.1f MB)' % (
+              args.subjects, time.time() - start,
+              os.path.getsize(indexFilePath) / 2.**20))
+
+        ctx = multiprocessing.get_context('fork')
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_worker,
+                               args=(indexFilePath, args.subjects,
+                                     args.duration, args.unknown_rate,
+                                     results))
+                   for i in range(args.workers)]
+        for worker in workers:
+            worker.start()
+
+        totalQPS = 0.
+        for i in range(args.workers):
+            pid, qps, nUnknown, usage = results.get(
+                                            timeout=args.duration + 60.)
+            totalQPS += qps
+            print('worker %d: %8.0f queries/s, %d unknown, RSS %d kB '
+                  '(anonymous %d kB, file %d kB)' % (pid, qps, nUnknown,
+                  usage.get('VmRSS', 0), usage.get('RssAnon', 0),
+                  usage.get('RssFile', 0)))
+
+        for worker in workers:
+            worker.join()
+
+        print('total: %.0f queries/s' % totalQPS)
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == '__main__':
+    main()
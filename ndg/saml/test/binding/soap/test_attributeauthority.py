@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""Unit tests for WSGI SAML 2.0 Attribute Authority backed by an attribute
+index file
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+
+from ndg.soap.etree import SOAPEnvelope
+
+from ndg.saml.saml2.core import Issuer, StatusCode
+from ndg.saml.xml.etree import AttributeQueryElementTree, ResponseElementTree
+from ndg.saml.saml2.attribute_index import AttributeIndex
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterface import \
+    SOAPQueryInterfaceMiddleware
+from ndg.saml.saml2.binding.soap.server.wsgi.attributeauthority import \
+    AttributeAuthorityMiddleware
+from ndg.saml.test.binding.soap import TestApp
+from ndg.saml.test.utils import SAMLUtil
+
+
+class AttributeAuthorityMiddlewareTestCase(unittest.TestCase):
+    """Test SAML Attribute Query over SOAP Binding to an Attribute Authority
+    backed by an attribute index file"""
+    SERVICE_URI = '/attribute-service'
+    QUERY_ISSUER = "/O=Site A/CN=Authorisation Service"
+    NO_ATTRIBUTES_SUBJECT = "https://openid.localhost/no-attributes"
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        indexFilePath = os.path.join(self.tmpDir, 'attributes.idx')
+        subjects = {
+            SAMLUtil.NAMEID_VALUE: {
+                "urn:esg:first:name": ["Philip"],
+                "urn:esg:last:name": ["Kershaw"],
+                "urn:esg:email:address": ["p.j.k@somewhere"]
+            },
+            self.__class__.NO_ATTRIBUTES_SUBJECT: {}
+        }
+        AttributeIndex.write(indexFilePath, subjects.items(), len(subjects))
+
+        queryInterfaceApp = SOAPQueryInterfaceMiddleware.filter_app_factory(
+            TestApp({}), {},
+            mountPath=self.__class__.SERVICE_URI,
+            queryInterfaceKeyName='attributeQueryInterface',
+            deserialise='ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+            serialise='ndg.saml.xml.etree:ResponseElementTree.toXML',
+            issuerName='/O=NDG/OU=BADC/CN=attributeauthority.badc.rl.ac.uk',
+            issuerFormat=Issuer.X509_SUBJECT)
+
+        self.app = AttributeAuthorityMiddleware.filter_app_factory(
+            queryInterfaceApp, {},
+            queryInterfaceKeyName='attributeQueryInterface',
+            indexFilePath=indexFilePath,
+            issuerName='/O=NDG/OU=BADC/CN=attributeauthority.badc.rl.ac.uk',
+            validQueryIssuers='\n' + self.__class__.QUERY_ISSUER + '\n')
+
+    def tearDown(self):
+        self.app.index.close()
+        shutil.rmtree(self.tmpDir)
+
+    def _query(self, attributeQuery):
+        """Post a query through the middleware stack and parse the response
+        """
+        soapRequest = SOAPEnvelope()
+        soapRequest.create()
+        soapRequest.body.elem.append(
+                                AttributeQueryElementTree.toXML(attributeQuery))
+        request = soapRequest.serialize()
+        if isinstance(request, str):
+            request = request.encode()
+
+        environ = {
+            'PATH_INFO': self.__class__.SERVICE_URI,
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(request)),
+            'wsgi.input': BytesIO(request)
+        }
+        status = []
+        def start_response(statusLine, headers):
+            status.append(statusLine)
+
+        responseBody = b''.join(self.app(environ, start_response))
+        self.assertEqual(status[0], '200 OK')
+
+        soapResponse = SOAPEnvelope()
+        soapResponse.parse(StringIO(responseBody.decode()))
+        return ResponseElementTree.fromXML(soapResponse.body.elem[0])
+
+    def _createAttributeQuery(self, subject=SAMLUtil.NAMEID_VALUE,
+                              issuer=QUERY_ISSUER):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = ''
+        samlUtil.emailAddress = ''
+        return samlUtil.buildAttributeQuery(issuer, subject)
+
+    def test01ValidQuery(self):
+        attributeQuery = self._createAttributeQuery()
+        samlResponse = self._query(attributeQuery)
+
+        self.assertEqual(samlResponse.status.statusCode.value,
+                         StatusCode.SUCCESS_URI)
+        self.assertEqual(samlResponse.inResponseTo, attributeQuery.id)
+        assertion = samlResponse.assertions[0]
+        self.assertEqual(assertion.subject.nameID.value,
+                         SAMLUtil.NAMEID_VALUE)
+
+        attributes = assertion.attributeStatements[0].attributes
+        self.assertEqual([(attribute.name,
+                           attribute.attributeValues[0].value)
+                          for attribute in attributes],
+                         [("urn:esg:first:name", "Philip"),
+                          ("urn:esg:email:address", "p.j.k@somewhere")])
+
+    def test02UnknownPrincipal(self):
+        samlResponse = self._query(self._createAttributeQuery(
+                                                        subject='Joe.Bloggs'))
+        self.assertEqual(samlResponse.status.statusCode.value,
+                         StatusCode.UNKNOWN_PRINCIPAL_URI)
+
+    def test03InvalidQueryIssuer(self):
+        samlResponse = self._query(self._createAttributeQuery(
+                                        issuer="/CN=My Attribute Query Issuer"))
+        self.assertEqual(samlResponse.status.statusCode.value,
+                         StatusCode.REQUEST_DENIED_URI)
+
+    def test04SubjectWithNoAttributes(self):
+        # No assertion rather than one with an empty attribute statement
+        attributeQuery = self._createAttributeQuery(
+                                subject=self.__class__.NO_ATTRIBUTES_SUBJECT)
+        del attributeQuery.attributes[:]
+        samlResponse = self._query(attributeQuery)
+
+        self.assertEqual(samlResponse.status.statusCode.value,
+                         StatusCode.SUCCESS_URI)
+        self.assertEqual(len(samlResponse.assertions), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Unit tests for WSGI SAML 2.0 Authorisation Decision query interface using
+a resource URI based policy
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from ndg.saml.saml2.core import (Response, Status, StatusCode, StatusMessage,
+                                 DecisionType)
+from ndg.saml.saml2.attribute_index import AttributeIndex
+from ndg.saml.saml2.binding.soap.server.wsgi.authzdecision import \
+    AuthzDecisionMiddleware
+from ndg.saml.test.utils import SAMLUtil
+
+
+class AuthzDecisionMiddlewareTestCase(unittest.TestCase):
+    """Test Authorisation Decision query interface"""
+    POLICY_FILEPATH = os.path.join(os.path.dirname(__file__), '..', '..',
+                                   'authz-decision-policy.ini')
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        indexFilePath = os.path.join(self.tmpDir, 'attributes.idx')
+        subjects = {
+            SAMLUtil.NAMEID_VALUE: {
+                'urn:esg:sitea:grouprole': ['siteagroup:default']
+            }
+        }
+        AttributeIndex.write(indexFilePath, subjects.items(), len(subjects))
+
+        self.app = AuthzDecisionMiddleware.filter_app_factory(None, {},
+                            policyFilePath=self.__class__.POLICY_FILEPATH,
+                            attributeIndexFilePath=indexFilePath,
+                            issuerName='/O=Test/OU=Authorisation Service')
+
+    def tearDown(self):
+        self.app.attributeIndex.close()
+        shutil.rmtree(self.tmpDir)
+
+    def _authzDecisionQuery(self, **kw):
+        query = SAMLUtil().buildAuthzDecisionQuery(**kw)
+        response = Response()
+        response.issueInstant = datetime.utcnow()
+        response.status = Status()
+        response.status.statusCode = StatusCode()
+        response.status.statusMessage = StatusMessage()
+
+        self.app.queryInterface(query, response)
+        self.assertEqual(response.status.statusCode.value,
+                         StatusCode.SUCCESS_URI)
+        return query, response.assertions[0].authzDecisionStatements[0]
+
+    def test01Permit(self):
+        query, statement = self._authzDecisionQuery(
+                        resource='http://localhost/dap/data/my%20file.nc')
+        self.assertEqual(statement.decision, DecisionType.PERMIT)
+        self.assertEqual(statement.resource, query.resource)
+        self.assertEqual(statement.actions[0].value, query.actions[0].value)
+
+    def test02Deny(self):
+        query, statement = self._authzDecisionQuery(
+                            resource='http://localhost/dap/data/my%20file.nc',
+                            subjectNameID='https://openid.localhost/unknown')
+        self.assertEqual(statement.decision, DecisionType.DENY)
+
+
+if __name__ == "__main__":
+    unittest.main()
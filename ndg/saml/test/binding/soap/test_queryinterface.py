@@ -9,14 +9,21 @@ __copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
 __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "Philip.Kershaw@stfc.ac.uk"
 __revision__ = '$Id$'
+import os
 import unittest
+from io import StringIO, BytesIO
 
 from datetime import timedelta
-from ndg.saml.saml2.binding.soap.server.wsgi.queryinterface import \
-    SOAPQueryInterfaceMiddleware
+from ndg.soap.etree import SOAPEnvelope
+from ndg.saml.saml2.binding.soap.server.wsgi.queryinterface import (
+    SOAPQueryInterfaceMiddleware, QueryInterfaceMountPoint, 
+    SOAPQueryInterfaceMiddlewareConfigError)
     
 from ndg.saml.xml.etree import AttributeQueryElementTree    
+from ndg.saml.xml.etree import AuthzDecisionQueryElementTree
 from ndg.saml.xml.etree import ResponseElementTree
+from ndg.saml.saml2.core import AttributeQuery, AuthzDecisionQuery, Issuer
+from ndg.saml.test.utils import SAMLUtil
 
 
 class SOAPQueryInterfaceMiddlewareTestCase(unittest.TestCase):
@@ -38,7 +45,344 @@ class SOAPQueryInterfaceMiddlewareTestCase(unittest.TestCase):
                      AttributeQueryElementTree.fromXML)
         self.assertTrue(queryIface.serialise == ResponseElementTree.toXML)
         self.assertTrue(queryIface.clockSkewTolerance == timedelta(seconds=60*3))
+        
+    def test02QueryTypeRegistry(self):
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        config = {
+        'queryInterfaceKeyName': 'QUERY_IFACE_KEY',
+        'deserialise': 'ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+        'serialise': 'ndg.saml.xml.etree:ResponseElementTree.toXML'
+        }
+        queryIface.initialise({}, **config)
+        
+        # Default deserialiser is registered against its query element tag
+        attributeQueryTag = "{%s}%s" % (
+                        AttributeQuery.DEFAULT_ELEMENT_NAME.namespaceURI,
+                        AttributeQuery.DEFAULT_ELEMENT_NAME.localPart)
+        registration = queryIface.queryTypeRegistry[attributeQueryTag]
+        self.assertEqual(registration.deserialise, 
+                         AttributeQueryElementTree.fromXML)
+        
+        # No explicit key set - defer to the mount point setting
+        self.assertIsNone(registration.queryInterfaceKeyName)
+        
+        # Add a further query type with its own query interface
+        queryIface.registerQueryType(AuthzDecisionQuery.DEFAULT_ELEMENT_NAME,
+                                     AuthzDecisionQueryElementTree.fromXML,
+                                     queryInterfaceKeyName='AUTHZ_IFACE_KEY')
+        authzDecisionQueryTag = "{%s}%s" % (
+                        AuthzDecisionQuery.DEFAULT_ELEMENT_NAME.namespaceURI,
+                        AuthzDecisionQuery.DEFAULT_ELEMENT_NAME.localPart)
+        registration = queryIface.queryTypeRegistry[authzDecisionQueryTag]
+        self.assertEqual(registration.deserialise, 
+                         AuthzDecisionQueryElementTree.fromXML)
+        self.assertEqual(registration.queryInterfaceKeyName, 
+                         'AUTHZ_IFACE_KEY')
+        
+    def test03MountPoints(self):
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        config = {
+        'saml.queryInterfaceKeyName': 'QUERY_IFACE_KEY',
+        'saml.deserialise': 
+            'ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+        'saml.serialise': 'ndg.saml.xml.etree:ResponseElementTree.toXML',
+        'saml.issuerName': '/O=Default/CN=Attribute Authority',
+        'saml.issuerFormat': Issuer.X509_SUBJECT,
+        'saml.mountPoints': 'vo1, vo2',
+        'saml.mountPoint.vo1.mountPath': '/vo1/attribute-service',
+        'saml.mountPoint.vo1.queryInterfaceKeyName': 'VO1_QUERY_IFACE_KEY',
+        'saml.mountPoint.vo1.issuerName': '/O=VO1/CN=Attribute Authority',
+        'saml.mountPoint.vo1.clockSkewTolerance': '60',
+        'saml.mountPoint.vo2.mountPath': '/vo2/attribute-service',
+        'saml.mountPoint.vo2.samlVersion': '1.1',
+        }
+        queryIface.initialise({}, prefix='saml.', **config)
+        
+        # The middleware level mount path is not explicitly set so only the
+        # named mount points are served
+        self.assertNotIn('/', queryIface.mountPoints)
+        self.assertEqual(len(queryIface.mountPoints), 4)
+        
+        vo1 = queryIface.mountPoints['/vo1/attribute-service']
+        self.assertIs(vo1, queryIface.mountPoints['/vo1/attribute-service/'])
+        self.assertEqual(vo1.queryInterfaceKeyName, 'VO1_QUERY_IFACE_KEY')
+        self.assertEqual(vo1.clockSkewTolerance, timedelta(seconds=60))
+        
+        response = queryIface._initResponse(mountPoint=vo1)
+        self.assertEqual(response.issuer.value, 
+                         '/O=VO1/CN=Attribute Authority')
+        self.assertEqual(response.issuer.format, Issuer.X509_SUBJECT)
+
+        # Unset values default to the middleware level settings
+        vo2 = queryIface.mountPoints['/vo2/attribute-service']
+        self.assertEqual(vo2.queryInterfaceKeyName, 'QUERY_IFACE_KEY')
+        self.assertEqual(vo2.issuerName, '/O=Default/CN=Attribute Authority')
+        self.assertEqual(vo2.samlVersion, '1.1')
+
+        
+    def _createStreamingQueryIface(self, **config):
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        config.update({
+        'deserialise': 'ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+        'serialise': 'ndg.saml.xml.etree:ResponseElementTree.toXML',
+        'streamResponse': 'True'
+        })
+        queryIface.initialise({}, **config)
+        return queryIface
+    
+    @staticmethod
+    def _createResponse(nAssertions):
+        response = SAMLUtil.create_authz_decision_query_response()
+        for i in range(nAssertions - 1):
+            response.assertions.append(response.assertions[0])
+            
+        return response
+    
+    @staticmethod
+    def _parseResponse(soapResponseTxt):
+        soapResponse = SOAPEnvelope()
+        soapResponse.parse(StringIO(soapResponseTxt.decode()))
+        return ResponseElementTree.fromXML(soapResponse.body.elem[0])
+    
+    def test04StreamSmallResponse(self):
+        queryIface = self._createStreamingQueryIface()
+        response = self._createResponse(3)
+        
+        headers = []
+        def start_response(status, responseHeaders):
+            headers.extend(responseHeaders)
+            
+        chunks = queryIface._streamResponse(response, start_response)
+        
+        # Buffered and sent in one go
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(dict(headers)['Content-length'], 
+                         str(len(chunks[0])))
+        
+        parsedResponse = self._parseResponse(chunks[0])
+        self.assertEqual(len(parsedResponse.assertions), 3)
+        self.assertEqual(parsedResponse.id, response.id)
+
+    def test05StreamLargeResponse(self):
+        queryIface = self._createStreamingQueryIface(
+                                                streamResponseBufferSize='512')
+        response = self._createResponse(10)
+        
+        headers = []
+        def start_response(status, responseHeaders):
+            headers.extend(responseHeaders)
+            
+        chunks = list(queryIface._streamResponse(response, start_response))
+        
+        # Envelope prefix, each assertion and the closing suffix
+        self.assertEqual(len(chunks), 12)
+        self.assertNotIn('Content-length', dict(headers))
+        
+        parsedResponse = self._parseResponse(b''.join(chunks))
+        self.assertEqual(len(parsedResponse.assertions), 10)
+        self.assertEqual(parsedResponse.status.statusCode.value,
+                         response.status.statusCode.value)
+        
+        # Response object is left intact
+        self.assertEqual(len(response.assertions), 10)
 
+        
+    def test06AttributeReleasePolicy(self):
+        policyFilePath = os.path.join(os.path.dirname(__file__), '..', '..', 
+                                      'attribute-release-policy.ini')
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        config = {
+        'deserialise': 'ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+        'serialise': 'ndg.saml.xml.etree:ResponseElementTree.toXML',
+        'attributeReleasePolicyFilePath': policyFilePath
+        }
+        queryIface.initialise({}, **config)
+        self.assertEqual(
+            queryIface.attributeReleasePolicy.releasableAttributeNames(None),
+            frozenset(["urn:esg:first:name"]))
+
+    def test07StreamResponseWithWriter(self):
+        queryIface = self._createStreamingQueryIface(
+            serialiseAssertion='ndg.saml.xml.writer:SAMLWriter.toBytes',
+            streamResponseBufferSize='512')
+        response = self._createResponse(10)
+        
+        def start_response(status, responseHeaders):
+            pass
+            
+        chunks = list(queryIface._streamResponse(response, start_response))
+        self.assertEqual(len(chunks), 12)
+        
+        parsedResponse = self._parseResponse(b''.join(chunks))
+        self.assertEqual(len(parsedResponse.assertions), 10)
+        self.assertEqual(parsedResponse.assertions[-1].id,
+                         response.assertions[-1].id)
+
+    def test08PullParse(self):
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        queryIface.initialise({}, 
+            queryInterfaceKeyName='QUERY_IFACE_KEY',
+            deserialise='ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+            serialise='ndg.saml.xml.etree:ResponseElementTree.toXML',
+            issuerName='/O=Test/CN=Attribute Authority',
+            pullParse='True')
+        self.assertTrue(queryIface.pullParse)
+        
+        queries = []
+        def queryInterface(samlQuery, samlResponse):
+            queries.append(samlQuery)
+        
+        samlUtil = SAMLUtil()
+        attributeQuery = samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                                      SAMLUtil.NAMEID_VALUE)
+        soapRequest = SOAPEnvelope()
+        soapRequest.create()
+        soapRequest.body.elem.append(
+                                AttributeQueryElementTree.toXML(attributeQuery))
+        request = soapRequest.serialize()
+        
+        environ = {
+            'PATH_INFO': '/',
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(request)),
+            'wsgi.input': BytesIO(request),
+            'QUERY_IFACE_KEY': queryInterface
+        }
+        def start_response(status, responseHeaders):
+            self.assertEqual(status, '200 OK')
+            
+        response = queryIface(environ, start_response)
+        
+        self.assertIsInstance(queries[0], AttributeQuery)
+        self.assertEqual(queries[0].id, attributeQuery.id)
+        parsedResponse = self._parseResponse(b''.join(response))
+        self.assertEqual(parsedResponse.inResponseTo, attributeQuery.id)
+
+    def test09MountPathSetAfterCreation(self):
+        # Paths are served without initialise being called and follow 
+        # changes to mountPath
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        self.assertIs(queryIface.mountPoints['/'], queryIface)
+        
+        queryIface.mountPath = '/attribute-service'
+        self.assertEqual(sorted(queryIface.mountPoints), 
+                         ['/attribute-service', '/attribute-service/'])
+        self.assertIs(queryIface.mountPoints['/attribute-service'], 
+                      queryIface)
+        
+        nextAppCalls = []
+        def nextApp(environ, start_response):
+            nextAppCalls.append(environ['PATH_INFO'])
+            return []
+        
+        queryIface._app = nextApp
+        start_response = lambda status, headers: None
+        queryIface({'PATH_INFO': '/'}, start_response)
+        self.assertEqual(nextAppCalls, ['/'])
+        
+        response = queryIface({'PATH_INFO': '/attribute-service/',
+                               'REQUEST_METHOD': 'GET'}, start_response)
+        self.assertEqual(response, [b'Invalid request method'])
+        self.assertEqual(nextAppCalls, ['/'])
+        
+        # Set after initialise
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        queryIface.initialise({}, 
+            deserialise='ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+            serialise='ndg.saml.xml.etree:ResponseElementTree.toXML')
+        queryIface.mountPath = '/attribute-service'
+        self.assertNotIn('/', queryIface.mountPoints)
+        self.assertIn('/attribute-service', queryIface.mountPoints)
+
+    def test10MalformedRequest(self):
+        request = b'<soap:Envelope><unclosed>'
+        for pullParse in ('False', 'True'):
+            queryIface = SOAPQueryInterfaceMiddleware(None)
+            queryIface.initialise({}, 
+            deserialise='ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+            serialise='ndg.saml.xml.etree:ResponseElementTree.toXML',
+            pullParse=pullParse)
+        
+            environ = {
+                'PATH_INFO': '/',
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_LENGTH': str(len(request)),
+                'wsgi.input': BytesIO(request)
+            }
+            statuses = []
+            def start_response(status, responseHeaders):
+                statuses.append(status)
+                
+            response = b''.join(queryIface(environ, start_response))
+            self.assertEqual(statuses, ['400 Bad Request'])
+            self.assertTrue(response.startswith(b'Invalid SAML SOAP query: '))
+
+    def test11ValidatorSignatures(self):
+        # Validators registered with the query and response only are still
+        # supported alongside those taking the mount point too
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        queryIface.initialise({}, 
+            queryInterfaceKeyName='QUERY_IFACE_KEY',
+            deserialise='ndg.saml.xml.etree:AttributeQueryElementTree.fromXML',
+            serialise='ndg.saml.xml.etree:ResponseElementTree.toXML',
+            issuerName='/O=Test/CN=Attribute Authority')
+        
+        samlUtil = SAMLUtil()
+        attributeQuery = samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                                      SAMLUtil.NAMEID_VALUE)
+        soapRequest = SOAPEnvelope()
+        soapRequest.create()
+        attributeQueryElem = AttributeQueryElementTree.toXML(attributeQuery)
+        soapRequest.body.elem.append(attributeQueryElem)
+        request = soapRequest.serialize()
+        
+        calls = []
+        def validate(query, response):
+            calls.append((query.id, ))
+            
+        def validateWithMountPoint(query, response, mountPoint):
+            calls.append((query.id, mountPoint))
+            
+        for validator in (validate, validateWithMountPoint):
+            queryIface.registerQueryType(
+                                    AttributeQuery.DEFAULT_ELEMENT_NAME,
+                                    AttributeQueryElementTree.fromXML,
+                                    validate=validator)
+            environ = {
+                'PATH_INFO': '/',
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_LENGTH': str(len(request)),
+                'wsgi.input': BytesIO(request),
+                'QUERY_IFACE_KEY': lambda query, response: None
+            }
+            queryIface(environ, lambda status, responseHeaders: None)
+            
+        self.assertEqual(calls, [(attributeQuery.id, ),
+                                 (attributeQuery.id, queryIface)])
+            
+    def test12AddMountPointDuplicate(self):
+        queryIface = SOAPQueryInterfaceMiddleware(None)
+        queryIface.addMountPoint(QueryInterfaceMountPoint(mountPath='/a/'))
+        
+        # '/a' is free but '/a/' is not so neither is added
+        mountPoint = QueryInterfaceMountPoint(mountPath='/a')
+        self.assertRaises(SOAPQueryInterfaceMiddlewareConfigError,
+                          queryIface.addMountPoint, mountPoint)
+        self.assertNotIn('/a', queryIface.mountPoints)
+        self.assertIsNot(queryIface.mountPoints['/a/'], mountPoint)
+        
+        # The middleware is the default mount point and shares its setting
+        # validation
+        self.assertIsInstance(queryIface, QueryInterfaceMountPoint)
+        queryIface.clockSkewTolerance = '1.5'
+        self.assertEqual(queryIface.clockSkewTolerance, 
+                         timedelta(seconds=1.5))
+        try:
+            queryIface.mountPath = None
+            self.fail('Expecting TypeError for mountPath set to None')
+        except TypeError:
+            pass
+        self.assertIs(queryIface.mountPoints['/'], queryIface)
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Unit tests for SAML SOAP query interface server script
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+from os import path
+import unittest
+
+from ndg.saml.utils.server import SamlServer
+
+
+class SamlServerTestCase(unittest.TestCase):
+    """Test SAML server start up"""
+    CONFIG_FILEPATH = path.join(path.dirname(__file__),
+                                'attribute-interface.ini')
+
+    def test01_parse_command_line(self):
+        server = SamlServer()
+        server.parse_command_line(['ndg_saml_server', '-w', '4',
+                                   '-k', 'gthread', '-t', '8',
+                                   self.__class__.CONFIG_FILEPATH])
+        options = server.options()
+        self.assertEqual(options['workers'], 4)
+        self.assertEqual(options['worker_class'], 'gthread')
+        self.assertEqual(options['threads'], 8)
+        self.assertTrue(options['preload_app'])
+        self.assertTrue(server.warm_up)
+
+    def test02_warm_up_app(self):
+        server = SamlServer()
+        server.parse_command_line(['ndg_saml_server',
+                                   self.__class__.CONFIG_FILEPATH])
+        app = server.load_app()
+
+        hookCalls = []
+        nWarmedUp = SamlServer.warm_up_app(app, hooks=[hookCalls.append])
+
+        # SOAPQueryInterfaceMiddleware is the only one with a warmUp method
+        self.assertEqual(nWarmedUp, 1)
+        self.assertEqual(hookCalls, [app])
+
+
+if __name__ == "__main__":
+    unittest.main()
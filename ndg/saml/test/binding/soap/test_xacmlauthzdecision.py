@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""Unit tests for WSGI SAML 2.0 profile for XACML v2.0 Authorisation Decision
+query interface using an embedded Policy Decision Point
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import unittest
+from datetime import datetime
+
+from ndg.saml.saml2.core import Response, Status, StatusCode, StatusMessage
+
+try:
+    from ndg.saml.saml2.xacml_profile import XACMLAuthzDecisionQuery
+    from ndg.saml.saml2.xacml_pdp import IndexedPDP
+    from ndg.saml.saml2.binding.soap.server.wsgi.xacmlauthzdecision import \
+        XACMLAuthzDecisionMiddleware
+    _xacml_support = True
+
+except ImportError as e:
+    from warnings import warn
+    warn('Error importing XACML packages - skipping XACML authorisation ' + \
+         'decision query interface unit tests module.  (Error is: %s)' % e)
+    _xacml_support = False
+
+
+if _xacml_support:
+
+    from ndg.xacml.core import Identifiers
+    from ndg.xacml.core.attribute import Attribute
+    from ndg.xacml.core.attributevalue import AttributeValueClassFactory
+    from ndg.xacml.core.context.action import Action
+    from ndg.xacml.core.context.request import Request
+    from ndg.xacml.core.context.resource import Resource
+    from ndg.xacml.core.context.result import Decision
+    from ndg.xacml.core.policy import Policy
+    from ndg.xacml.core.target import Target
+    from ndg.xacml.core.resource import Resource as TargetResource
+    from ndg.xacml.core.match import ResourceMatch
+    from ndg.xacml.core.attributedesignator import ResourceAttributeDesignator
+    from ndg.xacml.core.rule import Rule, Effect
+
+    _attributeValueClassFactory = AttributeValueClassFactory()
+    AnyUriAttributeValue = _attributeValueClassFactory(
+                                    'http://www.w3.org/2001/XMLSchema#anyURI')
+
+    class XACMLAuthzDecisionMiddlewareTestCase(unittest.TestCase):
+        """Test XACML Authorisation Decision query interface"""
+        RESOURCE_ID = 'http://localhost/dap/data/'
+
+        def _createPolicy(self, ident, resourceId, effect):
+            policy = Policy()
+            policy.policyId = ident
+            policy.ruleCombiningAlgId = \
+                'urn:oasis:names:tc:xacml:1.0:rule-combining-algorithm:' \
+                'permit-overrides'
+            policy.target = Target()
+
+            match = ResourceMatch()
+            match.matchId = IndexedPDP.EQUAL_MATCH_IDS[1]
+            match.attributeValue = AnyUriAttributeValue(resourceId)
+            match.attributeDesignator = ResourceAttributeDesignator()
+            match.attributeDesignator.attributeId = \
+                                            Identifiers.Resource.RESOURCE_ID
+            match.attributeDesignator.dataType = \
+                                            AnyUriAttributeValue.IDENTIFIER
+
+            targetResource = TargetResource()
+            targetResource.matches.append(match)
+            policy.target.resources.append(targetResource)
+
+            rule = Rule()
+            rule.id = ident + '-rule'
+            rule.effect = effect
+            policy.rules.append(rule)
+            return policy
+
+        def _createRequest(self, resourceId):
+            request = Request()
+            resource = Resource()
+            attribute = Attribute()
+            attribute.attributeId = Identifiers.Resource.RESOURCE_ID
+            attribute.dataType = AnyUriAttributeValue.IDENTIFIER
+            attribute.attributeValues.append(AnyUriAttributeValue(resourceId))
+            resource.attributes.append(attribute)
+            request.resources.append(resource)
+            request.action = Action()
+            return request
+
+        def setUp(self):
+            self.app = XACMLAuthzDecisionMiddleware(None)
+            self.app.issuerName = '/O=Test/OU=Authorisation Service'
+            self.app.pdp = IndexedPDP([
+                self._createPolicy('data', self.__class__.RESOURCE_ID,
+                                   Effect.PERMIT),
+                self._createPolicy('admin', 'http://localhost/admin/',
+                                   Effect.DENY)
+            ])
+
+        def _query(self, resourceId):
+            query = XACMLAuthzDecisionQuery()
+            query.xacmlContextRequest = self._createRequest(resourceId)
+            query.returnContext = True
+
+            response = Response()
+            response.issueInstant = datetime.utcnow()
+            response.status = Status()
+            response.status.statusCode = StatusCode()
+            response.status.statusMessage = StatusMessage()
+            return self.app.queryInterface(query, response)
+
+        def test01_candidate_policies(self):
+            request = self._createRequest(self.__class__.RESOURCE_ID)
+            candidates = self.app.pdp.candidatePolicies(request)
+            self.assertEqual([policy.policyId for policy in candidates],
+                             ['data'])
+
+        def test02_permit(self):
+            response = self._query(self.__class__.RESOURCE_ID)
+            self.assertEqual(response.status.statusCode.value,
+                             StatusCode.SUCCESS_URI)
+            statement = response.assertions[0].statements[0]
+            self.assertEqual(
+                statement.xacmlContextResponse.results[0].decision,
+                Decision.PERMIT)
+            self.assertIsNotNone(statement.xacmlContextRequest)
+
+        def test03_not_applicable(self):
+            response = self._query('http://localhost/other/')
+            statement = response.assertions[0].statements[0]
+            self.assertEqual(
+                statement.xacmlContextResponse.results[0].decision,
+                Decision.NOT_APPLICABLE)
+
+        def test04_decision_cache(self):
+            response = self._query(self.__class__.RESOURCE_ID)
+            response2 = self._query(self.__class__.RESOURCE_ID)
+            self.assertEqual(self.app.pdp.cache.hits, 1)
+            self.assertEqual(self.app.pdp.cache.misses, 1)
+
+            # Each response gets its own XACML context response
+            self.assertIsNot(
+                response2.assertions[0].statements[0].xacmlContextResponse,
+                response.assertions[0].statements[0].xacmlContextResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+'''ndg.saml.test.datetime_benchmark - compare parsing SAML timestamps with
+SAMLDateTime against the earlier strptime based implementation
+
+Run with:
+
+python -m ndg.saml.test.datetime_benchmark --iterations 100000
+
+Each parser is timed for a timestamp repeated as within one document and for
+distinct timestamps, for which the cache of parsed values doesn't help.
+'''
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import time
+import argparse
+from datetime import datetime, timedelta
+
+from ndg.saml.utils import SAMLDateTime
+
+
+def _strptimeFromString(strDateTime):
+    """Parse as SAMLDateTime.fromString did before it had its own parser"""
+    dateTimeTuple = strDateTime.split('.')
+    if len(dateTimeTuple) == 2:
+        strDateTimeFraction, strSecondsFraction = dateTimeTuple
+        secondsFraction = float("0." + strSecondsFraction.replace('Z', ''))
+    else:
+        strDateTimeFraction = dateTimeTuple[0].replace('Z', '')
+        secondsFraction = 0.
+
+    dtValue = datetime.strptime(strDateTimeFraction,
+                                SAMLDateTime.DATETIME_FORMAT)
+    dtValue += timedelta(seconds=secondsFraction)
+    return dtValue
+
+
+def _measure(parse, values):
+    start = time.perf_counter()
+    for value in values:
+        parse(value)
+    return (time.perf_counter() - start) / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=100000,
+                        help='number of timestamps to parse')
+    args = parser.parse_args()
+
+    start = datetime(2019, 10, 26, 12, 0, 0, 123456)
+    repeated = [SAMLDateTime.toString(start)] * args.iterations
+    distinct = [SAMLDateTime.toString(start + timedelta(seconds=i))
+                for i in range(args.iterations)]
+
+    for label, values in (('repeated', repeated), ('distinct', distinct)):
+        baseline = None
+        for name, parse in (('strptime', _strptimeFromString),
+                            ('uncached', SAMLDateTime._parse),
+                            ('fromString', SAMLDateTime.fromString)):
+            elapsed = _measure(parse, values)
+            if baseline is None:
+                baseline = elapsed
+            print('%-8s %-10s %8.3f us/timestamp (x%.2f)' % (
+                  label, name, elapsed * 1e6, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
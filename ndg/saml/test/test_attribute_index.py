@@ -0,0 +1,103 @@
+"""Unit tests for SAML 2.0 attribute index
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from ndg.saml.saml2.attribute_index import (AttributeIndex, AttributeIndexError,
+                                            BloomFilter, _hashKey)
+
+
+class AttributeIndexTestCase(unittest.TestCase):
+    """Test building and querying attribute index files"""
+    SUBJECTS = {
+        'https://openid.localhost/philip.kershaw': {
+            'urn:esg:first:name': ['Philip'],
+            'urn:esg:last:name': ['Kershaw'],
+            'urn:esg:sitea:grouprole': ['siteagroup:default',
+                                        'siteagroup:admin']
+        },
+        'https://openid.localhost/j.blöggs': {
+            'urn:esg:first:name': ['Jö']
+        }
+    }
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.indexFilePath = os.path.join(self.tmpDir, 'attributes.idx')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def test01BloomFilter(self):
+        nBits, nHashes = BloomFilter.optimalSize(1000, 0.01)
+        bloomFilter = BloomFilter(nBits, nHashes)
+        keys = [('subject%d' % i).encode() for i in range(1000)]
+        for key in keys:
+            bloomFilter.add(_hashKey(key))
+
+        for key in keys:
+            self.assertTrue(bloomFilter.mightContain(_hashKey(key)))
+
+        nFalsePositives = sum([
+            bloomFilter.mightContain(_hashKey(('other%d' % i).encode()))
+            for i in range(1000)])
+        self.assertLess(nFalsePositives, 50)
+
+    def test02WriteAndLookup(self):
+        subjects = self.__class__.SUBJECTS
+        AttributeIndex.write(self.indexFilePath, subjects.items(),
+                             len(subjects))
+
+        with AttributeIndex(self.indexFilePath) as index:
+            self.assertEqual(len(index), 2)
+            for subject, attributes in subjects.items():
+                self.assertIn(subject, index)
+                self.assertEqual(index.lookup(subject), attributes)
+
+            self.assertNotIn('https://openid.localhost/unknown', index)
+            self.assertIsNone(index.lookup('https://openid.localhost/unknown'))
+
+    def test03BuildFromCSV(self):
+        csvFilePath = os.path.join(self.tmpDir, 'attributes.csv')
+        with open(csvFilePath, 'w', encoding='utf-8') as csvFile:
+            csvFile.write('subject,name,value\n')
+            for subject, attributes in self.__class__.SUBJECTS.items():
+                for name, values in attributes.items():
+                    for value in values:
+                        csvFile.write('%s,%s,%s\n' % (subject, name, value))
+
+        AttributeIndex.build(csvFilePath, self.indexFilePath)
+        with AttributeIndex(self.indexFilePath) as index:
+            for subject, attributes in self.__class__.SUBJECTS.items():
+                self.assertEqual(index.lookup(subject), attributes)
+
+    def test04BuildFromJSON(self):
+        jsonFilePath = os.path.join(self.tmpDir, 'attributes.json')
+        with open(jsonFilePath, 'w', encoding='utf-8') as jsonFile:
+            json.dump({'alice': {'urn:esg:first:name': 'Alice'}}, jsonFile)
+
+        AttributeIndex.build(jsonFilePath, self.indexFilePath)
+        with AttributeIndex(self.indexFilePath) as index:
+            self.assertEqual(index.lookup('alice'),
+                             {'urn:esg:first:name': ['Alice']})
+
+    def test05InvalidIndexFile(self):
+        with open(self.indexFilePath, 'wb') as indexFile:
+            indexFile.write(b'x' * AttributeIndex.HEADER_SIZE)
+
+        self.assertRaises(AttributeIndexError, AttributeIndex,
+                          self.indexFilePath)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Unit tests for SAML 2.0 authorisation decision policy
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import unittest
+
+from ndg.saml.saml2.core import Action, DecisionType
+from ndg.saml.saml2.authz_policy import AuthzDecisionPolicy
+
+
+class AuthzDecisionPolicyTestCase(unittest.TestCase):
+    """Test authorisation decisions made with a resource URI trie policy"""
+    THIS_DIR = os.path.dirname(__file__)
+    POLICY_FILEPATH = os.path.join(THIS_DIR, 'authz-decision-policy.ini')
+    GET = [(Action.GHPP_NS_URI, Action.HTTP_GET_ACTION)]
+    POST = [(Action.GHPP_NS_URI, Action.HTTP_POST_ACTION)]
+    DEFAULT_GROUP = {'urn:esg:sitea:grouprole': ['siteagroup:default']}
+    ADMIN_GROUP = {'urn:esg:sitea:grouprole': ['siteagroup:admin']}
+
+    def setUp(self):
+        self.policy = AuthzDecisionPolicy.fromConfigFile(
+                                            self.__class__.POLICY_FILEPATH)
+
+    def test01PublicResource(self):
+        self.assertEqual(self.policy.evaluate('http://localhost/index.html',
+                                              self.__class__.GET, {}),
+                         DecisionType.PERMIT)
+        self.assertEqual(self.policy.evaluate('http://localhost/index.html',
+                                              self.__class__.POST, {}),
+                         DecisionType.DENY)
+
+    def test02NoApplicableRule(self):
+        self.assertEqual(self.policy.evaluate('http://otherhost/dap/data/',
+                                              self.__class__.GET, {}),
+                         DecisionType.INDETERMINATE)
+
+    def test03RequiredAttributes(self):
+        # Resource URIs are normalised in the same way as query resources
+        resource = 'http://localhost:80/dap/data/my file.nc'
+        self.assertEqual(self.policy.evaluate(resource, self.__class__.GET,
+                                              {}),
+                         DecisionType.DENY)
+        self.assertEqual(self.policy.evaluate(resource, self.__class__.GET,
+                                              self.__class__.DEFAULT_GROUP),
+                         DecisionType.PERMIT)
+
+        # HEAD is inherited from the rule for the parent URI
+        self.assertEqual(self.policy.evaluate(resource,
+                                    [(Action.GHPP_NS_URI, Action.HTTP_HEAD_ACTION)],
+                                    {}),
+                         DecisionType.PERMIT)
+
+    def test04MostSpecificRule(self):
+        resource = 'http://localhost/dap/data/admin/config'
+        self.assertEqual(self.policy.evaluate(resource, self.__class__.GET,
+                                              self.__class__.DEFAULT_GROUP),
+                         DecisionType.DENY)
+        self.assertEqual(self.policy.evaluate(resource,
+                                              self.__class__.GET + 
+                                              self.__class__.POST,
+                                              self.__class__.ADMIN_GROUP),
+                         DecisionType.PERMIT)
+
+        # Segment boundaries are respected
+        self.assertEqual(self.policy.evaluate(
+                                    'http://localhost/dap/data/administrator',
+                                    self.__class__.GET,
+                                    self.__class__.DEFAULT_GROUP),
+                         DecisionType.PERMIT)
+
+    def test05NoActions(self):
+        # A query with no actions is not permitted even for a public resource
+        for resource in ('http://localhost/index.html',
+                         'http://localhost/dap/data/my file.nc'):
+            self.assertEqual(self.policy.evaluate(resource, [],
+                                                  self.__class__.ADMIN_GROUP),
+                             DecisionType.INDETERMINATE)
+            self.assertEqual(self.policy.evaluate(resource, iter(()), {}),
+                             DecisionType.INDETERMINATE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests for the binary format for caching SAML objects
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import unittest
+import pickle
+import random
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from ndg.saml.saml2.core import (Assertion, DecisionType, Issuer,
+                                 XSStringAttributeValue)
+from ndg.saml.saml2 import binary_codec
+from ndg.saml.saml2.binary_codec import BinaryCodecError
+from ndg.saml.xml.writer import SAMLWriter
+from ndg.saml.test.utils import SAMLUtil
+
+
+class CustomAttributeValue(XSStringAttributeValue):
+    """Attribute value type outside the schema"""
+    __slots__ = ()
+
+
+class BinaryCodecTestCase(unittest.TestCase):
+    """Test dumps and loads"""
+
+    def _createResponse(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        for i in range(10):
+            samlUtil.addAttribute('urn:test:attribute%d' % i, 'value%d' % i)
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        response.assertions.append(samlUtil.buildAssertion())
+        return response
+
+    def test01_round_trip(self):
+        response = self._createResponse()
+        response2 = binary_codec.loads(binary_codec.dumps(response))
+        self.assertIsNot(response2, response)
+        self.assertEqual(SAMLWriter.toBytes(response2),
+                         SAMLWriter.toBytes(response))
+
+        statement = response2.assertions[0].authzDecisionStatements[0]
+        self.assertIs(statement.decision, DecisionType.PERMIT)
+
+        # Lists keep their item type checks
+        attributes = response2.assertions[1].attributeStatements[0].attributes
+        self.assertRaises(TypeError, attributes.append, None)
+
+        # Objects may be changed through their properties as before
+        attributes[0].name = 'urn:test:changed'
+        self.assertIn(b'urn:test:changed', SAMLWriter.toBytes(response2))
+
+    def test02_values(self):
+        assertion = Assertion()
+        assertion.id = 'a1'
+        assertion.issueInstant = datetime(2019, 10, 26, 13, 0,
+                                    tzinfo=timezone(timedelta(hours=1)))
+        assertion2 = binary_codec.loads(binary_codec.dumps(assertion))
+        self.assertEqual(assertion2.issueInstant, datetime(2019, 10, 26, 12))
+        self.assertIsNone(assertion2.subject)
+        self.assertEqual(assertion2.version, assertion.version)
+        self.assertIs(assertion2.qname, Assertion.DEFAULT_ELEMENT_NAME)
+
+        issuer = Issuer(namespacePrefix='test')
+        issuer2 = binary_codec.loads(binary_codec.dumps(issuer))
+        self.assertIsNot(issuer2.qname, Issuer.DEFAULT_ELEMENT_NAME)
+        self.assertEqual(issuer2.qname.prefix, 'test')
+        self.assertEqual(issuer2.qname.localPart, 'Issuer')
+
+    def test03_pickle_fallback(self):
+        response = self._createResponse()
+        attribute = response.assertions[1].attributeStatements[0].attributes[0]
+        attributeValue = CustomAttributeValue()
+        attributeValue.value = 'custom'
+        attribute.attributeValues.append(attributeValue)
+        response2 = binary_codec.loads(binary_codec.dumps(response))
+        attribute2 = response2.assertions[1].attributeStatements[0
+                                                            ].attributes[0]
+        self.assertIsInstance(attribute2.attributeValues[-1],
+                              CustomAttributeValue)
+        self.assertEqual(attribute2.attributeValues[-1].value, 'custom')
+
+    def test04_errors(self):
+        data = binary_codec.dumps(self._createResponse())
+        self.assertRaises(BinaryCodecError, binary_codec.loads, b'')
+        self.assertRaises(BinaryCodecError, binary_codec.loads, b'garbage')
+        self.assertRaises(BinaryCodecError, binary_codec.loads, data[:-10])
+
+        version = bytes((binary_codec.SCHEMA_VERSION + 1,))
+        data2 = data[:3] + version + data[4:]
+        self.assertRaisesRegex(BinaryCodecError, 'schema version',
+                               binary_codec.loads, data2)
+
+        attributeValue = XSStringAttributeValue()
+        attributeValue._XSStringAttributeValue__value = object()
+        self.assertRaises(BinaryCodecError, binary_codec.dumps,
+                          attributeValue)
+
+    def test05_shared_strings(self):
+        data = binary_codec.dumps(self._createResponse())
+        response = binary_codec.loads(data)
+        response2 = binary_codec.loads(data)
+        self.assertIs(response.assertions[1].id, response2.assertions[1].id)
+
+        attributes = response.assertions[1].attributeStatements[0].attributes
+        attributes2 = response.assertions[2].attributeStatements[0].attributes
+        self.assertIs(attributes[0].nameFormat, attributes2[0].nameFormat)
+
+    def test06_smaller_than_pickle(self):
+        response = self._createResponse()
+        self.assertLess(len(binary_codec.dumps(response)),
+                        len(pickle.dumps(response,
+                                         pickle.HIGHEST_PROTOCOL)) // 2)
+
+    def test07_corrupt(self):
+        data = binary_codec.dumps(self._createResponse())
+        rand = random.Random(1)
+        for _ in range(200):
+            corruptData = bytearray(data)
+            for _ in range(3):
+                corruptData[rand.randrange(8, len(data))] ^= \
+                                                    1 << rand.randrange(8)
+                
+            # Detected by the checksum
+            self.assertRaisesRegex(BinaryCodecError, 'checksum',
+                                   binary_codec.loads, bytes(corruptData))
+            
+            # Errors decoding a body with a matching checksum are reported
+            # in the same way
+            body = bytes(corruptData[8:])
+            corruptData[4:8] = struct.pack('<I', zlib.crc32(body))
+            try:
+                binary_codec.loads(bytes(corruptData))
+            except BinaryCodecError:
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
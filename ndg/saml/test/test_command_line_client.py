@@ -0,0 +1,64 @@
+"""Unit tests for the SAML SOAP command line client
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import unittest
+
+from ndg.saml.utils.command_line_client import SamlSoapCommandLineClient
+
+
+class SamlSoapCommandLineClientTestCase(unittest.TestCase):
+    """Test creation of queries from command line options"""
+    SUBJECT_ID = '/O=Site A/CN=Philip Kershaw'
+
+    def test01_authz_decision_query_template_reuse(self):
+        client = SamlSoapCommandLineClient()
+        command = client.parse_command_line([
+            'ndg_saml_client', 'authz',
+            '-u', 'https://localhost/authz-service',
+            '-s', self.__class__.SUBJECT_ID,
+            '-r', 'http://localhost/dap/data/'])
+        self.assertEqual(command, client.__class__.AUTHZ_DECISION_QUERY_CMD)
+
+        query = client.create_authz_decision_query()
+        query2 = client.create_authz_decision_query()
+        self.assertNotEqual(query.id, query2.id)
+        self.assertIs(query2.issuer, query.issuer)
+        self.assertEqual(query.subject.nameID.value,
+                         self.__class__.SUBJECT_ID)
+
+        # A new template is made when the settings change
+        client.resource_id = 'http://localhost/dap/other/'
+        query3 = client.create_authz_decision_query()
+        self.assertEqual(query3.resource, 'http://localhost/dap/other/')
+        self.assertIsNot(query3.issuer, query.issuer)
+
+    def test02_attribute_query_template_reuse(self):
+        client = SamlSoapCommandLineClient()
+        client.parse_command_line([
+            'ndg_saml_client', 'attr',
+            '-u', 'https://localhost/attribute-service',
+            '-s', self.__class__.SUBJECT_ID,
+            '-a', 'urn:esg:email:address'])
+
+        query = client.create_attribute_query()
+        query2 = client.create_attribute_query()
+        self.assertNotEqual(query.id, query2.id)
+        self.assertIs(query2.attributes[0], query.attributes[0])
+        self.assertEqual(query.attributes[0].name, 'urn:esg:email:address')
+
+        client.subject_id = '/O=Site A/CN=Another User'
+        query3 = client.create_attribute_query()
+        self.assertEqual(query3.subject.nameID.value,
+                         '/O=Site A/CN=Another User')
+        self.assertEqual(query.subject.nameID.value,
+                         self.__class__.SUBJECT_ID)
+
+
+if __name__ == "__main__":
+    unittest.main()
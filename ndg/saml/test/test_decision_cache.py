@@ -0,0 +1,138 @@
+"""Unit tests for the Policy Decision Point decision cache.  These don't need
+ndg_xacml: requests and responses are made from simple stand in classes
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import unittest
+
+from ndg.saml.saml2.decision_cache import DecisionCachingPDPBase
+
+
+class _AttributeValue(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class _Attribute(object):
+    def __init__(self, attributeId, *values):
+        self.attributeId = attributeId
+        self.dataType = 'http://www.w3.org/2001/XMLSchema#string'
+        self.issuer = None
+        self.attributeValues = [_AttributeValue(value) for value in values]
+
+
+class _RequestChild(object):
+    def __init__(self, *attributes):
+        self.attributes = list(attributes)
+        self.subjectCategory = None
+        self.resourceContent = None
+
+
+class _Request(object):
+    def __init__(self, resourceId, *roles):
+        self.subjects = [_RequestChild(_Attribute('role', *roles))]
+        self.resources = [_RequestChild(_Attribute('resource-id', resourceId))]
+        self.action = _RequestChild(_Attribute('action-id', 'read'))
+        self.environment = None
+
+
+class _Response(object):
+    def __init__(self, decision):
+        self.decision = decision
+
+
+class StubPDP(DecisionCachingPDPBase):
+    """Permit requests for resources under /public/ or with the admin role
+    """
+    __slots__ = ('decideCount',)
+
+    def __init__(self, **kw):
+        super(StubPDP, self).__init__(**kw)
+        self.decideCount = 0
+
+    def _decide(self, request):
+        self.decideCount += 1
+        resourceId = request.resources[0].attributes[0].attributeValues[0]
+        roles = [attributeValue.value for attributeValue in
+                 request.subjects[0].attributes[0].attributeValues]
+        if resourceId.value.startswith('/public/') or 'admin' in roles:
+            return 'Permit'
+        else:
+            return 'Deny'
+
+    def _createResponse(self, decision):
+        return _Response(decision)
+
+
+class DecisionCachingPDPTestCase(unittest.TestCase):
+    """Test DecisionCachingPDPBase with a stub PDP"""
+
+    def test01_cache_hit(self):
+        pdp = StubPDP()
+        self.assertEqual(pdp.evaluate(_Request('/public/a')).decision,
+                         'Permit')
+        self.assertEqual(pdp.evaluate(_Request('/public/a')).decision,
+                         'Permit')
+        self.assertEqual(pdp.decideCount, 1)
+        self.assertEqual(pdp.cache.hits, 1)
+        self.assertEqual(pdp.cache.misses, 1)
+
+        self.assertEqual(pdp.evaluate(_Request('/private/a')).decision,
+                         'Deny')
+        self.assertEqual(pdp.decideCount, 2)
+
+    def test02_fresh_response(self):
+        # A response modified by one caller mustn't be seen by the next
+        pdp = StubPDP()
+        response = pdp.evaluate(_Request('/public/a'))
+        response.decision = 'Deny'
+
+        response2 = pdp.evaluate(_Request('/public/a'))
+        self.assertIsNot(response2, response)
+        self.assertEqual(response2.decision, 'Permit')
+        self.assertEqual(pdp.decideCount, 1)
+
+    def test03_canonical_key(self):
+        # Attribute value ordering is not significant
+        pdp = StubPDP()
+        pdp.evaluate(_Request('/private/a', 'admin', 'staff'))
+        response = pdp.evaluate(_Request('/private/a', 'staff', 'admin'))
+        self.assertEqual(response.decision, 'Permit')
+        self.assertEqual(pdp.decideCount, 1)
+
+        pdp.evaluate(_Request('/private/a', 'staff'))
+        self.assertEqual(pdp.decideCount, 2)
+
+    def test04_resource_content_not_cached(self):
+        pdp = StubPDP()
+        request = _Request('/public/a')
+        request.resources[0].resourceContent = object()
+        self.assertIsNone(pdp.canonicalRequestKey(request))
+
+        pdp.evaluate(request)
+        pdp.evaluate(request)
+        self.assertEqual(pdp.decideCount, 2)
+        self.assertEqual(len(pdp.cache), 0)
+
+    def test05_cache_disabled(self):
+        pdp = StubPDP(cacheSize=0)
+        self.assertIsNone(pdp.cache)
+        pdp.evaluate(_Request('/public/a'))
+        pdp.evaluate(_Request('/public/a'))
+        self.assertEqual(pdp.decideCount, 2)
+
+    def test06_clear_cache(self):
+        pdp = StubPDP()
+        pdp.evaluate(_Request('/public/a'))
+        pdp.clearCache()
+        pdp.evaluate(_Request('/public/a'))
+        self.assertEqual(pdp.decideCount, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,8 +10,9 @@ __contact__ = "Philip.Kershaw@stfc.ac.uk"
 __revision__ = '$Id$'
 import unittest
 
+from ndg.saml.saml2.core import Subject, NameID, Action
 from ndg.saml.utils.factory import (AttributeQueryFactory, 
-                                    AuthzDecisionQueryFactory)
+                                    AuthzDecisionQueryFactory, QueryTemplate)
 
 
 class AttributeQueryFactoryTestCase(unittest.TestCase):
@@ -101,6 +102,66 @@ class AuthzDecisionQueryFactoryTestCase(unittest.TestCase):
                          'Parameter is %r, expected %r' % (
                          authz_query.issuer.value, 
                          self.config['authz_q.issuer.value']))
+
+            
+class QueryTemplateTestCase(unittest.TestCase):
+    '''Test making queries from a template'''
+    def setUp(self):
+        self.config = {
+            'authz_q.subject.nameID.format': 'urn:esg:openid',
+            'authz_q.issuer.value': '/O=Site A/CN=Authorisation Service',
+            'authz_q.attributes.0': 
+    'urn:esg:first:name, FirstName, http://www.w3.org/2001/XMLSchema#string',
+        }
+        
+    def test01_authz_decision_query(self):
+        del self.config['authz_q.attributes.0']
+        authz_query = AuthzDecisionQueryFactory.from_kw(prefix='authz_q.',
+                                                        **self.config)
+        authz_query.actions.append(Action())
+        authz_query.actions[-1].value = Action.READ_ACTION
+        template = QueryTemplate(authz_query)
+        
+        query = template.instantiate(subject='https://openid.localhost/a',
+                                     resource='http://LOCALHOST:80/a b')
+        query2 = template.instantiate(subject='https://openid.localhost/b',
+                                      resource='http://localhost/c')
+        self.assertIsInstance(query, template.queryClass)
+        self.assertNotEqual(query.id, query2.id)
+        self.assertIsNotNone(query.issueInstant)
+        
+        # Resource is normalised as when set on a query
+        self.assertEqual(query.resource, 'http://localhost/a%20b')
+        self.assertEqual(query2.resource, 'http://localhost/c')
+        self.assertEqual(query.subject.nameID.value, 
+                         'https://openid.localhost/a')
+        self.assertEqual(query.subject.nameID.format, 'urn:esg:openid')
+        
+        # Sub-objects are shared but lists are not
+        self.assertIs(query.issuer, query2.issuer)
+        self.assertIs(query.actions[0], query2.actions[0])
+        self.assertIsNot(query.actions, query2.actions)
+        query.actions.append(Action())
+        self.assertEqual(len(query2.actions), 1)
+        self.assertEqual(len(authz_query.actions), 1)
+        self.assertRaises(TypeError, query.actions.append, None)
+        
+    def test02_attribute_query(self):
+        template = AttributeQueryFactory.template_from_kw(prefix='authz_q.',
+                                                          **self.config)
+        subject = Subject()
+        subject.nameID = NameID()
+        query = template.instantiate(subject=subject)
+        self.assertIs(query.subject, subject)
+        self.assertEqual(query.attributes[0].friendlyName, 'FirstName')
+        self.assertEqual(query.issuer.value, 
+                         self.config['authz_q.issuer.value'])
+        
+        # Template subject is used by default
+        query = template.instantiate()
+        self.assertEqual(query.subject.nameID.format, 'urn:esg:openid')
+        
+        self.assertRaises(TypeError, template.instantiate, resource='a')
         
         
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+"""Test interned qualified names and Clark notation name splitting
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import pickle
+import sys
+import tracemalloc
+
+from ndg.saml.common.xml import SAMLConstants, QName, splitClarkName
+from ndg.saml.saml2.core import Attribute, Assertion, XSStringAttributeValue
+from ndg.saml.xml.etree import QName as ElementTreeQName
+
+
+class QNameTestCase(unittest.TestCase):
+    """Test QName interning"""
+    N_OBJECTS = 1000
+    
+    @classmethod
+    def _measure(cls, create):
+        """Get the memory allocated for each object made by create"""
+        tracemalloc.start()
+        try:
+            objects = [create() for _ in range(cls.N_OBJECTS)]
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return size / len(objects)
+
+    def test01_intern(self):
+        qname = QName.intern(SAMLConstants.SAML20_NS, 'Attribute',
+                             SAMLConstants.SAML20_PREFIX)
+        self.assertIs(qname, Attribute.DEFAULT_ELEMENT_NAME)
+        self.assertIs(Attribute().qname, Attribute().qname)
+        self.assertEqual(qname.clarkName,
+                         '{%s}Attribute' % SAMLConstants.SAML20_NS)
+        self.assertEqual(qname.clarkName, str(
+                                    ElementTreeQName.fromGeneric(qname)))
+
+        # Prefixes are part of the name for equality so they are for interning
+        # too
+        qname2 = QName.intern(SAMLConstants.SAML20_NS, 'Attribute', 'saml2')
+        self.assertIsNot(qname2, qname)
+        self.assertNotEqual(qname2, qname)
+
+    def test02_interned_read_only(self):
+        qname = Assertion.DEFAULT_ELEMENT_NAME
+        self.assertTrue(qname.interned)
+        self.assertRaises(AttributeError, setattr, qname, 'prefix', 'x')
+        self.assertRaises(AttributeError, setattr, qname, 'localPart', 'x')
+
+        qname2 = QName(qname.namespaceURI, qname.localPart, qname.prefix)
+        self.assertFalse(qname2.interned)
+        self.assertEqual(qname2, qname)
+        qname2.prefix = 'x'
+        self.assertEqual(qname2.clarkName, qname.clarkName)
+
+    def test03_pickle(self):
+        qname = Assertion.DEFAULT_ELEMENT_NAME
+        self.assertIs(pickle.loads(pickle.dumps(qname, 1)), qname)
+
+        qname2 = QName(qname.namespaceURI, qname.localPart, 'x')
+        qname3 = pickle.loads(pickle.dumps(qname2))
+        self.assertEqual(qname3, qname2)
+        self.assertFalse(qname3.interned)
+
+    def test04_split_clark_name(self):
+        tag = '{%s}Assertion' % SAMLConstants.SAML20_NS
+        self.assertEqual(splitClarkName(tag),
+                         (SAMLConstants.SAML20_NS, 'Assertion'))
+        self.assertIs(splitClarkName(tag), splitClarkName(tag))
+        self.assertEqual(splitClarkName('Assertion'), ('', 'Assertion'))
+        self.assertEqual(ElementTreeQName.getNs(tag), SAMLConstants.SAML20_NS)
+        self.assertEqual(ElementTreeQName.getLocalPart(tag), 'Assertion')
+
+    def test05_shared_default_qname(self):
+        def createWithOwnQName(samlClass):
+            # Allocate a QName for each object as SAMLObject did before the
+            # default was shared
+            samlObject = samlClass()
+            samlObject._SAMLObject__qname = QName(
+                                        samlClass.DEFAULT_NAMESPACE_URI,
+                                        samlClass.DEFAULT_ELEMENT_LOCAL_NAME,
+                                        samlClass.DEFAULT_NAMESPACE_PREFIX)
+            return samlObject
+        
+        qnameSize = sys.getsizeof(QName('', '', ''))
+        for samlClass in (Attribute, XSStringAttributeValue, Assertion):
+            self.assertIs(samlClass().qname, samlClass().qname)
+            
+            size = self._measure(samlClass)
+            ownQNameSize = self._measure(lambda: createWithOwnQName(samlClass))
+            self.assertGreater(ownQNameSize - size, qnameSize / 2,
+                               msg='%s: %s -> %s bytes per object' % (
+                               samlClass.__name__, ownQNameSize, size))
+            
+        # Overriding the name allocates a QName for the object only
+        attribute = Attribute(namespacePrefix='saml2')
+        self.assertFalse(attribute.qname.interned)
+        self.assertEqual(attribute.qname.localPart, 'Attribute')
+        self.assertIsNot(attribute.qname, 
+                         Attribute(namespacePrefix='saml2').qname)
+
+
+if __name__ == "__main__":
+    unittest.main()
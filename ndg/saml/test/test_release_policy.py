@@ -0,0 +1,113 @@
+"""Unit tests for SAML 2.0 attribute release policy
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import unittest
+
+from ndg.saml.saml2.core import Response, AttributeStatement
+from ndg.saml.saml2.release_policy import AttributeReleasePolicy
+from ndg.saml.test.utils import SAMLUtil
+
+
+class AttributeReleasePolicyTestCase(unittest.TestCase):
+    """Test filtering of attributes with an attribute release policy"""
+    THIS_DIR = os.path.dirname(__file__)
+    POLICY_FILEPATH = os.path.join(THIS_DIR, 'attribute-release-policy.ini')
+    SITE_A_ISSUER = '/O=Site A/CN=Authorisation Service'
+    SITE_B_ISSUER = '/O=Site B/CN=Authorisation Service'
+
+    @staticmethod
+    def _createAttributes():
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        samlUtil.emailAddress = "p.j.k@somewhere"
+        samlUtil.addAttribute("urn:esg:sitea:grouprole", "siteagroup:default")
+        return samlUtil
+
+    def test01FromConfigFile(self):
+        policy = AttributeReleasePolicy.fromConfigFile(
+                                        self.__class__.POLICY_FILEPATH)
+
+        self.assertEqual(
+            policy.releasableAttributeNames(self.__class__.SITE_A_ISSUER),
+            frozenset(["urn:esg:first:name", "urn:esg:last:name",
+                       "urn:esg:email:address"]))
+
+        # Default policy applies to issuers with no explicit entry
+        self.assertEqual(policy.releasableAttributeNames('/O=Unknown'),
+                         frozenset(["urn:esg:first:name"]))
+        self.assertEqual(policy.releasableAttributeNames(None),
+                         frozenset(["urn:esg:first:name"]))
+
+    def test02FilterAttributes(self):
+        policy = AttributeReleasePolicy.fromConfigFile(
+                                        self.__class__.POLICY_FILEPATH)
+        attributes = self._createAttributes().createAttributes()
+
+        released = policy.filterAttributes(self.__class__.SITE_A_ISSUER,
+                                           attributes)
+        self.assertEqual([attribute.name for attribute in released],
+                         ["urn:esg:first:name", "urn:esg:last:name",
+                          "urn:esg:email:address"])
+
+        releasedNames = policy.filterAttributeNames(
+                                    self.__class__.SITE_B_ISSUER,
+                                    [attribute.name for attribute in attributes])
+        self.assertEqual(releasedNames, frozenset(["urn:esg:first:name"]))
+
+    def test03FilterResponse(self):
+        policy = AttributeReleasePolicy({
+            self.__class__.SITE_A_ISSUER: ["urn:esg:last:name",
+                                           "urn:esg:sitea:grouprole"]
+        })
+        response = Response()
+        response.assertions.append(self._createAttributes().buildAssertion())
+
+        nRemoved = policy.filterResponse(self.__class__.SITE_A_ISSUER,
+                                         response)
+        self.assertEqual(nRemoved, 2)
+
+        attributes = response.assertions[0].attributeStatements[0].attributes
+        self.assertEqual([attribute.name for attribute in attributes],
+                         ["urn:esg:last:name", "urn:esg:sitea:grouprole"])
+
+        # No default policy set so nothing is released to other issuers.  The
+        # emptied attribute statement and assertion are removed
+        nRemoved = policy.filterResponse(self.__class__.SITE_B_ISSUER,
+                                         response)
+        self.assertEqual(nRemoved, 2)
+        self.assertEqual(len(response.assertions), 0)
+
+    def test04FilterResponseKeepsOtherStatements(self):
+        policy = AttributeReleasePolicy({
+            self.__class__.SITE_A_ISSUER: ["urn:esg:last:name"]
+        })
+        response = SAMLUtil.create_authz_decision_query_response()
+        assertion = self._createAttributes().buildAssertion()
+        assertion.attributeStatements.append(AttributeStatement())
+        assertion.attributeStatements[-1].attributes.append(
+                        assertion.attributeStatements[0].attributes[0])
+        response.assertions.append(assertion)
+        
+        policy.filterResponse(self.__class__.SITE_A_ISSUER, response)
+        self.assertEqual(len(response.assertions), 2)
+        self.assertEqual(len(response.assertions[0].authzDecisionStatements),
+                         1)
+        self.assertEqual(len(assertion.attributeStatements), 1)
+        self.assertEqual(len(assertion.attributeStatements[0].attributes), 1)
+        
+        # Authorisation decision assertions are kept
+        policy.filterResponse(self.__class__.SITE_B_ISSUER, response)
+        self.assertEqual(len(response.assertions), 1)
+        self.assertEqual(len(response.assertions[0].attributeStatements), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
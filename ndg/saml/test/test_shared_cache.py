@@ -0,0 +1,97 @@
+"""Unit tests for cache shared between processes
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import os
+import shutil
+import tempfile
+import unittest
+
+from ndg.saml.utils.shared_cache import (SharedMemoryCache,
+                                         SharedMemoryCacheError)
+
+
+class SharedMemoryCacheTestCase(unittest.TestCase):
+    """Test SharedMemoryCache"""
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.tmpDir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def test01_get_set(self):
+        with SharedMemoryCache(self.filePath, maxSize=8) as cache:
+            self.assertIsNone(cache.get('a'))
+            self.assertTrue(cache.set('a', b'response a'))
+            self.assertEqual(cache.get('a'), b'response a')
+            self.assertIn(b'a', cache)
+
+            cache.set('a', b'new response a')
+            self.assertEqual(cache.get('a'), b'new response a')
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.hits, 2)
+            self.assertEqual(cache.misses, 1)
+
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+            self.assertNotIn('a', cache)
+
+    def test02_bounded(self):
+        with SharedMemoryCache(self.filePath, maxSize=16, ways=4) as cache:
+            for i in range(100):
+                cache.set('key%d' % i, b'value%d' % i)
+
+            self.assertEqual(len(cache), cache.maxSize)
+            self.assertEqual(cache.get('key99'), b'value99')
+
+            # Too big for a slot
+            self.assertFalse(cache.set('big', b'x' * cache.slotSize))
+            self.assertNotIn('big', cache)
+
+    def test03_shared_between_processes(self):
+        cache = SharedMemoryCache(self.filePath, maxSize=8)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                # Child opens its own mapping of the file
+                try:
+                    with SharedMemoryCache(self.filePath, maxSize=8) as child:
+                        child.set('a', b'set by child')
+                finally:
+                    os._exit(0)
+
+            os.waitpid(pid, 0)
+            self.assertEqual(cache.get('a'), b'set by child')
+        finally:
+            cache.close()
+
+    def test04_different_settings(self):
+        with SharedMemoryCache(self.filePath, maxSize=8) as cache:
+            cache.set('a', b'response a')
+
+            # The file is not resized while it may be mapped by others
+            self.assertRaises(SharedMemoryCacheError, SharedMemoryCache,
+                              self.filePath, maxSize=32)
+            self.assertEqual(os.path.getsize(self.filePath),
+                             SharedMemoryCache.HEADER_SIZE + 
+                             cache.maxSize * cache.slotSize)
+            self.assertEqual(cache.get('a'), b'response a')
+
+        with SharedMemoryCache(self.filePath, maxSize=8) as cache:
+            self.assertEqual(cache.get('a'), b'response a')
+
+        with open(self.filePath, 'wb') as cacheFile:
+            cacheFile.write(b'not a cache')
+        self.assertRaises(SharedMemoryCacheError, SharedMemoryCache,
+                          self.filePath)
+
+
+if __name__ == "__main__":
+    unittest.main()
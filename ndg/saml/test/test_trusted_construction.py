@@ -0,0 +1,91 @@
+"""Unit tests for constructing SAML objects from trusted field values
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import unittest
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import (Assertion, Attribute, AttributeQuery,
+                                 Action, AuthzDecisionStatement, NameID)
+from ndg.saml.utils import TypedList
+from ndg.saml.xml.etree import ResponseElementTree
+from ndg.saml.xml.pullparser import SAMLPullParser
+from ndg.saml.xml.writer import SAMLWriter
+from ndg.saml.test.utils import SAMLUtil
+
+
+class TrustedConstructionTestCase(unittest.TestCase):
+    """Test SAMLObject._from_fields"""
+
+    def test01_defaults(self):
+        assertion = Assertion._from_fields()
+        assertion2 = Assertion._from_fields()
+        self.assertIsNot(assertion.attributeStatements,
+                         assertion2.attributeStatements)
+
+        # Lists keep their item type checks
+        self.assertRaises(TypeError, assertion.attributeStatements.append,
+                          None)
+        self.assertIs(assertion.qname, Assertion.DEFAULT_ELEMENT_NAME)
+        self.assertIsNone(assertion.subject)
+
+    def test02_fields(self):
+        nameID = NameID._from_fields(format=NameID.X509_SUBJECT,
+                                     value='CN=test')
+        self.assertEqual(nameID.format, NameID.X509_SUBJECT)
+        self.assertEqual(nameID.value, 'CN=test')
+
+        # Properties still check values set after construction
+        attribute = Attribute._from_fields(name='urn:test:a')
+        self.assertEqual(attribute.name, 'urn:test:a')
+        try:
+            attribute.name = 1
+            self.fail('Expecting TypeError for non-string name')
+        except TypeError:
+            pass
+
+        self.assertRaises(TypeError, Attribute._from_fields, unknown=1)
+
+    def test03_list_fields(self):
+        attributes = [Attribute._from_fields(name='urn:test:a')]
+        query = AttributeQuery._from_fields(attributes=attributes)
+        self.assertIs(type(query.attributes), TypedList)
+        self.assertIsNot(query.attributes, attributes)
+        self.assertEqual(list(query.attributes), attributes)
+        self.assertRaises(TypeError, query.attributes.append, 'junk')
+
+    def test04_validated_fields(self):
+        statement = AuthzDecisionStatement._from_fields(
+                                            resource='http://LOCALHOST:80/a b')
+        self.assertEqual(statement.resource, 'http://localhost/a%20b')
+
+        action = Action._from_fields(value=Action.READ_ACTION)
+        self.assertEqual(action.value, Action.READ_ACTION)
+        self.assertRaises(AttributeError, Action._from_fields, value='bogus')
+
+    def test05_parsers(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.addAttribute('urn:test:attribute', 'value')
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        xml = SAMLWriter.toBytes(response)
+
+        response2 = ResponseElementTree.fromXML(ElementTree.fromstring(xml))
+        response3 = SAMLPullParser.parse(xml)
+        self.assertEqual(SAMLWriter.toBytes(response2), xml)
+        self.assertEqual(SAMLWriter.toBytes(response3), xml)
+
+        attributes = response3.assertions[1].attributeStatements[0].attributes
+        self.assertRaises(TypeError, attributes.append, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,8 +7,9 @@ __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "Philip.Kershaw@stfc.ac.uk"
 import unittest
 import pickle
+from datetime import datetime, timedelta, timezone
 
-from ndg.saml.utils import TypedList
+from ndg.saml.utils import TypedList, LRUCache, SAMLDateTime
 
 
 class SamlUtilsTestCase(unittest.TestCase): 
@@ -26,6 +27,54 @@ class SamlUtilsTestCase(unittest.TestCase):
         self.assertEqual(len(int_list_restore), 2, 
                          'Expecting 2 elements in restored list')
         
+    def test02_lru_cache(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        
+        # 'b' is now the least recently used item so is discarded
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        
+    def test03_datetime_from_string(self):
+        expected = datetime(2010, 10, 20, 14, 49, 50)
+        for value in ('2010-10-20T14:49:50Z', '2010-10-20T14:49:50',
+                      '2010-10-20T15:49:50+01:00', 
+                      '2010-10-20T13:19:50-01:30'):
+            self.assertEqual(SAMLDateTime.fromString(value), expected)
+            
+        self.assertEqual(SAMLDateTime.fromString('2010-10-20T14:49:50.25Z'),
+                         expected + timedelta(microseconds=250000))
+        self.assertEqual(
+                    SAMLDateTime.fromString('2010-10-20T14:49:50.1234567Z'),
+                    expected + timedelta(microseconds=123456))
+        self.assertEqual(SAMLDateTime.fromString('2010-12-31T24:00:00Z'),
+                         datetime(2011, 1, 1))
+        
+        for value in ('2010-10-20', '2010-10-20T14:49Z', '2010-13-20T14:49:50Z',
+                      '2010-10-20T14:49:50+15:00', '2010-10-20T24:00:01Z',
+                      '10-10-20T14:49:50Z', '2010-10-20T14:49:50.Z'):
+            self.assertRaises(ValueError, SAMLDateTime.fromString, value)
+            
+    def test04_datetime_to_string(self):
+        value = datetime(2010, 10, 20, 14, 49, 50, 250000)
+        self.assertEqual(SAMLDateTime.toString(value), 
+                         '2010-10-20T14:49:50.250000Z')
+        
+        value = value.replace(tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(SAMLDateTime.toString(value), 
+                         '2010-10-20T12:49:50.250000Z')
+        
+        for value in (datetime(2010, 10, 20, 14, 49, 50), 
+                      datetime(2010, 10, 20, 14, 49, 50, 1)):
+            self.assertEqual(
+                    SAMLDateTime.fromString(SAMLDateTime.toString(value)), 
+                    value)
+        
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+'''ndg.saml.test.xml.serialisation_benchmark - compare serialising SAML
+responses via ElementTree with the streaming SAMLWriter
+
+Run with:
+
+python -m ndg.saml.test.xml.serialisation_benchmark \
+    --assertions 10 --attributes 20 --iterations 200
+
+A response is built with the given number of assertions each holding an
+attribute statement with the given number of attributes.  It is serialised
+repeatedly with each method and the time per response and peak memory
+allocated during a single serialisation are reported.  The time to parse the
+response back into SAML objects with ElementTree is reported too.
+
+Add --no-lxml-backend to compare with the generic ElementTree code when lxml
+is in use.
+'''
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import time
+import argparse
+import tracemalloc
+
+from ndg.saml import Config, importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.test.utils import SAMLUtil
+
+
+def _createResponse(nAssertions, nAttributes):
+    response = SAMLUtil.create_authz_decision_query_response()
+    del response.assertions[:]
+    for i in range(nAssertions):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = 'First%d' % i
+        samlUtil.lastName = 'Last%d' % i
+        samlUtil.emailAddress = 'user%d@somewhere' % i
+        for j in range(nAttributes):
+            samlUtil.addAttribute('urn:esg:sitea:attribute%d' % j,
+                                  'value %d <&> %d' % (i, j))
+        response.assertions.append(samlUtil.buildAssertion())
+    return response
+
+
+def _measure(serialise, response, nIterations):
+    start = time.perf_counter()
+    for i in range(nIterations):
+        xml = serialise(response)
+    elapsed = (time.perf_counter() - start) / nIterations
+
+    tracemalloc.start()
+    serialise(response)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, len(xml)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--assertions', type=int, default=10,
+                        help='number of assertions in the response')
+    parser.add_argument('--attributes', type=int, default=20,
+                        help='number of attributes in each assertion')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='number of times to serialise the response')
+    parser.add_argument('--no-lxml-backend', action='store_true',
+                        help='use the generic ElementTree code with lxml')
+    args = parser.parse_args()
+
+    # The backend is chosen when ndg.saml.xml.etree is imported
+    if args.no_lxml_backend:
+        Config.use_lxml_backend = False
+    from ndg.saml.xml import lxml_backend
+    from ndg.saml.xml.etree import ResponseElementTree
+    from ndg.saml.xml.writer import SAMLWriter
+
+    if lxml_backend.USE_LXML_BACKEND:
+        fromstring = lxml_backend.fromstring
+        print('Using lxml backend')
+    else:
+        fromstring = ElementTree.fromstring
+
+    def elementTreeSerialise(response):
+        return ElementTree.tostring(ResponseElementTree.toXML(response))
+
+    def writerSerialise(response):
+        return SAMLWriter.toBytes(response)
+
+    response = _createResponse(args.assertions, args.attributes)
+    xml = elementTreeSerialise(response)
+
+    def elementTreeParse(response):
+        ResponseElementTree.fromXML(fromstring(xml))
+        return xml
+
+    baseline = None
+    for name, serialise in (('ElementTree', elementTreeSerialise),
+                            ('SAMLWriter', writerSerialise),
+                            ('Parse', elementTreeParse)):
+        elapsed, peak, size = _measure(serialise, response, args.iterations)
+        if baseline is None:
+            baseline = elapsed
+        print('%-12s %8.3f ms/response (x%.2f), peak %8.1f kB, %d bytes' % (
+              name, elapsed * 1000., baseline / elapsed, peak / 1024., size))
+
+
+if __name__ == '__main__':
+    main()
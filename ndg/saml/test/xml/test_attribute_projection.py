@@ -0,0 +1,84 @@
+"""Test parsing selected attributes only from attribute statements
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import AttributeStatement
+from ndg.saml.xml.etree import (ResponseElementTree,
+                                AttributeStatementElementTree,
+                                AttributeProjection)
+from ndg.saml.xml.pullparser import SAMLPullParser
+from ndg.saml.test.utils import SAMLUtil
+
+
+class AttributeProjectionTestCase(unittest.TestCase):
+    """Test attributeProjection keyword"""
+    N_ATTRIBUTES = 60
+    SELECTED = ('urn:test:attribute3', 'urn:test:attribute59')
+
+    def _createResponseXML(self):
+        samlUtil = SAMLUtil()
+        for i in range(self.__class__.N_ATTRIBUTES):
+            samlUtil.addAttribute('urn:test:attribute%d' % i, 'value%d' % i)
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return ElementTree.tostring(ResponseElementTree.toXML(response))
+
+    @staticmethod
+    def _getAttributes(response):
+        return response.assertions[1].attributeStatements[0].attributes
+
+    def test01_names(self):
+        elem = ElementTree.fromstring(self._createResponseXML())
+        for projection in (set(self.__class__.SELECTED),
+                           AttributeProjection(self.__class__.SELECTED),
+                           lambda name: name in self.__class__.SELECTED):
+            response = ResponseElementTree.fromXML(elem,
+                                            attributeProjection=projection)
+            attributes = self._getAttributes(response)
+            self.assertEqual(tuple([a.name for a in attributes]),
+                             self.__class__.SELECTED)
+            self.assertEqual(attributes[1].attributeValues[0].value, 'value59')
+
+        # Other statements and the status are still parsed
+        self.assertEqual(len(response.assertions), 2)
+        self.assertIsNotNone(response.status.statusCode.value)
+
+        response = ResponseElementTree.fromXML(elem)
+        self.assertEqual(len(self._getAttributes(response)),
+                         self.__class__.N_ATTRIBUTES)
+
+        self.assertRaises(TypeError, AttributeProjection, 'urn:test:a')
+
+    def test02_statement_and_lazy(self):
+        elem = ElementTree.fromstring(self._createResponseXML())
+        response = ResponseElementTree.fromXML(elem, lazy=True,
+                            attributeProjection=self.__class__.SELECTED[:1])
+        self.assertEqual(len(self._getAttributes(response)), 1)
+
+        statementElem = next(elem.iter(
+                        AttributeStatement.DEFAULT_ELEMENT_NAME.clarkName))
+        statement = AttributeStatementElementTree.fromXML(statementElem,
+                                attributeProjection=lambda name: False)
+        self.assertEqual(len(statement.attributes), 0)
+
+    def test03_pull_parser(self):
+        response = SAMLPullParser.parse(self._createResponseXML(),
+                            attributeProjection=set(self.__class__.SELECTED))
+        attributes = self._getAttributes(response)
+        self.assertEqual(tuple([a.name for a in attributes]),
+                         self.__class__.SELECTED)
+        self.assertEqual(attributes[0].attributeValues[0].value, 'value3')
+
+
+if __name__ == "__main__":
+    unittest.main()
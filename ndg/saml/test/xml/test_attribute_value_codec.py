@@ -0,0 +1,156 @@
+"""Test AttributeValue codec registry
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.saml2.core import (AttributeValue, XSStringAttributeValue,
+                                 Attribute)
+from ndg.saml.xml import UnknownAttrProfile
+from ndg.saml.xml.etree import (AttributeValueCodecRegistry,
+                                AttributeValueElementTreeFactory,
+                                XSStringAttributeValueElementTree,
+                                AttributeElementTree,
+                                defaultAttributeValueCodecRegistry)
+
+
+class XSIntAttributeValue(AttributeValue):
+    """Custom Attribute Value type for testing"""
+    TYPE_LOCAL_NAME = 'int'
+
+    def __init__(self, value=None):
+        super(XSIntAttributeValue, self).__init__()
+        self.value = value
+
+
+class XSIntAttributeValueElementTree(XSIntAttributeValue):
+    """ElementTree representation of XSIntAttributeValue"""
+    XML_TMPL = ('<saml:AttributeValue xmlns:saml="%s" xmlns:xs="%s" '
+                'xmlns:xsi="%s" xsi:type="xs:int">%%d</saml:AttributeValue>' %
+                (SAMLConstants.SAML20_NS, SAMLConstants.XSD_NS,
+                 SAMLConstants.XSI_NS))
+
+    @classmethod
+    def toXML(cls, attributeValue):
+        return ElementTree.fromstring(cls.XML_TMPL % attributeValue.value)
+
+    @classmethod
+    def fromXML(cls, elem):
+        return XSIntAttributeValue(int(elem.text))
+
+
+class AttributeValueCodecRegistryTestCase(unittest.TestCase):
+    """Test dispatch of AttributeValue types to their ElementTree classes"""
+    XSI_TYPE_MAP = {
+        (SAMLConstants.XSD_NS, XSIntAttributeValue.TYPE_LOCAL_NAME):
+            XSIntAttributeValueElementTree
+    }
+    TO_XML_TYPE_MAP = {XSIntAttributeValue: XSIntAttributeValueElementTree}
+
+    def _makeElem(self, prefix, typeLocalName):
+        return ElementTree.fromstring(
+            '<saml:AttributeValue xmlns:saml="%s" xmlns:%s="%s" '
+            'xmlns:xsi="%s" xsi:type="%s:%s">1</saml:AttributeValue>' %
+            (SAMLConstants.SAML20_NS, prefix, SAMLConstants.XSD_NS,
+             SAMLConstants.XSI_NS, prefix, typeLocalName))
+
+    def test01_default_dispatch(self):
+        registry = defaultAttributeValueCodecRegistry
+        self.assertIs(registry(XSStringAttributeValue()),
+                      XSStringAttributeValueElementTree)
+
+        for prefix in ('xs', 'schema'):
+            self.assertIs(registry(self._makeElem(prefix, 'string')),
+                          XSStringAttributeValueElementTree)
+
+        self.assertRaises(UnknownAttrProfile, registry, XSIntAttributeValue(1))
+        self.assertRaises(UnknownAttrProfile, registry,
+                          self._makeElem('xs', 'int'))
+        self.assertRaises(TypeError, registry, 'string')
+
+    def test02_custom_types_isolated(self):
+        registry = defaultAttributeValueCodecRegistry.extend(
+                                        toXMLTypeMap=self.TO_XML_TYPE_MAP,
+                                        xsiTypeMap=self.XSI_TYPE_MAP)
+        self.assertIs(registry(self._makeElem('xs', 'int')),
+                      XSIntAttributeValueElementTree)
+        self.assertIs(registry(self._makeElem('xs', 'string')),
+                      XSStringAttributeValueElementTree)
+
+        factory = AttributeValueElementTreeFactory(
+                                customToXMLTypeMap=self.TO_XML_TYPE_MAP,
+                                customXSITypeMap=self.XSI_TYPE_MAP)
+        self.assertIs(factory(XSIntAttributeValue(1)),
+                      XSIntAttributeValueElementTree)
+
+        # Neither the default registry nor other factories see custom types
+        self.assertNotIn(XSIntAttributeValue,
+                         AttributeValueElementTreeFactory.toXMLTypeMap)
+        self.assertRaises(UnknownAttrProfile,
+                          defaultAttributeValueCodecRegistry,
+                          XSIntAttributeValue(1))
+        self.assertRaises(UnknownAttrProfile,
+                          AttributeValueElementTreeFactory(),
+                          XSIntAttributeValue(1))
+
+        self.assertRaises(TypeError, AttributeValueCodecRegistry,
+                          toXMLTypeMap={Attribute: object})
+        self.assertRaises(TypeError, AttributeValueCodecRegistry,
+                          xsiTypeMap={'int': XSIntAttributeValueElementTree})
+
+    def test03_attribute_round_trip(self):
+        attribute = Attribute()
+        attribute.name = 'urn:test:count'
+        attribute.attributeValues.append(XSIntAttributeValue(3))
+        attribute.attributeValues.append(XSStringAttributeValue())
+        attribute.attributeValues[-1].value = 'three'
+
+        self.assertRaises(UnknownAttrProfile, AttributeElementTree.toXML,
+                          attribute)
+
+        registry = defaultAttributeValueCodecRegistry.extend(
+                                        toXMLTypeMap=self.TO_XML_TYPE_MAP,
+                                        xsiTypeMap=self.XSI_TYPE_MAP)
+        for kw in ({'attributeValueCodecRegistry': registry},
+                   {'customToXMLTypeMap': self.TO_XML_TYPE_MAP,
+                    'customXSITypeMap': self.XSI_TYPE_MAP}):
+            elem = AttributeElementTree.toXML(attribute, **kw)
+            elem = ElementTree.fromstring(ElementTree.tostring(elem))
+            self.assertRaises(UnknownAttrProfile, AttributeElementTree.fromXML,
+                              elem)
+
+            attribute2 = AttributeElementTree.fromXML(elem, **kw)
+            self.assertEqual(attribute2.attributeValues[0].value, 3)
+            self.assertEqual(attribute2.attributeValues[1].value, 'three')
+
+    def test04_match_functions(self):
+        calls = []
+
+        def intMatch(elem):
+            calls.append(elem)
+            if elem.text.strip().isdigit():
+                return XSIntAttributeValueElementTree
+
+        factory = AttributeValueElementTreeFactory(
+                                customToSAMLTypeMap=[intMatch])
+
+        # Match functions are only tried if the xsi:type is not registered
+        self.assertIs(factory(self._makeElem('xs', 'string')),
+                      XSStringAttributeValueElementTree)
+        self.assertEqual(calls, [])
+        self.assertIs(factory(self._makeElem('xs', 'int')),
+                      XSIntAttributeValueElementTree)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
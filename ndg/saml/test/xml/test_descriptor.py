@@ -0,0 +1,124 @@
+"""Test ElementTree serialisation and parsing generated from SAML type
+descriptors
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.common.xml import SAMLConstants, QName as GenericQName
+from ndg.saml.saml2.core import Issuer
+from ndg.saml.xml import XMLTypeParseError
+from ndg.saml.xml.descriptor import (SAMLTypeDescriptor, XMLAttribute,
+                                     XMLChild)
+from ndg.saml.xml.etree import (ResponseElementTree, AssertionElementTree,
+                                SubjectElementTree, compileElementTreeClasses)
+from ndg.saml.test.utils import SAMLUtil
+
+
+class Audience(object):
+    """Minimal SAML type for testing descriptor registration"""
+    DEFAULT_ELEMENT_LOCAL_NAME = 'Audience'
+    DEFAULT_ELEMENT_NAME = GenericQName(SAMLConstants.SAML20_NS,
+                                        DEFAULT_ELEMENT_LOCAL_NAME,
+                                        SAMLConstants.SAML20_PREFIX)
+
+    def __init__(self):
+        self.lang = None
+        self.value = None
+        self.issuers = []
+
+
+class AudienceElementTree(Audience):
+    DESCRIPTOR = SAMLTypeDescriptor(Audience,
+        attributes=(
+            XMLAttribute('Lang', 'lang', required=False),
+        ),
+        children=(
+            XMLChild(Issuer, 'issuers', minOccurs=1, maxOccurs=None),
+        ))
+
+compileElementTreeClasses(AudienceElementTree)
+
+
+class SAMLTypeDescriptorTestCase(unittest.TestCase):
+    """Test toXML and fromXML generated from SAML type descriptors"""
+
+    def _createResponseElem(self):
+        response = SAMLUtil.create_authz_decision_query_response()
+        return ResponseElementTree.toXML(response)
+
+    def test01_cardinality(self):
+        responseElem = self._createResponseElem()
+
+        # Duplicate single valued child
+        responseElem.insert(0, ElementTree.fromstring(
+                                    ElementTree.tostring(responseElem[0])))
+        self.assertRaises(XMLTypeParseError, ResponseElementTree.fromXML,
+                          responseElem)
+
+        # Missing mandatory child
+        responseElem = self._createResponseElem()
+        responseElem.remove(responseElem[1])
+        self.assertRaises(XMLTypeParseError, ResponseElementTree.fromXML,
+                          responseElem)
+
+        subjectElem = self._createResponseElem()[2][1]
+        subjectElem.remove(subjectElem[0])
+        self.assertRaises(XMLTypeParseError, SubjectElementTree.fromXML,
+                          subjectElem)
+
+    def test02_unrecognised_and_unsupported_children(self):
+        assertionElem = self._createResponseElem()[2]
+        ElementTree.SubElement(assertionElem,
+                               '{%s}Unknown' % SAMLConstants.SAML20_NS)
+        self.assertRaises(XMLTypeParseError, AssertionElementTree.fromXML,
+                          assertionElem)
+
+        assertionElem = self._createResponseElem()[2]
+        ElementTree.SubElement(assertionElem,
+                               '{%s}Advice' % SAMLConstants.SAML20_NS)
+        self.assertRaises(NotImplementedError, AssertionElementTree.fromXML,
+                          assertionElem)
+
+    def test03_missing_attribute(self):
+        responseElem = self._createResponseElem()
+        del responseElem.attrib['InResponseTo']
+        self.assertRaises(XMLTypeParseError, ResponseElementTree.fromXML,
+                          responseElem)
+
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.inResponseTo = ''
+        self.assertRaises(TypeError, ResponseElementTree.toXML, response)
+
+    def test04_register_type(self):
+        audience = Audience()
+        audience.lang = 'en'
+        for value in ('a', 'b'):
+            issuer = Issuer()
+            issuer.value = value
+            audience.issuers.append(issuer)
+
+        elem = AudienceElementTree.toXML(audience)
+        self.assertEqual(elem.get('Lang'), 'en')
+
+        audience = AudienceElementTree.fromXML(
+                            ElementTree.fromstring(ElementTree.tostring(elem)))
+        self.assertIsInstance(audience, Audience)
+        self.assertEqual(audience.lang, 'en')
+        self.assertEqual([issuer.value for issuer in audience.issuers],
+                         ['a', 'b'])
+
+        del elem[:]
+        self.assertRaises(XMLTypeParseError, AudienceElementTree.fromXML, elem)
+
+
+if __name__ == "__main__":
+    unittest.main()
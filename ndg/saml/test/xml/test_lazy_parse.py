@@ -0,0 +1,123 @@
+"""Test parsing Response assertions on first access
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import pickle
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import Assertion, StatusCode
+from ndg.saml.utils import LazyList
+from ndg.saml.xml import XMLTypeParseError
+from ndg.saml.xml.etree import ResponseElementTree
+from ndg.saml.test.utils import SAMLUtil
+
+
+class LazyParseTestCase(unittest.TestCase):
+    """Test ResponseElementTree.fromXML lazy mode"""
+    N_ASSERTIONS = 3
+
+    def _createResponseElem(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        response = SAMLUtil.create_authz_decision_query_response()
+        for _ in range(self.__class__.N_ASSERTIONS - 1):
+            response.assertions.append(samlUtil.buildAssertion())
+
+        # Serialise and parse so that the element is as received
+        return ElementTree.fromstring(ElementTree.tostring(
+                                        ResponseElementTree.toXML(response)))
+
+    def test01_assertions_parsed_on_access(self):
+        elem = self._createResponseElem()
+        response = ResponseElementTree.fromXML(elem, lazy=True)
+        self.assertEqual(response.status.statusCode.value,
+                         StatusCode.SUCCESS_URI)
+
+        assertions = response.assertions
+        self.assertIsInstance(assertions, LazyList)
+        self.assertEqual(len(assertions), self.__class__.N_ASSERTIONS)
+        self.assertTrue(all(map(assertions.isPending, range(len(assertions)))))
+
+        assertion = assertions[1]
+        self.assertIsInstance(assertion, Assertion)
+        self.assertIs(assertions[1], assertion)
+        self.assertFalse(assertions.isPending(1))
+        self.assertTrue(assertions.isPending(0))
+        self.assertEqual(assertion.attributeStatements[0].attributes[0
+                            ].attributeValues[0].value, 'Philip')
+
+        # Results match eager parsing
+        response2 = ResponseElementTree.fromXML(elem)
+        self.assertNotIsInstance(response2.assertions, LazyList)
+        self.assertEqual([a.id for a in response.assertions],
+                         [a.id for a in response2.assertions])
+
+    def test02_list_operations(self):
+        response = ResponseElementTree.fromXML(self._createResponseElem(),
+                                               lazy=True)
+        assertions = response.assertions
+        last = assertions[-1]
+        self.assertEqual(list(reversed(assertions))[0].id, last.id)
+        self.assertIn(last, assertions)
+        self.assertEqual(assertions.index(last), len(assertions) - 1)
+        self.assertEqual(len(assertions[:2]), 2)
+
+        assertions.append(Assertion())
+        self.assertEqual(len(assertions), self.__class__.N_ASSERTIONS + 1)
+
+        copy = pickle.loads(pickle.dumps(assertions))
+        self.assertNotIsInstance(copy, LazyList)
+        self.assertEqual([a.id for a in copy], [a.id for a in assertions])
+
+    def test03_concatenation(self):
+        elem = self._createResponseElem()
+        ids = [a.id for a in ResponseElementTree.fromXML(elem).assertions]
+        
+        for concatenate in (lambda assertions: [] + assertions,
+                            lambda assertions: assertions + [],
+                            lambda assertions: (assertions + 
+                                                ResponseElementTree.fromXML(
+                                                elem, lazy=True).assertions)):
+            assertions = ResponseElementTree.fromXML(elem, 
+                                                     lazy=True).assertions
+            result = concatenate(assertions)
+            self.assertNotIsInstance(result, LazyList)
+            self.assertTrue(all([isinstance(a, Assertion) for a in result]))
+            self.assertEqual([a.id for a in result][:len(ids)], ids)
+            
+        assertions = ResponseElementTree.fromXML(elem, lazy=True).assertions
+        assertions += assertions
+        self.assertIsInstance(assertions, LazyList)
+        self.assertEqual([a.id for a in assertions], ids * 2)
+        self.assertIs(assertions[0], assertions[len(ids)])
+        
+        assertions = ResponseElementTree.fromXML(elem, lazy=True).assertions
+        assertions.extend(assertions)
+        self.assertIs(assertions[0], assertions[len(ids)])
+        
+        # Tuples are not concatenated with lists as before
+        self.assertRaises(TypeError, lambda: () + assertions)
+
+    def test04_parse_error_on_access(self):
+        elem = self._createResponseElem()
+        assertionElems = [childElem for childElem in elem
+                          if childElem.tag.endswith('}Assertion')]
+        del assertionElems[0].attrib['ID']
+
+        response = ResponseElementTree.fromXML(elem, lazy=True)
+        self.assertEqual(len(response.assertions), self.__class__.N_ASSERTIONS)
+        self.assertIsInstance(response.assertions[1], Assertion)
+        self.assertRaises(XMLTypeParseError, lambda: response.assertions[0])
+        self.assertRaises(XMLTypeParseError, ResponseElementTree.fromXML, elem)
+
+
+if __name__ == "__main__":
+    unittest.main()
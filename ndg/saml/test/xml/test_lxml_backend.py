@@ -0,0 +1,65 @@
+"""Test lxml specific element construction and parsing
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import threading
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.xml import lxml_backend
+from ndg.saml.xml.etree import ResponseElementTree
+from ndg.saml.test.utils import SAMLUtil
+
+
+@unittest.skipUnless(lxml_backend.USE_LXML_BACKEND, 'lxml backend not in use')
+class LxmlBackendTestCase(unittest.TestCase):
+    """Test lxml backend"""
+
+    def test01_namespaces_declared_at_root(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+
+        xml = ElementTree.tostring(ResponseElementTree.toXML(response))
+        for namespaceURI in (SAMLConstants.SAML20_NS, SAMLConstants.SAML20P_NS,
+                             SAMLConstants.XSI_NS, SAMLConstants.XSD_NS):
+            self.assertEqual(xml.count(('"%s"' % namespaceURI).encode()), 1)
+
+        response2 = ResponseElementTree.fromXML(lxml_backend.fromstring(xml))
+        self.assertEqual(
+            response2.assertions[1].attributeStatements[0].attributes[0
+                ].attributeValues[0].value, 'Philip')
+
+    def test02_parser_per_thread(self):
+        parser = lxml_backend.getParser()
+        self.assertIs(lxml_backend.getParser(), parser)
+
+        parsers = []
+        thread = threading.Thread(
+                        target=lambda: parsers.append(lxml_backend.getParser()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(parsers[0], parser)
+
+    def test03_parser_options(self):
+        elem = lxml_backend.fromstring(b'<a>\n  <b> x </b>\n</a>')
+        self.assertIsNone(elem.text)
+        self.assertEqual(elem[0].text, ' x ')
+
+        # Entities are not expanded
+        elem = lxml_backend.fromstring(b'<!DOCTYPE a [<!ENTITY e "expanded">]>'
+                                       b'<a>&e;</a>')
+        self.assertNotIn(b'expanded', ElementTree.tostring(elem))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Test namespace context used for ElementTree serialisation
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import threading
+
+from ndg.saml import Config, importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.xml.etree import ResponseElementTree, prettyPrint
+from ndg.saml.xml.namespace import NamespaceContext, defaultNamespaceContext
+from ndg.saml.test.utils import SAMLUtil
+
+
+class NamespaceContextTestCase(unittest.TestCase):
+    """Test serialisation with NamespaceContext"""
+    N_THREADS = 8
+    N_ITERATIONS = 50
+
+    def _createResponse(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return response
+
+    def test01_global_map_unchanged(self):
+        if Config.use_lxml:
+            namespaceMap = {}
+        else:
+            namespaceMap = ElementTree._namespace_map.copy()
+
+        response = self._createResponse()
+        responseElem = ResponseElementTree.toXML(response)
+        prettyPrint(responseElem)
+
+        xml = defaultNamespaceContext.tostring(responseElem)
+        self.assertIn(b'<samlp:Response', xml)
+        self.assertIn(b'<saml:Assertion', xml)
+        ResponseElementTree.fromXML(ElementTree.fromstring(xml))
+        if not Config.use_lxml:
+            self.assertEqual(ElementTree._namespace_map, namespaceMap)
+
+    def test02_child_context(self):
+        context = defaultNamespaceContext.createChild({'urn:a': 'a'})
+        self.assertEqual(context.getPrefix('urn:a'), 'a')
+        self.assertIsNone(defaultNamespaceContext.getPrefix('urn:a'))
+        self.assertIn('urn:oasis:names:tc:SAML:2.0:assertion', context)
+        self.assertRaises(TypeError, NamespaceContext, parent={})
+
+        if Config.use_lxml:
+            # Prefixes come from the element namespace maps
+            return
+
+        elem = ElementTree.Element('{urn:a}Root')
+        ElementTree.SubElement(elem, '{urn:b}Child')
+        xml = context.tostring(elem, encoding='unicode')
+        self.assertTrue(xml.startswith('<a:Root xmlns:a="urn:a"'))
+
+        # Prefix already in use in the document for another namespace
+        context = context.createChild({'urn:b': 'a'})
+        xml = context.tostring(elem, encoding='unicode')
+        self.assertIn('<ns1:Child', xml)
+
+    def test03_concurrent_serialisation(self):
+        response = self._createResponse()
+        expected = defaultNamespaceContext.tostring(
+                                        ResponseElementTree.toXML(response))
+        results = []
+
+        def serialise(prefix):
+            context = defaultNamespaceContext.createChild({'urn:a': prefix})
+            for i in range(self.N_ITERATIONS):
+                xml = defaultNamespaceContext.tostring(
+                                        ResponseElementTree.toXML(response))
+                elem = ElementTree.Element('{urn:a}Root')
+                results.append((xml == expected,
+                                prefix, context.tostring(elem,
+                                                         encoding='unicode')))
+
+        threads = [threading.Thread(target=serialise, args=('t%d' % i,))
+                   for i in range(self.N_THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.N_THREADS * self.N_ITERATIONS)
+        for same, prefix, xml in results:
+            self.assertTrue(same)
+            if not Config.use_lxml:
+                self.assertTrue(xml.startswith('<%s:Root' % prefix))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Test serialising received assertions from the elements they were parsed
+from
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import pickle
+import re
+from io import BytesIO
+from xml.etree.ElementTree import iterparse
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.saml2.core import XSStringAttributeValue
+from ndg.saml.xml.etree import ResponseElementTree, AssertionElementTree
+from ndg.saml.xml.writer import SAMLWriter
+from ndg.saml.test.utils import SAMLUtil
+
+
+class PassThroughTestCase(unittest.TestCase):
+    """Test keepSource keyword"""
+
+    def _createResponseElem(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return ElementTree.fromstring(ElementTree.tostring(
+                                        ResponseElementTree.toXML(response)))
+
+    @staticmethod
+    def _getContent(elem):
+        # Namespace declarations in scope may differ between an element and
+        # its copy.  They are set as attributes by the standard library 
+        # ElementTree implementation
+        return [(e.tag, sorted([(name, value) 
+                                for name, value in e.attrib.items()
+                                if not name.startswith('xmlns:')]), e.text)
+                for e in elem.iter()]
+
+    def _parseAssertion(self):
+        elem = self._createResponseElem()
+        response = ResponseElementTree.fromXML(elem, keepSource=True)
+        return response.assertions[1], elem[-1]
+
+    def test01_unchanged(self):
+        assertion, assertionElem = self._parseAssertion()
+        self.assertIsNotNone(assertion.parsedSource)
+
+        # The element is copied so that the source is not moved or altered
+        # by changes to the output
+        elem = AssertionElementTree.toXML(assertion)
+        self.assertIsNot(elem, assertionElem)
+        self.assertEqual(self._getContent(elem),
+                         self._getContent(assertionElem))
+
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions = [assertion]
+        responseElem = ResponseElementTree.toXML(response)
+        self.assertEqual(self._getContent(responseElem[-1]),
+                         self._getContent(assertionElem))
+        self.assertIsNotNone(assertion.parsedSource)
+
+        xml = SAMLWriter.toBytes(response)
+        self.assertEqual(ElementTree.fromstring(xml)[-1].get('ID'),
+                         assertion.id)
+
+        # Not kept by default
+        response = ResponseElementTree.fromXML(self._createResponseElem())
+        self.assertIsNone(response.assertions[0].parsedSource)
+
+    def test02_changed(self):
+        assertion, _ = self._parseAssertion()
+        assertion.id = 'changed'
+        elem = AssertionElementTree.toXML(assertion)
+        self.assertEqual(elem.get('ID'), 'changed')
+        self.assertIsNone(assertion.parsedSource)
+
+        assertion, _ = self._parseAssertion()
+        attribute = assertion.attributeStatements[0].attributes[0]
+        attribute.attributeValues[0].value = 'Phil'
+        elem = AssertionElementTree.toXML(assertion)
+        self.assertIsNone(assertion.parsedSource)
+        self.assertEqual(next(elem.iterfind('.//{*}AttributeValue')).text, 'Phil')
+
+        assertion, _ = self._parseAssertion()
+        attribute = assertion.attributeStatements[0].attributes[0]
+        attributeValue = XSStringAttributeValue()
+        attributeValue.value = 'Kershaw'
+        attribute.attributeValues.append(attributeValue)
+        xml = SAMLWriter.toBytes(assertion)
+        self.assertIn(b'Kershaw', xml)
+        self.assertIsNone(assertion.parsedSource)
+
+    def test03_pickle(self):
+        assertion, _ = self._parseAssertion()
+        assertion2 = pickle.loads(pickle.dumps(assertion))
+        self.assertIsNone(assertion2.parsedSource)
+        self.assertEqual(assertion2.id, assertion.id)
+
+    def test04_type_prefix(self):
+        # Declare the XML Schema namespace once with a different prefix from
+        # the one used by this package
+        xml = ElementTree.tostring(self._createResponseElem())
+        xml = re.sub(b' xmlns:%s="[^"]*"' % SAMLConstants.XSD_PREFIX.encode(),
+                     b'', xml)
+        xml = xml.replace(b'"%s:string"' % SAMLConstants.XSD_PREFIX.encode(), 
+                          b'"xsd:string"')
+        xml = re.sub(b'^(<[^ >]+)', 
+                     b'\\1 xmlns:xsd="%s"' % SAMLConstants.XSD_NS.encode(), 
+                     xml)
+        self.assertEqual(self._getTypeNamespaces(xml), [SAMLConstants.XSD_NS])
+        
+        response = ResponseElementTree.fromXML(ElementTree.fromstring(xml),
+                                               keepSource=True)
+        for xml in (
+            ElementTree.tostring(AssertionElementTree.toXML(
+                                                    response.assertions[1])),
+            ElementTree.tostring(ResponseElementTree.toXML(response)),
+            SAMLWriter.toBytes(response)):
+            self.assertEqual(self._getTypeNamespaces(xml), 
+                             [SAMLConstants.XSD_NS])
+        self.assertIsNotNone(response.assertions[1].parsedSource)
+        
+    def test05_projection(self):
+        # An assertion missing attributes skipped by a projection must not be
+        # serialised from its source
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        samlUtil.emailAddress = "p.j.k@somewhere"
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        elem = ElementTree.fromstring(ElementTree.tostring(
+                                        ResponseElementTree.toXML(response)))
+        
+        response = ResponseElementTree.fromXML(elem, keepSource=True,
+                                    attributeProjection={'urn:esg:first:name'})
+        self.assertIsNone(response.assertions[1].parsedSource)
+        
+        # The authorisation decision assertion has no attributes to skip
+        self.assertIsNotNone(response.assertions[0].parsedSource)
+        
+        for xml in (ElementTree.tostring(ResponseElementTree.toXML(response)),
+                    SAMLWriter.toBytes(response)):
+            attributeElems = list(ElementTree.fromstring(xml).iterfind(
+                                                            './/{*}Attribute'))
+            self.assertEqual([attributeElem.get('Name') 
+                              for attributeElem in attributeElems],
+                             ['urn:esg:first:name'])
+        
+        # Nothing skipped
+        response = ResponseElementTree.fromXML(elem, keepSource=True,
+                attributeProjection={'urn:esg:first:name', 'urn:esg:last:name',
+                                     'urn:esg:email:address'})
+        self.assertIsNotNone(response.assertions[1].parsedSource)
+        
+    @staticmethod
+    def _getTypeNamespaces(xml):
+        """Get the namespaces of the xsi:type values in serialised XML"""
+        xsiTypeTag = '{%s}type' % SAMLConstants.XSI_NS
+        typeNamespaces = []
+        scopes = [{}]
+        declared = {}
+        for event, item in iterparse(BytesIO(xml), 
+                                     events=('start-ns', 'start', 'end')):
+            if event == 'start-ns':
+                declared[item[0]] = item[1]
+            elif event == 'start':
+                scopes.append(dict(scopes[-1], **declared))
+                declared = {}
+                typeValue = item.get(xsiTypeTag)
+                if typeValue is not None:
+                    prefix = typeValue.rpartition(':')[0]
+                    typeNamespaces.append(scopes[-1].get(prefix))
+            else:
+                scopes.pop()
+                
+        return sorted(set(typeNamespaces), key=str)
+
+
+if __name__ == "__main__":
+    unittest.main()
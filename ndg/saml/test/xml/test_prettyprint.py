@@ -0,0 +1,71 @@
+"""Test pretty printing of ElementTree elements
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+from io import StringIO
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.xml.etree import ResponseElementTree, prettyPrint
+from ndg.saml.test.utils import SAMLUtil
+
+
+class PrettyPrintTestCase(unittest.TestCase):
+    """Test prettyPrint output"""
+    N_ATTRIBUTES = 1000
+
+    def _createResponse(self, nAttributes=1):
+        samlUtil = SAMLUtil()
+        for i in range(nAttributes):
+            samlUtil.addAttribute('urn:test:attribute%d' % i,
+                                  'value <%d> & "%d"' % (i, i))
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return response
+
+    def test01_round_trip(self):
+        response = self._createResponse()
+        xml = prettyPrint(ResponseElementTree.toXML(response))
+        response2 = ResponseElementTree.fromXML(ElementTree.fromstring(xml))
+
+        attributeValue = response2.assertions[1].attributeStatements[0
+                                    ].attributes[0].attributeValues[0]
+        self.assertEqual(attributeValue.value, 'value <0> & "0"')
+        self.assertEqual(response2.assertions[0].id, response.assertions[0].id)
+
+    def test02_child_scoped_declarations(self):
+        elem = ElementTree.Element('{urn:a}Root')
+        ElementTree.SubElement(elem, '{urn:b}Child')
+        ElementTree.SubElement(elem, '{urn:b}Child')
+        lines = prettyPrint(elem).split('\n')
+
+        # A declaration made on a child is not in scope for its sibling
+        self.assertEqual(len(lines), 4)
+        self.assertIn('xmlns:', lines[1])
+        self.assertIn('xmlns:', lines[2])
+        ElementTree.fromstring('\n'.join(lines))
+
+    def test03_truncation(self):
+        response = self._createResponse(nAttributes=self.N_ATTRIBUTES)
+        elem = ResponseElementTree.toXML(response)
+        xml = prettyPrint(elem)
+        self.assertEqual(len(xml.split('\n')), self.N_ATTRIBUTES * 3 + 21)
+
+        stream = StringIO()
+        self.assertIsNone(prettyPrint(elem, stream=stream, maxSize=1000))
+        truncated = stream.getvalue()
+        self.assertTrue(truncated.startswith(xml[:1000]))
+        self.assertIn('truncated at 1000', truncated[1000:])
+        self.assertEqual(prettyPrint(elem, maxSize=len(xml)), xml)
+        self.assertRaises(ValueError, prettyPrint, elem, maxSize=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""Test event driven deserialiser for SAML objects
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+import re
+from io import BytesIO
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.soap.etree import SOAPEnvelope
+
+from ndg.saml.saml2.core import Response, AttributeQuery, AuthzDecisionQuery
+from ndg.saml.xml import XMLTypeParseError, UnknownAttrProfile
+from ndg.saml.xml.etree import (QName, ResponseElementTree,
+                                AttributeQueryElementTree,
+                                AuthzDecisionQueryElementTree)
+from ndg.saml.xml.pullparser import SAMLPullParser
+from ndg.saml.xml.writer import SAMLWriter
+from ndg.saml.test.utils import SAMLUtil
+
+
+class SAMLPullParserTestCase(unittest.TestCase):
+    """Compare SAMLPullParser with ElementTree deserialisation"""
+
+    def _createAttributeResponse(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        samlUtil.emailAddress = "p.j.k@somewhere"
+        samlUtil.addAttribute("urn:esg:sitea:grouprole",
+                              'group <a> & "b"')
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return response
+
+    def _assertEquivalent(self, samlObject, elementTreeClass):
+        xml = ElementTree.tostring(elementTreeClass.toXML(samlObject))
+        expected = elementTreeClass.fromXML(ElementTree.XML(xml))
+        parsed = SAMLPullParser.parse(xml)
+        self.assertIsInstance(parsed, type(samlObject))
+        self.assertEqual(SAMLWriter.toBytes(parsed),
+                         SAMLWriter.toBytes(expected))
+        return xml, parsed
+
+    def test01_response(self):
+        response = self._createAttributeResponse()
+        xml, parsedResponse = self._assertEquivalent(response,
+                                                     ResponseElementTree)
+        self.assertIsInstance(parsedResponse, Response)
+        self.assertEqual(len(parsedResponse.assertions), 2)
+        attribute = parsedResponse.assertions[1].attributeStatements[0
+                                                            ].attributes[-1]
+        self.assertEqual(attribute.attributeValues[0].value, 'group <a> & "b"')
+
+    def test02_queries(self):
+        samlUtil = SAMLUtil()
+        attributeQuery = samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                                      SAMLUtil.NAMEID_VALUE)
+        xml, parsed = self._assertEquivalent(attributeQuery,
+                                             AttributeQueryElementTree)
+        self.assertIsInstance(parsed, AttributeQuery)
+
+        authzDecisionQuery = samlUtil.buildAuthzDecisionQuery()
+        xml, parsed = self._assertEquivalent(authzDecisionQuery,
+                                             AuthzDecisionQueryElementTree)
+        self.assertIsInstance(parsed, AuthzDecisionQuery)
+        self.assertEqual(parsed.actions[0].value,
+                         authzDecisionQuery.actions[0].value)
+
+    def test03_stream_and_feed(self):
+        response = self._createAttributeResponse()
+        xml = SAMLWriter.toBytes(response)
+
+        parsed = SAMLPullParser.parse(BytesIO(xml))
+        self.assertEqual(SAMLWriter.toBytes(parsed), xml)
+
+        parser = SAMLPullParser()
+        for i in range(0, len(xml), 7):
+            parser.feed(xml[i:i + 7])
+        self.assertEqual(SAMLWriter.toBytes(parser.close()), xml)
+
+    def test04_soap_envelope(self):
+        response = self._createAttributeResponse()
+        soapResponse = SOAPEnvelope()
+        soapResponse.create()
+        soapResponse.body.elem.append(ResponseElementTree.toXML(response))
+
+        parser = SAMLPullParser(soapEnvelope=True)
+        parser.feed(soapResponse.serialize())
+        parsed = parser.close()
+        self.assertEqual(parsed.id, response.id)
+        self.assertEqual(parser.payloadTag,
+                         str(QName.fromGeneric(Response.DEFAULT_ELEMENT_NAME)))
+
+        # Root element not supported without a fallback parser
+        soapResponse = SOAPEnvelope()
+        soapResponse.create()
+        soapResponse.body.elem.append(ElementTree.Element('{urn:a}Query'))
+        xml = soapResponse.serialize()
+        self.assertRaises(XMLTypeParseError, SAMLPullParser.parseSOAPEnvelope,
+                          xml)
+
+        parsed = SAMLPullParser.parseSOAPEnvelope(xml, fallbackParsers={
+                                            '{urn:a}Query': lambda elem: elem})
+        self.assertEqual(parsed.tag, '{urn:a}Query')
+
+    def test05_errors(self):
+        response = self._createAttributeResponse()
+        xml = SAMLWriter.toBytes(response)
+
+        # Missing mandatory attribute
+        self.assertRaises(XMLTypeParseError, SAMLPullParser.parse,
+                          xml.replace(b' ID="', b' Other="', 1))
+
+        # Malformed XML
+        self.assertRaises(XMLTypeParseError, SAMLPullParser.parse, xml[:-10])
+
+        # Unrecognised attribute value type
+        self.assertRaises(UnknownAttrProfile, SAMLPullParser.parse,
+                          xml.replace(b'xsi:type="xs:string"',
+                                      b'xsi:type="xs:integer"'))
+
+        # Document type declarations are rejected
+        self.assertRaises(XMLTypeParseError, SAMLPullParser.parse,
+                          b'<!DOCTYPE a [<!ENTITY b "c">]>' + xml)
+
+    def _assertBothRaise(self, xml, elementTreeClass):
+        self.assertRaises(XMLTypeParseError, elementTreeClass.fromXML,
+                          ElementTree.XML(xml))
+        self.assertRaises(XMLTypeParseError, SAMLPullParser.parse, xml)
+
+    def test06_child_occurrences(self):
+        # Both parsers check the number of child elements the same way
+        samlUtil = SAMLUtil()
+        subjectPat = re.compile(b'<saml:Subject .*?</saml:Subject>')
+        for query, elementTreeClass in (
+                (samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                              SAMLUtil.NAMEID_VALUE),
+                 AttributeQueryElementTree),
+                (samlUtil.buildAuthzDecisionQuery(),
+                 AuthzDecisionQueryElementTree)):
+            xml = SAMLWriter.toBytes(query)
+            subject = subjectPat.search(xml).group()
+
+            # Missing Subject
+            self._assertBothRaise(xml.replace(subject, b''),
+                                  elementTreeClass)
+
+            # Duplicate Subject
+            self._assertBothRaise(xml.replace(subject, subject * 2),
+                                  elementTreeClass)
+
+            # Subject with two NameIDs
+            nameID = re.search(b'<saml:NameID .*?</saml:NameID>',
+                               subject).group()
+            self._assertBothRaise(xml.replace(nameID, nameID * 2),
+                                  elementTreeClass)
+
+        xml = SAMLWriter.toBytes(self._createAttributeResponse())
+        status = re.search(b'<samlp:Status>.*?</samlp:Status>', xml).group()
+        issuer = re.search(b'<saml:Issuer .*?</saml:Issuer>', xml).group()
+        statusCode = re.search(b'<samlp:StatusCode .*?</samlp:StatusCode>',
+                               status).group()
+
+        # Missing and duplicate Status
+        self._assertBothRaise(xml.replace(status, b''), ResponseElementTree)
+        self._assertBothRaise(xml.replace(status, status * 2),
+                              ResponseElementTree)
+
+        # Duplicate Issuer
+        self._assertBothRaise(xml.replace(issuer, issuer * 2, 1),
+                              ResponseElementTree)
+
+        # Status with a StatusMessage but no StatusCode
+        self._assertBothRaise(
+                xml.replace(status, status.replace(statusCode, b'')),
+                ResponseElementTree)
+
+        # Subject is not a Response child element.  The query Subject
+        # declares its namespace
+        self._assertBothRaise(xml.replace(status, status + subject),
+                              ResponseElementTree)
+
+
+if __name__ == "__main__":
+    unittest.main()
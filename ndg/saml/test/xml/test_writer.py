@@ -0,0 +1,159 @@
+"""Test streaming XML writer for SAML objects
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import unittest
+from io import BytesIO
+import xml.etree.ElementTree as StdElementTree
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import (Attribute, AuthzDecisionQuery, Issuer,
+                                 XSStringAttributeValue)
+from ndg.saml.xml.etree import (ResponseElementTree, AssertionElementTree,
+                                AttributeQueryElementTree,
+                                AuthzDecisionQueryElementTree)
+from ndg.saml.xml.writer import SAMLWriter
+from ndg.saml.test.utils import SAMLUtil
+
+
+def canonicalTree(xml):
+    """Parse XML into nested tuples of tag, attributes, stripped text and
+    children so that documents can be compared regardless of prefixes and
+    where namespaces are declared
+    """
+    def _canonical(elem):
+        return (elem.tag, sorted(elem.attrib.items()),
+                (elem.text or '').strip(),
+                [_canonical(child) for child in elem])
+
+    return _canonical(StdElementTree.fromstring(xml))
+
+
+class SAMLWriterTestCase(unittest.TestCase):
+    """Compare SAMLWriter output with ElementTree serialisation"""
+
+    def _createAttributeResponse(self):
+        samlUtil = SAMLUtil()
+        samlUtil.firstName = "Philip"
+        samlUtil.lastName = "Kershaw"
+        samlUtil.emailAddress = "p.j.k@somewhere"
+        samlUtil.addAttribute("urn:esg:sitea:grouprole",
+                              'group <a> & "b"\n')
+        response = SAMLUtil.create_authz_decision_query_response()
+        response.assertions.append(samlUtil.buildAssertion())
+        return response
+
+    def _assertEquivalent(self, samlObject, elementTreeClass):
+        expected = ElementTree.tostring(elementTreeClass.toXML(samlObject))
+        xml = SAMLWriter.toBytes(samlObject)
+        self.assertEqual(canonicalTree(xml), canonicalTree(expected))
+        return xml
+
+    def test01_response(self):
+        response = self._createAttributeResponse()
+        xml = self._assertEquivalent(response, ResponseElementTree)
+
+        # Escaped attribute value is read back as set
+        parsedResponse = ResponseElementTree.fromXML(ElementTree.XML(xml))
+        attribute = parsedResponse.assertions[1].attributeStatements[0
+                                                            ].attributes[-1]
+        self.assertEqual(attribute.attributeValues[0].value, 'group <a> & "b"')
+
+    def test02_assertion(self):
+        response = self._createAttributeResponse()
+        for assertion in response.assertions:
+            self._assertEquivalent(assertion, AssertionElementTree)
+
+    def test03_queries(self):
+        samlUtil = SAMLUtil()
+        attributeQuery = samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                                      SAMLUtil.NAMEID_VALUE)
+        attribute = Attribute()
+        attribute.name = 'urn:esg:email:address'
+        attribute.nameFormat = 'http://www.w3.org/2001/XMLSchema#string'
+        attribute.friendlyName = 'email "address"'
+        attributeQuery.attributes.append(attribute)
+        self._assertEquivalent(attributeQuery, AttributeQueryElementTree)
+
+        authzDecisionQuery = samlUtil.buildAuthzDecisionQuery()
+        self._assertEquivalent(authzDecisionQuery,
+                               AuthzDecisionQueryElementTree)
+
+    def test04_issuer(self):
+        # Issuer is optional for queries but must have a value if set
+        samlUtil = SAMLUtil()
+        attributeQuery = samlUtil.buildAttributeQuery(SAMLUtil.ISSUER_DN,
+                                                      SAMLUtil.NAMEID_VALUE)
+        authzDecisionQuery = samlUtil.buildAuthzDecisionQuery()
+        queries = (
+            (attributeQuery, AttributeQueryElementTree),
+            (authzDecisionQuery, AuthzDecisionQueryElementTree)
+        )
+        for query, elementTreeClass in queries:
+            # Copy with no issuer set
+            query2 = query.__class__()
+            for name in ('version', 'id', 'issueInstant', 'subject'):
+                setattr(query2, name, getattr(query, name))
+            if isinstance(query, AuthzDecisionQuery):
+                query2.resource = query.resource
+                query2.actions.extend(query.actions)
+                
+            xml = self._assertEquivalent(query2, elementTreeClass)
+            self.assertNotIn(b'Issuer', xml)
+            
+            # Issuer with no value
+            query.issuer = Issuer()
+            self.assertRaises(AttributeError, elementTreeClass.toXML, query)
+            self.assertRaises(AttributeError, SAMLWriter.toBytes, query)
+        
+        response = self._createAttributeResponse()
+        response.assertions[0].issuer.value = ''
+        self.assertRaises(AttributeError, ResponseElementTree.toXML, response)
+        self.assertRaises(AttributeError, SAMLWriter.toBytes, response)
+        
+    def test05_stream(self):
+        response = self._createAttributeResponse()
+        stream = BytesIO()
+        SAMLWriter.toStream(response, stream)
+        self.assertEqual(stream.getvalue(), SAMLWriter.toBytes(response))
+
+        # Small buffer forces several writes
+        stream = BytesIO()
+        writer = SAMLWriter(stream=stream, bufferSize=16)
+        writer.write(response)
+        writer.flush()
+        self.assertEqual(stream.getvalue(), SAMLWriter.toBytes(response))
+
+    def test06_unsupported_type(self):
+        self.assertRaises(TypeError, SAMLWriter.toBytes, object())
+
+        attributeValue = XSStringAttributeValue()
+        attributeValue.value = 'value'
+        xml = SAMLWriter.toBytes(attributeValue)
+        self.assertIn(b'xsi:type="xs:string"', xml)
+        self.assertIn(b'xmlns:xs=', xml)
+
+    def test07_type_namespaces_declared_once(self):
+        response = self._createAttributeResponse()
+        for i in range(SAMLWriter.PARTS_PER_CHUNK):
+            attributeValue = XSStringAttributeValue()
+            attributeValue.value = 'value%d' % i
+            response.assertions[1].attributeStatements[0].attributes[0
+                                    ].attributeValues.append(attributeValue)
+            
+        xml = self._assertEquivalent(response, ResponseElementTree)
+        rootTagEnd = xml.index(b'>')
+        for declaration in (b'xmlns:xs=', b'xmlns:xsi='):
+            self.assertEqual(xml.count(declaration), 1)
+            self.assertLess(xml.index(declaration), rootTagEnd)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,11 @@ except ImportError:
     from time import strptime as _strptime
     strptime = lambda datetimeStr, format: datetime(*(_strptime(datetimeStr, 
                                                                 format)[0:6]))
+import re
 from datetime import datetime, timedelta
+from functools import lru_cache
+from collections import OrderedDict
+from threading import Lock
 
         
 # Interpret a string as a boolean
@@ -27,26 +31,46 @@ class SAMLDateTime(object):
     """Generic datetime formatting utility for SAML timestamps - XMLSchema
     Datetime format
     
+    Timestamps are parsed into naive datetimes in UTC.  Values with a time 
+    zone offset are converted to UTC and values with no time zone are taken 
+    to be UTC already.
+    
     @cvar DATETIME_FORMAT: date/time format string for SAML timestamps
     @type DATETIME_FORMAT: string
+    @cvar DATETIME_PAT: pattern for the xs:dateTime values supported.  
+    Years must have four digits to be represented by datetime
+    @type DATETIME_PAT: _sre.SRE_Pattern
+    @cvar CACHE_SIZE: number of parsed timestamps to keep.  Timestamps are 
+    often repeated within a document, for example the IssueInstant of a 
+    response and its assertions
+    @type CACHE_SIZE: int
     """
     DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+    DATETIME_PAT = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)'
+                              r'(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?$')
+    CACHE_SIZE = 256
     
     @classmethod
     def toString(cls, dtValue):
         """Convert issue instant datetime to correct string type for output
         
         @type dtValue: datetime.datetime
-        @param dtValue: issue instance as a datetime
+        @param dtValue: issue instance as a datetime.  Time zone aware values
+        are converted to UTC
         @rtype: basestring
         @return: issue instance as a string
         """
         if not isinstance(dtValue, datetime):
             raise TypeError("Expecting datetime type for string conversion, "
                             "got %r" % dtValue)
+        
+        if dtValue.tzinfo is not None:
+            offset = dtValue.utcoffset()
+            if offset is not None:
+                dtValue = dtValue - offset
+            dtValue = dtValue.replace(tzinfo=None)
             
         # isoformat provides the correct formatting
-#        return dtIssueInstant.strftime(cls.DATETIME_FORMAT)
         return datetime.isoformat(dtValue)+'Z'
 
     @classmethod
@@ -57,30 +81,71 @@ class SAMLDateTime(object):
         @param strDateTime: issue instance as a string
         @rtype: datetime.datetime
         @return: issue instance as a datetime
+        @raise ValueError: string is not a valid xs:dateTime
         """
         if not isinstance(strDateTime, str):
             raise TypeError("Expecting basestring derived type for string "
                             "conversion, got %r" % strDateTime)
         
-        # Workaround for seconds fraction as strptime doesn't seem able to deal
-        # with this 
-        dateTimeTuple = strDateTime.split('.')
+        return _parseDateTime(strDateTime)
+    
+    @classmethod
+    def _parse(cls, strDateTime):
+        """Parse an xs:dateTime string - see 
+        http://www.w3.org/TR/xmlschema-2/#dateTime
+        
+        @type strDateTime: basestring
+        @param strDateTime: timestamp
+        @rtype: datetime.datetime
+        @return: timestamp as a naive datetime in UTC
+        @raise ValueError: string is not a valid xs:dateTime
+        """
+        match = cls.DATETIME_PAT.match(strDateTime.strip())
+        if match is None:
+            raise ValueError("Invalid xs:dateTime value %r" % strDateTime)
         
-        # Seconds fraction may not be present - see
-        # http://www.w3.org/TR/xmlschema-2/#dateTime - explicitly test for ...
-        if len(dateTimeTuple) == 2:
-            strDateTimeFraction, strSecondsFraction = dateTimeTuple
-            secondsFraction = float("0." + strSecondsFraction.replace('Z', ''))
+        (year, month, day, hour, minute, second, 
+         fraction, timezone) = match.groups()
+        
+        # Seconds fraction may not be present.  Digits beyond microseconds 
+        # are discarded
+        if fraction is None:
+            microsecond = 0
         else:
-            strDateTimeFraction = dateTimeTuple[0].replace('Z', '')
-            secondsFraction = 0.
+            microsecond = int(fraction[:6].ljust(6, '0'))
             
-        dtValue = datetime.strptime(strDateTimeFraction, cls.DATETIME_FORMAT)
-        dtValue += timedelta(seconds=secondsFraction)
-        
+        # 24:00:00 is allowed for the end of a day
+        hour = int(hour)
+        endOfDay = hour == 24
+        if endOfDay:
+            if minute != '00' or second != '00' or microsecond:
+                raise ValueError("Invalid xs:dateTime value %r" % strDateTime)
+            hour = 0
+            
+        dtValue = datetime(int(year), int(month), int(day), hour, int(minute),
+                           int(second), microsecond)
+        if endOfDay:
+            dtValue += timedelta(days=1)
+            
+        if timezone is not None and timezone != 'Z':
+            offset = timedelta(hours=int(timezone[1:3]), 
+                               minutes=int(timezone[4:6]))
+            if offset > timedelta(hours=14):
+                raise ValueError("Invalid time zone in xs:dateTime value %r" % 
+                                 strDateTime)
+            if timezone[0] == '+':
+                dtValue -= offset
+            else:
+                dtValue += offset
+                
         return dtValue
 
 
+# Parsed timestamps are immutable so can be shared between callers
+_parseDateTime = lru_cache(maxsize=SAMLDateTime.CACHE_SIZE)(
+                                                        SAMLDateTime._parse)
+
+
 class TypedList(list):
     """Extend list type to enabled only items of a given type.  Supports
     any type where the array type in the Standard Library is restricted to 
@@ -143,4 +208,239 @@ class TypedList(list):
     
         return super(TypedList, self).append(item)
 
-    
\ No newline at end of file
+    def copy(self):
+        """Make a shallow copy of the list.  The items have been checked
+        already so are not checked again
+
+        @return: copy of this list
+        @rtype: TypedList
+        """
+        typedList = list.__new__(self.__class__)
+        typedList.__dict__ = self.__dict__.copy()
+        if self:
+            list.extend(typedList, self)
+        return typedList
+
+
+class _Pending(object):
+    """Item of a LazyList which has not been made yet"""
+    __slots__ = ('source',)
+
+    def __init__(self, source):
+        self.source = source
+
+
+class LazyList(list):
+    """List with items made on first access.  Pending items are added with
+    appendPending and made by passing their source to the function the list
+    was created with.  The made item replaces the source.
+
+    Indexing and iteration make only the items they return.  Other list
+    operations which read items such as comparison, concatenation, search 
+    and sorting make all pending items first.  Copies and pickles are plain lists.  Errors
+    making an item are raised when it is first accessed.
+    """
+    def __init__(self, make):
+        """
+        @type make: callable
+        @param make: function taking the source of a pending item and
+        returning the item
+        """
+        super(LazyList, self).__init__()
+        self._make = make
+
+    def appendPending(self, source):
+        """Append an item to be made from source when it is first accessed
+
+        @param source: object to pass to the make function
+        @type source: object
+        """
+        super(LazyList, self).append(_Pending(source))
+
+    def _getItem(self, index):
+        """Get an item, making it if it is pending
+
+        @type index: int
+        @param index: item index
+        @return: item
+        """
+        item = super(LazyList, self).__getitem__(index)
+        if item.__class__ is _Pending:
+            item = self._make(item.source)
+            super(LazyList, self).__setitem__(index, item)
+        return item
+
+    def _makeAll(self):
+        """Make all pending items"""
+        for i in range(len(self)):
+            self._getItem(i)
+
+    def isPending(self, index):
+        """Check whether an item has still to be made
+
+        @type index: int
+        @param index: item index
+        @rtype: bool
+        @return: True if the item at index has not been accessed yet
+        """
+        return super(LazyList, self).__getitem__(index).__class__ is _Pending
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            for i in range(*index.indices(len(self))):
+                self._getItem(i)
+            return super(LazyList, self).__getitem__(index)
+
+        return self._getItem(index)
+
+    def __iter__(self):
+        i = 0
+        while i < len(self):
+            yield self._getItem(i)
+            i += 1
+
+    def __reversed__(self):
+        i = len(self) - 1
+        while i >= 0:
+            if i < len(self):
+                yield self._getItem(i)
+            i -= 1
+
+    def __add__(self, other):
+        # list.__add__ reads the items of a list on the right hand side
+        # directly rather than by iterating over it
+        self._makeAll()
+        if isinstance(other, LazyList):
+            other._makeAll()
+        return list.__add__(self, other)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        self._makeAll()
+        return list.__add__(other, self)
+
+    def __reduce_ex__(self, protocol):
+        return (list, (list(self),))
+
+    def copy(self):
+        return list(self)
+
+
+def _makeAllAndCall(name):
+    """Make a LazyList method which makes pending items before calling the
+    list method with the given name"""
+    method = getattr(list, name)
+    def lazyListMethod(self, *args, **kw):
+        self._makeAll()
+        return method(self, *args, **kw)
+
+    lazyListMethod.__name__ = name
+    lazyListMethod.__doc__ = method.__doc__
+    return lazyListMethod
+
+for _name in ('__contains__', '__eq__', '__ne__', '__lt__', '__le__',
+              '__gt__', '__ge__', '__iadd__', '__mul__', '__rmul__',
+              '__repr__', 'count', 'extend', 'index', 'pop', 'remove', 'sort'):
+    setattr(LazyList, _name, _makeAllAndCall(_name))
+
+del _name
+
+
+class LRUCache(object):
+    """Mapping of limited size which discards the least recently used item
+    when full.  Access is serialised with a lock so that an instance can be
+    shared between the threads of a multi-threaded server
+    
+    @ivar __maxSize: maximum number of items held
+    @type __maxSize: int
+    @ivar __items: cached items in order of use, least recent first
+    @type __items: collections.OrderedDict
+    """
+    __slots__ = ('__maxSize', '__items', '__lock', '__hits', '__misses')
+    
+    def __init__(self, maxSize):
+        """
+        @param maxSize: maximum number of items to hold
+        @type maxSize: int
+        """
+        if not isinstance(maxSize, int):
+            raise TypeError('Expecting int type for "maxSize"; got %r' %
+                            type(maxSize))
+        if maxSize < 1:
+            raise ValueError('Expecting "maxSize" greater than zero; got %r' %
+                             maxSize)
+            
+        self.__maxSize = maxSize
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+        
+    @property
+    def maxSize(self):
+        """@return: maximum number of items held
+        @rtype: int
+        """
+        return self.__maxSize
+    
+    @property
+    def hits(self):
+        """@return: number of get calls which found an item
+        @rtype: int
+        """
+        return self.__hits
+    
+    @property
+    def misses(self):
+        """@return: number of get calls which found no item
+        @rtype: int
+        """
+        return self.__misses
+    
+    def __len__(self):
+        return len(self.__items)
+    
+    def __contains__(self, key):
+        return key in self.__items
+        
+    def get(self, key, default=None):
+        """Get an item marking it as most recently used
+        
+        @param key: item key
+        @type key: hashable type
+        @param default: value to return if there is no item for the key
+        @type default: any
+        @return: cached item or default
+        @rtype: any
+        """
+        with self.__lock:
+            try:
+                value = self.__items[key]
+            except KeyError:
+                self.__misses += 1
+                return default
+            
+            self.__items.move_to_end(key)
+            self.__hits += 1
+            return value
+        
+    def set(self, key, value):
+        """Add or replace an item, discarding the least recently used item if
+        the cache is full
+        
+        @param key: item key
+        @type key: hashable type
+        @param value: item to cache
+        @type value: any
+        """
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            if len(self.__items) > self.__maxSize:
+                self.__items.popitem(last=False)
+                
+    def clear(self):
+        """Remove all items"""
+        with self.__lock:
+            self.__items.clear()
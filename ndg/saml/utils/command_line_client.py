@@ -5,8 +5,6 @@ Created on Feb 18, 2013
 '''
 import sys
 from optparse import OptionParser
-from uuid import uuid4
-from datetime import datetime
 
 from ndg.saml import importElementTree
 ElementTree = importElementTree()
@@ -24,13 +22,14 @@ from ndg.saml.saml2.core import (SAMLVersion, Subject, NameID, Issuer,
                                  Attribute, Action, StatusCode,
                                  XSStringAttributeValue)
 from ndg.saml.xml.etree import ResponseElementTree
+from ndg.saml.utils.factory import QueryTemplate
 
 
 class SamlSoapCommandLineClient(object):
     '''Simple SAML SOAP Client'''
     CONFIG_FILENAME = 'authz-decision-interface.ini'
     
-    __slots__ = (
+    OPTION_NAMES = (
         "service_uri",
         "issuer", 
         "issuer_format",
@@ -50,13 +49,17 @@ class SamlSoapCommandLineClient(object):
         "clock_skew_tolerance",
         "debug"
     )
+    __slots__ = OPTION_NAMES + ("_query_templates",)
     
     ATTRIBUTE_QUERY_CMD = 'attr'
     AUTHZ_DECISION_QUERY_CMD = 'authz'
     
     def __init__(self):
-        for i in self.__class__.__slots__:
+        for i in self.__class__.OPTION_NAMES:
             setattr(self, i, None)
+            
+        # Query templates with the settings they were made from
+        self._query_templates = {}
         
     def parse_command_line(self, argv):
         usage = """usage: %prog [command] [options]
@@ -287,7 +290,7 @@ For help with individual commands run: %prog [command] -h
                                                     len_attribute_names
            
         missing_vals = []
-        for attr_name in (self.__class__.__slots__):
+        for attr_name in self.__class__.OPTION_NAMES:
             val = getattr(options, attr_name, None)
             if val == '':
                 for option in parser.option_list:
@@ -305,10 +308,9 @@ For help with individual commands run: %prog [command] -h
         return command
     
     def _set_query_common_attrs(self, query):
-        """Set attributes common to both types of SAML query"""
+        """Set attributes common to both types of SAML query.  The ID and
+        issue instant are set when the query is made from its template"""
         query.version = SAMLVersion(SAMLVersion.VERSION_20)
-        query.id = str(uuid4())
-        query.issueInstant = datetime.utcnow()
         
         query.issuer = Issuer()
         query.issuer.format = self.issuer_format
@@ -319,8 +321,10 @@ For help with individual commands run: %prog [command] -h
         query.subject.nameID.format = self.subject_id_format
         query.subject.nameID.value = self.subject_id
  
-    def create_authz_decision_query(self):
-        """Convenience utility to make an Authorisation decision query"""
+    def create_authz_decision_query_template(self):
+        """Make a template for Authorisation decision queries with the 
+        settings of this client.  Queries for other subjects and resources
+        can be made from it with its instantiate method"""
         authz_decision_query = AuthzDecisionQuery()
 
         self._set_query_common_attrs(authz_decision_query)
@@ -331,9 +335,33 @@ For help with individual commands run: %prog [command] -h
         authz_decision_query.actions[-1].namespace = self.action_namespace
         authz_decision_query.actions[-1].value = self.action
             
-        return authz_decision_query
+        return QueryTemplate(authz_decision_query)
 
-    def create_attribute_query(self):
+    def _get_query_template(self, create_template, settings):
+        """Get a query template for the current settings, making it only if 
+        the settings have changed since a template was last made"""
+        name = create_template.__name__
+        cached_settings, query_template = self._query_templates.get(name, 
+                                                                (None, None))
+        if query_template is None or cached_settings != settings:
+            query_template = create_template()
+            self._query_templates[name] = (settings, query_template)
+            
+        return query_template
+
+    def create_authz_decision_query(self):
+        """Convenience utility to make an Authorisation decision query"""
+        settings = (self.issuer, self.issuer_format, 
+                    self.subject_id, self.subject_id_format,
+                    self.resource_id, self.action, self.action_namespace)
+        return self._get_query_template(
+                            self.create_authz_decision_query_template,
+                            settings).instantiate()
+
+    def create_attribute_query_template(self):
+        """Make a template for attribute queries with the settings of this
+        client.  Queries for other subjects can be made from it with its 
+        instantiate method"""
         attr_query = AttributeQuery()
 
         self._set_query_common_attrs(attr_query)
@@ -349,7 +377,18 @@ For help with individual commands run: %prog [command] -h
             
             attr_query.attributes.append(attribute)
         
-        return attr_query
+        return QueryTemplate(attr_query)
+
+    def create_attribute_query(self):
+        """Convenience utility to make an attribute query"""
+        settings = (self.issuer, self.issuer_format, 
+                    self.subject_id, self.subject_id_format,
+                    tuple(self.attribute_names or ()),
+                    tuple(self.attribute_friendly_names or ()),
+                    tuple(self.attribute_formats or ()))
+        return self._get_query_template(
+                            self.create_attribute_query_template,
+                            settings).instantiate()
                     
     def dispatch(self, command):
         if command == self.__class__.ATTRIBUTE_QUERY_CMD:
@@ -14,6 +14,8 @@ import logging
 import os
 import sys
 import re
+from uuid import uuid4
+from datetime import datetime
 from configparser import ConfigParser
 from abc import ABCMeta, abstractmethod
 
@@ -168,6 +170,93 @@ class SubjectFactory(object):
         return subject
 
 
+class QueryTemplate(object):
+    """Query built once, for example from configuration, and copied for each
+    request.  Copies share the sub-objects of the template query such as the
+    issuer, attributes and actions so these should not be altered.  Only the
+    per-request fields are set on a copy: a new ID and issue instant and
+    optionally the subject and resource.  Lists are copied so that items may
+    be added to the lists of a copy.
+    
+    @ivar __cls: query class
+    @type __cls: type
+    @ivar __state: attributes of the template query
+    @type __state: dict
+    @ivar __listAttrNames: names of attributes holding lists
+    @type __listAttrNames: tuple
+    @ivar __nameIDFormat: subject name ID format for subjects given by value
+    @type __nameIDFormat: basestring
+    """
+    __slots__ = ('__cls', '__state', '__listAttrNames', '__nameIDFormat')
+    
+    def __init__(self, query):
+        """
+        @param query: query to copy.  It is read once so later changes to 
+        its attributes are not seen by the template
+        @type query: ndg.saml.saml2.core.SubjectQuery
+        """
+        if not isinstance(query, saml2.SubjectQuery):
+            raise TypeError('Expecting %r type for "query"; got %r' % 
+                            (saml2.SubjectQuery, type(query)))
+            
+        self.__cls = query.__class__
+        self.__state = query.__getstate__()
+        self.__listAttrNames = tuple([attrName 
+                                for attrName, value in self.__state.items()
+                                if isinstance(value, list)])
+        
+        subject = query.subject
+        if subject is not None and subject.nameID is not None:
+            self.__nameIDFormat = subject.nameID.format
+        else:
+            self.__nameIDFormat = None
+            
+    @property
+    def queryClass(self):
+        """@return: class of queries made
+        @rtype: type
+        """
+        return self.__cls
+        
+    def instantiate(self, subject=None, resource=None):
+        """Make a query from the template
+        
+        @param subject: subject of the query or the name ID value of the 
+        subject.  A name ID is given the format of the template subject.  
+        Defaults to the subject of the template
+        @type subject: ndg.saml.saml2.core.Subject / basestring / NoneType
+        @param resource: resource for an authorisation decision query.  
+        Defaults to the resource of the template
+        @type resource: basestring / NoneType
+        @return: new query
+        @rtype: ndg.saml.saml2.core.SubjectQuery
+        """
+        query = self.__cls.__new__(self.__cls)
+        query.__setstate__(self.__state)
+        for attrName in self.__listAttrNames:
+            setattr(query, attrName, getattr(query, attrName).copy())
+            
+        query.id = str(uuid4())
+        query.issueInstant = datetime.utcnow()
+        
+        if subject is not None:
+            if isinstance(subject, str):
+                nameID = saml2.NameID._from_fields(format=self.__nameIDFormat,
+                                                   value=subject)
+                subject = saml2.Subject._from_fields(nameID=nameID)
+                
+            query.subject = subject
+            
+        if resource is not None:
+            if not isinstance(query, saml2.AuthzDecisionQuery):
+                raise TypeError('"resource" may only be set for %r type '
+                                'queries; template is for %r' % 
+                                (saml2.AuthzDecisionQuery, self.__cls))
+            query.resource = resource
+            
+        return query
+    
+
 class QueryFactoryBase(object, metaclass=ABCMeta):
     """Abstract base Factory class to create SAML queries from various 
     inputs - derived classes determine the query types
@@ -232,6 +321,25 @@ class QueryFactoryBase(object, metaclass=ABCMeta):
             
         return cls.from_kw(**kw)
     
+    @classmethod
+    def template_from_config(cls, cfg, prefix=PREFIX, section='DEFAULT'):
+        '''Create a query template from config file settings.  Arguments are
+        as for from_config
+        @rtype: ndg.saml.utils.factory.QueryTemplate
+        @return: template for queries with the given settings
+        '''
+        return QueryTemplate(cls.from_config(cfg, prefix=prefix, 
+                                             section=section))
+    
+    @classmethod
+    def template_from_kw(cls, **config):
+        '''Create a query template from input keywords.  Keywords are as for
+        from_kw
+        @rtype: ndg.saml.utils.factory.QueryTemplate
+        @return: template for queries with the given settings
+        '''
+        return QueryTemplate(cls.from_kw(**config))
+    
     @classmethod
     @abstractmethod
     def from_kw(cls, prefix=PREFIX, **config):
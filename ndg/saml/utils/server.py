@@ -0,0 +1,260 @@
+"""SAML SOAP query interface server - run a Paste Deploy configured
+application with the Gunicorn WSGI application server
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import gc
+import logging
+import multiprocessing
+import sys
+from importlib import import_module
+from optparse import OptionParser
+from os import path
+
+from ndg.saml.utils.factory import importModuleObject
+
+log = logging.getLogger(__name__)
+
+
+class SamlServer(object):
+    '''Run a SAML SOAP query interface application from a Paste ini file.
+
+    The application is loaded and warmed up in the Gunicorn master process
+    before the workers are forked so that they start with modules imported
+    and caches populated, sharing that memory copy-on-write.
+
+    :cvar WARM_UP_MODULES: modules imported before the application is loaded
+    :type WARM_UP_MODULES: tuple
+    '''
+    WARM_UP_MODULES = (
+        'ndg.saml.saml2.core',
+        'ndg.saml.xml.etree',
+        'ndg.saml.utils.factory',
+        'ndg.soap.etree',
+        'ndg.saml.saml2.binding.soap.server.wsgi.queryinterface',
+    )
+    DEFAULT_BIND = '127.0.0.1:5000'
+    DEFAULT_WORKER_CLASS = 'sync'
+
+    __slots__ = (
+        "config_filepath",
+        "bind",
+        "workers",
+        "worker_class",
+        "threads",
+        "timeout",
+        "certfile",
+        "keyfile",
+        "warm_up",
+        "warm_up_hooks",
+        "debug"
+    )
+
+    def __init__(self):
+        for i in self.__class__.__slots__:
+            setattr(self, i, None)
+
+    @staticmethod
+    def number_of_workers():
+        return (multiprocessing.cpu_count() * 2) + 1
+
+    def parse_command_line(self, argv):
+        usage = """usage: %prog [options] <Paste ini file>
+
+Run a SAML SOAP query interface with the Gunicorn WSGI server.  The
+application is loaded from the "main" application or pipeline section of the
+ini file.
+"""
+        cls = self.__class__
+        parser = OptionParser(usage=usage)
+
+        parser.add_option("-b", "--bind", dest="bind",
+                          help="Address to listen on, default is %s" %
+                               cls.DEFAULT_BIND,
+                          default=cls.DEFAULT_BIND,
+                          metavar="ADDRESS")
+
+        parser.add_option("-w", "--workers", dest="workers",
+                          type="int",
+                          help="Number of worker processes, default is "
+                               "twice the number of CPUs plus one",
+                          default=cls.number_of_workers(),
+                          metavar="WORKERS")
+
+        parser.add_option("-k", "--worker-class", dest="worker_class",
+                          help="Gunicorn worker class e.g. sync, gthread or "
+                               "gevent, default is %s" %
+                               cls.DEFAULT_WORKER_CLASS,
+                          default=cls.DEFAULT_WORKER_CLASS,
+                          metavar="WORKER_CLASS")
+
+        parser.add_option("-t", "--threads", dest="threads",
+                          type="int",
+                          help="Number of threads per worker for the gthread "
+                               "worker class",
+                          default=1,
+                          metavar="THREADS")
+
+        parser.add_option("-T", "--timeout", dest="timeout",
+                          type="int",
+                          help="Worker timeout in seconds",
+                          default=30,
+                          metavar="TIMEOUT")
+
+        parser.add_option("-c", "--cert", dest="certfile",
+                          help="SSL certificate file - enables HTTPS",
+                          metavar="CERT")
+
+        parser.add_option("-K", "--key", dest="keyfile",
+                          help="SSL private key file",
+                          metavar="KEY")
+
+        parser.add_option("-n", "--no-warm-up", dest="warm_up",
+                          action="store_false",
+                          help="Skip warming up the application before "
+                               "forking workers",
+                          default=True)
+
+        parser.add_option("-H", "--warm-up-hook", dest="warm_up_hooks",
+                          action="append",
+                          help="Additional warm up callable as "
+                               "<module>:<name>.  It's called with the "
+                               "application.  Set multiple times for more "
+                               "than one hook",
+                          default=[],
+                          metavar="WARM_UP_HOOK")
+
+        parser.add_option("-d", "--debug", dest="debug",
+                          action="store_true",
+                          help="Print debug information",
+                          default=False)
+
+        opts, args = parser.parse_args(argv[1:])
+        if len(args) != 1:
+            parser.error("Expecting a Paste ini file path")
+
+        self.config_filepath = path.abspath(args[0])
+        for name in cls.__slots__:
+            if name != 'config_filepath':
+                setattr(self, name, getattr(opts, name))
+
+    def load_app(self):
+        '''Load the application from the Paste ini file
+
+        :return: WSGI application
+        :rtype: callable
+        '''
+        from paste.deploy import loadapp
+
+        return loadapp('config:%s' % self.config_filepath)
+
+    @classmethod
+    def warm_up_app(cls, app, hooks=()):
+        '''Prepare an application to serve requests: import modules, call
+        the warmUp method of each middleware in the chain which has one and
+        then any additional hooks.  Middleware are found by following
+        their "_app" attributes from the outermost
+
+        :param app: WSGI application
+        :type app: callable
+        :param hooks: additional callables, each called with app
+        :type hooks: iterable
+        :return: number of middleware warmed up
+        :rtype: int
+        '''
+        for moduleName in cls.WARM_UP_MODULES:
+            import_module(moduleName)
+
+        nWarmedUp = 0
+        visited = set()
+        middleware = app
+        while middleware is not None and id(middleware) not in visited:
+            visited.add(id(middleware))
+            warmUp = getattr(middleware, 'warmUp', None)
+            if callable(warmUp):
+                log.debug("Warming up %r", middleware)
+                warmUp()
+                nWarmedUp += 1
+
+            middleware = getattr(middleware, '_app', None)
+
+        for hook in hooks:
+            if isinstance(hook, str):
+                hook = importModuleObject(hook)
+            hook(app)
+
+        return nWarmedUp
+
+    def options(self):
+        '''Gunicorn settings.  The application is always preloaded so that
+        warm up happens once in the master process
+
+        :return: settings
+        :rtype: dict
+        '''
+        return {
+            'bind': self.bind,
+            'workers': self.workers,
+            'worker_class': self.worker_class,
+            'threads': self.threads,
+            'timeout': self.timeout,
+            'certfile': self.certfile,
+            'keyfile': self.keyfile,
+            'preload_app': True
+        }
+
+    def run(self):
+        '''Load the application and run the server'''
+        import gunicorn.app.base
+
+        server = self
+
+        class GunicornServerApp(gunicorn.app.base.BaseApplication):
+            def load_config(self):
+                for key, value in server.options().items():
+                    if key in self.cfg.settings and value is not None:
+                        self.cfg.set(key, value)
+
+            def load(self):
+                app = server.load_app()
+                if server.warm_up:
+                    server.warm_up_app(app, hooks=server.warm_up_hooks)
+
+                # Move objects created so far out of the collector's
+                # generations so that collections in the workers don't write
+                # to the pages shared with the master
+                gc.collect()
+                gc.freeze()
+                return app
+
+        GunicornServerApp().run()
+
+    @classmethod
+    def main(cls, argv=sys.argv):
+        server = cls()
+        server.parse_command_line(argv)
+
+        if server.debug:
+            log_level = logging.DEBUG
+        else:
+            log_level = logging.INFO
+
+        logging.basicConfig(level=log_level)
+
+        try:
+            from paste.script.util.logging_config import fileConfig
+            fileConfig(server.config_filepath)
+        except Exception as e:
+            log.debug("No logging configuration loaded from %r: %s",
+                      server.config_filepath, e)
+
+        server.run()
+
+
+if __name__ == "__main__":
+    SamlServer.main()
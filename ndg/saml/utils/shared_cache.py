@@ -0,0 +1,429 @@
+"""Cache shared between the processes on a host via a memory mapped file
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+import logging
+import mmap
+import os
+import struct
+import time
+from hashlib import blake2b
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows - only threads within a process are
+    # synchronised
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+
+class SharedMemoryCacheError(Exception):
+    """Error opening a shared memory cache file"""
+
+
+class SharedMemoryCache(object):
+    """Bounded cache of byte string values shared between processes.  Items
+    are held in fixed size slots in a memory mapped file so that all the
+    workers of a pre-forking server on a host share one cache without an
+    external service.  The get, set and clear methods follow 
+    ndg.saml.utils.LRUCache but values must be byte strings: unlike 
+    LRUCache, items are not held as objects so callers serialise them, for 
+    example with ndg.saml.saml2.binary_codec.  No cache in this package uses
+    this class itself.
+
+    Slots are grouped into buckets of a few ways.  A key hashes to a bucket
+    and may be held in any slot of it.  When a bucket is full, the least
+    recently set item in it is replaced.  Buckets are guarded by a fixed
+    number of lock stripes.  Each stripe is a byte range lock on the file,
+    for other processes, and a thread lock, for other threads in this
+    process.  Reads take shared locks so that they run concurrently.
+
+    @cvar MAGIC: file identifier
+    @type MAGIC: bytes
+    @cvar HEADER_FMT: file header struct format: magic, number of slots,
+    slot size, ways per bucket and number of lock stripes
+    @type HEADER_FMT: string
+    @cvar SLOT_HEADER_FMT: slot header struct format: key hash, time set,
+    key length and value length.  A zero key hash marks an empty slot
+    @type SLOT_HEADER_FMT: string
+    """
+    MAGIC = b'NDGSAMLSHMCACHE1'
+    HEADER_FMT = '<16sIIII'
+    HEADER_SIZE = 64
+    SLOT_HEADER_FMT = '<QdII'
+    SLOT_HEADER_SIZE = struct.calcsize(SLOT_HEADER_FMT)
+
+    DEFAULT_MAX_SIZE = 1024
+    DEFAULT_SLOT_SIZE = 4096
+    DEFAULT_WAYS = 4
+    DEFAULT_N_STRIPES = 64
+
+    __slots__ = (
+        '__filePath',
+        '__fd',
+        '__mmap',
+        '__nSlots',
+        '__slotSize',
+        '__ways',
+        '__nBuckets',
+        '__nStripes',
+        '__threadLocks',
+        '__hits',
+        '__misses'
+    )
+
+    def __init__(self, filePath, maxSize=DEFAULT_MAX_SIZE,
+                 slotSize=DEFAULT_SLOT_SIZE, ways=DEFAULT_WAYS,
+                 nStripes=DEFAULT_N_STRIPES):
+        """Open a cache file, creating it if it doesn't exist.  All processes
+        sharing a cache must use the same settings.  A file in use can't 
+        safely be resized so one made with different settings is not reset:
+        remove it or use another path to change the settings
+
+        @param filePath: cache file path.  Use a file on a memory backed file
+        system e.g. under /dev/shm to avoid writes to disk
+        @type filePath: basestring
+        @param maxSize: maximum number of items held.  Rounded up to a
+        multiple of ways
+        @type maxSize: int
+        @param slotSize: size in bytes of each slot.  Items whose key and
+        value don't fit in a slot are not cached
+        @type slotSize: int
+        @param ways: number of slots per bucket
+        @type ways: int
+        @param nStripes: number of lock stripes
+        @type nStripes: int
+        @raise SharedMemoryCacheError: the file is not a cache file or was
+        made with different settings
+        """
+        for name, value in (('maxSize', maxSize), ('slotSize', slotSize),
+                            ('ways', ways), ('nStripes', nStripes)):
+            if not isinstance(value, int):
+                raise TypeError('Expecting int type for %r; got %r' %
+                                (name, type(value)))
+            if value < 1:
+                raise ValueError('Expecting %r greater than zero; got %r' %
+                                 (name, value))
+
+        if slotSize <= self.__class__.SLOT_HEADER_SIZE:
+            raise ValueError('Expecting "slotSize" greater than %d; got %r' %
+                             (self.__class__.SLOT_HEADER_SIZE, slotSize))
+
+        self.__filePath = filePath
+        self.__ways = ways
+        self.__nBuckets = -(-maxSize // ways)
+        self.__nSlots = self.__nBuckets * ways
+        self.__slotSize = slotSize
+        self.__nStripes = nStripes
+        self.__threadLocks = [Lock() for _ in range(nStripes)]
+        self.__hits = 0
+        self.__misses = 0
+        self.__fd = None
+        self.__mmap = None
+
+        self.__fd = os.open(filePath, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._initFile()
+            self.__mmap = mmap.mmap(self.__fd, self._fileSize())
+        except Exception:
+            os.close(self.__fd)
+            self.__fd = None
+            raise
+
+    def _fileSize(self):
+        return (self.__class__.HEADER_SIZE +
+                self.__nSlots * self.__slotSize)
+
+    def _initFile(self):
+        """Write the header and empty slots if the file is new.  The whole 
+        file is locked so that only one process initialises it
+        
+        @raise SharedMemoryCacheError: the file is not a cache file or was
+        made with different settings.  Other processes may have it mapped so
+        it's not resized
+        """
+        cls = self.__class__
+        header = struct.pack(cls.HEADER_FMT, cls.MAGIC, self.__nSlots,
+                             self.__slotSize, self.__ways, self.__nStripes)
+        if fcntl is not None:
+            fcntl.lockf(self.__fd, fcntl.LOCK_EX)
+        try:
+            fileSize = os.fstat(self.__fd).st_size
+            if fileSize == 0:
+                log.debug("Initialising shared memory cache file %r",
+                          self.__filePath)
+                os.ftruncate(self.__fd, self._fileSize())
+                os.pwrite(self.__fd, header, 0)
+                return
+            
+            existingHeader = os.pread(self.__fd, len(header), 0)
+            if (len(existingHeader) != len(header) or
+                existingHeader[:len(cls.MAGIC)] != cls.MAGIC):
+                raise SharedMemoryCacheError('%r is not a shared memory '
+                                             'cache file' % self.__filePath)
+
+            if existingHeader != header or fileSize != self._fileSize():
+                _, nSlots, slotSize, ways, nStripes = struct.unpack(
+                                            cls.HEADER_FMT, existingHeader)
+                raise SharedMemoryCacheError('Shared memory cache file %r '
+                        'has different settings: %d slots of %d bytes, %d '
+                        'ways and %d lock stripes' % (self.__filePath, 
+                                                      nSlots, slotSize, ways,
+                                                      nStripes))
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(self.__fd, fcntl.LOCK_UN)
+
+    @property
+    def filePath(self):
+        """@return: cache file path
+        @rtype: basestring
+        """
+        return self.__filePath
+
+    @property
+    def maxSize(self):
+        """@return: maximum number of items held
+        @rtype: int
+        """
+        return self.__nSlots
+
+    @property
+    def slotSize(self):
+        """@return: size in bytes of each slot
+        @rtype: int
+        """
+        return self.__slotSize
+
+    @property
+    def hits(self):
+        """@return: number of get calls by this process which found an item
+        @rtype: int
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """@return: number of get calls by this process which found no item
+        @rtype: int
+        """
+        return self.__misses
+
+    @staticmethod
+    def _hashKey(key):
+        """Hash a key to a non-zero 64-bit integer.  Python's built-in hash
+        is randomised per process so can't be used for a shared file
+
+        @param key: key
+        @type key: bytes
+        @return: hash value
+        @rtype: int
+        """
+        keyHash, = struct.unpack('<Q', blake2b(key, digest_size=8).digest())
+        return keyHash or 1
+
+    @staticmethod
+    def _encodeKey(key):
+        if isinstance(key, str):
+            return key.encode('utf-8')
+
+        if not isinstance(key, bytes):
+            raise TypeError('Expecting string or bytes type for key; got %r' %
+                            type(key))
+        return key
+
+    def _lock(self, stripe, exclusive):
+        self.__threadLocks[stripe].acquire()
+        if fcntl is not None:
+            try:
+                fcntl.lockf(self.__fd,
+                            fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH,
+                            1, stripe)
+            except Exception:
+                self.__threadLocks[stripe].release()
+                raise
+
+    def _unlock(self, stripe):
+        if fcntl is not None:
+            fcntl.lockf(self.__fd, fcntl.LOCK_UN, 1, stripe)
+        self.__threadLocks[stripe].release()
+
+    def _find(self, bucket, keyHash, key):
+        """Find the slot holding a key
+
+        @return: slot offset and slot header or None if the key isn't held
+        @rtype: tuple / NoneType
+        """
+        cls = self.__class__
+        offset = (cls.HEADER_SIZE +
+                  bucket * self.__ways * self.__slotSize)
+        for _ in range(self.__ways):
+            slotHeader = struct.unpack_from(cls.SLOT_HEADER_FMT, self.__mmap,
+                                            offset)
+            if slotHeader[0] == keyHash:
+                keyOffset = offset + cls.SLOT_HEADER_SIZE
+                if self.__mmap[keyOffset:keyOffset + slotHeader[2]] == key:
+                    return offset, slotHeader
+            offset += self.__slotSize
+
+        return None
+
+    def get(self, key, default=None):
+        """Get an item
+
+        @param key: item key
+        @type key: basestring / bytes
+        @param default: value to return if there is no item for the key
+        @type default: any
+        @return: cached item or default
+        @rtype: bytes / any
+        """
+        key = self._encodeKey(key)
+        keyHash = self._hashKey(key)
+        bucket = keyHash % self.__nBuckets
+        stripe = bucket % self.__nStripes
+
+        self._lock(stripe, False)
+        try:
+            found = self._find(bucket, keyHash, key)
+            if found is None:
+                value = None
+            else:
+                offset, (_, _, keyLen, valueLen) = found
+                valueOffset = offset + self.__class__.SLOT_HEADER_SIZE + keyLen
+                value = self.__mmap[valueOffset:valueOffset + valueLen]
+        finally:
+            self._unlock(stripe)
+
+        if value is None:
+            self.__misses += 1
+            return default
+
+        self.__hits += 1
+        return value
+
+    def set(self, key, value):
+        """Add or replace an item, discarding the least recently set item in
+        its bucket if the bucket is full
+
+        @param key: item key
+        @type key: basestring / bytes
+        @param value: item to cache
+        @type value: bytes
+        @return: True if the item was cached, False if it's too big for a
+        slot
+        @rtype: bool
+        """
+        cls = self.__class__
+        key = self._encodeKey(key)
+        if not isinstance(value, bytes):
+            raise TypeError('Expecting bytes type for value; got %r' %
+                            type(value))
+
+        if cls.SLOT_HEADER_SIZE + len(key) + len(value) > self.__slotSize:
+            log.debug("Item of %d bytes is too big to cache",
+                      len(key) + len(value))
+            return False
+
+        keyHash = self._hashKey(key)
+        bucket = keyHash % self.__nBuckets
+        stripe = bucket % self.__nStripes
+
+        self._lock(stripe, True)
+        try:
+            found = self._find(bucket, keyHash, key)
+            if found is not None:
+                offset = found[0]
+            else:
+                # Use an empty slot or else the oldest one
+                offset = None
+                oldest = None
+                slotOffset = (cls.HEADER_SIZE +
+                              bucket * self.__ways * self.__slotSize)
+                for _ in range(self.__ways):
+                    slotHash, stamp, _, _ = struct.unpack_from(
+                                cls.SLOT_HEADER_FMT, self.__mmap, slotOffset)
+                    if slotHash == 0:
+                        offset = slotOffset
+                        break
+
+                    if oldest is None or stamp < oldest:
+                        oldest = stamp
+                        offset = slotOffset
+                    slotOffset += self.__slotSize
+
+            dataOffset = offset + cls.SLOT_HEADER_SIZE
+            self.__mmap[dataOffset:dataOffset + len(key)] = key
+            dataOffset += len(key)
+            self.__mmap[dataOffset:dataOffset + len(value)] = value
+            struct.pack_into(cls.SLOT_HEADER_FMT, self.__mmap, offset,
+                             keyHash, time.time(), len(key), len(value))
+        finally:
+            self._unlock(stripe)
+
+        return True
+
+    def __contains__(self, key):
+        key = self._encodeKey(key)
+        keyHash = self._hashKey(key)
+        bucket = keyHash % self.__nBuckets
+        stripe = bucket % self.__nStripes
+
+        self._lock(stripe, False)
+        try:
+            return self._find(bucket, keyHash, key) is not None
+        finally:
+            self._unlock(stripe)
+
+    def __len__(self):
+        """@return: number of items held.  Not locked so only approximate
+        while other processes are making changes
+        @rtype: int
+        """
+        cls = self.__class__
+        n = 0
+        for i in range(self.__nSlots):
+            if struct.unpack_from('<Q', self.__mmap,
+                                  cls.HEADER_SIZE + i * self.__slotSize)[0]:
+                n += 1
+        return n
+
+    def clear(self):
+        """Remove all items"""
+        cls = self.__class__
+        for stripe in range(self.__nStripes):
+            self._lock(stripe, True)
+        try:
+            for i in range(self.__nSlots):
+                struct.pack_into(cls.SLOT_HEADER_FMT, self.__mmap,
+                                 cls.HEADER_SIZE + i * self.__slotSize,
+                                 0, 0., 0, 0)
+        finally:
+            for stripe in range(self.__nStripes):
+                self._unlock(stripe)
+
+    def close(self):
+        """Unmap and close the cache file.  The file itself is left in place
+        for other processes
+        """
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *arg):
+        self.close()
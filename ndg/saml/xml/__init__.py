@@ -117,4 +117,47 @@ class XMLTypeParseError(XMLTypeError):
 
 class UnknownAttrProfile(XMLTypeError):
     """Raise from Attribute Value factory if attribute type is not recognised
-    """
\ No newline at end of file
+    """
+
+
+def escapeText(text):
+    """Escape element text content
+
+    @param text: text to escape
+    @type text: basestring
+    @return: escaped text
+    @rtype: basestring
+    """
+    # Membership tests are cheap and most values need no escaping
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escapeAttribute(value):
+    """Escape an attribute value for enclosing in double quotes
+
+    @param value: value to escape
+    @type value: basestring
+    @return: escaped value
+    @rtype: basestring
+    """
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+    if '\n' in value:
+        value = value.replace('\n', '&#10;')
+    if '\r' in value:
+        value = value.replace('\r', '&#13;')
+    if '\t' in value:
+        value = value.replace('\t', '&#09;')
+    return value
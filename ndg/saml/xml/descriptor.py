@@ -0,0 +1,253 @@
+"""Implementation of SAML 2.0 for NDG Security - declarative descriptions of
+the XML representation of SAML types
+
+Each SAML type is described once: its element name, XML attributes with the
+codecs used to convert their values and its child element slots with their
+cardinality.  XML backends such as ndg.saml.xml.etree compile these
+descriptions into serialisation and parsing functions.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+from ndg.saml.common import SAMLVersion, SAMLObject
+
+
+def samlVersionFromString(value):
+    """Codec for SAML Version attributes.  Only SAML 2.0 is supported
+
+    @type value: basestring
+    @param value: version attribute value
+    @rtype: ndg.saml.common.SAMLVersion
+    @return: SAML version
+    @raise NotImplementedError: version is other than 2.0
+    """
+    version = SAMLVersion(value)
+    if version != SAMLVersion.VERSION_20:
+        raise NotImplementedError("Parsing is implemented for SAML version %s "
+                                  "only; version %s is not supported" %
+                                  (SAMLVersion(SAMLVersion.VERSION_20),
+                                   version))
+    return version
+
+
+class XMLAttribute(object):
+    """Description of an XML attribute of a SAML type
+
+    @type name: basestring
+    @ivar name: XML attribute name
+    @type attrName: basestring
+    @ivar attrName: name of the SAML object attribute holding the value
+    @type required: bool
+    @ivar required: True if the attribute must be present
+    @type toString: callable / None
+    @ivar toString: convert the SAML object value into a string.  If None the
+    value is used as is
+    @type fromString: callable / None
+    @ivar fromString: convert the attribute string into the SAML object
+    value.  If None the string is used as is
+    @type unsetError: type
+    @ivar unsetError: exception raised serialising an object with no value
+    set for a required attribute
+    """
+    __slots__ = ('name', 'attrName', 'required', 'toString', 'fromString',
+                 'unsetError')
+
+    def __init__(self, name, attrName, required=True, toString=None,
+                 fromString=None, unsetError=TypeError):
+        self.name = name
+        self.attrName = attrName
+        self.required = required
+        self.toString = toString
+        self.fromString = fromString
+        self.unsetError = unsetError
+
+
+class XMLText(object):
+    """Description of the text content of a SAML type element
+
+    @type attrName: basestring
+    @ivar attrName: name of the SAML object attribute holding the text
+    @type required: bool
+    @ivar required: True if the text must be set
+    @type default: basestring / None
+    @ivar default: value set when parsing an element with no text
+    @type unsetError: type
+    @ivar unsetError: exception raised serialising an object with no text set
+    when it is required
+    """
+    __slots__ = ('attrName', 'required', 'default', 'unsetError')
+
+    def __init__(self, attrName, required=False, default=None,
+                 unsetError=AttributeError):
+        self.attrName = attrName
+        self.required = required
+        self.default = default
+        self.unsetError = unsetError
+
+
+class XMLChild(object):
+    """Description of a child element slot of a SAML type
+
+    @type samlClass: type
+    @ivar samlClass: SAML type of the child.  Its XML representation is
+    looked up from the backend's registry unless elementTree is set
+    @type attrName: basestring
+    @ivar attrName: name of the SAML object attribute holding the child or
+    list of children
+    @type minOccurs: int
+    @ivar minOccurs: minimum number of occurrences
+    @type maxOccurs: int / None
+    @ivar maxOccurs: maximum number of occurrences or None if unbounded.  If
+    greater than one, attrName refers to a list
+    @type include: callable / None
+    @ivar include: predicate taking the child value.  If set, the child is
+    serialised only if it returns True
+    @type passKw: bool
+    @ivar passKw: pass AttributeValue factory keywords to the child's
+    serialisation and parsing functions
+    @type elementTree: object / None
+    @ivar elementTree: object with toXML and fromXML callables to use instead
+    of the registered representation of samlClass
+    @type selectKw: basestring / None
+    @ivar selectKw: if the slot holds a list of children, name of a parsing
+    keyword for a callable taking the XML attributes of a child element.  
+    Children for which it returns False are skipped without being parsed.  
+    The keyword is not passed on to the children parsed
+    @type lazy: bool
+    @ivar lazy: if the slot holds a list of children, parse each child on
+    first access when the parent is parsed with lazy set.  attrName must be
+    settable to a list
+    @type localName: basestring
+    @ivar localName: element local name of the child
+    """
+    __slots__ = ('samlClass', 'attrName', 'minOccurs', 'maxOccurs', 'include',
+                 'passKw', 'elementTree', 'selectKw', 'lazy', 'localName')
+
+    def __init__(self, samlClass, attrName, minOccurs=0, maxOccurs=1,
+                 include=None, passKw=False, elementTree=None, selectKw=None,
+                 lazy=False):
+        self.samlClass = samlClass
+        self.attrName = attrName
+        self.minOccurs = minOccurs
+        self.maxOccurs = maxOccurs
+        self.include = include
+        self.passKw = passKw
+        self.elementTree = elementTree
+        self.selectKw = selectKw
+        self.lazy = lazy
+        self.localName = samlClass.DEFAULT_ELEMENT_LOCAL_NAME
+
+    def _getMultiple(self):
+        """@rtype: bool
+        @return: True if the slot holds a list of children
+        """
+        return self.maxOccurs is None or self.maxOccurs > 1
+
+    multiple = property(_getMultiple, doc="Slot holds a list of children")
+
+
+class XMLUnsupportedChild(object):
+    """Description of a child element defined by the SAML schema which is
+    not supported by this implementation.  Parsing it raises
+    NotImplementedError as does serialising an object for which isSet
+    returns True
+
+    @type localName: basestring
+    @ivar localName: element local name of the child
+    @type isSet: callable / None
+    @ivar isSet: predicate taking the parent SAML object.  None if the child
+    has no corresponding SAML object attribute
+    """
+    __slots__ = ('localName', 'isSet')
+
+    def __init__(self, localName, isSet=None):
+        self.localName = localName
+        self.isSet = isSet
+
+
+class XMLExtensionChild(object):
+    """Description of a slot holding extension elements such as the
+    statements of an assertion.  Their XML representations are looked up
+    by element name in the backend's extension registry
+
+    @type attrName: basestring
+    @ivar attrName: name of the SAML object attribute holding the list of
+    extension elements
+    """
+    __slots__ = ('attrName',)
+
+    def __init__(self, attrName):
+        self.attrName = attrName
+
+
+class SAMLTypeDescriptor(object):
+    """Declarative description of the XML representation of a SAML type
+
+    @type samlClass: type
+    @ivar samlClass: SAML type described.  Its DEFAULT_ELEMENT_NAME gives the
+    element name
+    @type attributes: tuple
+    @ivar attributes: XMLAttribute items in serialisation order
+    @type children: tuple
+    @ivar children: XMLChild, XMLUnsupportedChild and XMLExtensionChild
+    items in serialisation order
+    @type text: XMLText / None
+    @ivar text: element text content or None if the type has none
+    @type factory: callable
+    @ivar factory: create a new SAML object when parsing.  It is passed the
+    mapping of XML attribute names to values of the element.  By default
+    SAMLObject derived types are made with samlClass._from_fields.  Parsed 
+    values are written to their slots directly except for the properties 
+    listed in samlClass._VALIDATED_FIELDS
+    @type keepSource: bool
+    @ivar keepSource: objects parsed with the keepSource keyword keep the
+    element they were parsed from and serialise to a copy of it while they
+    are unchanged.  samlClass must have a settable parsedSource attribute
+    """
+    __slots__ = ('samlClass', 'attributes', 'children', 'text', 'factory',
+                 'keepSource')
+
+    def __init__(self, samlClass, attributes=(), children=(), text=None,
+                 factory=None, keepSource=False):
+        self.samlClass = samlClass
+        self.attributes = tuple(attributes)
+        self.children = tuple(children)
+        self.text = text
+        self.keepSource = keepSource
+        if factory is None:
+            if issubclass(samlClass, SAMLObject):
+                self.factory = lambda attrib: samlClass._from_fields()
+            else:
+                self.factory = lambda attrib: samlClass()
+        else:
+            self.factory = factory
+
+        names = set()
+        for child in self.children:
+            localName = getattr(child, 'localName', None)
+            if localName is None:
+                continue
+            if localName in names:
+                raise ValueError('Duplicate child element "%s" in descriptor '
+                                 'for %r' % (localName, samlClass))
+            names.add(localName)
+
+    def _getElementName(self):
+        """@rtype: ndg.saml.common.xml.QName
+        @return: element name of the SAML type
+        """
+        return self.samlClass.DEFAULT_ELEMENT_NAME
+
+    elementName = property(_getElementName, doc="Element name")
+
+    def _getLocalName(self):
+        """@rtype: basestring
+        @return: element local name of the SAML type
+        """
+        return self.samlClass.DEFAULT_ELEMENT_LOCAL_NAME
+
+    localName = property(_getLocalName, doc="Element local name")
@@ -11,8 +11,9 @@ __contact__ = "Philip.Kershaw@stfc.ac.uk"
 __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "Philip.Kershaw@stfc.ac.uk"
 import logging
+from copy import deepcopy
+from functools import partial
 log = logging.getLogger(__name__)
-import re
 
 from ndg.saml import Config, importElementTree
 ElementTree = importElementTree()
@@ -25,11 +26,18 @@ from ndg.saml.saml2.core import (Attribute, AttributeStatement,
                                  StatusMessage, StatusDetail, Advice, Action, 
                                  Evidence, DecisionType, XSStringAttributeValue) 
                              
-from ndg.saml.common import SAMLVersion
+from ndg.saml.common import SAMLObject
 from ndg.saml.common.xml import SAMLConstants
-from ndg.saml.common.xml import QName as GenericQName
+from ndg.saml.common.xml import QName as GenericQName, splitClarkName
 from ndg.saml.xml import XMLTypeParseError, UnknownAttrProfile
-from ndg.saml.utils import SAMLDateTime
+from ndg.saml.xml.namespace import declareNamespace
+# Pretty printing is imported from this module by existing code
+from ndg.saml.xml.prettyprint import prettyPrint, _PrettyPrint
+from ndg.saml.xml.descriptor import (SAMLTypeDescriptor, XMLAttribute, XMLText,
+                                     XMLChild, XMLUnsupportedChild,
+                                     XMLExtensionChild, samlVersionFromString)
+from ndg.saml.xml.lxml_backend import USE_LXML_BACKEND, makeSubElement
+from ndg.saml.utils import SAMLDateTime, LazyList
 
 # Map of QName to ElementTree parsing class to be used in addition to those
 # defined in this module.
@@ -40,7 +48,8 @@ if Config.use_lxml:
         """Makes an ElementTree element handling namespaces in the way
         appropriate for the ElementTree implementation in use.
         """
-        elem = ElementTree.Element(tag, {ns_prefix: ns_uri}, attrib, **extra)
+        elem = ElementTree.Element(tag, attrib, nsmap={ns_prefix: ns_uri},
+                                   **extra)
         return elem
 else:
     def makeEtreeElement(tag, ns_prefix, ns_uri, attrib={}, **extra):
@@ -48,7 +57,10 @@ else:
          appropriate for the ElementTree implementation in use.
         """
         elem = ElementTree.Element(tag, attrib, **extra)
-        ElementTree._namespace_map[ns_uri] = ns_prefix
+        
+        # Prefixes are applied from the namespace context when the document
+        # is serialised rather than set in ElementTree._namespace_map here
+        declareNamespace(ns_uri, ns_prefix)
         return elem
 
 # Generic ElementTree Helper classes
@@ -58,11 +70,9 @@ class QName(ElementTree.QName):
 
     # ElementTree tag is of the form {namespace}localPart.  getNs extracts the
     # namespace from within the brackets but if not found returns ''
-    getNs = staticmethod(lambda tag: getattr(re.search('(?<=\{).+(?=\})', tag),
-                                             'group', 
-                                             str)())
+    getNs = staticmethod(lambda tag: splitClarkName(tag)[0])
                                              
-    getLocalPart = staticmethod(lambda tag: tag.rsplit('}', 1)[-1])
+    getLocalPart = staticmethod(lambda tag: splitClarkName(tag)[1])
 
     def __init__(self, input, tag=None, prefix=None):
         """
@@ -132,6 +142,15 @@ class QName(ElementTree.QName):
     namespaceURI = property(_getNamespaceURI, _setNamespaceURI, None, 
                             "Namespace URI'")
 
+    def _getClarkName(self):
+        """@return: name in the form {namespace URI}local name
+        @rtype: basestring
+        """
+        return self.text
+    
+    clarkName = property(_getClarkName, None, None, 
+                         "Name in {namespace URI}local name form")
+
     def __eq__(self, qname):
         """Enable equality check for QName.  Note that prefixes don't need to
         match
@@ -180,668 +199,115 @@ class QName(ElementTree.QName):
         return qname
     
     
-def prettyPrint(*arg, **kw):
-    '''Lightweight pretty printing of ElementTree elements.  This function
-    wraps the PrettyPrint class
-    
-    @param arg: arguments to pretty print function
-    @type arg: tuple
-    @param kw: keyword arguments to pretty print function
-    @type kw: dict
-    '''
-    
-    # Keep track of namespace declarations made so they're not repeated
-    declaredNss = []
-    if not Config.use_lxml:
-        mappedPrefixes = dict.fromkeys(list(ElementTree._namespace_map.values()), True)
-        namespace_map_backup = ElementTree._namespace_map.copy()
-    else:
-        mappedPrefixes = {}
-
-    _prettyPrint = _PrettyPrint(declaredNss, mappedPrefixes)
-    result = _prettyPrint(*arg, **kw)
-
-    if not Config.use_lxml:
-        ElementTree._namespace_map = namespace_map_backup
-
-    return result
-
-
-class _PrettyPrint(object):
-    '''Class for lightweight pretty printing of ElementTree elements'''
-    MAX_NS_TRIES = 256
-    def __init__(self, declaredNss, mappedPrefixes):
-        """
-        @param declaredNss: declared namespaces
-        @type declaredNss: iterable of string elements
-        @param mappedPrefixes: map of namespace URIs to prefixes
-        @type mappedPrefixes: map of string to string
-        """
-        self.declaredNss = declaredNss
-        self.mappedPrefixes = mappedPrefixes
-    
-    @staticmethod
-    def estrip(elem):
-        '''Utility to remove unwanted leading and trailing whitespace 
-        
-        @param elem: ElementTree element
-        @type elem: ElementTree.Element
-        @return: element content with whitespace removed
-        @rtype: basestring'''
-        if elem is None:
-            return ''
-        else:
-            # just in case the elem is another simple type - e.g. int - 
-            # wrapper it as a string
-            return str(elem).strip()
-        
-    def __call__(self, elem, indent='', html=0, space=' '*4):
-        '''Most of the work done in this wrapped function - wrapped so that
-        state can be maintained for declared namespace declarations during
-        recursive calls using "declaredNss" above
-        
-        @param elem: ElementTree element
-        @type elem: ElementTree.Element
-        @param indent: set indent for output
-        @type indent: basestring
-        @param space: set output spacing
-        @type space: basestring 
-        @return: pretty print format for doc
-        @rtype: basestring       
-        '''  
-        strAttribs = []
-        for attr, attrVal in list(elem.attrib.items()):
-            nsDeclaration = ''
-            
-            attrNamespace = QName.getNs(attr)
-            if attrNamespace:
-                nsPrefix = self._getNamespacePrefix(elem, attrNamespace)
-                
-                attr = "%s:%s" % (nsPrefix, QName.getLocalPart(attr))
-                
-                if attrNamespace not in self.declaredNss:
-                    nsDeclaration = ' xmlns:%s="%s"' % (nsPrefix,attrNamespace)
-                    self.declaredNss.append(attrNamespace)
-                
-            strAttribs.append('%s %s="%s"' % (nsDeclaration, attr, attrVal))
-            
-        strAttrib = ''.join(strAttribs)
-        
-        namespace = QName.getNs(elem.tag)
-        nsPrefix = self._getNamespacePrefix(elem, namespace)
-            
-        tag = "%s:%s" % (nsPrefix, QName.getLocalPart(elem.tag))
-        
-        # Put in namespace declaration if one doesn't already exist
-        # FIXME: namespace declaration handling is wrong for handling child
-        # element scope
-        if namespace in self.declaredNss:
-            nsDeclaration = ''
-        else:
-            nsDeclaration = ' xmlns:%s="%s"' % (nsPrefix, namespace)
-            self.declaredNss.append(namespace)
-            
-        result = '%s<%s%s%s>%s' % (indent, tag, nsDeclaration, strAttrib, 
-                                   _PrettyPrint.estrip(elem.text))
-        
-        children = len(elem)
-        if children:
-            for child in elem:
-                declaredNss = self.declaredNss[:]
-                _prettyPrint = _PrettyPrint(declaredNss, self.mappedPrefixes)
-                result += '\n'+ _prettyPrint(child, indent=indent+space) 
-                
-            result += '\n%s%s</%s>' % (indent,
-                                     _PrettyPrint.estrip(child.tail),
-                                     tag)
-        else:
-            result += '</%s>' % tag
-            
-        return result
-
-    if Config.use_lxml:
-        def _getNamespacePrefix(self, elem, namespace):
-            for nsPrefix, ns in elem.nsmap.items():
-                if ns == namespace:
-                    return nsPrefix
-            raise KeyError('prettyPrint: missing namespace "%s" for '
-                               'elem.nsmap' % namespace)
-    else:
-        def _getNamespacePrefix(self, elem, namespace):
-            nsPrefix = self._allocNsPrefix(namespace)
-            if nsPrefix is None:
-                raise KeyError('prettyPrint: missing namespace "%s" for '
-                               'ElementTree._namespace_map' % namespace)
-            return nsPrefix
-
-        def _allocNsPrefix(self, nsURI):
-            """Allocate a namespace prefix if one is not already set for the given
-            Namespace URI
-            """
-            nsPrefix = ElementTree._namespace_map.get(nsURI)
-            if nsPrefix is not None:
-                return nsPrefix
-
-            for i in range(self.__class__.MAX_NS_TRIES):
-                nsPrefix = "ns%d" % i
-                if nsPrefix not in self.mappedPrefixes:
-                    ElementTree._namespace_map[nsURI] = nsPrefix
-                    self.mappedPrefixes[nsPrefix] = True
-                    break
-
-            if nsURI not in ElementTree._namespace_map:                            
-                raise KeyError('prettyPrint: error adding namespace '
-                               '"%s" to ElementTree._namespace_map' % 
-                               nsURI)   
-
-            return nsPrefix
-
 # ElementTree SAML wrapper classes
 class ConditionsElementTree(Conditions):
     """ElementTree based XML representation of Conditions class
     """
-    
-    @classmethod
-    def toXML(cls, conditions):
-        """Make a tree of a XML elements based on the assertion conditions
-        
-        @type conditions: saml.saml2.core.Conditions
-        @param conditions: Assertion conditions to be represented as an 
-        ElementTree Element
-        @rtype: ElementTree.Element
-        @return: ElementTree Element
-        """
-        if not isinstance(conditions, Conditions):
-            raise TypeError("Expecting %r type got: %r" % (Conditions,
-                                                           conditions))
-        
-        notBeforeStr = SAMLDateTime.toString(conditions.notBefore)
-        notOnOrAfterStr = SAMLDateTime.toString(conditions.notOnOrAfter)
-        attrib = {
-            cls.NOT_BEFORE_ATTRIB_NAME: notBeforeStr,
-            cls.NOT_ON_OR_AFTER_ATTRIB_NAME: notOnOrAfterStr,
-        }
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
-
-        for condition in conditions.conditions:
-            raise NotImplementedError("Conditions list creation is not "
-                                      "implemented")
-                
-        return elem
-    
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse an ElementTree SAML Conditions element into an
-        Conditions object
-        
-        @type elem: ElementTree.Element
-        @param elem: ElementTree element containing the conditions
-        @rtype: saml.saml2.core.Conditions
-        @return: Conditions object
-        """
-        
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        localName = QName.getLocalPart(elem.tag)
-        if localName != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        
-        if len(elem) > 0:
-            raise NotImplementedError("Conditions list parsing is not "
-                                      "implemented")
-
-        conditions = Conditions()
-        notBefore = elem.attrib.get(Conditions.NOT_BEFORE_ATTRIB_NAME)
-        if notBefore is not None:
-            conditions.notBefore = SAMLDateTime.fromString(notBefore)
-            
-        notOnOrAfter = elem.attrib.get(Conditions.NOT_ON_OR_AFTER_ATTRIB_NAME)
-        if notBefore is not None:
-            conditions.notOnOrAfter = SAMLDateTime.fromString(notOnOrAfter)
-            
-        return conditions                
+    DESCRIPTOR = SAMLTypeDescriptor(Conditions,
+        attributes=(
+            XMLAttribute(Conditions.NOT_BEFORE_ATTRIB_NAME, 'notBefore',
+                         required=False,
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
+            XMLAttribute(Conditions.NOT_ON_OR_AFTER_ATTRIB_NAME,
+                         'notOnOrAfter',
+                         required=False,
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
+        ),
+        children=(
+            XMLUnsupportedChild('Condition',
+                                lambda conditions: conditions.conditions),
+            XMLUnsupportedChild('AudienceRestriction'),
+            XMLUnsupportedChild('OneTimeUse'),
+            XMLUnsupportedChild('ProxyRestriction'),
+        ))
         
                
 class AssertionElementTree(Assertion):
     """ElementTree based XML representation of Assertion class
     """
-    
-    @classmethod
-    def toXML(cls, assertion, **attributeValueElementTreeFactoryKw):
-        """Make a tree of a XML elements based on the assertion
-        
-        @type assertion: saml.saml2.core.Assertion
-        @param assertion: Assertion to be represented as an ElementTree Element
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
-        @rtype: ElementTree.Element
-        @return: ElementTree Element
-        """
-        
-        if not isinstance(assertion, Assertion):
-            raise TypeError("Expecting %r type got: %r"%(Assertion, assertion))
-        
-        issueInstant = SAMLDateTime.toString(assertion.issueInstant)
-        attrib = {
-            cls.ID_ATTRIB_NAME: assertion.id,
-            cls.ISSUE_INSTANT_ATTRIB_NAME: issueInstant,
+    DESCRIPTOR = SAMLTypeDescriptor(Assertion,
+        attributes=(
+            XMLAttribute(Assertion.ID_ATTRIB_NAME, 'id'),
+            XMLAttribute(Assertion.ISSUE_INSTANT_ATTRIB_NAME, 'issueInstant',
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
             
             # Nb. Version is a SAMLVersion instance and requires explicit cast
-            cls.VERSION_ATTRIB_NAME: str(assertion.version)
-        }
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
-        
-        if assertion.issuer is not None:
-            issuerElem = IssuerElementTree.toXML(assertion.issuer)
-            elem.append(issuerElem)
-        
-        if assertion.subject is not None:
-            subjectElem = SubjectElementTree.toXML(assertion.subject)
-            elem.append(subjectElem)
-
-        if assertion.advice:
-            raise NotImplementedError("Assertion Advice creation is not "
-                                      "implemented")
-
-        if assertion.conditions is not None:
-            conditionsElem = ConditionsElementTree.toXML(assertion.conditions)
-            elem.append(conditionsElem)
-            
-        for statement in assertion.statements:
-            qname = statement.qname
-            etreeImpl = _getElementTreeImplementationForQName(qname)
-            if etreeImpl is None:
-                raise NotImplementedError("No ElementTree implementation for "
-                                          "QName {%s}%s" %
-                                          (qname.namespaceURI, qname.localPart))
-            statementElem = etreeImpl.toXML(statement)
-            elem.append(statementElem)
-        
-        for authnStatement in assertion.authnStatements:
-            raise NotImplementedError("Assertion Authentication Statement "
-                                      "creation is not implemented")
-        
-        for authzDecisionStatement in assertion.authzDecisionStatements:
-            authzDecisionStatementElem = \
-                AuthzDecisionStatementElementTree.toXML(authzDecisionStatement)
-            elem.append(authzDecisionStatementElem)
-            
-        for attributeStatement in assertion.attributeStatements:
-            attributeStatementElem = AttributeStatementElementTree.toXML(
-                                        attributeStatement,
-                                        **attributeValueElementTreeFactoryKw)
-            elem.append(attributeStatementElem)
-        
-        return elem
-
-    @classmethod
-    def fromXML(cls, elem, **attributeValueElementTreeFactoryKw):
-        """Parse an ElementTree representation of an Assertion into an
-        Assertion object
-        
-        @type elem: ElementTree.Element
-        @param elem: ElementTree element containing the assertion
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        @rtype: saml.saml2.core.Assertion
-        @return: Assertion object
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        localName = QName.getLocalPart(elem.tag)
-        if localName != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        
-        # Unpack attributes from top-level element
-        attributeValues = []
-        for attributeName in (cls.VERSION_ATTRIB_NAME,
-                              cls.ISSUE_INSTANT_ATTRIB_NAME,
-                              cls.ID_ATTRIB_NAME):
-            attributeValue = elem.attrib.get(attributeName)
-            if attributeValue is None:
-                raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                          'element' %
-                                          (attributeName,
-                                           cls.DEFAULT_ELEMENT_LOCAL_NAME))
-                
-            attributeValues.append(attributeValue)
-        
-        assertion = cls()
-        assertion.version = SAMLVersion(attributeValues[0])
-        if assertion.version != SAMLVersion.VERSION_20:
-            raise NotImplementedError("Parsing for %r is implemented for "
-                                      "SAML version %s only; version %s is " 
-                                      "not supported" % 
-                                      (cls,
-                                       SAMLVersion(SAMLVersion.VERSION_20),
-                                       SAMLVersion(assertion.version)))
-            
-        assertion.issueInstant = SAMLDateTime.fromString(attributeValues[1])
-        assertion.id = attributeValues[2]
-        
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-
-            statementElementTree = _getElementTreeImplementationForQName(QName(childElem.tag))
-
-            if localName == Issuer.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Issuer
-                assertion.issuer = IssuerElementTree.fromXML(childElem)
-                
-            elif localName == Subject.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse subject
-                assertion.subject = SubjectElementTree.fromXML(childElem)
-                
-            elif localName == Advice.DEFAULT_ELEMENT_LOCAL_NAME:
-                raise NotImplementedError("Assertion Advice parsing is not "
-                                          "implemented")
-                
-            elif localName == Conditions.DEFAULT_ELEMENT_LOCAL_NAME:
-                assertion.conditions = ConditionsElementTree.fromXML(childElem)
-
-            elif statementElementTree is not None:
-                statement = statementElementTree.fromXML(childElem)
-                assertion.statements.append(statement)
-
-            elif localName == AuthnStatement.DEFAULT_ELEMENT_LOCAL_NAME:
-                raise NotImplementedError("Assertion Authentication Statement "
-                                          "parsing is not implemented")
-        
-            elif localName == AuthzDecisionStatement.DEFAULT_ELEMENT_LOCAL_NAME:
-                authzDecisionStatement = \
-                    AuthzDecisionStatementElementTree.fromXML(childElem)
-                assertion.authzDecisionStatements.append(authzDecisionStatement)
+            XMLAttribute(Assertion.VERSION_ATTRIB_NAME, 'version',
+                         toString=str,
+                         fromString=samlVersionFromString),
+        ),
+        children=(
+            XMLChild(Issuer, 'issuer'),
+            XMLChild(Subject, 'subject'),
+            XMLUnsupportedChild(Advice.DEFAULT_ELEMENT_LOCAL_NAME,
+                                lambda assertion: assertion.advice),
+            XMLChild(Conditions, 'conditions'),
             
-            elif localName == AttributeStatement.DEFAULT_ELEMENT_LOCAL_NAME:
-                attributeStatement = AttributeStatementElementTree.fromXML(
-                                        childElem,
-                                        **attributeValueElementTreeFactoryKw)
-                assertion.attributeStatements.append(attributeStatement)
-            else:
-                raise XMLTypeParseError('Assertion child element name "%s" '
-                                        'not recognised' % localName)
-        
-        return assertion
+            # Statement types registered with 
+            # setElementTreeImplementationForQName
+            XMLExtensionChild('statements'),
+            XMLUnsupportedChild(AuthnStatement.DEFAULT_ELEMENT_LOCAL_NAME,
+                                lambda assertion: assertion.authnStatements),
+            XMLChild(AuthzDecisionStatement, 'authzDecisionStatements',
+                     maxOccurs=None),
+            XMLChild(AttributeStatement, 'attributeStatements',
+                     maxOccurs=None, passKw=True),
+        ),
+        keepSource=True)
 
   
 class AttributeStatementElementTree(AttributeStatement):
     """ElementTree XML representation of AttributeStatement"""
-    
-    @classmethod
-    def toXML(cls, attributeStatement, **attributeValueElementTreeFactoryKw):
-        """Make a tree of a XML elements based on the attribute statement
-        
-        @type attributeStatement: saml.saml2.core.AttributeStatement
-        @param attributeStatement: Attribute Statement to be represented as an 
-        ElementTree Element
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
-        @rtype: ElementTree.Element
-        @return: ElementTree Element
-        """
-        if not isinstance(attributeStatement, AttributeStatement):
-            raise TypeError("Expecting %r type got: %r" % (AttributeStatement, 
-                                                           attributeStatement))
-            
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))  
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI)
-
-        for attribute in attributeStatement.attributes:
-            # Factory enables support for multiple attribute types
-            attributeElem = AttributeElementTree.toXML(attribute,
-                                        **attributeValueElementTreeFactoryKw)
-            elem.append(attributeElem)
-        
-        return elem
-    
-    @classmethod
-    def fromXML(cls, elem, **attributeValueElementTreeFactoryKw):
-        """Parse an ElementTree SAML AttributeStatement element into an
-        AttributeStatement object
-        
-        @type elem: ElementTree.Element
-        @param elem: ElementTree element containing the AttributeStatement
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
-        @rtype: saml.saml2.core.AttributeStatement
-        @return: Attribute Statement
-        """
-        
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        localName = QName.getLocalPart(elem.tag)
-        if localName != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        
-        attributeStatement = AttributeStatement()
-
-        for childElem in elem:
+    DESCRIPTOR = SAMLTypeDescriptor(AttributeStatement,
+        children=(
             # Factory enables support for multiple attribute types
-            attribute = AttributeElementTree.fromXML(childElem,
-                                        **attributeValueElementTreeFactoryKw)
-            attributeStatement.attributes.append(attribute)
-        
-        return attributeStatement
+            XMLChild(Attribute, 'attributes', maxOccurs=None, passKw=True,
+                     selectKw='attributeProjection'),
+        ))
 
   
 class AuthzDecisionStatementElementTree(AuthzDecisionStatement):
     """ElementTree XML representation of AuthzDecisionStatement"""
-    
-    @classmethod
-    def toXML(cls, authzDecisionStatement):
-        """Make a tree of a XML elements based on the authzDecision statement
-        
-        @type authzDecisionStatement: saml.saml2.core.AuthzDecisionStatement
-        @param authzDecisionStatement: AuthzDecision Statement to be represented
-        as an ElementTree Element
-        @rtype: ElementTree.Element
-        @return: ElementTree Element
-        """
-        if not isinstance(authzDecisionStatement, AuthzDecisionStatement):
-            raise TypeError("Expecting %r type got: %r" % 
-                            (AuthzDecisionStatement, authzDecisionStatement))
-          
-        if not authzDecisionStatement.resource:
-            raise AttributeError("Resource for AuthzDecisionStatement is not "
-                                 "set")
-              
-        attrib = {
-            cls.DECISION_ATTRIB_NAME: str(authzDecisionStatement.decision),
-            cls.RESOURCE_ATTRIB_NAME: authzDecisionStatement.resource
-        }
-            
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))  
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
-
-        for action in authzDecisionStatement.actions:
-            # Factory enables support for multiple authzDecision types
-            actionElem = ActionElementTree.toXML(action)
-            elem.append(actionElem)
-        
-        if (authzDecisionStatement.evidence and 
-            len(authzDecisionStatement.evidence.values) > 0):
-            raise NotImplementedError("authzDecisionStatementElementTree does "
-                                      "not currently support the Evidence type")
-            
-        return elem
-    
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse an ElementTree SAML AuthzDecisionStatement element into an
-        AuthzDecisionStatement object
-        
-        @type elem: ElementTree.Element
-        @param elem: ElementTree element containing the AuthzDecisionStatement
-        @rtype: saml.saml2.core.AuthzDecisionStatement
-        @return: AuthzDecision Statement"""
-        
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        localName = QName.getLocalPart(elem.tag)
-        if localName != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        # Unpack attributes from top-level element
-        attributeValues = []
-        for attributeName in (cls.DECISION_ATTRIB_NAME,
-                              cls.RESOURCE_ATTRIB_NAME):
-            attributeValue = elem.attrib.get(attributeName)
-            if attributeValue is None:
-                raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                 'element' %
-                                 (attributeName,
-                                  cls.DEFAULT_ELEMENT_LOCAL_NAME))
-                
-            attributeValues.append(attributeValue)
-        
-        authzDecisionStatement = AuthzDecisionStatement()
-        authzDecisionStatement.decision = DecisionType(attributeValues[0])
-        authzDecisionStatement.resource = attributeValues[1]
-
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            
-            if localName == Action.DEFAULT_ELEMENT_LOCAL_NAME:
-                action = ActionElementTree.fromXML(childElem)
-                authzDecisionStatement.actions.append(action)
-                
-            elif localName == Evidence.DEFAULT_ELEMENT_LOCAL_NAME:
-                raise NotImplementedError("XML parse of %s element is not "
-                                          "implemented" %
-                                          Evidence.DEFAULT_ELEMENT_LOCAL_NAME)
-            else:
-                raise XMLTypeParseError("AuthzDecisionStatement child element "
-                                        "name %r not recognised" % localName)
-        
-        return authzDecisionStatement
+    DESCRIPTOR = SAMLTypeDescriptor(AuthzDecisionStatement,
+        attributes=(
+            XMLAttribute(AuthzDecisionStatement.DECISION_ATTRIB_NAME,
+                         'decision',
+                         toString=str,
+                         fromString=DecisionType,
+                         unsetError=AttributeError),
+            XMLAttribute(AuthzDecisionStatement.RESOURCE_ATTRIB_NAME,
+                         'resource',
+                         unsetError=AttributeError),
+        ),
+        children=(
+            XMLChild(Action, 'actions', maxOccurs=None),
+            XMLUnsupportedChild(Evidence.DEFAULT_ELEMENT_LOCAL_NAME,
+                                lambda statement: (statement.evidence and 
+                                            len(statement.evidence.values) > 0)),
+        ))
 
 
 class AttributeElementTree(Attribute):
     """ElementTree XML representation of SAML Attribute object.  Extend
     to make Attribute types""" 
-
-    @classmethod
-    def toXML(cls, attribute, **attributeValueElementTreeFactoryKw):
-        """Make a tree of a XML elements based on the Attribute
-        
-        @type attribute: saml.saml2.core.Attribute
-        @param attribute: Attribute to be represented as an ElementTree Element
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
-        @rtype: ElementTree.Element
-        @return: ElementTree Element
-        """
-        if not isinstance(attribute, Attribute):
-            raise TypeError("Expecting %r type got: %r"%(Attribute, attribute))
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))    
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI)
-        
-        if attribute.friendlyName:
-            elem.set(cls.FRIENDLY_NAME_ATTRIB_NAME, attribute.friendlyName) 
-             
-        if attribute.name:
-            elem.set(cls.NAME_ATTRIB_NAME, attribute.name)
-        
-        if attribute.nameFormat:
-            elem.set(cls.NAME_FORMAT_ATTRIB_NAME, attribute.nameFormat)
-
-        for attributeValue in attribute.attributeValues:
-            factory = AttributeValueElementTreeFactory(
-                                        **attributeValueElementTreeFactoryKw)
-            
-            attributeValueElementTree = factory(attributeValue)
-            
-            attributeValueElem = attributeValueElementTree.toXML(attributeValue)
-            elem.append(attributeValueElem)
-            
-        return elem
- 
-    @classmethod
-    def fromXML(cls, elem, **attributeValueElementTreeFactoryKw):
-        """Parse ElementTree element into a SAML Attribute object
-        
-        @type elem: ElementTree.Element
-        @param elem: Attribute as ElementTree XML element
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
-        @rtype: saml.saml2.core.Attribute
-        @return: SAML Attribute
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
+    DESCRIPTOR = SAMLTypeDescriptor(Attribute,
+        attributes=(
+            XMLAttribute(Attribute.FRIENDLY_NAME_ATTRIB_NAME, 'friendlyName',
+                         required=False),
             
-        attribute = Attribute()
-            
-        # Name is mandatory in the schema
-        name = elem.attrib.get(cls.NAME_ATTRIB_NAME)
-        if name is None:
-            raise XMLTypeParseError('No "%s" attribute found in the "%s" '
-                                    'element' %
-                                    (cls.NAME_ATTRIB_NAME,
-                                     cls.DEFAULT_ELEMENT_LOCAL_NAME))
-        attribute.name = name
-            
-        friendlyName = elem.attrib.get(cls.FRIENDLY_NAME_ATTRIB_NAME)
-        if friendlyName is not None:
-            attribute.friendlyName = friendlyName
-            
-        nameFormat = elem.attrib.get(cls.NAME_FORMAT_ATTRIB_NAME)    
-        if nameFormat is not None:
-            attribute.nameFormat = nameFormat
-        
-        # Factory to handle the different Attribute Value types
-        factory = AttributeValueElementTreeFactory(
-                                        **attributeValueElementTreeFactoryKw)
-
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            if localName != AttributeValue.DEFAULT_ELEMENT_LOCAL_NAME:
-                raise XMLTypeParseError('Expecting "%s" element; found "%s"'%
-                                    (AttributeValue.DEFAULT_ELEMENT_LOCAL_NAME,
-                                     localName))
-                            
-            attributeValueElementTreeClass = factory(childElem)
-            attributeValue = attributeValueElementTreeClass.fromXML(childElem)
-            attribute.attributeValues.append(attributeValue)
-        
-        return attribute
+            # Name is mandatory in the schema
+            XMLAttribute(Attribute.NAME_ATTRIB_NAME, 'name'),
+            XMLAttribute(Attribute.NAME_FORMAT_ATTRIB_NAME, 'nameFormat',
+                         required=False),
+        ),
+        children=(
+            # Factory to handle the different Attribute Value types
+            XMLChild(AttributeValue, 'attributeValues', maxOccurs=None,
+                     passKw=True),
+        ))
         
     
 class AttributeValueElementTreeBase(AttributeValue):
@@ -861,7 +327,7 @@ class AttributeValueElementTreeBase(AttributeValue):
             raise TypeError("Expecting %r type got: %r" % (AttributeValue, 
                                                            attributeValue))
             
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))   
+        tag = cls.DEFAULT_ELEMENT_NAME.clarkName
         elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
                                 cls.DEFAULT_ELEMENT_NAME.namespaceURI)
 
@@ -871,6 +337,7 @@ class AttributeValueElementTreeBase(AttributeValue):
 class XSStringAttributeValueElementTree(AttributeValueElementTreeBase,
                                         XSStringAttributeValue):
     """ElementTree XML representation of SAML String type Attribute Value""" 
+    XSI_TYPE_ATTRIB_TAG = str(QName(SAMLConstants.XSI_NS, tag='type'))
     
     @classmethod
     def toXML(cls, attributeValue):
@@ -933,58 +400,278 @@ class XSStringAttributeValueElementTree(AttributeValueElementTreeBase,
         
         # Parse the attribute type checking that it is set to the expected 
         # string type
-        typeQName = QName(SAMLConstants.XSI_NS, tag='type')
-        
-        typeValue = elem.attrib.get(str(typeQName), '')
+        typeValue = elem.attrib.get(cls.XSI_TYPE_ATTRIB_TAG, '')
         typeValueLocalName = typeValue.split(':')[-1]
         if typeValueLocalName != cls.TYPE_LOCAL_NAME:
             raise XMLTypeParseError('Expecting "%s" type; got "%s"' %
                                       (cls.TYPE_LOCAL_NAME,
                                        typeValueLocalName))
         
-        # Update namespace map as an XSI type has been referenced.  This will
-        # ensure the correct prefix is applied if it is re-serialised.
-        if not Config.use_lxml:
-            ElementTree._namespace_map[SAMLConstants.XSI_NS
-                                       ] = SAMLConstants.XSI_PREFIX
-                                      
-        attributeValue = XSStringAttributeValue()
-        if elem.text is not None:
-            attributeValue.value = elem.text.strip()
-
-        return attributeValue
+        # The XSI prefix is declared in the default namespace context so
+        # it will be applied correctly if this is re-serialised.
+        if elem.text is None:
+            return XSStringAttributeValue._from_fields()
+        
+        return XSStringAttributeValue._from_fields(value=elem.text.strip())
 
 
-class AttributeValueElementTreeFactory(object):
-    """Class factory for AttributeValue ElementTree classes.  These classes are
-    used to represent SAML Attribute value types
+class AttributeValueCodecRegistry(object):
+    """Immutable registry of the ElementTree classes used to represent SAML
+    Attribute Value types.  Serialisation looks up the class by SAML
+    AttributeValue class and parsing by the namespace and local name of the
+    element's xsi:type so that each is a single dictionary lookup.  Use 
+    extend to make a registry with custom types for a given binding: the 
+    registry extended is unchanged.
     
-    @type toXMLTypeMap: dict
-    @cvar toXMLTypeMap: mapping between SAML AttributeValue class and its 
-    ElementTree handler class
-    @type toSAMLTypeMap: dict
-    @cvar toSAMLTypeMap: mapping between SAML AttributeValue string identifier 
-    and its ElementTree handler class
+    @type XSI_TYPE_ATTRIB_TAG: string
+    @cvar XSI_TYPE_ATTRIB_TAG: qualified name of xsi:type attribute
+    @type XSI_TYPE_PREFIXES: dict
+    @cvar XSI_TYPE_PREFIXES: namespaces for the conventional prefixes used in
+    xsi:type values.  These are used for elements which carry no namespace 
+    map of their own
     """
-    toXMLTypeMap = {
-        XSStringAttributeValue: XSStringAttributeValueElementTree
+    XSI_TYPE_ATTRIB_TAG = str(QName(SAMLConstants.XSI_NS, tag='type'))
+    XSI_TYPE_ATTRIB_NAME = "%s:%s" % (SAMLConstants.XSI_PREFIX, 'type')
+    XSI_TYPE_PREFIXES = {
+        SAMLConstants.XSD_PREFIX: SAMLConstants.XSD_NS,
+        'xsd': SAMLConstants.XSD_NS
     }
+    
+    __slots__ = ('__toXMLTypeMap', '__xsiTypeMap', '__xsiTypeLocalNameMap',
+                 '__matchFuncs')
+    
+    def __init__(self, toXMLTypeMap=None, xsiTypeMap=None, matchFuncs=()):
+        """
+        @type toXMLTypeMap: dict
+        @param toXMLTypeMap: mapping of SAML AttributeValue classes to their
+        respective ElementTree based representations
+        @type xsiTypeMap: dict
+        @param xsiTypeMap: mapping of (namespace, local name) tuples of 
+        xsi:type values to ElementTree based representations
+        @type matchFuncs: list / tuple
+        @param matchFuncs: functions taking an AttributeValue element and 
+        returning its ElementTree based representation or None.  These are 
+        tried only for elements with an xsi:type not in xsiTypeMap
+        """
+        if toXMLTypeMap is None:
+            toXMLTypeMap = {}
+        elif not isinstance(toXMLTypeMap, dict):
+            raise TypeError('Expecting dict type for "toXMLTypeMap"')
 
-    # Convert into static method _after_ addition to type map
-    def xsstringMatch(elem):
-        """Match function for xs:string type attribute.
+        for samlClass in toXMLTypeMap:
+            if not issubclass(samlClass, AttributeValue):
+                raise TypeError("Input custom class must be derived from %r, "
+                                "got %r instead" % (AttributeValue, samlClass))
+            
+        if xsiTypeMap is None:
+            xsiTypeMap = {}
+        elif not isinstance(xsiTypeMap, dict):
+            raise TypeError('Expecting dict type for "xsiTypeMap"')
+        
+        # Fallback for xsi:type values whose prefix can't be resolved.  Local
+        # names registered for more than one namespace are left out
+        xsiTypeLocalNameMap = {}
+        ambiguous = set()
+        for xsiType, etreeClass in xsiTypeMap.items():
+            if not isinstance(xsiType, tuple) or len(xsiType) != 2:
+                raise TypeError('Expecting (namespace, local name) tuple for '
+                                '"xsiTypeMap" key; got %r' % (xsiType,))
+            localName = xsiType[1]
+            if localName in xsiTypeLocalNameMap:
+                ambiguous.add(localName)
+            xsiTypeLocalNameMap[localName] = etreeClass
+            
+        for localName in ambiguous:
+            del xsiTypeLocalNameMap[localName]
+            
+        if not isinstance(matchFuncs, (list, tuple)):
+            raise TypeError('Expecting list or tuple type for "matchFuncs"')
         
-        @type elem: ElementTree.Element
-        @param elem: Attribute Value element to be checked
-        @rtype: XSStringAttributeValueElementTree/None
+        for func in matchFuncs:
+            if not callable(func):
+                raise TypeError('"matchFuncs" items must be callable')
+            
+        self.__toXMLTypeMap = dict(toXMLTypeMap)
+        self.__xsiTypeMap = dict(xsiTypeMap)
+        self.__xsiTypeLocalNameMap = xsiTypeLocalNameMap
+        self.__matchFuncs = tuple(matchFuncs)
+        
+    def extend(self, toXMLTypeMap=None, xsiTypeMap=None, matchFuncs=()):
+        """Make a new registry with the entries of this one and the custom
+        types given.  This registry is not modified
+        
+        @type toXMLTypeMap: dict
+        @param toXMLTypeMap: additional SAML class to ElementTree class 
+        mappings
+        @type xsiTypeMap: dict
+        @param xsiTypeMap: additional xsi:type to ElementTree class mappings
+        @type matchFuncs: list / tuple
+        @param matchFuncs: additional match functions
+        @rtype: AttributeValueCodecRegistry
+        @return: new registry
+        """
+        newToXMLTypeMap = self.__toXMLTypeMap.copy()
+        if toXMLTypeMap:
+            newToXMLTypeMap.update(toXMLTypeMap)
+            
+        newXSITypeMap = self.__xsiTypeMap.copy()
+        if xsiTypeMap:
+            newXSITypeMap.update(xsiTypeMap)
+            
+        return self.__class__(toXMLTypeMap=newToXMLTypeMap, 
+                              xsiTypeMap=newXSITypeMap,
+                              matchFuncs=self.__matchFuncs + tuple(matchFuncs))
+        
+    def getToXMLTypeMap(self):
+        """@rtype: dict
+        @return: copy of the SAML class to ElementTree class mapping
+        """
+        return self.__toXMLTypeMap.copy()
+    
+    def getXSITypeMap(self):
+        """@rtype: dict
+        @return: copy of the xsi:type to ElementTree class mapping
+        """
+        return self.__xsiTypeMap.copy()
+    
+    @classmethod
+    def getXSIType(cls, elem):
+        """Get the namespace and local name of the xsi:type of an 
+        AttributeValue element
+        
+        @type elem: ElementTree.Element
+        @param elem: Attribute Value element
+        @rtype: tuple
+        @return: namespace and local name.  The namespace is None if the
+        prefix can't be resolved and both are None if the element has no 
+        xsi:type attribute
+        """
+        attrib = elem.attrib
+        typeValue = attrib.get(cls.XSI_TYPE_ATTRIB_TAG)
+        if typeValue is None:
+            # Element made by the standard library toXML and not yet 
+            # serialised
+            typeValue = attrib.get(cls.XSI_TYPE_ATTRIB_NAME)
+            if typeValue is None:
+                return None, None
+        
+        prefix, _, localName = typeValue.strip().rpartition(':')
+        namespaceURI = cls.XSI_TYPE_PREFIXES.get(prefix)
+        if namespaceURI is None:
+            nsmap = getattr(elem, 'nsmap', None)
+            if nsmap is not None:
+                namespaceURI = nsmap.get(prefix or None)
+            
+        return namespaceURI, localName
+        
+    def __call__(self, input):
+        """Get the ElementTree class to serialise or parse an Attribute Value
+        
+        @type input: saml.saml2.core.AttributeValue or ElementTree.Element
+        @param input: AttributeValue derived type to serialise or 
+        AttributeValue element to parse
+        @return: ElementTree class which can render or parse the relevant
+        AttributeValue class
+        @raise UnknownAttrProfile: no class is registered for the input
+        """
+        if isinstance(input, AttributeValue):
+            XMLTypeClass = self.__toXMLTypeMap.get(input.__class__)
+            if XMLTypeClass is None:
+                raise UnknownAttrProfile("no matching XMLType class "
+                                         "representation for class %r" % 
+                                         input.__class__)
+            return XMLTypeClass
+        
+        elif ElementTree.iselement(input):
+            xsiType = self.getXSIType(input)
+            XMLTypeClass = self.__xsiTypeMap.get(xsiType)
+            if XMLTypeClass is not None:
+                return XMLTypeClass
+            
+            if xsiType[0] is None and xsiType[1] is not None:
+                XMLTypeClass = self.__xsiTypeLocalNameMap.get(xsiType[1])
+                if XMLTypeClass is not None:
+                    return XMLTypeClass
+                
+            return self._match(input)
+        else:
+            raise TypeError("Expecting %r class got %r" % (AttributeValue, 
+                                                           type(input)))
+            
+    def _match(self, elem):
+        """Find the ElementTree class for an element using the match 
+        functions
+        
+        @type elem: ElementTree.Element
+        @param elem: Attribute Value element
+        @return: ElementTree class
+        @raise UnknownAttrProfile: no match function returned a class
+        @raise TypeError: more than one match function returned a class
+        """
+        XMLTypeClasses = []
+        for matchFunc in self.__matchFuncs:
+            cls = matchFunc(elem)
+            if cls is None:
+                continue
+            elif issubclass(cls, AttributeValue):
+                XMLTypeClasses.append(cls)
+            else:
+                raise TypeError("Expecting AttributeValue derived type "
+                                "for XML class; got %r" % cls)
+        
+        nXMLTypeClasses = len(XMLTypeClasses)
+        if nXMLTypeClasses == 0:
+            raise UnknownAttrProfile("no matching XMLType class "
+                                     "representation for SAML "
+                                     "AttributeValue type %r" % elem)
+        elif nXMLTypeClasses > 1:
+            raise TypeError("Multiple XMLType classes %r matched for "
+                            "for SAML AttributeValue type %r" % 
+                            (XMLTypeClasses, elem)) 
+               
+        return XMLTypeClasses[0]
+
+
+# Registry of the Attribute Value types supported by this package.  Extend it
+# to add custom types rather than modifying it
+defaultAttributeValueCodecRegistry = AttributeValueCodecRegistry(
+    toXMLTypeMap={
+        XSStringAttributeValue: XSStringAttributeValueElementTree
+    },
+    xsiTypeMap={
+        (SAMLConstants.XSD_NS, XSStringAttributeValue.TYPE_LOCAL_NAME):
+            XSStringAttributeValueElementTree
+    })
+
+
+class AttributeValueElementTreeFactory(object):
+    """Class factory for AttributeValue ElementTree classes.  These classes are
+    used to represent SAML Attribute value types.  Lookups are made with an
+    AttributeValueCodecRegistry extended with any custom types passed in.
+    
+    @type toXMLTypeMap: dict
+    @cvar toXMLTypeMap: mapping between SAML AttributeValue class and its 
+    ElementTree handler class for the default types.  This is for reference
+    only: custom types are passed to the constructor
+    @type toSAMLTypeMap: list
+    @cvar toSAMLTypeMap: match functions for the default types
+    """
+    toXMLTypeMap = defaultAttributeValueCodecRegistry.getToXMLTypeMap()
+
+    # Convert into static method _after_ addition to type map
+    def xsstringMatch(elem):
+        """Match function for xs:string type attribute.
+        
+        @type elem: ElementTree.Element
+        @param elem: Attribute Value element to be checked
+        @rtype: XSStringAttributeValueElementTree/None
         @return: Parsing class if this element is an xs:string Attribute Value,
         None otherwise.
         """
         # Iterate through the attributes searching for a type attribute set to
         # xs:string
-        for attribName, attribVal in list(elem.attrib.items()):
-            qname = QName(attribName)
-            if qname.localPart == "type":
+        for attribName, attribVal in elem.attrib.items():
+            if QName.getLocalPart(attribName) == "type":
                 typeLocalName = attribVal.split(':')[-1]
                 
                 if typeLocalName == XSStringAttributeValue.TYPE_LOCAL_NAME:
@@ -998,18 +685,25 @@ class AttributeValueElementTreeFactory(object):
     toSAMLTypeMap = [xsstringMatch]
     xsstringMatch = staticmethod(toSAMLTypeMap[0])
    
-    def __init__(self, customToXMLTypeMap=None, customToSAMLTypeMap=None): 
+    def __init__(self, customToXMLTypeMap=None, customToSAMLTypeMap=None,
+                 customXSITypeMap=None, attributeValueCodecRegistry=None): 
         """Set-up a SAML class to ElementTree mapping
         
         @type customToXMLTypeMap: dict
         @param customToXMLTypeMap: mapping for custom SAML AttributeValue 
-        classes to their respective ElementTree based representations.  This 
-        appends to self.__toXMLTypeMap
-        @type customToSAMLTypeMap: dict
-        @param customToSAMLTypeMap: string ID based mapping for custom SAML 
-        AttributeValue classes to their respective ElementTree based 
-        representations.  As with customToXMLTypeMap, this appends to
-        to the respective self.__saml_type_map
+        classes to their respective ElementTree based representations.  These
+        apply to this factory only
+        @type customToSAMLTypeMap: list / tuple
+        @param customToSAMLTypeMap: match functions for custom SAML 
+        AttributeValue classes returning their respective ElementTree based 
+        representations.  These are called only for elements with an 
+        xsi:type not found in the registry
+        @type customXSITypeMap: dict
+        @param customXSITypeMap: mapping of (namespace, local name) tuples of
+        xsi:type values to ElementTree based representations for custom types
+        @type attributeValueCodecRegistry: AttributeValueCodecRegistry
+        @param attributeValueCodecRegistry: registry to extend with the custom
+        types.  Defaults to defaultAttributeValueCodecRegistry
         """
         if customToXMLTypeMap is None:
             customToXMLTypeMap = {}
@@ -1017,881 +711,1216 @@ class AttributeValueElementTreeFactory(object):
         if customToSAMLTypeMap is None:
             customToSAMLTypeMap = []
             
-        self.__toXMLTypeMap = AttributeValueElementTreeFactory.toXMLTypeMap
         if not isinstance(customToXMLTypeMap, dict):
             raise TypeError('Expecting dict type for "customToXMLTypeMap"')
 
-        for samlClass, etreeClass in list(customToXMLTypeMap.items()): 
-            if not issubclass(samlClass, AttributeValue):
-                raise TypeError("Input custom class must be derived from %r, "
-                                "got %r instead" % (Attribute, samlClass))
-                
-            self.__toXMLTypeMap[samlClass] = etreeClass
-
         if not isinstance(customToSAMLTypeMap, (list, tuple)):
             raise TypeError('Expecting list or tuple type for '
                             '"customToSAMLTypeMap"')
-        
-        self.__saml_type_map = AttributeValueElementTreeFactory.toSAMLTypeMap[:]
-        for func in customToSAMLTypeMap:
-            if not callable(func):
-                raise TypeError('"customToSAMLTypeMap" items must be callable')
             
-        self.__saml_type_map += customToSAMLTypeMap
+        if attributeValueCodecRegistry is None:
+            attributeValueCodecRegistry = defaultAttributeValueCodecRegistry
+            
+        elif not isinstance(attributeValueCodecRegistry, 
+                            AttributeValueCodecRegistry):
+            raise TypeError('Expecting %r type for '
+                            '"attributeValueCodecRegistry"; got %r' %
+                            (AttributeValueCodecRegistry,
+                             type(attributeValueCodecRegistry)))
+            
+        if customToXMLTypeMap or customToSAMLTypeMap or customXSITypeMap:
+            attributeValueCodecRegistry = attributeValueCodecRegistry.extend(
+                                            toXMLTypeMap=customToXMLTypeMap,
+                                            xsiTypeMap=customXSITypeMap,
+                                            matchFuncs=customToSAMLTypeMap)
+            
+        self.__registry = attributeValueCodecRegistry
+        
+    def _getRegistry(self):
+        return self.__registry
+    
+    registry = property(_getRegistry, 
+                        doc="Registry of AttributeValue ElementTree classes")
 
     def __call__(self, input):
         """Create an ElementTree object based on the Attribute class type
         passed in
         
-        @type input: saml.saml2.core.AttributeValue or basestring
-        @param input: pass an AttributeValue derived type or a string.  If
-        an AttributeValue type, then self.__toXMLTypeMap is checked for a 
-        matching AttributeValue class entry, if a string is passed, 
-        self.__saml_type_map is checked for a matching string ID.  In both 
+        @type input: saml.saml2.core.AttributeValue or ElementTree.Element
+        @param input: pass an AttributeValue derived type or an element.  If
+        an AttributeValue type, the registry is checked for a matching 
+        AttributeValue class entry, if an element, for its xsi:type.  In both 
         cases, if a match is found an ElementTree class is returned which can 
         render or parse the relevant AttributeValue class
         """
-        if isinstance(input, AttributeValue):
-            XMLTypeClass = self.__toXMLTypeMap.get(input.__class__)
-            if XMLTypeClass is None:
-                raise UnknownAttrProfile("no matching XMLType class "
-                                         "representation for class %r" % 
-                                         input.__class__)
-                
-        elif ElementTree.iselement(input):
-            XMLTypeClasses = []
-            for matchFunc in self.__saml_type_map:
-                try:
-                    cls = matchFunc(input)
-                except:
-                    raise
-                if cls is None:
-                    continue
-                elif issubclass(cls, AttributeValue):
-                    XMLTypeClasses.append(cls)
-                else:
-                    raise TypeError("Expecting AttributeValue derived type "
-                                    "for XML class; got %r" % cls)
-            
-            nXMLTypeClasses = len(XMLTypeClasses)
-            if nXMLTypeClasses == 0:
-                raise UnknownAttrProfile("no matching XMLType class "
-                                         "representation for SAML "
-                                         "AttributeValue type %r" % input)
-            elif nXMLTypeClasses > 1:
-                raise TypeError("Multiple XMLType classes %r matched for "
-                                "for SAML AttributeValue type %r" % 
-                                (XMLTypeClasses, input)) 
-                   
-            XMLTypeClass = XMLTypeClasses[0]            
-        else:
-            raise TypeError("Expecting %r class got %r" % (AttributeValue, 
-                                                           type(input)))
-        return XMLTypeClass
+        return self.__registry(input)
     
 
-class IssuerElementTree(Issuer):
-    """Represent a SAML Issuer element in XML using ElementTree"""
+class AttributeProjection(object):
+    """Select the Attributes to parse from a response by name.  Pass as the
+    attributeProjection keyword to ResponseElementTree.fromXML, 
+    AssertionElementTree.fromXML or AttributeStatementElementTree.fromXML.  
+    Attribute elements not selected are skipped without making Attribute or 
+    AttributeValue objects.  A set of names or a callable may be passed
+    instead and is converted by fromProjection
     
-    @classmethod
-    def toXML(cls, issuer):
-        """Create an XML representation of the input SAML issuer object
-        
-        @type issuer: saml.saml2.core.Issuer
-        @param issuer: Assertion object
-        @rtype: ElementTree.Element
-        @return: ElementTree element containing the assertion
+    @type names: frozenset / None
+    @ivar names: names of attributes selected or None if a predicate is used
+    @type predicate: callable / None
+    @ivar predicate: function taking an attribute name and returning True if
+    the attribute is selected or None if names is used
+    """
+    __slots__ = ('__names', '__predicate')
+    
+    def __init__(self, projection):
+        """
+        @type projection: iterable / callable
+        @param projection: attribute names to select or a function taking an
+        attribute name and returning True if it is to be selected
         """
-        if not isinstance(issuer, Issuer):
-            raise TypeError("Expecting %r class got %r" % (Issuer, 
-                                                           type(issuer)))
+        if callable(projection):
+            self.__names = None
+            self.__predicate = projection
+        else:
+            if isinstance(projection, str):
+                raise TypeError('Expecting an iterable of attribute names or '
+                                'a callable for "projection"; got %r' %
+                                projection)
+            self.__names = frozenset(projection)
+            self.__predicate = None
             
-        # Issuer format may be omitted from a response: saml-profiles-2.0-os,
-        # Section 4.1.4.2
-        attrib = {}
-        if issuer.format is not None:
-            attrib[cls.FORMAT_ATTRIB_NAME] = issuer.format
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, issuer.qname.prefix,
-                                issuer.qname.namespaceURI,
-                                **attrib)
-                                   
-        elem.text = issuer.value
-
-        return elem
-
     @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML Issuer instance
-        
-        @type elem: ElementTree.Element
-        @param elem: ElementTree element containing the assertion
-        @rtype: saml.saml2.core.Issuer
-        @return: Assertion object"""
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError('No "%s" element found' %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
+    def fromProjection(cls, projection):
+        """Get an AttributeProjection for a projection given in any of the
+        forms accepted by __init__
+        
+        @type projection: AttributeProjection / iterable / callable
+        @param projection: projection
+        @rtype: AttributeProjection
+        @return: projection as an AttributeProjection
+        """
+        if isinstance(projection, cls):
+            return projection
+        return cls(projection)
+    
+    def _getNames(self):
+        return self.__names
+    
+    names = property(_getNames, doc="Names of attributes selected")
+    
+    def _getPredicate(self):
+        return self.__predicate
+    
+    predicate = property(_getPredicate, doc="Attribute name predicate")
             
-        issuerFormat = elem.attrib.get(cls.FORMAT_ATTRIB_NAME)
-        issuer = Issuer()
-        
-        # Issuer format may be omitted from a response: saml-profiles-2.0-os,
-        # Section 4.1.4.2
-        if issuerFormat is not None:
-            issuer.format = issuerFormat
-        
-        if elem.text is None:
-            raise XMLTypeParseError('No SAML issuer value set')
-        
-        issuer.value = elem.text.strip() 
+    def isSelected(self, name):
+        """Check whether an attribute is selected
         
-        return issuer
-
-        
-class NameIdElementTree(NameID):
-    """Represent a SAML Name Identifier in XML using ElementTree"""
-    
-    @classmethod
-    def toXML(cls, nameID):
-        """Create an XML representation of the input SAML Name Identifier
-        object
-        @type nameID: saml.saml2.core.NameID
-        @param nameID: SAML name ID
-        @rtype: ElementTree.Element
-        @return: Name ID as ElementTree XML element
+        @type name: basestring
+        @param name: attribute name
+        @rtype: bool
+        @return: True if the attribute is to be parsed
         """
+        if self.__names is not None:
+            return name in self.__names
+        return bool(self.__predicate(name))
         
-        if not isinstance(nameID, NameID):
-            raise TypeError("Expecting %r class got %r" % (NameID, 
-                                                           type(nameID)))
-        attrib = {
-            cls.FORMAT_ATTRIB_NAME: nameID.format
-        }
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, nameID.qname.prefix,
-                                nameID.qname.namespaceURI,
-                                **attrib)
+    def __call__(self, attrib):
+        """Check whether an Attribute element is selected
         
-        elem.text = nameID.value
+        @type attrib: dict
+        @param attrib: XML attributes of the Attribute element
+        @rtype: bool
+        @return: True if the attribute is to be parsed
+        """
+        return self.isSelected(attrib.get(Attribute.NAME_ATTRIB_NAME))
 
-        return elem
 
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML NameID object
-        
-        @type elem: ElementTree.Element
-        @param elem: Name ID as ElementTree XML element
-        @rtype: saml.saml2.core.NameID
-        @return: SAML Name ID
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
+class IssuerElementTree(Issuer):
+    """Represent a SAML Issuer element in XML using ElementTree"""
+    
+    # Issuer format may be omitted from a response: saml-profiles-2.0-os,
+    # Section 4.1.4.2
+    DESCRIPTOR = SAMLTypeDescriptor(Issuer,
+        attributes=(
+            XMLAttribute(Issuer.FORMAT_ATTRIB_NAME, 'format', required=False),
+        ),
+        text=XMLText('value', required=True))
 
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-            
-        format = elem.attrib.get(cls.FORMAT_ATTRIB_NAME)
-        if format is None:
-            raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                    'element' %
-                                    (cls.FORMAT_ATTRIB_NAME,
-                                     cls.DEFAULT_ELEMENT_LOCAL_NAME))
-        nameID = NameID()
-        nameID.format = format
-        if elem.text is None:
-            nameID.value = ''
-        else:
-            nameID.value = elem.text.strip() 
         
-        return nameID
+class NameIdElementTree(NameID):
+    """Represent a SAML Name Identifier in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(NameID,
+        attributes=(
+            XMLAttribute(NameID.FORMAT_ATTRIB_NAME, 'format'),
+        ),
+        text=XMLText('value', default=''))
 
 
 class SubjectElementTree(Subject):
     """Represent a SAML Subject in XML using ElementTree"""
-    
-    @classmethod
-    def toXML(cls, subject):
-        """Create an XML representation of the input SAML subject object
-        @type subject: saml.saml2.core.Subject
-        @param subject: SAML subject
-        @rtype: ElementTree.Element
-        @return: subject as ElementTree XML element
-        """
-        if not isinstance(subject, Subject):
-            raise TypeError("Expecting %r class got %r" % (Subject, 
-                                                           type(subject)))
-            
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))  
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI)
+    DESCRIPTOR = SAMLTypeDescriptor(Subject,
+        children=(
+            XMLChild(NameID, 'nameID', minOccurs=1),
+        ))
 
-        nameIdElem = NameIdElementTree.toXML(subject.nameID)
-        elem.append(nameIdElem)
         
-        return elem
+class StatusCodeElementTree(StatusCode):
+    """Represent a SAML Status Code in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(StatusCode,
+        attributes=(
+            XMLAttribute(StatusCode.VALUE_ATTRIB_NAME, 'value'),
+        ))
 
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML Subject object
         
-        @type elem: ElementTree.Element
-        @param elem: subject as ElementTree XML element
-        @rtype: saml.saml2.core.Subject
-        @return: SAML subject
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
+class StatusMessageElementTree(StatusMessage):
+    """Represent a SAML Status Message in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(StatusMessage, text=XMLText('value'))
 
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      cls.DEFAULT_ELEMENT_LOCAL_NAME)
-            
-        if len(elem) != 1:
-            raise XMLTypeParseError("Expecting single Name ID child element "
-                                      "for SAML Subject element")
-            
-        subject = Subject()
-        subject.nameID = NameIdElementTree.fromXML(elem[0])
-        
-        return subject
 
-        
-class StatusCodeElementTree(StatusCode):
-    """Represent a SAML Status Code in XML using ElementTree"""
+class StatusElementTree(Status):
+    """Represent a SAML Status in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(Status,
+        children=(
+            XMLChild(StatusCode, 'statusCode', minOccurs=1),
+            
+            # Status message is optional
+            XMLChild(StatusMessage, 'statusMessage',
+                     include=lambda statusMessage: (
+                                            statusMessage.value is not None)),
+            XMLUnsupportedChild(StatusDetail.DEFAULT_ELEMENT_LOCAL_NAME,
+                                lambda status: status.statusDetail is not None),
+        ))
     
-    @classmethod
-    def toXML(cls, statusCode):
-        """Create an XML representation of the input SAML Name Status Code
-        
-        @type statusCode: saml.saml2.core.StatusCode
-        @param statusCode: SAML Status Code
-        @rtype: ElementTree.Element
-        @return: Status Code as ElementTree XML element
-        """
+    
+class AttributeQueryElementTree(AttributeQuery):
+    """Represent a SAML Attribute Query in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(AttributeQuery,
+        attributes=(
+            XMLAttribute(AttributeQuery.ID_ATTRIB_NAME, 'id'),
+            XMLAttribute(AttributeQuery.ISSUE_INSTANT_ATTRIB_NAME,
+                         'issueInstant',
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
+            XMLAttribute(AttributeQuery.VERSION_ATTRIB_NAME, 'version',
+                         toString=str,
+                         fromString=samlVersionFromString),
+        ),
+        children=(
+            XMLChild(Issuer, 'issuer'),
+            XMLChild(Subject, 'subject', minOccurs=1),
+            XMLChild(Attribute, 'attributes', maxOccurs=None, passKw=True),
+        ))
         
-        if not isinstance(statusCode, StatusCode):
-            raise TypeError("Expecting %r class got %r" % (StatusCode, 
-                                                           type(statusCode)))
+    
+class ResponseElementTree(Response):
+    """Represent a SAML Response in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(Response,
+        attributes=(
+            XMLAttribute(Response.ID_ATTRIB_NAME, 'id'),
+            XMLAttribute(Response.ISSUE_INSTANT_ATTRIB_NAME, 'issueInstant',
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
             
-        attrib = {
-            cls.VALUE_ATTRIB_NAME: statusCode.value
-        }
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, statusCode.qname.prefix,
-                                statusCode.qname.namespaceURI,
-                                **attrib)
+            # TODO: Does inResponseTo have to be set?  This implementation 
+            # currently enforces this ...
+            XMLAttribute(Response.IN_RESPONSE_TO_ATTRIB_NAME, 'inResponseTo'),
+            XMLAttribute(Response.VERSION_ATTRIB_NAME, 'version',
+                         toString=str,
+                         fromString=samlVersionFromString),
+        ),
+        children=(
+            # Issuer may be omitted: saml-profiles-2.0-os Section 4.1.4.2
+            XMLChild(Issuer, 'issuer'),
+            XMLChild(Status, 'status', minOccurs=1),
+            XMLChild(Assertion, 'assertions', maxOccurs=None, passKw=True,
+                     lazy=True),
+        ))
+
+
+def _createAction(attrib):
+    """Create an Action for parsing.  If no action namespace is set then 
+    spec. says to default to Read/write/negation type (2.7.4.2 SAML 2 Core
+    Spec. 15 March 2005).  However, set default to none to allow for
+    misbehaving third party code ;)
+    
+    @type attrib: dict
+    @param attrib: Action element XML attributes
+    @rtype: saml.saml2.core.Action
+    @return: new Action object
+    """
+    if Action.NAMESPACE_ATTRIB_NAME in attrib:
+        return Action._from_fields()
+    
+    log.warning('No "%s" attribute found in "%s" element - no action '
+                'namespace set' %
+                (Action.NAMESPACE_ATTRIB_NAME,
+                 Action.DEFAULT_ELEMENT_LOCAL_NAME))
+    return Action(default_namespace=None)
 
-        return elem
 
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML StatusCode object
+class ActionElementTree(Action):
+    """Represent a SAML authorization action in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(Action,
+        attributes=(
+            XMLAttribute(Action.NAMESPACE_ATTRIB_NAME, 'namespace',
+                         required=False),
+        ),
+        text=XMLText('value', required=True),
+        factory=_createAction)
+    
+    
+class AuthzDecisionQueryElementTree(AuthzDecisionQuery):
+    """Represent a SAML Attribute Query in XML using ElementTree"""
+    DESCRIPTOR = SAMLTypeDescriptor(AuthzDecisionQuery,
+        attributes=(
+            XMLAttribute(AuthzDecisionQuery.ID_ATTRIB_NAME, 'id'),
+            XMLAttribute(AuthzDecisionQuery.ISSUE_INSTANT_ATTRIB_NAME,
+                         'issueInstant',
+                         toString=SAMLDateTime.toString,
+                         fromString=SAMLDateTime.fromString),
+            XMLAttribute(AuthzDecisionQuery.VERSION_ATTRIB_NAME, 'version',
+                         toString=str,
+                         fromString=samlVersionFromString),
+            XMLAttribute(AuthzDecisionQuery.RESOURCE_ATTRIB_NAME, 'resource',
+                         unsetError=AttributeError),
+        ),
+        children=(
+            XMLChild(Issuer, 'issuer'),
+            XMLChild(Subject, 'subject', minOccurs=1),
+            XMLChild(Action, 'actions', maxOccurs=None),
+            XMLUnsupportedChild(Evidence.DEFAULT_ELEMENT_LOCAL_NAME,
+                                lambda query: (query.evidence and 
+                                            len(query.evidence.evidence) > 0)),
+        ))
+
+def _getElementTreeImplementationForQName(qname):
+    return _extensionElementTreeMap.get(qname.clarkName)
+
+def setElementTreeImplementationForQName(qname, impl):
+    _extensionElementTreeMap[qname.clarkName] = impl
+
+
+
+
+# Engine generating toXML and fromXML for the ElementTree classes above from
+# their descriptors
+
+# Map of SAML class to the ElementTree class used to represent it as a child
+# element of another SAML type
+_descriptorElementTreeMap = {}
+
+# Map of ElementTree class to function making its element as a child of
+# another with the lxml backend
+_subElementXMLMap = {}
+
+
+class _AttributeValueElementTree(object):
+    """Represent AttributeValue elements of any type in XML using the
+    AttributeValueCodecRegistry"""
+
+    @staticmethod
+    def _getRegistry(attributeValueElementTreeFactoryKw):
+        """Get the registry for the given factory keywords.  A factory is
+        only made if custom types are passed
         
-        @type elem: ElementTree.Element
-        @param elem: Status Code as ElementTree XML element
-        @rtype: saml.saml2.core.StatusCode
-        @return: SAML Status Code
+        @type attributeValueElementTreeFactoryKw: dict
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory.  Parsing options in _PARSE_OPTION_KW are ignored
+        @rtype: AttributeValueCodecRegistry
+        @return: registry
         """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError('No "%s" element found' %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-            
-        statusCode = StatusCode()
+        if not attributeValueElementTreeFactoryKw:
+            return defaultAttributeValueCodecRegistry
+        
+        nKw = len(attributeValueElementTreeFactoryKw)
+        for name in _PARSE_OPTION_KW:
+            if name in attributeValueElementTreeFactoryKw:
+                nKw -= 1
+                
+        if nKw == 0:
+            return defaultAttributeValueCodecRegistry
             
-        value = elem.attrib.get(cls.VALUE_ATTRIB_NAME)
-        if value is None:
-            raise XMLTypeParseError('No "%s" attribute found in "%s" element' %
-                                    (cls.VALUE_ATTRIB_NAME,
-                                     cls.DEFAULT_ELEMENT_LOCAL_NAME))
-        statusCode.value = value
+        if nKw == 1:
+            registry = attributeValueElementTreeFactoryKw.get(
+                                                'attributeValueCodecRegistry')
+            if registry is not None:
+                return registry
         
-        return statusCode
+        factoryKw = dict([(name, value) for name, value in 
+                          attributeValueElementTreeFactoryKw.items()
+                          if name not in _PARSE_OPTION_KW])
+        return AttributeValueElementTreeFactory(**factoryKw).registry
 
-        
-class StatusMessageElementTree(StatusMessage):
-    """Represent a SAML Status Message in XML using ElementTree"""
-    
     @classmethod
-    def toXML(cls, statusMessage):
-        """Create an XML representation of the input SAML Name Status Message
+    def toXML(cls, attributeValue, **attributeValueElementTreeFactoryKw):
+        """Create an XML representation of the input SAML Attribute Value
         
-        @type statusMessage: saml.saml2.core.StatusMessage
-        @param statusMessage: SAML Status Message
+        @type attributeValue: saml.saml2.core.AttributeValue
+        @param attributeValue: SAML Attribute Value
+        @type attributeValueElementTreeFactoryKw: dict
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory
         @rtype: ElementTree.Element
-        @return: Status Code as ElementTree XML element
+        @return: ElementTree Element
         """
-        
-        if not isinstance(statusMessage, StatusMessage):
-            raise TypeError("Expecting %r class got %r" % (StatusMessage, 
-                                                           type(statusMessage)))
-            
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, statusMessage.qname.prefix,
-                                statusMessage.qname.namespaceURI)
-        
-        elem.text = statusMessage.value
-
-        return elem
+        registry = cls._getRegistry(attributeValueElementTreeFactoryKw)
+        return registry(attributeValue).toXML(attributeValue)
 
     @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML StatusMessage object
+    def fromXML(cls, elem, **attributeValueElementTreeFactoryKw):
+        """Parse ElementTree element into a SAML Attribute Value
         
         @type elem: ElementTree.Element
-        @param elem: Status Code as ElementTree XML element
-        @rtype: saml.saml2.core.StatusMessage
-        @return: SAML Status Message
+        @param elem: Attribute value as ElementTree XML element
+        @type attributeValueElementTreeFactoryKw: dict
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory
+        @rtype: saml.saml2.core.AttributeValue
+        @return: SAML Attribute value
         """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
+        registry = cls._getRegistry(attributeValueElementTreeFactoryKw)
+        return registry(elem).fromXML(elem)
 
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError('No "%s" element found' %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-            
-        statusMessage = StatusMessage()
-        if elem.text is not None:
-            statusMessage.value = elem.text.strip() 
-        
-        return statusMessage
 
+# Parsing options passed down to child elements with the AttributeValue 
+# factory keywords.  _projectionSkips is internal: a list to which elements 
+# skipped by an attribute projection are added so that a source element is
+# not kept for an object parsed without them
+_PARSE_OPTION_KW = ('attributeProjection', 'keepSource', '_projectionSkips')
 
-class StatusElementTree(Status):
-    """Represent a SAML Status in XML using ElementTree"""
+
+def _resolveAttributeValueKw(attributeValueElementTreeFactoryKw):
+    """Replace AttributeValue factory keywords with the registry they define
+    so that it is made once for each document rather than for each value.
+    An attribute projection is converted to an AttributeProjection
     
-    @classmethod
-    def toXML(cls, status):
-        """Create an XML representation of the input SAML subject object
-        @type status: saml.saml2.core.Status
-        @param status: SAML subject
-        @rtype: ElementTree.Element
-        @return: subject as ElementTree XML element
+    @type attributeValueElementTreeFactoryKw: dict
+    @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+    factory and parsing options
+    @rtype: dict
+    @return: keywords holding the registry and parsing options only
+    """
+    registry = _AttributeValueElementTree._getRegistry(
+                                        attributeValueElementTreeFactoryKw)
+    kw = {'attributeValueCodecRegistry': registry}
+    
+    projection = attributeValueElementTreeFactoryKw.get('attributeProjection')
+    if projection is not None:
+        kw['attributeProjection'] = AttributeProjection.fromProjection(
+                                                                projection)
+        
+    if attributeValueElementTreeFactoryKw.get('keepSource'):
+        kw['keepSource'] = True
+        
+    projectionSkips = attributeValueElementTreeFactoryKw.get(
+                                                        '_projectionSkips')
+    if projectionSkips is not None:
+        kw['_projectionSkips'] = projectionSkips
+    
+    return kw
+
+
+class _ParsedSource(object):
+    """Element a SAML object was parsed from with a snapshot of the object's
+    state.  The snapshot holds references to the object, its attribute values
+    and, recursively, those of its child objects and lists of children.  The
+    object is unchanged if a new snapshot has identical items.  Holding 
+    references stops the ids of replaced values being re-used.  Changes made
+    in place to values which are not SAML objects or lists, for example XACML
+    context objects, are not detected
+    
+    @type elem: ElementTree.Element
+    @ivar elem: element parsed
+    @type state: list
+    @ivar state: snapshot of object state
+    """
+    __slots__ = ('elem', 'state')
+    
+    # Marks the end of a list in a snapshot so that the items of nested lists
+    # are not confused
+    END_OF_LIST = object()
+    
+    # Slot descriptors of each SAML class read for a snapshot
+    _slots = {}
+    
+    def __init__(self, elem, samlObject):
         """
-        if not isinstance(status, Status):
-            raise TypeError("Expecting %r class got %r" % (status, 
-                                                           type(Status)))
-            
-        tag = str(QName.fromGeneric(Status.DEFAULT_ELEMENT_NAME))  
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI)
-        
-        statusCodeElem = StatusCodeElementTree.toXML(status.statusCode)
-        elem.append(statusCodeElem)
-        
-        # Status message is optional
-        if status.statusMessage is not None and \
-           status.statusMessage.value is not None:
-            statusMessageElem = StatusMessageElementTree.toXML(
-                                                        status.statusMessage)
-            elem.append(statusMessageElem)
+        @type elem: ElementTree.Element
+        @param elem: element parsed
+        @type samlObject: ndg.saml.common.SAMLObject
+        @param samlObject: object parsed from elem
+        """
+        self.elem = elem
+        self.state = self._snapshot(samlObject)
         
-        if status.statusDetail is not None:
-            raise NotImplementedError("StatusDetail XML serialisation is not "
-                                      "implemented")
-            
-        return elem
-
     @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML Status object
+    def _getSlots(cls, samlClass):
+        """Get the slot descriptors of a SAML class
         
-        @type elem: ElementTree.Element
-        @param elem: subject as ElementTree XML element
-        @rtype: saml.saml2.core.Status
-        @return: SAML subject
+        @type samlClass: type
+        @param samlClass: SAML object class
+        @rtype: tuple / None
+        @return: slot descriptors or None if instances have a dictionary
         """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != Status.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError('No "%s" element found' %
-                                      Status.DEFAULT_ELEMENT_LOCAL_NAME)
-            
-        if len(elem) < 1:
-            raise XMLTypeParseError("Expecting a StatusCode child element for "
-                                    "SAML Status element")
+        try:
+            return cls._slots[samlClass]
+        except KeyError:
+            pass
+        
+        slots = []
+        for klass in samlClass.__mro__[:-1]:
+            if '__dict__' in klass.__dict__:
+                slots = None
+                break
             
-        status = Status()
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            if localName == StatusCode.DEFAULT_ELEMENT_LOCAL_NAME:
-                status.statusCode = StatusCodeElementTree.fromXML(childElem)
+            for name in klass.__dict__.get('__slots__', ()):
+                if name.startswith('__') and not name.endswith('__'):
+                    name = '_%s%s' % (klass.__name__.lstrip('_'), name)
+                slots.append(klass.__dict__[name])
                 
-            elif localName == StatusMessage.DEFAULT_ELEMENT_LOCAL_NAME:
-                status.statusMessage = StatusMessageElementTree.fromXML(
-                                                                childElem)
-            elif localName == StatusDetail.DEFAULT_ELEMENT_LOCAL_NAME:
-                raise NotImplementedError("XML parse of %s element is not "
-                                    "implemented" %
-                                    StatusDetail.DEFAULT_ELEMENT_LOCAL_NAME)
-            else:
-                raise XMLTypeParseError("Status child element name %r not "
-                                        "recognised" % localName)
-       
-        return status
+        if slots is not None:
+            slots = tuple(slots)
+        cls._slots[samlClass] = slots
+        return slots
     
+    @classmethod
+    def _snapshot(cls, samlObject):
+        """Make a snapshot of the state of a SAML object
+        
+        @type samlObject: ndg.saml.common.SAMLObject
+        @param samlObject: SAML object
+        @rtype: list
+        @return: snapshot
+        """
+        state = []
+        append = state.append
+        endOfList = cls.END_OF_LIST
+        getSlots = cls._getSlots
+        
+        def add(value):
+            append(value)
+            if isinstance(value, SAMLObject):
+                slots = getSlots(value.__class__)
+                if slots is None:
+                    items = value.__getstate__().values()
+                else:
+                    items = []
+                    for slot in slots:
+                        try:
+                            items.append(slot.__get__(value))
+                        except AttributeError:
+                            items.append(endOfList)
+                            
+                for item in items:
+                    # The source of a parsed object is not part of its state
+                    if item.__class__ is cls:
+                        item = None
+                    add(item)
+            elif isinstance(value, list):
+                for item in value:
+                    add(item)
+                append(endOfList)
+                
+        add(samlObject)
+        return state
     
-class AttributeQueryElementTree(AttributeQuery):
-    """Represent a SAML Attribute Query in XML using ElementTree"""
+    def isUnchanged(self, samlObject):
+        """Check whether an object is unchanged since it was parsed
         
-    @classmethod
-    def toXML(cls, attributeQuery, **attributeValueElementTreeFactoryKw):
-        """Create an XML representation of the input SAML Attribute Query
-        object
+        @type samlObject: ndg.saml.common.SAMLObject
+        @param samlObject: object parsed from elem
+        @rtype: bool
+        @return: True if samlObject is unchanged
+        """
+        state = self._snapshot(samlObject)
+        if len(state) != len(self.state):
+            return False
+        
+        for item, parsedItem in zip(state, self.state):
+            if item is not parsedItem:
+                return False
+        return True
+    
+    
+def _getUnchangedSourceElement(samlObject):
+    """Get the element a SAML object was parsed from if it was kept and the 
+    object has not changed since.  If it has, the element is discarded
+    
+    @type samlObject: ndg.saml.common.SAMLObject
+    @param samlObject: SAML object
+    @rtype: ElementTree.Element / None
+    @return: element parsed or None
+    """
+    source = getattr(samlObject, 'parsedSource', None)
+    if source is None:
+        return None
+    
+    if source.isUnchanged(samlObject):
+        return source.elem
+    
+    samlObject.parsedSource = None
+    return None
 
-        @type attributeQuery: saml.saml2.core.AttributeQuery
-        @param attributeQuery: SAML Attribute Query
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        factory
+
+if Config.use_lxml:
+    def _copySourceElement(sourceElem, parent=None):
+        """Copy an element kept from parsing for output.  The namespaces in 
+        scope for each element are declared on its copy as prefixes may be 
+        used in attribute values such as xsi:type as well as in names.  
+        Elements are copied one by one rather than with deepcopy because 
+        lxml drops the declarations of namespaces already declared with 
+        another prefix when an element is moved into the output tree
+        
+        @type sourceElem: ElementTree.Element
+        @param sourceElem: element parsed
+        @type parent: ElementTree.Element / None
+        @param parent: element to add the copy to
         @rtype: ElementTree.Element
-        @return: Attribute Query as ElementTree XML element
+        @return: copy of the element
         """
-        if not isinstance(attributeQuery, AttributeQuery):
-            raise TypeError("Expecting %r class got %r" % (AttributeQuery, 
-                                                        type(attributeQuery)))
-            
-        
-        issueInstant = SAMLDateTime.toString(attributeQuery.issueInstant)
-        attrib = {
-            cls.ID_ATTRIB_NAME: attributeQuery.id,
-            cls.ISSUE_INSTANT_ATTRIB_NAME: issueInstant,
+        if parent is None:
+            elem = ElementTree.Element(sourceElem.tag, sourceElem.attrib,
+                                       nsmap=sourceElem.nsmap)
+        else:
+            elem = ElementTree.SubElement(parent, sourceElem.tag, 
+                                          sourceElem.attrib,
+                                          nsmap=sourceElem.nsmap)
+        elem.text = sourceElem.text
+        for child in sourceElem:
+            if isinstance(child.tag, str):
+                _copySourceElement(child, elem).tail = child.tail
+            else:
+                # Comment or processing instruction
+                elem.append(deepcopy(child))
+        return elem
+else:
+    def _copySourceElement(sourceElem, parent=None):
+        """Copy an element kept from parsing for output.  The standard 
+        library ElementTree discards namespace declarations on parsing so 
+        those for the conventional prefixes used in xsi:type values are 
+        added to the elements with them
+        
+        @type sourceElem: ElementTree.Element
+        @param sourceElem: element parsed
+        @type parent: ElementTree.Element / None
+        @param parent: element to add the copy to
+        @rtype: ElementTree.Element
+        @return: copy of the element
+        """
+        elem = deepcopy(sourceElem)
+        for subElem in elem.iter():
+            typeValue = subElem.get(
+                                AttributeValueCodecRegistry.XSI_TYPE_ATTRIB_TAG)
+            if typeValue is None:
+                continue
             
-            # Nb. Version is a SAMLVersion instance and requires explicit cast
-            cls.VERSION_ATTRIB_NAME: str(attributeQuery.version)
-        }
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
-        
-        issuerElem = IssuerElementTree.toXML(attributeQuery.issuer)
-        elem.append(issuerElem)
+            prefix = typeValue.strip().rpartition(':')[0]
+            namespaceURI = AttributeValueCodecRegistry.XSI_TYPE_PREFIXES.get(
+                                                                        prefix)
+            if namespaceURI is not None:
+                subElem.set("%s:%s" % (SAMLConstants.XMLNS_PREFIX, prefix),
+                            namespaceURI)
+                
+        if parent is not None:
+            parent.append(elem)
+        return elem
 
-        subjectElem = SubjectElementTree.toXML(attributeQuery.subject)
-        elem.append(subjectElem)
 
-        for attribute in attributeQuery.attributes:
-            # Factory enables support for multiple attribute types
-            attributeElem = AttributeElementTree.toXML(attribute,
-                                        **attributeValueElementTreeFactoryKw)
-            elem.append(attributeElem)
-        
-        return elem
+def _getChildElementTree(child):
+    """Get the ElementTree class for a child element slot
+    
+    @type child: ndg.saml.xml.descriptor.XMLChild
+    @param child: child element slot
+    @return: ElementTree class
+    """
+    if child.elementTree is not None:
+        return child.elementTree
+    
+    etreeClass = _descriptorElementTreeMap.get(child.samlClass)
+    if etreeClass is None:
+        raise TypeError("No ElementTree class registered for %r" %
+                        child.samlClass)
+    return etreeClass
+
+
+def _appendChild(elem, etreeClass, value, kw, declared):
+    """Add the XML representation of a SAML object to a parent element.  
+    With the lxml backend, classes generated from descriptors make the child
+    in place with SubElement.  Subclasses may override toXML so they are
+    always called through it
+    
+    @type elem: ElementTree.Element
+    @param elem: parent element
+    @param etreeClass: ElementTree class for the child
+    @param value: SAML object
+    @type kw: dict / None
+    @param kw: AttributeValue factory keywords or None if the child's toXML
+    doesn't take them
+    @type declared: frozenset / None
+    @param declared: namespace URIs declared in the scope of the parent.  
+    None if the lxml backend is not in use
+    """
+    if declared is not None:
+        subElementXML = _subElementXMLMap.get(etreeClass)
+        if subElementXML is not None:
+            subElementXML(elem, value, kw or {}, declared)
+            return
+        
+    if kw is None:
+        elem.append(etreeClass.toXML(value))
+    else:
+        elem.append(etreeClass.toXML(value, **kw))
 
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML AttributeQuery object
-        
-        @type elem: ElementTree.Element
-        @param elem: XML element containing the AttributeQuery
-        @rtype: saml.saml2.core.AttributeQuery
-        @return: AttributeQuery object
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
 
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        # Unpack attributes from top-level element
-        attributeValues = []
-        for attributeName in (cls.VERSION_ATTRIB_NAME,
-                              cls.ISSUE_INSTANT_ATTRIB_NAME,
-                              cls.ID_ATTRIB_NAME):
-            attributeValue = elem.attrib.get(attributeName)
-            if attributeValue is None:
-                raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                 'element' %
-                                 (attributeName,
-                                  cls.DEFAULT_ELEMENT_LOCAL_NAME))
+def _makeChildSerialiser(child):
+    """Make a function serialising a child element slot of a SAML object
+    
+    @type child: ndg.saml.xml.descriptor.XMLChild / XMLUnsupportedChild /
+    XMLExtensionChild
+    @param child: child element slot
+    @rtype: callable / None
+    @return: function taking the parent element, SAML object, AttributeValue
+    factory keywords and namespace URIs declared in the scope of the parent
+    or None if there is nothing to serialise
+    """
+    if isinstance(child, XMLUnsupportedChild):
+        if child.isSet is None:
+            return None
+        
+        isSet = child.isSet
+        message = "%s XML serialisation is not implemented" % child.localName
+        def serialise(elem, samlObject, kw, declared):
+            if isSet(samlObject):
+                raise NotImplementedError(message)
+        return serialise
+    
+    attrName = child.attrName
+    if isinstance(child, XMLExtensionChild):
+        def serialise(elem, samlObject, kw, declared):
+            for extension in getattr(samlObject, attrName):
+                qname = extension.qname
+                etreeImpl = _getElementTreeImplementationForQName(qname)
+                if etreeImpl is None:
+                    raise NotImplementedError("No ElementTree implementation "
+                                              "for QName {%s}%s" %
+                                              (qname.namespaceURI, 
+                                               qname.localPart))
+                _appendChild(elem, etreeImpl, extension, None, declared)
+        return serialise
+    
+    etreeClass = _getChildElementTree(child)
+    passKw = child.passKw
+    include = child.include
+    if child.multiple:
+        def serialise(elem, samlObject, kw, declared):
+            childKw = kw if passKw else None
+            for value in getattr(samlObject, attrName):
+                _appendChild(elem, etreeClass, value, childKw, declared)
+        return serialise
+        
+    # Mandatory children are serialised even if unset so that the child's
+    # toXML raises a TypeError
+    required = child.minOccurs > 0
+    def serialise(elem, samlObject, kw, declared):
+        value = getattr(samlObject, attrName)
+        if value is None and not required:
+            return
+        if include is not None and not include(value):
+            return
+        _appendChild(elem, etreeClass, value, kw if passKw else None, 
+                     declared)
+    return serialise
+
+
+def _getDescriptorNamespaces(descriptor, namespaces=None, visited=None):
+    """Get the namespaces of a SAML type and the types it may contain so that
+    they can be declared on the root element of a document
+    
+    @type descriptor: ndg.saml.xml.descriptor.SAMLTypeDescriptor
+    @param descriptor: description of the SAML type
+    @type namespaces: dict / None
+    @param namespaces: prefix to namespace URI mapping to add to
+    @type visited: set / None
+    @param visited: descriptors already included
+    @rtype: dict
+    @return: prefix to namespace URI mapping
+    """
+    if namespaces is None:
+        namespaces = {}
+    if visited is None:
+        visited = set()
+        
+    def add(qname):
+        # Where a prefix is taken by another namespace the element declares
+        # its own namespace instead
+        namespaces.setdefault(qname.prefix, qname.namespaceURI)
+        
+    visited.add(descriptor)
+    add(descriptor.elementName)
+    for child in descriptor.children:
+        if not isinstance(child, XMLChild):
+            continue
+        
+        childDescriptor = getattr(_getChildElementTree(child), 'DESCRIPTOR', 
+                                  None)
+        if childDescriptor is None:
+            add(child.samlClass.DEFAULT_ELEMENT_NAME)
+            if issubclass(child.samlClass, AttributeValue):
+                # For xsi:type attributes and their values
+                namespaces.setdefault(SAMLConstants.XSI_PREFIX, 
+                                      SAMLConstants.XSI_NS)
+                namespaces.setdefault(SAMLConstants.XSD_PREFIX, 
+                                      SAMLConstants.XSD_NS)
                 
-            attributeValues.append(attributeValue)
-        
-        attributeQuery = AttributeQuery()
-        attributeQuery.version = SAMLVersion(attributeValues[0])
-        if attributeQuery.version != SAMLVersion.VERSION_20:
-            raise NotImplementedError("Parsing for %r is implemented for "
-                                      "SAML version %s only; version %s is " 
-                                      "not supported" % 
-                                      (cls,
-                                       SAMLVersion(SAMLVersion.VERSION_20),
-                                       SAMLVersion(attributeQuery.version)))
+        elif childDescriptor not in visited:
+            _getDescriptorNamespaces(childDescriptor, namespaces, visited)
             
-        attributeQuery.issueInstant = SAMLDateTime.fromString(
-                                                            attributeValues[1])
-        attributeQuery.id = attributeValues[2]
-        
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            if localName == Issuer.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Issuer
-                attributeQuery.issuer = IssuerElementTree.fromXML(childElem)
-                
-            elif localName == Subject.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Subject
-                attributeQuery.subject = SubjectElementTree.fromXML(childElem)
+    return namespaces
+
+
+def _makeToXML(descriptor):
+    """Make a toXML function for a SAML type
+    
+    @type descriptor: ndg.saml.xml.descriptor.SAMLTypeDescriptor
+    @param descriptor: description of the SAML type
+    @rtype: tuple
+    @return: function creating an ElementTree element from a SAML object for
+    use as a classmethod and, with the lxml backend, a function creating the
+    element as a child of another or None otherwise
+    """
+    samlClass = descriptor.samlClass
+    localName = descriptor.localName
+    elementName = descriptor.elementName
+    tag = elementName.clarkName
+    prefix = elementName.prefix
+    namespaceURI = elementName.namespaceURI
+    
+    attributes = tuple([(attribute.name, attribute.attrName, 
+                         attribute.required, attribute.toString,
+                         attribute.unsetError)
+                        for attribute in descriptor.attributes])
+    text = descriptor.text
+    serialisers = tuple([serialise for serialise in map(_makeChildSerialiser,
+                                                        descriptor.children)
+                         if serialise is not None])
+    
+    def makeAttrib(samlObject):
+        if not isinstance(samlObject, samlClass):
+            raise TypeError("Expecting %r class got %r" % (samlClass,
+                                                           type(samlObject)))
+        attrib = {}
+        for name, attrName, required, toString, unsetError in attributes:
+            value = getattr(samlObject, attrName)
+            if value is None or (value.__class__ is str and not value):
+                if required:
+                    raise unsetError("SAML %s %s is not set" % (localName,
+                                                                attrName))
+                continue
             
-            elif localName == Attribute.DEFAULT_ELEMENT_LOCAL_NAME:
-                attribute = AttributeElementTree.fromXML(childElem)
-                attributeQuery.attributes.append(attribute)
+            if toString is None:
+                attrib[name] = value
             else:
-                raise XMLTypeParseError("Unrecognised AttributeQuery child "
-                                          "element \"%s\"" % localName)
-        
-        return attributeQuery
+                attrib[name] = toString(value)
+        return attrib
+    
+    def addContent(elem, samlObject, kw, declared):
+        if text is not None:
+            value = getattr(samlObject, text.attrName)
+            if text.required and not value:
+                raise text.unsetError("SAML %s %s is not set" % (localName, 
+                                                                text.attrName))
+            elem.text = value
+            
+        for serialise in serialisers:
+            serialise(elem, samlObject, kw, declared)
+    
+    if USE_LXML_BACKEND:
+        # Namespaces to declare on the root element, found on first use so
+        # that all the types it may contain have been registered
+        rootNamespaces = []
+        
+        def toXML(cls, samlObject, **attributeValueElementTreeFactoryKw):
+            if attributeValueElementTreeFactoryKw:
+                attributeValueElementTreeFactoryKw = _resolveAttributeValueKw(
+                                        attributeValueElementTreeFactoryKw)
+            if not rootNamespaces:
+                nsmap = _getDescriptorNamespaces(descriptor)
+                rootNamespaces.append((nsmap, frozenset(nsmap.values())))
+                
+            nsmap, declared = rootNamespaces[0]
+            elem = ElementTree.Element(tag, makeAttrib(samlObject), 
+                                       nsmap=nsmap)
+            addContent(elem, samlObject, attributeValueElementTreeFactoryKw,
+                       declared)
+            return elem
+        
+        def subElementXML(parent, samlObject, kw, declared):
+            attrib = makeAttrib(samlObject)
+            if kw:
+                kw = _resolveAttributeValueKw(kw)
+            elem, declared = makeSubElement(parent, tag, prefix, namespaceURI,
+                                            declared, attrib)
+            addContent(elem, samlObject, kw, declared)
+            
+    else:
+        def toXML(cls, samlObject, **attributeValueElementTreeFactoryKw):
+            attrib = makeAttrib(samlObject)
+            if attributeValueElementTreeFactoryKw:
+                # Make any custom AttributeValue registry once for all values
+                attributeValueElementTreeFactoryKw = _resolveAttributeValueKw(
+                                        attributeValueElementTreeFactoryKw)
+                
+            elem = makeEtreeElement(tag, prefix, namespaceURI, attrib)
+            addContent(elem, samlObject, attributeValueElementTreeFactoryKw,
+                       None)
+            return elem
         
+        subElementXML = None
     
-class ResponseElementTree(Response):
-    """Represent a SAML Response in XML using ElementTree"""
+    if descriptor.keepSource:
+        # Objects parsed with keepSource set serialise to a copy of the
+        # element parsed while they are unchanged
+        makeToXML = toXML
+        def toXML(cls, samlObject, **attributeValueElementTreeFactoryKw):
+            sourceElem = _getUnchangedSourceElement(samlObject)
+            if sourceElem is not None:
+                return _copySourceElement(sourceElem)
+            
+            return makeToXML(cls, samlObject, 
+                             **attributeValueElementTreeFactoryKw)
+        
+        if subElementXML is not None:
+            makeSubElementXML = subElementXML
+            def subElementXML(parent, samlObject, kw, declared):
+                sourceElem = _getUnchangedSourceElement(samlObject)
+                if sourceElem is not None:
+                    _copySourceElement(sourceElem, parent)
+                else:
+                    makeSubElementXML(parent, samlObject, kw, declared)
+    
+    toXML.__name__ = 'toXML'
+    toXML.__doc__ = """Create an XML representation of the input SAML %s
         
-    @classmethod
-    def toXML(cls, response, **attributeValueElementTreeFactoryKw):
-        """Create an XML representation of the input SAML Response
-        object
-
-        @type response: saml.saml2.core.Response
-        @param response: SAML Response
+        @type %s: %s.%s
+        @param %s: SAML object to be represented as an ElementTree Element
         @type attributeValueElementTreeFactoryKw: dict
         @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
         factory
         @rtype: ElementTree.Element
-        @return: Response as ElementTree XML element
-        """
-        if not isinstance(response, Response):
-            raise TypeError("Expecting %r class, got %r" % (Response, 
-                                                            type(response)))
-         
-        if response.id is None:
-            raise TypeError("SAML Response id is not set")
-          
-        if response.issueInstant is None:
-            raise TypeError("SAML Response issueInstant is not set")
-        
-        # TODO: Does inResponseTo have to be set?  This implementation 
-        # currently enforces this ...
-        if response.inResponseTo is None:
-            raise TypeError("SAML Response inResponseTo identifier is not set")
-        
-        issueInstant = SAMLDateTime.toString(response.issueInstant)
-        attrib = {
-            cls.ID_ATTRIB_NAME: response.id,
-            cls.ISSUE_INSTANT_ATTRIB_NAME: issueInstant,
-            cls.IN_RESPONSE_TO_ATTRIB_NAME: response.inResponseTo,
-            
-            # Nb. Version is a SAMLVersion instance and requires explicit cast
-            cls.VERSION_ATTRIB_NAME: str(response.version)
-        }
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))        
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
+        @return: ElementTree Element
+        """ % (localName, localName, samlClass.__module__, samlClass.__name__,
+               localName)
+    return toXML, subElementXML
 
-        # Issuer may be omitted: saml-profiles-2.0-os Section 4.1.4.2
-        if response.issuer is not None: 
-            issuerElem = IssuerElementTree.toXML(response.issuer)
-            elem.append(issuerElem)
 
-        statusElem = StatusElementTree.toXML(response.status)       
-        elem.append(statusElem)
+def _getFieldAttrName(samlClass, attrName):
+    """Get the attribute to write a parsed value to
+    
+    @type samlClass: type
+    @param samlClass: SAML type
+    @type attrName: basestring
+    @param attrName: name of the SAML object attribute
+    @rtype: basestring
+    @return: slot of a SAMLObject derived type or attrName for its property 
+    setter or for other types
+    """
+    if issubclass(samlClass, SAMLObject):
+        return samlClass._getFieldAttrName(attrName)
+    return attrName
 
-        for assertion in response.assertions:
-            # Factory enables support for multiple attribute types
-            assertionElem = AssertionElementTree.toXML(assertion,
-                                        **attributeValueElementTreeFactoryKw)
-            elem.append(assertionElem)
-        
-        return elem
 
-    @classmethod
-    def fromXML(cls, elem, **attributeValueElementTreeFactoryKw):
-        """Parse ElementTree element into a SAML Response object
-        
-        @type elem: ElementTree.Element
-        @param elem: XML element containing the Response
-        @type attributeValueElementTreeFactoryKw: dict
-        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
-        @rtype: saml.saml2.core.Response
-        @return: Response object
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
+def _appendItem(items, item):
+    items.append(item)
 
-        if QName.getLocalPart(elem.tag) != Response.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                      Response.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        # Unpack attributes from top-level element
-        attributeValues = []
-        for attributeName in (Response.VERSION_ATTRIB_NAME,
-                              Response.ISSUE_INSTANT_ATTRIB_NAME,
-                              Response.ID_ATTRIB_NAME,
-                              Response.IN_RESPONSE_TO_ATTRIB_NAME):
-            attributeValue = elem.attrib.get(attributeName)
-            if attributeValue is None:
-                raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                        'element' %
-                                        (attributeName,
-                                         Response.DEFAULT_ELEMENT_LOCAL_NAME))
+
+def _makeChildParser(child, samlClass, lazy=False):
+    """Make a function parsing a child element into a SAML object.  Parsed
+    children are set or appended to lists without the property and list 
+    type checks
+    
+    @type child: ndg.saml.xml.descriptor.XMLChild / XMLUnsupportedChild
+    @param child: child element slot
+    @type samlClass: type
+    @param samlClass: SAML type of the parent
+    @type lazy: bool
+    @param lazy: add the child element to a LazyList to be parsed on first
+    access instead.  child must hold a list of children
+    @rtype: callable
+    @return: function taking the parent SAML object, child element, 
+    AttributeValue factory keywords and set of local names of the children
+    parsed so far
+    """
+    localName = child.localName
+    if isinstance(child, XMLUnsupportedChild):
+        message = "XML parse of %s element is not implemented" % localName
+        def parse(samlObject, childElem, kw, parsed):
+            raise NotImplementedError(message)
+        return parse
+    
+    attrName = _getFieldAttrName(samlClass, child.attrName)
+    etreeClass = _getChildElementTree(child)
+    if issubclass(samlClass, SAMLObject):
+        listAppend = list.append
+    else:
+        listAppend = _appendItem
+    passKw = child.passKw
+    selectKw = child.selectKw
+    if selectKw is not None and child.multiple:
+        def parse(samlObject, childElem, kw, parsed):
+            select = kw.get(selectKw)
+            if select is not None:
+                if not select(childElem.attrib):
+                    projectionSkips = kw.get('_projectionSkips')
+                    if projectionSkips is not None:
+                        projectionSkips.append(childElem)
+                    return
                 
-            attributeValues.append(attributeValue)
-        
-        response = Response()
-        response.version = SAMLVersion(attributeValues[0])
-        if response.version != SAMLVersion.VERSION_20:
-            raise NotImplementedError("Parsing for %r is implemented for "
-                                      "SAML version %s only; version %s is " 
-                                      "not supported" % 
-                                      (cls,
-                                       SAMLVersion(SAMLVersion.VERSION_20),
-                                       SAMLVersion(response.version)))
-            
-        response.issueInstant = SAMLDateTime.fromString(attributeValues[1])
-        response.id = attributeValues[2]
-        response.inResponseTo = attributeValues[3]
-        
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            if localName == Issuer.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Issuer
-                response.issuer = IssuerElementTree.fromXML(childElem)
-            
-            elif localName == Status.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Get status of response
-                response.status = StatusElementTree.fromXML(childElem)
+                # The selection applies to this level only
+                kw = dict(kw)
+                del kw[selectKw]
                 
-            elif localName == Subject.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Subject
-                response.subject = SubjectElementTree.fromXML(childElem)
-            
-            elif localName == Assertion.DEFAULT_ELEMENT_LOCAL_NAME:
-                assertion = AssertionElementTree.fromXML(childElem,
-                                        **attributeValueElementTreeFactoryKw)
-                response.assertions.append(assertion)
+            if passKw:
+                value = etreeClass.fromXML(childElem, **kw)
             else:
-                raise XMLTypeParseError('Unrecognised Response child '
-                                          'element "%s"' % localName)
-        
-        return response
+                value = etreeClass.fromXML(childElem)
+            listAppend(getattr(samlObject, attrName), value)
+            parsed.add(localName)
+        return parse
+    
+    if lazy:
+        def parse(samlObject, childElem, kw, parsed):
+            if localName not in parsed:
+                if passKw and kw:
+                    make = partial(etreeClass.fromXML, **kw)
+                else:
+                    make = etreeClass.fromXML
+                setattr(samlObject, attrName, LazyList(make))
+                parsed.add(localName)
+            getattr(samlObject, attrName).appendPending(childElem)
+        return parse
+    
+    if child.multiple:
+        def parse(samlObject, childElem, kw, parsed):
+            if passKw:
+                value = etreeClass.fromXML(childElem, **kw)
+            else:
+                value = etreeClass.fromXML(childElem)
+            listAppend(getattr(samlObject, attrName), value)
+            parsed.add(localName)
+        return parse
+    
+    def parse(samlObject, childElem, kw, parsed):
+        if localName in parsed:
+            raise XMLTypeParseError('Expecting at most one "%s" element' %
+                                    localName)
+        if passKw:
+            value = etreeClass.fromXML(childElem, **kw)
+        else:
+            value = etreeClass.fromXML(childElem)
+        setattr(samlObject, attrName, value)
+        parsed.add(localName)
+    return parse
 
 
-class ActionElementTree(Action):
-    """Represent a SAML authorization action in XML using ElementTree"""
+def _makeFromXML(descriptor):
+    """Make a fromXML function for a SAML type
     
-    @classmethod
-    def toXML(cls, action):
-        """Create an XML representation of the input SAML Name Identifier
-        object
-        @type action: saml.saml2.core.Action
-        @param action: SAML subject
-        @rtype: ElementTree.Element
-        @return: Name ID as ElementTree XML element
-        """
-        
-        if not isinstance(action, Action):
-            raise TypeError("Expecting %r class got %r" % (Action, 
-                                                           type(action)))
+    @type descriptor: ndg.saml.xml.descriptor.SAMLTypeDescriptor
+    @param descriptor: description of the SAML type
+    @rtype: callable
+    @return: function parsing an ElementTree element into a SAML object for
+    use as a classmethod
+    """
+    samlClass = descriptor.samlClass
+    localName = descriptor.localName
+    factory = descriptor.factory
+    keepSource = descriptor.keepSource
+    attributes = tuple([(attribute.name, 
+                         _getFieldAttrName(samlClass, attribute.attrName),
+                         attribute.required, attribute.fromString)
+                        for attribute in descriptor.attributes])
+    text = descriptor.text
+    if text is not None:
+        textAttrName = _getFieldAttrName(samlClass, text.attrName)
+    
+    # Dispatch on child element local name
+    parsers = {}
+    lazyParsers = {}
+    requiredChildren = []
+    hasExtensions = False
+    for child in descriptor.children:
+        if isinstance(child, XMLExtensionChild):
+            hasExtensions = True
+            extensionAttrName = child.attrName
+            continue
+        
+        parsers[child.localName] = _makeChildParser(child, samlClass)
+        if getattr(child, 'lazy', False) and child.multiple:
+            lazyParsers[child.localName] = _makeChildParser(child, samlClass,
+                                                            lazy=True)
             
-        if not action.namespace:
-            raise AttributeError("No action namespace set")
-        
-        attrib = {
-            cls.NAMESPACE_ATTRIB_NAME: action.namespace
-        }
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = ElementTree.Element(tag, **attrib)
-        
-        if not action.value:
-            raise AttributeError("No action name set")
-         
-        elem.text = action.value
-
-        return elem
-
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML Action object
-        
-        @type elem: ElementTree.Element
-        @param elem: Name ID as ElementTree XML element
-        @rtype: saml.saml2.core.Action
-        @return: SAML Name ID
-        """
+        if getattr(child, 'minOccurs', 0) > 0:
+            requiredChildren.append(child.localName)
+    
+    requiredChildren = tuple(requiredChildren)
+    if lazyParsers:
+        lazyParsers = dict(parsers, **lazyParsers)
+    else:
+        lazyParsers = parsers
+    
+    def fromXML(cls, elem, lazy=False, **attributeValueElementTreeFactoryKw):
         if not ElementTree.iselement(elem):
             raise TypeError("Expecting %r input type for parsing; got %r" %
                             (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-
-        namespace = elem.attrib.get(cls.NAMESPACE_ATTRIB_NAME)
-        if namespace is None:
-            # If no action namespace is set then spec. says to default to 
-            # Read/write/negation type (2.7.4.2 SAML 2 Core Spec.
-            # 15 March 2005).  However, set default to none to allow for
-            # misbehaving third party code ;)
-            action = Action(default_namespace=None)
-            log.warning('No "%s" attribute found in "%s" element - no action '
-                        'namespace set' %
-                        (cls.NAMESPACE_ATTRIB_NAME,
-                         cls.DEFAULT_ELEMENT_LOCAL_NAME))
-        else:
-            action = Action()
-            action.namespace = namespace
-
-        action.value = elem.text.strip() 
         
-        return action
-    
-    
-class AuthzDecisionQueryElementTree(AuthzDecisionQuery):
-    """Represent a SAML Attribute Query in XML using ElementTree"""
-        
-    @classmethod
-    def toXML(cls, authzDecisionQuery):
-        """Create an XML representation of the input SAML Authorization
-        Decision Query object
-
-        @type authzDecisionQuery: saml.saml2.core.AuthzDecisionQuery
-        @param authzDecisionQuery: SAML Authorization Decision Query
-        @rtype: ElementTree.Element
-        @return: Attribute Query as ElementTree XML element
-        """
-        if not isinstance(authzDecisionQuery, AuthzDecisionQuery):
-            raise TypeError("Expecting %r class got %r" % (AuthzDecisionQuery, 
-                                                    type(authzDecisionQuery)))
-            
-        if not authzDecisionQuery.resource:
-            raise AttributeError("No resource has been set for the "
-                                 "AuthzDecisionQuery")
-            
-        issueInstant = SAMLDateTime.toString(authzDecisionQuery.issueInstant)
-        attrib = {
-            cls.ID_ATTRIB_NAME: authzDecisionQuery.id,
-            cls.ISSUE_INSTANT_ATTRIB_NAME: issueInstant,
+        tag = elem.tag
+        if tag[tag.rfind('}') + 1:] != localName:
+            raise XMLTypeParseError('No "%s" element found' % localName)
+        
+        if attributeValueElementTreeFactoryKw:
+            attributeValueElementTreeFactoryKw = _resolveAttributeValueKw(
+                                        attributeValueElementTreeFactoryKw)
+        attrib = elem.attrib
+        samlObject = factory(attrib)
+        for name, attrName, required, fromString in attributes:
+            value = attrib.get(name)
+            if value is None:
+                if required:
+                    raise XMLTypeParseError('No "%s" attribute found in "%s" '
+                                            'element' % (name, localName))
+                continue
             
-            # Nb. Version is a SAMLVersion instance and requires explicit cast
-            cls.VERSION_ATTRIB_NAME: str(authzDecisionQuery.version),
+            if fromString is None:
+                setattr(samlObject, attrName, value)
+            else:
+                setattr(samlObject, attrName, fromString(value))
+                
+        if text is not None:
+            value = elem.text
+            if value is not None:
+                setattr(samlObject, textAttrName, value.strip())
+            elif text.required:
+                raise XMLTypeParseError('No "%s" element %s set' % 
+                                        (localName, text.attrName))
+            elif text.default is not None:
+                setattr(samlObject, textAttrName, text.default)
+        
+        if lazy:
+            childParsers = lazyParsers
+        else:
+            childParsers = parsers
             
-            cls.RESOURCE_ATTRIB_NAME: authzDecisionQuery.resource
-        }
-        
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
-        elem = makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
-                                cls.DEFAULT_ELEMENT_NAME.namespaceURI,
-                                **attrib)
-        
-        issuerElem = IssuerElementTree.toXML(authzDecisionQuery.issuer)
-        elem.append(issuerElem)
-
-        subjectElem = SubjectElementTree.toXML(authzDecisionQuery.subject)
-        elem.append(subjectElem)
-
-        for action in authzDecisionQuery.actions:
-            # Factory enables support for multiple attribute types
-            actionElem = ActionElementTree.toXML(action)
-            elem.append(actionElem)
-        
-        if (authzDecisionQuery.evidence and 
-            len(authzDecisionQuery.evidence.evidence) > 0):
-            raise NotImplementedError("Conversion of AuthzDecisionQuery "
-                                      "Evidence type to ElementTree Element is "
-                                      "not currently supported")
+        projectionSkips = None
+        if (keepSource and attributeValueElementTreeFactoryKw and
+            attributeValueElementTreeFactoryKw.get('keepSource')):
+            if 'attributeProjection' in attributeValueElementTreeFactoryKw:
+                # Track children skipped by the projection.  The list is 
+                # shared with any enclosing object also keeping its source
+                projectionSkips = attributeValueElementTreeFactoryKw.get(
+                                                        '_projectionSkips')
+                if projectionSkips is None:
+                    projectionSkips = []
+                    attributeValueElementTreeFactoryKw[
+                                    '_projectionSkips'] = projectionSkips
+                nSkipped = len(projectionSkips)
+            keepSourceElem = True
+        else:
+            keepSourceElem = False
             
-        return elem
-
-    @classmethod
-    def fromXML(cls, elem):
-        """Parse ElementTree element into a SAML AuthzDecisionQuery object
-        
-        @type elem: ElementTree.Element
-        @param elem: XML element containing the AuthzDecisionQuery
-        @rtype: saml.saml2.core.AuthzDecisionQuery
-        @return: AuthzDecisionQuery object
-        """
-        if not ElementTree.iselement(elem):
-            raise TypeError("Expecting %r input type for parsing; got %r" %
-                            (ElementTree.Element, elem))
-
-        if QName.getLocalPart(elem.tag) != cls.DEFAULT_ELEMENT_LOCAL_NAME:
-            raise XMLTypeParseError("No \"%s\" element found" %
-                                    cls.DEFAULT_ELEMENT_LOCAL_NAME)
-        
-        # Unpack attributes from top-level element
-        attributeValues = []
-        for attributeName in (cls.VERSION_ATTRIB_NAME,
-                              cls.ISSUE_INSTANT_ATTRIB_NAME,
-                              cls.ID_ATTRIB_NAME,
-                              cls.RESOURCE_ATTRIB_NAME):
-            attributeValue = elem.attrib.get(attributeName)
-            if attributeValue is None:
-                raise XMLTypeParseError('No "%s" attribute found in "%s" '
-                                 'element' %
-                                 (attributeName,
-                                  cls.DEFAULT_ELEMENT_LOCAL_NAME))
+        parsed = set()
+        for childElem in elem:
+            childTag = childElem.tag
+            if hasExtensions:
+                etreeImpl = _extensionElementTreeMap.get(childTag)
+                if etreeImpl is not None:
+                    getattr(samlObject, extensionAttrName).append(
+                                                etreeImpl.fromXML(childElem))
+                    continue
                 
-            attributeValues.append(attributeValue)
-        
-        authzDecisionQuery = AuthzDecisionQuery()
-        authzDecisionQuery.version = SAMLVersion(attributeValues[0])
-        if authzDecisionQuery.version != SAMLVersion.VERSION_20:
-            raise NotImplementedError("Parsing for %r is implemented for "
-                                      "SAML version %s only; version %s is " 
-                                      "not supported" % 
-                                      (cls,
-                                       SAMLVersion(SAMLVersion.VERSION_20),
-                                       SAMLVersion(authzDecisionQuery.version)))
+            childLocalName = childTag[childTag.rfind('}') + 1:]
+            parse = childParsers.get(childLocalName)
+            if parse is None:
+                raise XMLTypeParseError('%s child element name "%s" not '
+                                        'recognised' % 
+                                        (localName, childLocalName))
+            parse(samlObject, childElem, attributeValueElementTreeFactoryKw,
+                  parsed)
             
-        authzDecisionQuery.issueInstant = SAMLDateTime.fromString(
-                                                            attributeValues[1])
-        authzDecisionQuery.id = attributeValues[2]        
-        authzDecisionQuery.resource = attributeValues[3]
-        
-        for childElem in elem:
-            localName = QName.getLocalPart(childElem.tag)
-            if localName == Issuer.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Issuer
-                authzDecisionQuery.issuer = IssuerElementTree.fromXML(childElem)
+        for childLocalName in requiredChildren:
+            if childLocalName not in parsed:
+                raise XMLTypeParseError('Expecting a "%s" child element for '
+                                        'SAML "%s" element' % 
+                                        (childLocalName, localName))
                 
-            elif localName == Subject.DEFAULT_ELEMENT_LOCAL_NAME:
-                # Parse Subject
-                authzDecisionQuery.subject = SubjectElementTree.fromXML(childElem)
+        # The source element can't be used to serialise an object parsed 
+        # without some of its children
+        if keepSourceElem and (projectionSkips is None or 
+                               len(projectionSkips) == nSkipped):
+            samlObject.parsedSource = _ParsedSource(elem, samlObject)
             
-            elif localName == Action.DEFAULT_ELEMENT_LOCAL_NAME:
-                action = ActionElementTree.fromXML(childElem)
-                authzDecisionQuery.actions.append(action)
-            else:
-                raise XMLTypeParseError("Unrecognised AuthzDecisionQuery child "
-                                        "element \"%s\"" % localName)
+        return samlObject
+    
+    fromXML.__name__ = 'fromXML'
+    fromXML.__doc__ = """Parse an ElementTree element into a SAML %s object
         
-        return authzDecisionQuery
-
-def _getElementTreeImplementationForQName(qname):
-    key = ("{%s}%s" % (qname.namespaceURI, qname.localPart))
-    return _extensionElementTreeMap.get(key)
-
-def setElementTreeImplementationForQName(qname, impl):
-    key = ("{%s}%s" % (qname.namespaceURI, qname.localPart))
-    _extensionElementTreeMap[key] = impl
+        @type elem: ElementTree.Element
+        @param elem: ElementTree element containing the %s
+        @type lazy: bool
+        @param lazy: parse child elements described with lazy set when they
+        are first accessed.  Parse errors in them are raised then
+        @type attributeValueElementTreeFactoryKw: dict
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory and the parsing options attributeProjection and keepSource
+        @rtype: %s.%s
+        @return: SAML %s
+        """ % (localName, localName, samlClass.__module__, samlClass.__name__,
+               localName)
+    return fromXML
+
+
+def compileElementTreeClasses(*etreeClasses):
+    """Set toXML and fromXML for ElementTree classes generated from their 
+    DESCRIPTOR class variable.  The classes are also registered so that they
+    represent child elements of their respective SAML types.  Use this to
+    add new SAML types described with ndg.saml.xml.descriptor
+    
+    @type etreeClasses: tuple
+    @param etreeClasses: ElementTree classes each with a DESCRIPTOR class
+    variable set to a ndg.saml.xml.descriptor.SAMLTypeDescriptor
+    """
+    for etreeClass in etreeClasses:
+        if not isinstance(etreeClass.DESCRIPTOR, SAMLTypeDescriptor):
+            raise TypeError("Expecting %r for %r DESCRIPTOR; got %r" %
+                            (SAMLTypeDescriptor, etreeClass, 
+                             type(etreeClass.DESCRIPTOR)))
+        
+        _descriptorElementTreeMap[etreeClass.DESCRIPTOR.samlClass] = etreeClass
+    
+    # Children are resolved from the registry so compile only when all the 
+    # classes have been registered
+    for etreeClass in etreeClasses:
+        toXML, subElementXML = _makeToXML(etreeClass.DESCRIPTOR)
+        etreeClass.toXML = classmethod(toXML)
+        if subElementXML is not None:
+            _subElementXMLMap[etreeClass] = subElementXML
+        etreeClass.fromXML = classmethod(_makeFromXML(etreeClass.DESCRIPTOR))
+    
 
+_descriptorElementTreeMap[AttributeValue] = _AttributeValueElementTree
+
+compileElementTreeClasses(ConditionsElementTree,
+                          AssertionElementTree,
+                          AttributeStatementElementTree,
+                          AuthzDecisionStatementElementTree,
+                          AttributeElementTree,
+                          IssuerElementTree,
+                          NameIdElementTree,
+                          SubjectElementTree,
+                          StatusCodeElementTree,
+                          StatusMessageElementTree,
+                          StatusElementTree,
+                          AttributeQueryElementTree,
+                          ResponseElementTree,
+                          ActionElementTree,
+                          AuthzDecisionQueryElementTree)
@@ -21,7 +21,7 @@ from ndg.saml.saml2.core import Issuer
 from ndg.saml.saml2.xacml_profile import (XACMLAuthzDecisionQuery,
                                           XACMLAuthzDecisionStatement)
 from ndg.saml.utils import SAMLDateTime
-from ndg.saml.xml import XMLTypeParseError, UnknownAttrProfile
+from ndg.saml.xml import XMLTypeParseError
 import ndg.saml.xml.etree as etree
 from ndg.saml.xml.etree import (IssuerElementTree, QName,
                                 setElementTreeImplementationForQName)
@@ -62,7 +62,7 @@ class XACMLAuthzDecisionQueryElementTree(XACMLAuthzDecisionQuery):
             cls.VERSION_ATTRIB_NAME: str(xacmlAuthzDecisionQuery.version),
         }
 
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
+        tag = cls.DEFAULT_ELEMENT_NAME.clarkName
         elem = etree.makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
                                       cls.DEFAULT_ELEMENT_NAME.namespaceURI,
                                       **attrib)
@@ -151,7 +151,7 @@ class XACMLAuthzDecisionStatementElementTree(XACMLAuthzDecisionStatement):
             raise AttributeError("No xacmlContextResponse has been set for the "
                                  "XACMLAuthzDecisionStatement")
 
-        tag = str(QName.fromGeneric(cls.DEFAULT_ELEMENT_NAME))
+        tag = cls.DEFAULT_ELEMENT_NAME.clarkName
         elem = etree.makeEtreeElement(tag, cls.DEFAULT_ELEMENT_NAME.prefix,
                                       cls.DEFAULT_ELEMENT_NAME.namespaceURI)
 
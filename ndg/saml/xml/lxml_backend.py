@@ -0,0 +1,98 @@
+"""Implementation of SAML 2.0 for NDG Security - lxml specific element
+construction and parsing
+
+ndg.saml.xml.etree and ndg.soap.etree use these functions in place of the
+generic ElementTree code when lxml is in use and Config.use_lxml_backend is
+not set to False.  Namespaces are declared once on the root element of a
+document so that child elements are made with SubElement without namespace
+maps of their own, and XML is parsed with an XMLParser made once for each
+thread.  The choice is made when ndg.saml.xml.etree is first imported.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import threading
+
+from ndg.saml import Config, importElementTree
+ElementTree = importElementTree()
+
+# Set when this module is imported
+USE_LXML_BACKEND = bool(Config.use_lxml and
+                        Config.use_lxml_backend is not False)
+
+# Blank text between elements is not significant in SAML or SOAP messages.
+# Entities are not expanded to guard against entity expansion attacks
+PARSER_OPTIONS = {
+    'remove_blank_text': True,
+    'resolve_entities': False
+}
+
+_threadLocal = threading.local()
+
+
+def getParser():
+    """Get the XML parser for the calling thread.  lxml parsers may not be
+    used by more than one thread at once so each has its own
+
+    @rtype: lxml.etree.XMLParser
+    @return: parser configured with PARSER_OPTIONS
+    """
+    try:
+        return _threadLocal.parser
+    except AttributeError:
+        parser = ElementTree.XMLParser(**PARSER_OPTIONS)
+        _threadLocal.parser = parser
+        return parser
+
+
+def parse(source):
+    """Parse XML from a file
+
+    @type source: basestring / file like object
+    @param source: file path or file object
+    @rtype: lxml.etree._Element
+    @return: root element
+    """
+    return ElementTree.parse(source, getParser()).getroot()
+
+
+def fromstring(text):
+    """Parse XML from a string
+
+    @type text: basestring / bytes
+    @param text: XML
+    @rtype: lxml.etree._Element
+    @return: root element
+    """
+    return ElementTree.fromstring(text, getParser())
+
+
+def makeSubElement(parent, tag, prefix, namespaceURI, declared, attrib=None):
+    """Make a child element.  The namespace is only declared on the new
+    element if it is not already declared in the parent's scope
+
+    @type parent: lxml.etree._Element
+    @param parent: parent element
+    @type tag: basestring
+    @param tag: element tag in the form {namespace URI}local name
+    @type prefix: basestring
+    @param prefix: namespace prefix
+    @type namespaceURI: basestring
+    @param namespaceURI: namespace URI
+    @type declared: frozenset
+    @param declared: namespace URIs declared in the scope of parent
+    @type attrib: dict / None
+    @param attrib: element attributes
+    @rtype: tuple
+    @return: new element and namespace URIs declared in its scope
+    """
+    if namespaceURI in declared:
+        return ElementTree.SubElement(parent, tag, attrib), declared
+
+    elem = ElementTree.SubElement(parent, tag, attrib,
+                                  nsmap={prefix: namespaceURI})
+    return elem, declared | frozenset((namespaceURI,))
@@ -0,0 +1,255 @@
+"""Implementation of SAML 2.0 for NDG Security - namespace context for
+ElementTree serialisation
+
+With the standard library ElementTree, namespace prefixes are chosen at
+serialisation time from the process wide ElementTree._namespace_map.  Rather
+than writing to that map for every element created, prefixes are held in a
+NamespaceContext which is consulted once for each document serialised.
+The standard SAML prefixes are registered with ElementTree when this module
+is imported so that plain ElementTree.tostring calls still use them.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+from io import StringIO
+
+from ndg.saml import Config, importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.common.xml import SAMLConstants
+
+
+class NamespaceContext(object):
+    """Mapping of namespace URIs to the prefixes to use for them when
+    serialising.  Contexts may be chained: prefixes not declared in a
+    context are looked up from its parent.
+
+    Lookups don't modify the context so a context can be shared between
+    threads.  Create a child context with createChild to add declarations
+    for one document only.
+    """
+    __slots__ = ('__namespaces', '__parent')
+
+    def __init__(self, namespaces=None, parent=None):
+        """
+        @type namespaces: dict / None
+        @param namespaces: initial mapping of namespace URI to prefix
+        @type parent: NamespaceContext / None
+        @param parent: context to look up prefixes not declared in this one
+        """
+        if parent is not None and not isinstance(parent, NamespaceContext):
+            raise TypeError('Expecting %r for "parent"; got %r' %
+                            (NamespaceContext, type(parent)))
+        self.__parent = parent
+        self.__namespaces = {}
+        if namespaces is not None:
+            for namespaceURI, prefix in namespaces.items():
+                self.declare(namespaceURI, prefix)
+
+    def declare(self, namespaceURI, prefix):
+        """Set the prefix for a namespace
+
+        @type namespaceURI: basestring
+        @param namespaceURI: namespace URI
+        @type prefix: basestring
+        @param prefix: prefix to use for the namespace
+        """
+        if not isinstance(namespaceURI, str):
+            raise TypeError('Expecting string type for namespace URI; got %r'
+                            % type(namespaceURI))
+        if not isinstance(prefix, str):
+            raise TypeError('Expecting string type for namespace prefix; got '
+                            '%r' % type(prefix))
+        self.__namespaces[namespaceURI] = prefix
+
+    def getPrefix(self, namespaceURI):
+        """Get the prefix for a namespace
+
+        @type namespaceURI: basestring
+        @param namespaceURI: namespace URI
+        @rtype: basestring / None
+        @return: prefix or None if none is declared in this context or its
+        parents
+        """
+        context = self
+        while context is not None:
+            prefix = context.__namespaces.get(namespaceURI)
+            if prefix is not None:
+                return prefix
+            context = context.__parent
+        return None
+
+    def __contains__(self, namespaceURI):
+        """@rtype: bool
+        @return: True if a prefix is declared for the namespace in this
+        context or its parents
+        """
+        return self.getPrefix(namespaceURI) is not None
+
+    def createChild(self, namespaces=None):
+        """Create a context inheriting the declarations of this one
+
+        @type namespaces: dict / None
+        @param namespaces: mapping of namespace URI to prefix for the new
+        context
+        @rtype: NamespaceContext
+        @return: new context
+        """
+        return self.__class__(namespaces=namespaces, parent=self)
+
+    def _getQNames(self, elem):
+        """Identify the namespaces used in an element tree and the prefixed
+        names to serialise its qualified names with.  This follows
+        ElementTree's own _namespaces function but takes prefixes from this
+        context
+
+        @type elem: ElementTree.Element
+        @param elem: root element
+        @rtype: tuple
+        @return: map of qualified names to prefixed names and map of
+        namespace URIs to prefixes
+        """
+        qnames = {None: None}
+        namespaces = {}
+        usedPrefixes = set()
+
+        def addQName(qname):
+            if qname[:1] == "{":
+                namespaceURI, tag = qname[1:].rsplit("}", 1)
+                prefix = namespaces.get(namespaceURI)
+                if prefix is None:
+                    prefix = self.getPrefix(namespaceURI)
+                    if prefix is None:
+                        prefix = ElementTree._namespace_map.get(namespaceURI)
+
+                    # Fall back to a generated prefix if none is set or the
+                    # one set is already taken by another namespace in this
+                    # document
+                    if prefix is None or prefix in usedPrefixes:
+                        prefix = "ns%d" % len(namespaces)
+                    if prefix != "xml":
+                        namespaces[namespaceURI] = prefix
+                        usedPrefixes.add(prefix)
+
+                qnames[qname] = "%s:%s" % (prefix, tag)
+            else:
+                qnames[qname] = qname
+
+        for child in elem.iter():
+            tag = child.tag
+            if isinstance(tag, ElementTree.QName):
+                if tag.text not in qnames:
+                    addQName(tag.text)
+            elif isinstance(tag, str):
+                if tag not in qnames:
+                    addQName(tag)
+            elif (tag is not None and tag is not ElementTree.Comment and
+                  tag is not ElementTree.PI):
+                raise TypeError("cannot serialize %r (type %s)" %
+                                (tag, type(tag).__name__))
+
+            for key, value in child.items():
+                if isinstance(key, ElementTree.QName):
+                    key = key.text
+                if key not in qnames:
+                    addQName(key)
+                if (isinstance(value, ElementTree.QName) and
+                    value.text not in qnames):
+                    addQName(value.text)
+
+            text = child.text
+            if isinstance(text, ElementTree.QName) and text.text not in qnames:
+                addQName(text.text)
+
+        return qnames, namespaces
+
+    def tostring(self, elem, encoding=None):
+        """Serialise an element tree using the prefixes from this context.
+        The namespace declarations are written once on the root element.
+
+        @type elem: ElementTree.Element
+        @param elem: root element
+        @type encoding: basestring / None
+        @param encoding: output encoding.  As ElementTree.tostring,
+        "unicode" returns a string, otherwise bytes are returned encoded
+        with the given encoding or US-ASCII if None
+        @rtype: basestring / bytes
+        @return: serialised XML
+        """
+        if Config.use_lxml:
+            # lxml elements carry their own namespace maps
+            if encoding is None:
+                return ElementTree.tostring(elem)
+            return ElementTree.tostring(elem, encoding=encoding)
+
+        qnames, namespaces = self._getQNames(elem)
+        stream = StringIO()
+        if encoding is not None and encoding.lower() not in ('unicode',
+                                                             'utf-8', 'utf8',
+                                                             'us-ascii'):
+            stream.write("<?xml version='1.0' encoding='%s'?>\n" % encoding)
+
+        ElementTree._serialize_xml(stream.write, elem, qnames, namespaces,
+                                   short_empty_elements=True)
+        if encoding is not None and encoding.lower() == 'unicode':
+            return stream.getvalue()
+
+        return stream.getvalue().encode(encoding or 'us-ascii',
+                                        'xmlcharrefreplace')
+
+
+_STANDARD_NAMESPACES = {
+    SAMLConstants.SAML20_NS: SAMLConstants.SAML20_PREFIX,
+    SAMLConstants.SAML20P_NS: SAMLConstants.SAML20P_PREFIX,
+    SAMLConstants.XSI_NS: SAMLConstants.XSI_PREFIX,
+    SAMLConstants.XSD_NS: SAMLConstants.XSD_PREFIX
+}
+
+# Shared context for prefixes of the namespaces used in this package.  Element
+# factories add to it the first time they see a namespace and never
+# otherwise write to it
+defaultNamespaceContext = NamespaceContext(_STANDARD_NAMESPACES)
+
+
+def declareNamespace(namespaceURI, prefix):
+    """Add a prefix to the default context if none is already declared for
+    the namespace.  This is called by the element factories for each element
+    created and so only writes to the context the first time a namespace is
+    seen
+
+    @type namespaceURI: basestring
+    @param namespaceURI: namespace URI
+    @type prefix: basestring
+    @param prefix: namespace prefix
+    """
+    if (prefix and namespaceURI and
+        defaultNamespaceContext.getPrefix(namespaceURI) is None):
+        defaultNamespaceContext.declare(namespaceURI, prefix)
+
+
+def tostring(elem, encoding=None, context=None):
+    """Serialise an element tree using the prefixes from a namespace context
+
+    @type elem: ElementTree.Element
+    @param elem: root element
+    @type encoding: basestring / None
+    @param encoding: output encoding as for ElementTree.tostring
+    @type context: NamespaceContext / None
+    @param context: namespace context.  Defaults to defaultNamespaceContext
+    @rtype: basestring / bytes
+    @return: serialised XML
+    """
+    if context is None:
+        context = defaultNamespaceContext
+    return context.tostring(elem, encoding=encoding)
+
+
+if not Config.use_lxml:
+    # Registered once here so that ElementTree.tostring uses the standard
+    # prefixes too
+    for _namespaceURI, _prefix in _STANDARD_NAMESPACES.items():
+        ElementTree.register_namespace(_prefix, _namespaceURI)
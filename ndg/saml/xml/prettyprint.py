@@ -0,0 +1,271 @@
+"""Implementation of SAML 2.0 for NDG Security - pretty printing of
+ElementTree elements for debug and diagnostic output
+
+Elements are written in a single pass over the tree to a stream.  Namespace
+declarations are made on the element where a namespace is first used and
+apply to it and its children only.  Output may be capped at a maximum size
+so that large messages can be logged safely.
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+from io import StringIO
+
+from ndg.saml import Config, importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.xml import escapeText, escapeAttribute
+from ndg.saml.xml.namespace import defaultNamespaceContext
+
+
+def prettyPrint(elem, indent='', html=0, space=' '*4, stream=None,
+                maxSize=None, context=None):
+    '''Lightweight pretty printing of ElementTree elements.  This function
+    wraps the _PrettyPrint class
+
+    @param elem: ElementTree element
+    @type elem: ElementTree.Element
+    @param indent: indent for the root element
+    @type indent: basestring
+    @param html: unused, kept for compatibility with earlier versions
+    @type html: int
+    @param space: indent added for each level of child elements
+    @type space: basestring
+    @param stream: text stream to write to.  If None, the output is returned
+    @type stream: file like object / None
+    @param maxSize: maximum number of characters to write before the output
+    is truncated.  None for no limit
+    @type maxSize: int / None
+    @param context: namespace context giving the prefixes to use for
+    namespaces not already mapped by the elements themselves
+    @type context: ndg.saml.xml.namespace.NamespaceContext / None
+    @return: pretty print format for doc or None if stream is set
+    @rtype: basestring / None
+    '''
+    if stream is None:
+        output = StringIO()
+    else:
+        output = stream
+
+    _PrettyPrint(output, space=space, maxSize=maxSize, context=context)(
+                                                            elem, indent=indent)
+    if stream is None:
+        return output.getvalue()
+
+
+class _Truncated(Exception):
+    """Raised internally when the output size limit is reached"""
+
+
+class _PrettyPrint(object):
+    '''Class for lightweight pretty printing of ElementTree elements
+
+    @cvar MAX_NS_TRIES: maximum number of generated prefixes to try for a
+    namespace with none set
+    @type MAX_NS_TRIES: int
+    @cvar TRUNCATED_MSG: message appended to truncated output
+    @type TRUNCATED_MSG: string
+    '''
+    MAX_NS_TRIES = 256
+    TRUNCATED_MSG = '\n... [output truncated at %d characters]'
+
+    def __init__(self, stream, space=' '*4, maxSize=None, context=None):
+        """
+        @param stream: text stream to write to
+        @type stream: file like object
+        @param space: indent added for each level of child elements
+        @type space: basestring
+        @param maxSize: maximum number of characters to write.  None for no
+        limit
+        @type maxSize: int / None
+        @param context: namespace context giving the prefixes to use for
+        namespaces not already mapped by the elements themselves
+        @type context: ndg.saml.xml.namespace.NamespaceContext / None
+        """
+        if maxSize is not None and maxSize < 0:
+            raise ValueError('Expecting zero or positive "maxSize"; got %r' %
+                             maxSize)
+        self.__write = stream.write
+        self.__space = space
+        self.__maxSize = maxSize
+        self.__nChars = 0
+        if context is None:
+            self.__context = defaultNamespaceContext
+        else:
+            self.__context = context
+
+    @staticmethod
+    def estrip(elem):
+        '''Utility to remove unwanted leading and trailing whitespace
+
+        @param elem: ElementTree element
+        @type elem: ElementTree.Element
+        @return: element content with whitespace removed
+        @rtype: basestring'''
+        if elem is None:
+            return ''
+        else:
+            # just in case the elem is another simple type - e.g. int -
+            # wrapper it as a string
+            return str(elem).strip()
+
+    def __call__(self, elem, indent=''):
+        '''Write an element and its children
+
+        @param elem: ElementTree element
+        @type elem: ElementTree.Element
+        @param indent: indent for the element
+        @type indent: basestring
+        @return: False if the output was truncated, True otherwise
+        @rtype: bool
+        '''
+        try:
+            self._writeElem(elem, indent, {}, {},
+                            rootNamespaces=getattr(elem, 'nsmap', None))
+        except _Truncated:
+            self.__write(self.__class__.TRUNCATED_MSG % self.__maxSize)
+            return False
+        return True
+
+    def _write(self, text):
+        """Write to the stream, raising _Truncated if the size limit is
+        reached
+
+        @param text: text to write
+        @type text: basestring
+        """
+        if self.__maxSize is not None:
+            remaining = self.__maxSize - self.__nChars
+            if len(text) > remaining:
+                self.__write(text[:remaining])
+                self.__nChars = self.__maxSize
+                raise _Truncated()
+
+        self.__nChars += len(text)
+        self.__write(text)
+
+    def _getPrefix(self, namespaceURI, preferredPrefix, prefixes, namespaces,
+                   declarations):
+        """Get the prefix for a namespace declaring it if it is not already
+        declared in scope.  prefixes and namespaces are copied before a
+        declaration is added so that it applies to the current element and
+        its children only
+
+        @param namespaceURI: namespace URI
+        @type namespaceURI: basestring
+        @param preferredPrefix: prefix to use if the namespace needs to be
+        declared
+        @type preferredPrefix: basestring / None
+        @param prefixes: map of prefix to namespace URI for declarations in
+        scope
+        @type prefixes: dict
+        @param namespaces: map of namespace URI to prefix for declarations in
+        scope
+        @type namespaces: dict
+        @param declarations: namespace declarations made by the current
+        element.  New declarations are appended
+        @type declarations: list
+        @return: prefix and prefix and namespace maps for the current element
+        @rtype: tuple
+        """
+        prefix = namespaces.get(namespaceURI)
+        if prefix is not None:
+            return prefix, prefixes, namespaces
+
+        if preferredPrefix is None:
+            preferredPrefix = self.__context.getPrefix(namespaceURI)
+            if preferredPrefix is None and not Config.use_lxml:
+                preferredPrefix = ElementTree._namespace_map.get(namespaceURI)
+
+        if preferredPrefix is not None and preferredPrefix not in prefixes:
+            prefix = preferredPrefix
+        else:
+            for i in range(self.__class__.MAX_NS_TRIES):
+                if "ns%d" % i not in prefixes:
+                    prefix = "ns%d" % i
+                    break
+            else:
+                raise KeyError('prettyPrint: error allocating a prefix for '
+                               'namespace "%s"' % namespaceURI)
+
+        if not declarations:
+            prefixes = prefixes.copy()
+            namespaces = namespaces.copy()
+
+        prefixes[prefix] = namespaceURI
+        namespaces[namespaceURI] = prefix
+        declarations.append(' xmlns:%s="%s"' % (prefix,
+                                                 escapeAttribute(namespaceURI)))
+        return prefix, prefixes, namespaces
+
+    def _writeElem(self, elem, indent, prefixes, namespaces,
+                   rootNamespaces=None):
+        '''Write an element and its children
+
+        @param elem: ElementTree element
+        @type elem: ElementTree.Element
+        @param indent: indent for the element
+        @type indent: basestring
+        @param prefixes: map of prefix to namespace URI for declarations in
+        scope
+        @type prefixes: dict
+        @param namespaces: map of namespace URI to prefix for declarations in
+        scope
+        @type namespaces: dict
+        @param rootNamespaces: map of prefix to namespace URI to declare on
+        this element.  lxml root elements pass their nsmap so that prefixes
+        used in attribute values such as xsi:type are declared
+        @type rootNamespaces: dict / None
+        '''
+        tag = elem.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions
+            return
+
+        declarations = []
+        if rootNamespaces:
+            for prefix, namespaceURI in rootNamespaces.items():
+                if prefix is not None:
+                    _, prefixes, namespaces = self._getPrefix(namespaceURI,
+                                                prefix, prefixes, namespaces,
+                                                declarations)
+        if tag[:1] == '{':
+            namespaceURI, localName = tag[1:].split('}', 1)
+
+            # lxml elements keep the prefix they were made or parsed with
+            prefix, prefixes, namespaces = self._getPrefix(namespaceURI,
+                                                getattr(elem, 'prefix', None),
+                                                prefixes, namespaces,
+                                                declarations)
+            tag = "%s:%s" % (prefix, localName)
+
+        strAttribs = []
+        for attr, attrVal in elem.attrib.items():
+            if attr[:1] == '{':
+                namespaceURI, localName = attr[1:].split('}', 1)
+                prefix, prefixes, namespaces = self._getPrefix(namespaceURI,
+                                                None, prefixes, namespaces,
+                                                declarations)
+                attr = "%s:%s" % (prefix, localName)
+
+            strAttribs.append(' %s="%s"' % (attr, escapeAttribute(attrVal)))
+
+        self._write('%s<%s%s%s>%s' % (indent, tag, ''.join(declarations),
+                                      ''.join(strAttribs),
+                                      escapeText(self.estrip(elem.text))))
+        if len(elem):
+            childIndent = indent + self.__space
+            for child in elem:
+                self._write('\n')
+                self._writeElem(child, childIndent, prefixes, namespaces)
+                tail = self.estrip(child.tail)
+                if tail:
+                    self._write(escapeText(tail))
+
+            self._write('\n%s</%s>' % (indent, tag))
+        else:
+            self._write('</%s>' % tag)
@@ -0,0 +1,1046 @@
+"""Implementation of SAML 2.0 for NDG Security - event driven deserialiser
+which builds SAML objects directly from expat parser events without first
+building an ElementTree
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+
+from xml.parsers import expat
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import (Attribute, AttributeStatement,
+                                 AuthzDecisionStatement, Assertion, Conditions,
+                                 AttributeValue, AttributeQuery,
+                                 AuthzDecisionQuery, Subject, NameID, Issuer,
+                                 Response, Status, StatusCode, StatusMessage,
+                                 StatusDetail, Action, Advice, AuthnStatement,
+                                 Evidence, DecisionType,
+                                 XSStringAttributeValue)
+from ndg.saml.common import SAMLVersion
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.utils import SAMLDateTime
+from ndg.saml.xml import XMLTypeParseError, UnknownAttrProfile
+from ndg.saml.xml.descriptor import XMLChild
+from ndg.saml.xml.etree import (AttributeValueElementTreeFactory,
+                                AttributeProjection,
+                                _getElementTreeImplementationForQName, QName,
+                                AssertionElementTree,
+                                AttributeStatementElementTree,
+                                AuthzDecisionStatementElementTree,
+                                AttributeElementTree, SubjectElementTree,
+                                StatusElementTree, AttributeQueryElementTree,
+                                ResponseElementTree,
+                                AuthzDecisionQueryElementTree)
+
+# expat reports namespace qualified names as "<namespace URI>}<local name>"
+# so that Clark notation is made by prefixing "{"
+_NS_SEPARATOR = '}'
+
+
+def _clark(name):
+    if _NS_SEPARATOR in name:
+        return '{' + name
+    else:
+        return name
+
+
+def _getAttributeValues(attrib, attributeNames, localName):
+    """Get mandatory XML attribute values for an element
+
+    @param attrib: XML attributes of element
+    @type attrib: dict
+    @param attributeNames: names of the attributes to get
+    @type attributeNames: tuple
+    @param localName: element local name for error messages
+    @type localName: basestring
+    @return: attribute values in the order given in attributeNames
+    @rtype: list
+    @raise XMLTypeParseError: an attribute is missing
+    """
+    attributeValues = []
+    for attributeName in attributeNames:
+        attributeValue = attrib.get(attributeName)
+        if attributeValue is None:
+            raise XMLTypeParseError('No "%s" attribute found in "%s" element' %
+                                    (attributeName, localName))
+        attributeValues.append(attributeValue)
+
+    return attributeValues
+
+
+def _getVersion(value, samlClass):
+    version = SAMLVersion(value)
+    if version != SAMLVersion.VERSION_20:
+        raise NotImplementedError("Parsing for %r is implemented for SAML "
+                                  "version %s only; version %s is not "
+                                  "supported" %
+                                  (samlClass,
+                                   SAMLVersion(SAMLVersion.VERSION_20),
+                                   version))
+    return version
+
+
+def _getOccurrences(descriptor):
+    """Get the child element occurrence rules of a SAML type from the
+    descriptor of its ElementTree representation so that both parsers accept
+    the same documents
+
+    @param descriptor: description of the SAML type
+    @type descriptor: ndg.saml.xml.descriptor.SAMLTypeDescriptor
+    @return: child element local name to maximum number of occurrences for
+    children with an upper bound and tuple of local names of mandatory
+    children or None if there are no rules to check
+    @rtype: tuple / NoneType
+    """
+    maxOccurs = {}
+    requiredChildren = []
+    for child in descriptor.children:
+        if not isinstance(child, XMLChild):
+            continue
+        if child.maxOccurs is not None:
+            maxOccurs[child.localName] = child.maxOccurs
+        if child.minOccurs > 0:
+            requiredChildren.append(child.localName)
+
+    if not maxOccurs and not requiredChildren:
+        return None
+
+    return maxOccurs, tuple(requiredChildren)
+
+
+class _ElementTreeParser(object):
+    """Marker for elements with no handler here.  A subtree is built for them
+    from the parser events and passed to an ElementTree based parse function
+    """
+    __slots__ = ('fromXML',)
+
+    def __init__(self, fromXML):
+        self.fromXML = fromXML
+
+
+class _ElementHandler(object):
+    """Base class for building a SAML object from the events for an element.
+    Handlers are not instantiated - all methods are class methods.
+
+    @cvar LOCAL_NAME: local name of element handled
+    @type LOCAL_NAME: basestring
+    @cvar COLLECT_TEXT: set to True to collect the text content of the element
+    @type COLLECT_TEXT: bool
+    @cvar CHILD_HANDLERS: child element local name to handler and function to
+    attach the child object to this one
+    @type CHILD_HANDLERS: dict
+    @cvar OCCURRENCES: child element occurrence rules as returned by
+    _getOccurrences or None if there are none
+    @type OCCURRENCES: tuple / NoneType
+    """
+    LOCAL_NAME = None
+    COLLECT_TEXT = False
+    CHILD_HANDLERS = {}
+    OCCURRENCES = None
+
+    @classmethod
+    def start(cls, attrib, parser):
+        """Make the SAML object for this element from its XML attributes.
+        Objects are made with _from_fields as their values are checked here
+
+        @param attrib: XML attributes
+        @type attrib: dict
+        @param parser: parser instance
+        @type parser: SAMLPullParser
+        @return: new SAML object.  Elements with no children may return the
+        values to make it from in end with the text instead
+        @rtype: ndg.saml.common.SAMLObject
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def end(cls, obj, text, nChildren):
+        """Complete the SAML object at the end of the element
+
+        @param obj: SAML object or values returned by start
+        @type obj: ndg.saml.common.SAMLObject
+        @param text: element text content or None if COLLECT_TEXT is False or
+        there is none
+        @type text: basestring / NoneType
+        @param nChildren: number of child elements
+        @type nChildren: int
+        @return: completed SAML object
+        @rtype: ndg.saml.common.SAMLObject
+        """
+        return obj
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        """Get the handler for a child element
+
+        @param localName: child element local name
+        @type localName: basestring
+        @param name: child element name as reported by expat
+        @type name: basestring
+        @param attrib: child element XML attributes
+        @type attrib: dict
+        @param parser: parser instance
+        @type parser: SAMLPullParser
+        @return: handler and function to attach child object to its parent
+        @rtype: tuple
+        """
+        handlerAndAttach = cls.CHILD_HANDLERS.get(localName)
+        if handlerAndAttach is None:
+            raise XMLTypeParseError('%s child element name "%s" not '
+                                    'recognised' % (cls.LOCAL_NAME, localName))
+        return handlerAndAttach
+
+
+class _IgnoreHandler(_ElementHandler):
+    """Skip an element and all its children e.g. SOAP Header"""
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return None
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        return cls, _attachNothing
+
+
+def _attachNothing(parent, obj):
+    pass
+
+
+class _IssuerHandler(_ElementHandler):
+    LOCAL_NAME = Issuer.DEFAULT_ELEMENT_LOCAL_NAME
+    COLLECT_TEXT = True
+
+    @classmethod
+    def start(cls, attrib, parser):
+        # Issuer format may be omitted from a response: saml-profiles-2.0-os,
+        # Section 4.1.4.2
+        return attrib.get(Issuer.FORMAT_ATTRIB_NAME)
+
+    @classmethod
+    def end(cls, issuerFormat, text, nChildren):
+        if text is None:
+            raise XMLTypeParseError('No SAML issuer value set')
+
+        return Issuer._from_fields(format=issuerFormat, value=text.strip())
+
+
+class _NameIDHandler(_ElementHandler):
+    LOCAL_NAME = NameID.DEFAULT_ELEMENT_LOCAL_NAME
+    COLLECT_TEXT = True
+
+    @classmethod
+    def start(cls, attrib, parser):
+        nameIDFormat, = _getAttributeValues(attrib,
+                                            (NameID.FORMAT_ATTRIB_NAME,),
+                                            cls.LOCAL_NAME)
+        return nameIDFormat
+
+    @classmethod
+    def end(cls, nameIDFormat, text, nChildren):
+        if text is None:
+            value = ''
+        else:
+            value = text.strip()
+
+        return NameID._from_fields(format=nameIDFormat, value=value)
+
+
+class _SubjectHandler(_ElementHandler):
+    LOCAL_NAME = Subject.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return Subject._from_fields()
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        if localName != NameID.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise XMLTypeParseError('No "%s" element found' %
+                                    NameID.DEFAULT_ELEMENT_LOCAL_NAME)
+        return _NameIDHandler, _setNameID
+
+
+def _setNameID(subject, nameID):
+    subject.nameID = nameID
+
+
+class _StatusCodeHandler(_ElementHandler):
+    LOCAL_NAME = StatusCode.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        value, = _getAttributeValues(attrib, (StatusCode.VALUE_ATTRIB_NAME,),
+                                     cls.LOCAL_NAME)
+        return StatusCode._from_fields(value=value)
+
+
+class _StatusMessageHandler(_ElementHandler):
+    LOCAL_NAME = StatusMessage.DEFAULT_ELEMENT_LOCAL_NAME
+    COLLECT_TEXT = True
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return None
+
+    @classmethod
+    def end(cls, obj, text, nChildren):
+        if text is None:
+            return StatusMessage._from_fields()
+
+        return StatusMessage._from_fields(value=text.strip())
+
+
+class _StatusHandler(_ElementHandler):
+    LOCAL_NAME = Status.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return Status._from_fields()
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        if localName == StatusDetail.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise NotImplementedError("XML parse of %s element is not "
+                                      "implemented" %
+                                      StatusDetail.DEFAULT_ELEMENT_LOCAL_NAME)
+
+        return super(_StatusHandler, cls).child(localName, name, attrib,
+                                                parser)
+
+
+def _setStatusCode(status, statusCode):
+    status.statusCode = statusCode
+
+
+def _setStatusMessage(status, statusMessage):
+    status.statusMessage = statusMessage
+
+
+_StatusHandler.CHILD_HANDLERS = {
+    StatusCode.DEFAULT_ELEMENT_LOCAL_NAME: (_StatusCodeHandler,
+                                            _setStatusCode),
+    StatusMessage.DEFAULT_ELEMENT_LOCAL_NAME: (_StatusMessageHandler,
+                                               _setStatusMessage)
+}
+
+
+class _ConditionsHandler(_ElementHandler):
+    LOCAL_NAME = Conditions.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        fields = {}
+        notBefore = attrib.get(Conditions.NOT_BEFORE_ATTRIB_NAME)
+        if notBefore is not None:
+            fields['notBefore'] = SAMLDateTime.fromString(notBefore)
+
+        notOnOrAfter = attrib.get(Conditions.NOT_ON_OR_AFTER_ATTRIB_NAME)
+        if notOnOrAfter is not None:
+            fields['notOnOrAfter'] = SAMLDateTime.fromString(notOnOrAfter)
+
+        return Conditions._from_fields(**fields)
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        raise NotImplementedError("Conditions list parsing is not "
+                                  "implemented")
+
+
+class _ActionHandler(_ElementHandler):
+    LOCAL_NAME = Action.DEFAULT_ELEMENT_LOCAL_NAME
+    COLLECT_TEXT = True
+
+    @classmethod
+    def start(cls, attrib, parser):
+        namespace = attrib.get(Action.NAMESPACE_ATTRIB_NAME)
+        if namespace is None:
+            # As ActionElementTree.fromXML - allow for third party code which
+            # omits the namespace
+            log.warning('No "%s" attribute found in "%s" element - no action '
+                        'namespace set', Action.NAMESPACE_ATTRIB_NAME,
+                        cls.LOCAL_NAME)
+        return namespace
+
+    @classmethod
+    def end(cls, namespace, text, nChildren):
+        # Namespace and value are checked against the action types
+        if namespace is None:
+            action = Action(default_namespace=None)
+            action.value = (text or '').strip()
+            return action
+
+        return Action._from_fields(namespace=namespace, 
+                                   value=(text or '').strip())
+
+
+class _XSStringAttributeValueHandler(_ElementHandler):
+    LOCAL_NAME = AttributeValue.DEFAULT_ELEMENT_LOCAL_NAME
+    COLLECT_TEXT = True
+    TYPE_ATTRIB_NAME = SAMLConstants.XSI_NS + _NS_SEPARATOR + 'type'
+
+    @classmethod
+    def start(cls, attrib, parser):
+        typeValue = attrib.get(cls.TYPE_ATTRIB_NAME, '')
+        typeValueLocalName = typeValue.split(':')[-1]
+        if typeValueLocalName != XSStringAttributeValue.TYPE_LOCAL_NAME:
+            raise XMLTypeParseError('Expecting "%s" type; got "%s"' %
+                                    (XSStringAttributeValue.TYPE_LOCAL_NAME,
+                                     typeValueLocalName))
+
+        return None
+
+    @classmethod
+    def end(cls, obj, text, nChildren):
+        if text is None:
+            return XSStringAttributeValue._from_fields()
+
+        return XSStringAttributeValue._from_fields(value=text.strip())
+
+
+class _AttributeHandler(_ElementHandler):
+    LOCAL_NAME = Attribute.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        # Name is mandatory in the schema
+        name, = _getAttributeValues(attrib, (Attribute.NAME_ATTRIB_NAME,),
+                                    cls.LOCAL_NAME)
+        fields = {'name': name}
+
+        friendlyName = attrib.get(Attribute.FRIENDLY_NAME_ATTRIB_NAME)
+        if friendlyName is not None:
+            fields['friendlyName'] = friendlyName
+
+        nameFormat = attrib.get(Attribute.NAME_FORMAT_ATTRIB_NAME)
+        if nameFormat is not None:
+            fields['nameFormat'] = nameFormat
+
+        return Attribute._from_fields(**fields)
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        if localName != AttributeValue.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise XMLTypeParseError('Expecting "%s" element; found "%s"' %
+                                    (AttributeValue.DEFAULT_ELEMENT_LOCAL_NAME,
+                                     localName))
+
+        attributeValueParser = parser._attributeValueParser
+        if attributeValueParser is not None:
+            # Custom types are matched against the element by the factory
+            return attributeValueParser, _appendAttributeValue
+
+        # Match xs:string as the default factory does - any attribute with
+        # local name "type"
+        for attribName, attribVal in attrib.items():
+            if attribName.rpartition(_NS_SEPARATOR)[-1] == 'type':
+                if (attribVal.split(':')[-1] ==
+                    XSStringAttributeValue.TYPE_LOCAL_NAME):
+                    return (_XSStringAttributeValueHandler,
+                            _appendAttributeValue)
+                break
+
+        raise UnknownAttrProfile("no matching XMLType class representation "
+                                 "for SAML AttributeValue type with "
+                                 "attributes %r" % attrib)
+
+
+# Parsed children are appended without the TypedList item type check
+def _appendAttributeValue(attribute, attributeValue):
+    list.append(attribute.attributeValues, attributeValue)
+
+
+class _AttributeStatementHandler(_ElementHandler):
+    LOCAL_NAME = AttributeStatement.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return AttributeStatement._from_fields()
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        if localName != Attribute.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise XMLTypeParseError('No "%s" element found' %
+                                    Attribute.DEFAULT_ELEMENT_LOCAL_NAME)
+        
+        projection = parser._attributeProjection
+        if projection is not None and not projection(attrib):
+            return _IgnoreHandler, _attachNothing
+        
+        return _AttributeHandler, _appendAttribute
+
+
+def _appendAttribute(parent, attribute):
+    list.append(parent.attributes, attribute)
+
+
+class _AuthzDecisionStatementHandler(_ElementHandler):
+    LOCAL_NAME = AuthzDecisionStatement.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        decision, resource = _getAttributeValues(attrib,
+                                (AuthzDecisionStatement.DECISION_ATTRIB_NAME,
+                                 AuthzDecisionStatement.RESOURCE_ATTRIB_NAME),
+                                cls.LOCAL_NAME)
+
+        return AuthzDecisionStatement._from_fields(
+                                            decision=DecisionType(decision),
+                                            resource=resource)
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        if localName == Evidence.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise NotImplementedError("XML parse of %s element is not "
+                                      "implemented" %
+                                      Evidence.DEFAULT_ELEMENT_LOCAL_NAME)
+
+        return super(_AuthzDecisionStatementHandler, cls).child(localName,
+                                                                name, attrib,
+                                                                parser)
+
+
+def _appendAction(parent, action):
+    list.append(parent.actions, action)
+
+
+_AuthzDecisionStatementHandler.CHILD_HANDLERS = {
+    Action.DEFAULT_ELEMENT_LOCAL_NAME: (_ActionHandler, _appendAction)
+}
+
+
+def _setIssuer(parent, issuer):
+    parent.issuer = issuer
+
+
+def _setSubject(parent, subject):
+    parent.subject = subject
+
+
+class _AssertionHandler(_ElementHandler):
+    LOCAL_NAME = Assertion.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        version, issueInstant, id = _getAttributeValues(attrib,
+                                        (Assertion.VERSION_ATTRIB_NAME,
+                                         Assertion.ISSUE_INSTANT_ATTRIB_NAME,
+                                         Assertion.ID_ATTRIB_NAME),
+                                        cls.LOCAL_NAME)
+        return Assertion._from_fields(
+                            version=_getVersion(version, Assertion),
+                            issueInstant=SAMLDateTime.fromString(issueInstant),
+                            id=id)
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        handlerAndAttach = cls.CHILD_HANDLERS.get(localName)
+        if handlerAndAttach is not None:
+            return handlerAndAttach
+
+        if localName == Advice.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise NotImplementedError("Assertion Advice parsing is not "
+                                      "implemented")
+
+        # Extension statements are parsed by their registered ElementTree
+        # implementation
+        statementElementTree = _getElementTreeImplementationForQName(
+                                                            QName(_clark(name)))
+        if statementElementTree is not None:
+            return (_ElementTreeParser(statementElementTree.fromXML),
+                    _appendStatement)
+
+        if localName == AuthnStatement.DEFAULT_ELEMENT_LOCAL_NAME:
+            raise NotImplementedError("Assertion Authentication Statement "
+                                      "parsing is not implemented")
+
+        handlerAndAttach = cls.STATEMENT_HANDLERS.get(localName)
+        if handlerAndAttach is None:
+            raise XMLTypeParseError('Assertion child element name "%s" not '
+                                    'recognised' % localName)
+        return handlerAndAttach
+
+
+def _setConditions(assertion, conditions):
+    assertion.conditions = conditions
+
+
+def _appendStatement(assertion, statement):
+    list.append(assertion.statements, statement)
+
+
+def _appendAuthzDecisionStatement(assertion, authzDecisionStatement):
+    list.append(assertion.authzDecisionStatements, authzDecisionStatement)
+
+
+def _appendAttributeStatement(assertion, attributeStatement):
+    list.append(assertion.attributeStatements, attributeStatement)
+
+
+_AssertionHandler.CHILD_HANDLERS = {
+    Issuer.DEFAULT_ELEMENT_LOCAL_NAME: (_IssuerHandler, _setIssuer),
+    Subject.DEFAULT_ELEMENT_LOCAL_NAME: (_SubjectHandler, _setSubject),
+    Conditions.DEFAULT_ELEMENT_LOCAL_NAME: (_ConditionsHandler,
+                                            _setConditions)
+}
+
+# Checked after extension statements
+_AssertionHandler.STATEMENT_HANDLERS = {
+    AuthzDecisionStatement.DEFAULT_ELEMENT_LOCAL_NAME: (
+                                            _AuthzDecisionStatementHandler,
+                                            _appendAuthzDecisionStatement),
+    AttributeStatement.DEFAULT_ELEMENT_LOCAL_NAME: (
+                                            _AttributeStatementHandler,
+                                            _appendAttributeStatement)
+}
+
+
+class _ResponseHandler(_ElementHandler):
+    LOCAL_NAME = Response.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        version, issueInstant, id, inResponseTo = _getAttributeValues(attrib,
+                                        (Response.VERSION_ATTRIB_NAME,
+                                         Response.ISSUE_INSTANT_ATTRIB_NAME,
+                                         Response.ID_ATTRIB_NAME,
+                                         Response.IN_RESPONSE_TO_ATTRIB_NAME),
+                                        cls.LOCAL_NAME)
+        return Response._from_fields(
+                            version=_getVersion(version, Response),
+                            issueInstant=SAMLDateTime.fromString(issueInstant),
+                            id=id,
+                            inResponseTo=inResponseTo)
+
+
+def _setStatus(response, status):
+    response.status = status
+
+
+def _appendAssertion(response, assertion):
+    list.append(response.assertions, assertion)
+
+
+_ResponseHandler.CHILD_HANDLERS = {
+    Issuer.DEFAULT_ELEMENT_LOCAL_NAME: (_IssuerHandler, _setIssuer),
+    Status.DEFAULT_ELEMENT_LOCAL_NAME: (_StatusHandler, _setStatus),
+    Assertion.DEFAULT_ELEMENT_LOCAL_NAME: (_AssertionHandler,
+                                           _appendAssertion)
+}
+
+
+class _AttributeQueryHandler(_ElementHandler):
+    LOCAL_NAME = AttributeQuery.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        version, issueInstant, id = _getAttributeValues(attrib,
+                                    (AttributeQuery.VERSION_ATTRIB_NAME,
+                                     AttributeQuery.ISSUE_INSTANT_ATTRIB_NAME,
+                                     AttributeQuery.ID_ATTRIB_NAME),
+                                    cls.LOCAL_NAME)
+        return AttributeQuery._from_fields(
+                            version=_getVersion(version, AttributeQuery),
+                            issueInstant=SAMLDateTime.fromString(issueInstant),
+                            id=id)
+
+
+_AttributeQueryHandler.CHILD_HANDLERS = {
+    Issuer.DEFAULT_ELEMENT_LOCAL_NAME: (_IssuerHandler, _setIssuer),
+    Subject.DEFAULT_ELEMENT_LOCAL_NAME: (_SubjectHandler, _setSubject),
+    Attribute.DEFAULT_ELEMENT_LOCAL_NAME: (_AttributeHandler,
+                                           _appendAttribute)
+}
+
+
+class _AuthzDecisionQueryHandler(_ElementHandler):
+    LOCAL_NAME = AuthzDecisionQuery.DEFAULT_ELEMENT_LOCAL_NAME
+
+    @classmethod
+    def start(cls, attrib, parser):
+        version, issueInstant, id, resource = _getAttributeValues(attrib,
+                            (AuthzDecisionQuery.VERSION_ATTRIB_NAME,
+                             AuthzDecisionQuery.ISSUE_INSTANT_ATTRIB_NAME,
+                             AuthzDecisionQuery.ID_ATTRIB_NAME,
+                             AuthzDecisionQuery.RESOURCE_ATTRIB_NAME),
+                            cls.LOCAL_NAME)
+        return AuthzDecisionQuery._from_fields(
+                            version=_getVersion(version, AuthzDecisionQuery),
+                            issueInstant=SAMLDateTime.fromString(issueInstant),
+                            id=id,
+                            resource=resource)
+
+
+_AuthzDecisionQueryHandler.CHILD_HANDLERS = {
+    Issuer.DEFAULT_ELEMENT_LOCAL_NAME: (_IssuerHandler, _setIssuer),
+    Subject.DEFAULT_ELEMENT_LOCAL_NAME: (_SubjectHandler, _setSubject),
+    Action.DEFAULT_ELEMENT_LOCAL_NAME: (_ActionHandler, _appendAction)
+}
+
+
+# Check the same child element occurrences as the ElementTree implementation
+for _handler, _elementTree in (
+        (_SubjectHandler, SubjectElementTree),
+        (_StatusHandler, StatusElementTree),
+        (_AttributeHandler, AttributeElementTree),
+        (_AttributeStatementHandler, AttributeStatementElementTree),
+        (_AuthzDecisionStatementHandler, AuthzDecisionStatementElementTree),
+        (_AssertionHandler, AssertionElementTree),
+        (_ResponseHandler, ResponseElementTree),
+        (_AttributeQueryHandler, AttributeQueryElementTree),
+        (_AuthzDecisionQueryHandler, AuthzDecisionQueryElementTree)):
+    _handler.OCCURRENCES = _getOccurrences(_elementTree.DESCRIPTOR)
+
+del _handler, _elementTree
+
+
+def _appendResult(results, obj):
+    results.append(obj)
+
+
+class _DocumentHandler(_ElementHandler):
+    """Handler for the document root element - a SAML object"""
+    LOCAL_NAME = 'document'
+
+    @classmethod
+    def child(cls, localName, name, attrib, parser):
+        tag = _clark(name)
+        parser._payloadTag = tag
+
+        handlerAndAttach = cls.CHILD_HANDLERS.get(localName)
+        if handlerAndAttach is not None:
+            return handlerAndAttach
+
+        fromXML = parser._fallbackParsers.get(tag)
+        if fromXML is None:
+            raise XMLTypeParseError('No parser for "%s" element' % tag)
+
+        return _ElementTreeParser(fromXML), _appendResult
+
+
+_DocumentHandler.CHILD_HANDLERS = dict([
+    (handler.LOCAL_NAME, (handler, _appendResult))
+    for handler in (_ResponseHandler, _AssertionHandler,
+                    _AttributeQueryHandler, _AuthzDecisionQueryHandler,
+                    _AttributeStatementHandler, _AttributeHandler)
+])
+
+
+class _SOAPBodyHandler(_DocumentHandler):
+    """SOAP Body containing a single SAML object"""
+    LOCAL_NAME = 'Body'
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return parser._results
+
+    @classmethod
+    def end(cls, results, text, nChildren):
+        if nChildren != 1:
+            raise XMLTypeParseError("Expecting single child element in SOAP "
+                                    "Body; found %d" % nChildren)
+        return None
+
+
+class _SOAPEnvelopeHandler(_ElementHandler):
+    LOCAL_NAME = 'Envelope'
+    CHILD_HANDLERS = {
+        'Header': (_IgnoreHandler, _attachNothing),
+        _SOAPBodyHandler.LOCAL_NAME: (_SOAPBodyHandler, _attachNothing)
+    }
+
+    @classmethod
+    def start(cls, attrib, parser):
+        return None
+
+
+class _SOAPDocumentHandler(_ElementHandler):
+    """Handler for the document root element - a SOAP Envelope"""
+    LOCAL_NAME = 'document'
+    CHILD_HANDLERS = {
+        _SOAPEnvelopeHandler.LOCAL_NAME: (_SOAPEnvelopeHandler, _attachNothing)
+    }
+
+
+class _Frame(object):
+    """Parser state for an open element"""
+    __slots__ = ('handler', 'obj', 'attach', 'text', 'nChildren',
+                 'childCounts')
+
+    def __init__(self, handler, obj, attach):
+        self.handler = handler
+        self.obj = obj
+        self.attach = attach
+        self.text = [] if handler.COLLECT_TEXT else None
+        self.nChildren = 0
+
+        # Occurrences of each child element local name if there are rules to
+        # check
+        self.childCounts = None if handler.OCCURRENCES is None else {}
+
+
+class SAMLPullParser(object):
+    """Deserialise SAML objects directly from expat parser events.  Unlike
+    the ndg.saml.xml.etree *ElementTree.fromXML methods no element tree is
+    built so that peak memory use is close to that of the resulting SAML
+    objects alone.  Input can be fed incrementally, passed as a string or read
+    from a stream.
+
+    Response, Assertion, AttributeQuery, AuthzDecisionQuery,
+    AttributeStatement and Attribute root elements are supported.  Errors
+    are raised with the same types as the ElementTree implementation:
+    XMLTypeParseError for invalid content, NotImplementedError for
+    unsupported SAML constructs and UnknownAttrProfile for unrecognised
+    attribute value types.  Malformed XML also raises XMLTypeParseError.
+
+    Extension statements and custom attribute value types are parsed by their
+    registered ElementTree implementation from a subtree built for that
+    element only.
+
+    @cvar READ_SIZE: number of bytes read at a time when parsing a stream
+    @type READ_SIZE: int
+    """
+    READ_SIZE = 64 * 1024
+
+    __slots__ = (
+        '__parser',
+        '__stack',
+        '__treeBuilder',
+        '__treeDepth',
+        '__treeParser',
+        '_results',
+        '_payloadTag',
+        '_fallbackParsers',
+        '_attributeValueParser',
+        '_attributeProjection'
+    )
+
+    def __init__(self, soapEnvelope=False, fallbackParsers=None,
+                 attributeProjection=None,
+                 **attributeValueElementTreeFactoryKw):
+        """
+        @param soapEnvelope: set to True if the SAML object is contained in a
+        SOAP envelope.  The SOAP Header if any is skipped.
+        @type soapEnvelope: bool
+        @param fallbackParsers: root element tag in Clark notation to callable
+        taking an ElementTree element.  These are used for root elements not
+        supported by this class e.g. SAML XACML profile queries
+        @type fallbackParsers: dict / NoneType
+        @param attributeProjection: attributes to parse from attribute 
+        statements.  Others are skipped.  See 
+        ndg.saml.xml.etree.AttributeProjection
+        @type attributeProjection: AttributeProjection / iterable / callable /
+        NoneType
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory for custom attribute value types
+        @type attributeValueElementTreeFactoryKw: dict
+        """
+        parser = expat.ParserCreate(namespace_separator=_NS_SEPARATOR)
+        parser.buffer_text = True
+        parser.StartElementHandler = self._startElement
+        parser.EndElementHandler = self._endElement
+        parser.CharacterDataHandler = self._characterData
+
+        # SAML and SOAP messages have no need of DTDs.  Rejecting them
+        # guards against entity expansion attacks
+        parser.StartDoctypeDeclHandler = self._startDoctypeDecl
+        self.__parser = parser
+
+        self._results = []
+        if soapEnvelope:
+            rootHandler = _SOAPDocumentHandler
+        else:
+            rootHandler = _DocumentHandler
+        self.__stack = [_Frame(rootHandler, self._results, None)]
+
+        self.__treeBuilder = None
+        self.__treeDepth = 0
+        self.__treeParser = None
+        self._payloadTag = None
+
+        if fallbackParsers is None:
+            self._fallbackParsers = {}
+        else:
+            self._fallbackParsers = dict(fallbackParsers)
+
+        if attributeProjection is None:
+            self._attributeProjection = None
+        else:
+            self._attributeProjection = AttributeProjection.fromProjection(
+                                                        attributeProjection)
+            
+        if attributeValueElementTreeFactoryKw:
+            factory = AttributeValueElementTreeFactory(
+                                        **attributeValueElementTreeFactoryKw)
+            self._attributeValueParser = _ElementTreeParser(
+                                    lambda elem: factory(elem).fromXML(elem))
+        else:
+            self._attributeValueParser = None
+
+    @classmethod
+    def parse(cls, source, **kw):
+        """Parse a SAML object from a string or stream
+
+        @param source: XML as bytes or string or a readable stream
+        @type source: bytes / basestring / file like object
+        @param kw: keywords to initialise parser
+        @type kw: dict
+        @return: SAML object
+        @rtype: ndg.saml.common.SAMLObject
+        """
+        parser = cls(**kw)
+        if isinstance(source, (bytes, str)):
+            parser.feed(source)
+        else:
+            read = source.read
+            data = read(cls.READ_SIZE)
+            while data:
+                parser.feed(data)
+                data = read(cls.READ_SIZE)
+
+        return parser.close()
+
+    @classmethod
+    def parseSOAPEnvelope(cls, source, **kw):
+        """Parse a SAML object contained in a SOAP envelope
+
+        @param source: XML as bytes or string or a readable stream
+        @type source: bytes / basestring / file like object
+        @param kw: keywords to initialise parser
+        @type kw: dict
+        @return: SAML object
+        @rtype: ndg.saml.common.SAMLObject
+        """
+        return cls.parse(source, soapEnvelope=True, **kw)
+
+    def feed(self, data):
+        """Parse the next fragment of the document
+
+        @param data: XML fragment
+        @type data: bytes / basestring
+        @raise XMLTypeParseError: XML is not well formed
+        """
+        try:
+            self.__parser.Parse(data, False)
+        except expat.ExpatError as e:
+            raise XMLTypeParseError("Error parsing XML: %s" % e)
+
+    def close(self):
+        """Complete parsing
+
+        @return: SAML object
+        @rtype: ndg.saml.common.SAMLObject
+        @raise XMLTypeParseError: XML is not well formed or incomplete
+        """
+        try:
+            self.__parser.Parse(b'', True)
+        except expat.ExpatError as e:
+            raise XMLTypeParseError("Error parsing XML: %s" % e)
+        finally:
+            # Release the expat parser now - its handlers reference this
+            # object so it would otherwise only be freed by garbage collection
+            self.__parser = None
+
+        if not self._results:
+            raise XMLTypeParseError("No SAML object found")
+
+        return self._results[0]
+
+    @property
+    def payloadTag(self):
+        """Tag in Clark notation of the root SAML element or the SOAP Body
+        child element.  None if parsing has not reached it yet
+
+        @return: tag
+        @rtype: basestring / NoneType
+        """
+        return self._payloadTag
+
+    def _startElement(self, name, attrib):
+        if self.__treeBuilder is not None:
+            self.__treeDepth += 1
+            self.__treeBuilder.start(_clark(name), self._clarkAttrib(attrib))
+            return
+
+        frame = self.__stack[-1]
+        frame.nChildren += 1
+        localName = name.rpartition(_NS_SEPARATOR)[-1]
+        handler, attach = frame.handler.child(localName, name, attrib, self)
+
+        childCounts = frame.childCounts
+        if childCounts is not None:
+            count = childCounts.get(localName, 0) + 1
+            maxOccurs = frame.handler.OCCURRENCES[0].get(localName)
+            if maxOccurs is not None and count > maxOccurs:
+                if maxOccurs == 1:
+                    raise XMLTypeParseError('Expecting at most one "%s" '
+                                            'element' % localName)
+                raise XMLTypeParseError('Expecting at most %d "%s" elements' %
+                                        (maxOccurs, localName))
+            childCounts[localName] = count
+
+        if handler.__class__ is _ElementTreeParser:
+            # Build a subtree for this element only
+            self.__treeBuilder = ElementTree.TreeBuilder()
+            self.__treeDepth = 1
+            self.__treeParser = (handler.fromXML, attach, frame.obj)
+            self.__treeBuilder.start(_clark(name), self._clarkAttrib(attrib))
+            return
+
+        self.__stack.append(_Frame(handler, handler.start(attrib, self),
+                                   attach))
+
+    def _endElement(self, name):
+        if self.__treeBuilder is not None:
+            self.__treeBuilder.end(_clark(name))
+            self.__treeDepth -= 1
+            if self.__treeDepth == 0:
+                elem = self.__treeBuilder.close()
+                self.__treeBuilder = None
+                fromXML, attach, parent = self.__treeParser
+                self.__treeParser = None
+                attach(parent, fromXML(elem))
+            return
+
+        frame = self.__stack.pop()
+        if frame.childCounts is not None:
+            for childLocalName in frame.handler.OCCURRENCES[1]:
+                if childLocalName not in frame.childCounts:
+                    raise XMLTypeParseError('Expecting a "%s" child element '
+                                            'for SAML "%s" element' %
+                                            (childLocalName,
+                                             frame.handler.LOCAL_NAME))
+
+        if frame.text:
+            text = ''.join(frame.text)
+        else:
+            text = None
+
+        obj = frame.handler.end(frame.obj, text, frame.nChildren)
+        frame.attach(self.__stack[-1].obj, obj)
+
+    def _characterData(self, data):
+        if self.__treeBuilder is not None:
+            self.__treeBuilder.data(data)
+            return
+
+        text = self.__stack[-1].text
+        if text is not None:
+            text.append(data)
+
+    def _startDoctypeDecl(self, *arg):
+        raise XMLTypeParseError("Document type declarations are not "
+                                "permitted")
+
+    @staticmethod
+    def _clarkAttrib(attrib):
+        return dict([(_clark(name), value) for name, value in attrib.items()])
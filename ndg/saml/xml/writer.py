@@ -0,0 +1,523 @@
+"""Implementation of SAML 2.0 for NDG Security - streaming XML writer which
+serialises SAML objects directly to text without building an ElementTree
+
+NERC DataGrid Project
+"""
+__author__ = "P J Kershaw"
+__date__ = "19/10/26"
+__copyright__ = "Copyright 2019 United Kingdom Research and Innovation"
+__contact__ = "Philip.Kershaw@stfc.ac.uk"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+import logging
+log = logging.getLogger(__name__)
+from io import BytesIO
+
+from ndg.saml import importElementTree
+ElementTree = importElementTree()
+
+from ndg.saml.saml2.core import (Attribute, AttributeStatement,
+                                 AuthzDecisionStatement, Assertion, Conditions,
+                                 AttributeValue, AttributeQuery,
+                                 AuthzDecisionQuery, Subject, NameID, Issuer,
+                                 Response, Status, StatusCode, StatusMessage,
+                                 Action, XSStringAttributeValue)
+from ndg.saml.common.xml import SAMLConstants
+from ndg.saml.utils import SAMLDateTime
+from ndg.saml.xml import escapeText, escapeAttribute
+from ndg.saml.xml.namespace import defaultNamespaceContext
+from ndg.saml.xml.etree import (AttributeValueElementTreeFactory,
+                                _getElementTreeImplementationForQName,
+                                _getUnchangedSourceElement,
+                                _copySourceElement)
+
+
+class SAMLWriter(object):
+    """Serialise SAML objects straight to UTF-8 encoded XML.  Output is XML
+    equivalent to serialising the ElementTree elements made by the
+    ndg.saml.xml.etree *ElementTree.toXML methods but no intermediate element
+    tree is made.  Each namespace is declared on the outermost element which
+    uses it except those for xsi:type attributes and their values which, as
+    for the lxml backend, are declared once on the root element of documents
+    which may contain attribute values.
+
+    Extension statements and attribute value types with no writer method
+    here are serialised with their registered ElementTree implementation.
+
+    @cvar DEFAULT_BUFFER_SIZE: number of encoded bytes buffered before
+    writing to the output stream
+    @type DEFAULT_BUFFER_SIZE: int
+    @cvar PARTS_PER_CHUNK: number of strings written before they are joined
+    and encoded
+    @type PARTS_PER_CHUNK: int
+    """
+    DEFAULT_BUFFER_SIZE = 16 * 1024
+    PARTS_PER_CHUNK = 64
+    XSI_TYPE_ATTRIB_NAME = "%s:type" % SAMLConstants.XSI_PREFIX
+    XSI_TYPE_NSS = (
+        (SAMLConstants.XSD_PREFIX, SAMLConstants.XSD_NS),
+        (SAMLConstants.XSI_PREFIX, SAMLConstants.XSI_NS)
+    )
+
+    __slots__ = (
+        '__stream',
+        '__bufferSize',
+        '__parts',
+        '__buffer',
+        '__rootNss',
+        '__attributeValueElementTreeFactory'
+    )
+
+    def __init__(self, stream=None, bufferSize=DEFAULT_BUFFER_SIZE,
+                 **attributeValueElementTreeFactoryKw):
+        """
+        @param stream: writable binary stream.  If None, output is kept in
+        memory - see getvalue
+        @type stream: file like object / NoneType
+        @param bufferSize: number of encoded bytes buffered before writing to
+        stream
+        @type bufferSize: int
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory used for custom attribute value types
+        @type attributeValueElementTreeFactoryKw: dict
+        """
+        self.__stream = stream
+        self.__bufferSize = bufferSize
+        self.__parts = []
+        
+        # Encoded output.  Where no stream is set this holds all of it
+        self.__buffer = BytesIO()
+        self.__rootNss = ()
+        self.__attributeValueElementTreeFactory = \
+            AttributeValueElementTreeFactory(
+                                        **attributeValueElementTreeFactoryKw)
+
+    @classmethod
+    def toBytes(cls, samlObject, **attributeValueElementTreeFactoryKw):
+        """Serialise a SAML object
+
+        @param samlObject: SAML object e.g. Response or Assertion
+        @type samlObject: ndg.saml.common.SAMLObject
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory
+        @type attributeValueElementTreeFactoryKw: dict
+        @return: UTF-8 encoded XML
+        @rtype: bytes
+        """
+        writer = cls(**attributeValueElementTreeFactoryKw)
+        writer.write(samlObject)
+        return writer.getvalue()
+
+    @classmethod
+    def toStream(cls, samlObject, stream, **attributeValueElementTreeFactoryKw):
+        """Serialise a SAML object to a stream
+
+        @param samlObject: SAML object e.g. Response or Assertion
+        @type samlObject: ndg.saml.common.SAMLObject
+        @param stream: writable binary stream
+        @type stream: file like object
+        @param attributeValueElementTreeFactoryKw: keywords for AttributeValue
+        factory
+        @type attributeValueElementTreeFactoryKw: dict
+        """
+        writer = cls(stream=stream, **attributeValueElementTreeFactoryKw)
+        writer.write(samlObject)
+        writer.flush()
+
+    def write(self, samlObject):
+        """Serialise a SAML object
+
+        @param samlObject: SAML object e.g. Response or Assertion
+        @type samlObject: ndg.saml.common.SAMLObject
+        """
+        cls = self.__class__
+        for samlClass in type(samlObject).__mro__:
+            writeMethodName = cls._WRITE_METHOD_NAMES.get(samlClass)
+            if writeMethodName is not None:
+                if samlClass in cls._ATTRIBUTE_VALUE_CONTAINERS:
+                    self.__rootNss = cls.XSI_TYPE_NSS
+                try:
+                    getattr(self, writeMethodName)(samlObject, {})
+                finally:
+                    self.__rootNss = ()
+                return
+
+        raise TypeError("No XML writer for %r type" % type(samlObject))
+
+    def flush(self):
+        """Write buffered output to the stream"""
+        self._encodeParts()
+        if self.__stream is not None and self.__buffer.tell():
+            with self.__buffer.getbuffer() as view:
+                self.__stream.write(view)
+            self.__buffer.seek(0)
+            self.__buffer.truncate()
+
+    def getvalue(self):
+        """Get the output written so far where no stream was set
+
+        @return: UTF-8 encoded XML
+        @rtype: bytes
+        """
+        self._encodeParts()
+        return self.__buffer.getvalue()
+
+    def _encodeParts(self):
+        # Strings written are joined and encoded in chunks as many small
+        # strings take several times the space of the text
+        parts = self.__parts
+        if not parts:
+            return
+        
+        self.__buffer.write(''.join(parts).encode('utf-8'))
+        parts.clear()
+        
+    def _out(self, text):
+        parts = self.__parts
+        parts.append(text)
+        if len(parts) >= self.__class__.PARTS_PER_CHUNK:
+            self._encodeParts()
+            if (self.__stream is not None and 
+                self.__buffer.tell() >= self.__bufferSize):
+                self.flush()
+
+    def _startTag(self, qname, attrib, nsScope, extraNss=()):
+        """Write a start tag declaring any namespaces not already in scope
+
+        @param qname: element name
+        @type qname: ndg.saml.common.xml.QName
+        @param attrib: attribute name, value pairs.  Values are escaped
+        @type attrib: iterable
+        @param nsScope: namespace URI to prefix mapping for namespaces
+        declared by parent elements
+        @type nsScope: dict
+        @param extraNss: prefix, namespace URI pairs for additional namespaces
+        used by attributes or their values
+        @type extraNss: iterable
+        @return: tag name and namespace scope for child elements
+        @rtype: tuple
+        """
+        if self.__rootNss:
+            # Namespaces to declare on the root element
+            extraNss = self.__rootNss + tuple(extraNss)
+            self.__rootNss = ()
+            
+        declarations = []
+        nsUri = qname.namespaceURI
+        prefix = nsScope.get(nsUri)
+        if prefix is None:
+            prefix = qname.prefix
+            nsScope = dict(nsScope)
+            nsScope[nsUri] = prefix
+            declarations.append(' xmlns:%s="%s"' % (prefix,
+                                                    escapeAttribute(nsUri)))
+
+        for extraPrefix, extraNsUri in extraNss:
+            if nsScope.get(extraNsUri) != extraPrefix:
+                nsScope = dict(nsScope)
+                nsScope[extraNsUri] = extraPrefix
+                declarations.append(' xmlns:%s="%s"' % (
+                                                extraPrefix,
+                                                escapeAttribute(extraNsUri)))
+
+        tag = prefix + ':' + qname.localPart
+        self._out('<' + tag + ''.join(declarations) +
+                  ''.join([' %s="%s"' % (name, escapeAttribute(value))
+                           for name, value in attrib]) + '>')
+        return tag, nsScope
+
+    def _endTag(self, tag):
+        self._out('</' + tag + '>')
+
+    def _writeTextElement(self, qname, attrib, text, nsScope):
+        tag, _ = self._startTag(qname, attrib, nsScope)
+        if text:
+            self._out(escapeText(text))
+        self._endTag(tag)
+
+    def _writeElementTree(self, elem):
+        self._out(defaultNamespaceContext.tostring(elem, encoding='unicode'))
+
+    def _writeIssuer(self, issuer, nsScope):
+        if not issuer.value:
+            raise AttributeError("SAML Issuer value is not set")
+        
+        attrib = []
+        if issuer.format is not None:
+            attrib.append((Issuer.FORMAT_ATTRIB_NAME, issuer.format))
+        self._writeTextElement(Issuer.DEFAULT_ELEMENT_NAME, attrib,
+                               issuer.value, nsScope)
+
+    def _writeNameID(self, nameID, nsScope):
+        self._writeTextElement(NameID.DEFAULT_ELEMENT_NAME,
+                               [(NameID.FORMAT_ATTRIB_NAME, nameID.format)],
+                               nameID.value, nsScope)
+
+    def _writeSubject(self, subject, nsScope):
+        tag, nsScope = self._startTag(Subject.DEFAULT_ELEMENT_NAME, (),
+                                      nsScope)
+        self._writeNameID(subject.nameID, nsScope)
+        self._endTag(tag)
+
+    def _writeStatus(self, status, nsScope):
+        tag, nsScope = self._startTag(Status.DEFAULT_ELEMENT_NAME, (), nsScope)
+
+        statusCode = status.statusCode
+        self._writeTextElement(StatusCode.DEFAULT_ELEMENT_NAME,
+                               [(StatusCode.VALUE_ATTRIB_NAME,
+                                 statusCode.value)],
+                               None, nsScope)
+
+        # Status message is optional
+        if (status.statusMessage is not None and
+            status.statusMessage.value is not None):
+            self._writeTextElement(StatusMessage.DEFAULT_ELEMENT_NAME, (),
+                                   status.statusMessage.value, nsScope)
+
+        if status.statusDetail is not None:
+            raise NotImplementedError("StatusDetail XML serialisation is not "
+                                      "implemented")
+        self._endTag(tag)
+
+    def _writeConditions(self, conditions, nsScope):
+        if len(conditions.conditions) > 0:
+            raise NotImplementedError("Conditions list creation is not "
+                                      "implemented")
+
+        attrib = [
+            (Conditions.NOT_BEFORE_ATTRIB_NAME,
+             SAMLDateTime.toString(conditions.notBefore)),
+            (Conditions.NOT_ON_OR_AFTER_ATTRIB_NAME,
+             SAMLDateTime.toString(conditions.notOnOrAfter))
+        ]
+        self._writeTextElement(Conditions.DEFAULT_ELEMENT_NAME, attrib, None,
+                               nsScope)
+
+    def _writeAction(self, action, nsScope):
+        if not action.namespace:
+            raise AttributeError("No action namespace set")
+
+        if not action.value:
+            raise AttributeError("No action name set")
+
+        self._writeTextElement(Action.DEFAULT_ELEMENT_NAME,
+                               [(Action.NAMESPACE_ATTRIB_NAME,
+                                 action.namespace)],
+                               action.value, nsScope)
+
+    def _writeAttributeValue(self, attributeValue, nsScope):
+        if type(attributeValue) is XSStringAttributeValue:
+            # The namespaces are declared here only if they are not in scope
+            # from the root element
+            attrib = [(self.__class__.XSI_TYPE_ATTRIB_NAME,
+                       "%s:%s" % (SAMLConstants.XSD_PREFIX,
+                                  XSStringAttributeValue.TYPE_LOCAL_NAME))]
+            tag, _ = self._startTag(AttributeValue.DEFAULT_ELEMENT_NAME,
+                                    attrib, nsScope,
+                                    extraNss=self.__class__.XSI_TYPE_NSS)
+            if attributeValue.value:
+                self._out(escapeText(attributeValue.value))
+            self._endTag(tag)
+        else:
+            # Custom attribute value types
+            attributeValueElementTree = \
+                self.__attributeValueElementTreeFactory(attributeValue)
+            self._writeElementTree(
+                            attributeValueElementTree.toXML(attributeValue))
+
+    def _writeAttribute(self, attribute, nsScope):
+        attrib = []
+        if attribute.friendlyName:
+            attrib.append((Attribute.FRIENDLY_NAME_ATTRIB_NAME,
+                           attribute.friendlyName))
+        if attribute.name:
+            attrib.append((Attribute.NAME_ATTRIB_NAME, attribute.name))
+
+        if attribute.nameFormat:
+            attrib.append((Attribute.NAME_FORMAT_ATTRIB_NAME,
+                           attribute.nameFormat))
+
+        tag, nsScope = self._startTag(Attribute.DEFAULT_ELEMENT_NAME, attrib,
+                                      nsScope)
+        for attributeValue in attribute.attributeValues:
+            self._writeAttributeValue(attributeValue, nsScope)
+        self._endTag(tag)
+
+    def _writeAttributeStatement(self, attributeStatement, nsScope):
+        tag, nsScope = self._startTag(AttributeStatement.DEFAULT_ELEMENT_NAME,
+                                      (), nsScope)
+        for attribute in attributeStatement.attributes:
+            self._writeAttribute(attribute, nsScope)
+        self._endTag(tag)
+
+    def _writeAuthzDecisionStatement(self, authzDecisionStatement, nsScope):
+        if not authzDecisionStatement.resource:
+            raise AttributeError("Resource for AuthzDecisionStatement is not "
+                                 "set")
+
+        if (authzDecisionStatement.evidence and
+            len(authzDecisionStatement.evidence.values) > 0):
+            raise NotImplementedError("authzDecisionStatementElementTree does "
+                                      "not currently support the Evidence type")
+
+        attrib = [
+            (AuthzDecisionStatement.DECISION_ATTRIB_NAME,
+             str(authzDecisionStatement.decision)),
+            (AuthzDecisionStatement.RESOURCE_ATTRIB_NAME,
+             authzDecisionStatement.resource)
+        ]
+        tag, nsScope = self._startTag(
+                                AuthzDecisionStatement.DEFAULT_ELEMENT_NAME,
+                                attrib, nsScope)
+        for action in authzDecisionStatement.actions:
+            self._writeAction(action, nsScope)
+        self._endTag(tag)
+
+    def _writeAssertion(self, assertion, nsScope):
+        # Assertions parsed with keepSource set are written as received while
+        # they are unchanged
+        sourceElem = _getUnchangedSourceElement(assertion)
+        if sourceElem is not None:
+            self._writeElementTree(_copySourceElement(sourceElem))
+            return
+
+        if assertion.advice:
+            raise NotImplementedError("Assertion Advice creation is not "
+                                      "implemented")
+
+        if len(assertion.authnStatements) > 0:
+            raise NotImplementedError("Assertion Authentication Statement "
+                                      "creation is not implemented")
+
+        attrib = [
+            (Assertion.ID_ATTRIB_NAME, assertion.id),
+            (Assertion.ISSUE_INSTANT_ATTRIB_NAME,
+             SAMLDateTime.toString(assertion.issueInstant)),
+            (Assertion.VERSION_ATTRIB_NAME, str(assertion.version))
+        ]
+        tag, nsScope = self._startTag(Assertion.DEFAULT_ELEMENT_NAME, attrib,
+                                      nsScope)
+
+        if assertion.issuer is not None:
+            self._writeIssuer(assertion.issuer, nsScope)
+
+        if assertion.subject is not None:
+            self._writeSubject(assertion.subject, nsScope)
+
+        if assertion.conditions is not None:
+            self._writeConditions(assertion.conditions, nsScope)
+
+        for statement in assertion.statements:
+            qname = statement.qname
+            etreeImpl = _getElementTreeImplementationForQName(qname)
+            if etreeImpl is None:
+                raise NotImplementedError("No ElementTree implementation for "
+                                          "QName {%s}%s" %
+                                          (qname.namespaceURI, qname.localPart))
+            self._writeElementTree(etreeImpl.toXML(statement))
+
+        for authzDecisionStatement in assertion.authzDecisionStatements:
+            self._writeAuthzDecisionStatement(authzDecisionStatement, nsScope)
+
+        for attributeStatement in assertion.attributeStatements:
+            self._writeAttributeStatement(attributeStatement, nsScope)
+
+        self._endTag(tag)
+
+    def _writeResponse(self, response, nsScope):
+        if response.id is None:
+            raise TypeError("SAML Response id is not set")
+
+        if response.issueInstant is None:
+            raise TypeError("SAML Response issueInstant is not set")
+
+        if response.inResponseTo is None:
+            raise TypeError("SAML Response inResponseTo identifier is not set")
+
+        attrib = [
+            (Response.ID_ATTRIB_NAME, response.id),
+            (Response.ISSUE_INSTANT_ATTRIB_NAME,
+             SAMLDateTime.toString(response.issueInstant)),
+            (Response.IN_RESPONSE_TO_ATTRIB_NAME, response.inResponseTo),
+            (Response.VERSION_ATTRIB_NAME, str(response.version))
+        ]
+        tag, nsScope = self._startTag(Response.DEFAULT_ELEMENT_NAME, attrib,
+                                      nsScope)
+
+        # Issuer may be omitted: saml-profiles-2.0-os Section 4.1.4.2
+        if response.issuer is not None:
+            self._writeIssuer(response.issuer, nsScope)
+
+        self._writeStatus(response.status, nsScope)
+
+        for assertion in response.assertions:
+            self._writeAssertion(assertion, nsScope)
+
+        self._endTag(tag)
+
+    def _writeAttributeQuery(self, attributeQuery, nsScope):
+        attrib = [
+            (AttributeQuery.ID_ATTRIB_NAME, attributeQuery.id),
+            (AttributeQuery.ISSUE_INSTANT_ATTRIB_NAME,
+             SAMLDateTime.toString(attributeQuery.issueInstant)),
+            (AttributeQuery.VERSION_ATTRIB_NAME, str(attributeQuery.version))
+        ]
+        tag, nsScope = self._startTag(AttributeQuery.DEFAULT_ELEMENT_NAME,
+                                      attrib, nsScope)
+        if attributeQuery.issuer is not None:
+            self._writeIssuer(attributeQuery.issuer, nsScope)
+        self._writeSubject(attributeQuery.subject, nsScope)
+        for attribute in attributeQuery.attributes:
+            self._writeAttribute(attribute, nsScope)
+        self._endTag(tag)
+
+    def _writeAuthzDecisionQuery(self, authzDecisionQuery, nsScope):
+        if not authzDecisionQuery.resource:
+            raise AttributeError("No resource has been set for the "
+                                 "AuthzDecisionQuery")
+
+        if (authzDecisionQuery.evidence and
+            len(authzDecisionQuery.evidence.evidence) > 0):
+            raise NotImplementedError("Conversion of AuthzDecisionQuery "
+                                      "Evidence type to XML is not currently "
+                                      "supported")
+
+        attrib = [
+            (AuthzDecisionQuery.ID_ATTRIB_NAME, authzDecisionQuery.id),
+            (AuthzDecisionQuery.ISSUE_INSTANT_ATTRIB_NAME,
+             SAMLDateTime.toString(authzDecisionQuery.issueInstant)),
+            (AuthzDecisionQuery.VERSION_ATTRIB_NAME,
+             str(authzDecisionQuery.version)),
+            (AuthzDecisionQuery.RESOURCE_ATTRIB_NAME,
+             authzDecisionQuery.resource)
+        ]
+        tag, nsScope = self._startTag(AuthzDecisionQuery.DEFAULT_ELEMENT_NAME,
+                                      attrib, nsScope)
+        if authzDecisionQuery.issuer is not None:
+            self._writeIssuer(authzDecisionQuery.issuer, nsScope)
+        self._writeSubject(authzDecisionQuery.subject, nsScope)
+        for action in authzDecisionQuery.actions:
+            self._writeAction(action, nsScope)
+        self._endTag(tag)
+
+    # Types of root element which may contain attribute values
+    _ATTRIBUTE_VALUE_CONTAINERS = frozenset((Response, Assertion, 
+                                             AttributeStatement, Attribute, 
+                                             AttributeQuery))
+
+    # SAML class to writer method name
+    _WRITE_METHOD_NAMES = {
+        Response: '_writeResponse',
+        Assertion: '_writeAssertion',
+        AttributeStatement: '_writeAttributeStatement',
+        AuthzDecisionStatement: '_writeAuthzDecisionStatement',
+        Attribute: '_writeAttribute',
+        AttributeValue: '_writeAttributeValue',
+        AttributeQuery: '_writeAttributeQuery',
+        AuthzDecisionQuery: '_writeAuthzDecisionQuery',
+        Status: '_writeStatus',
+        Issuer: '_writeIssuer',
+        Subject: '_writeSubject',
+        NameID: '_writeNameID',
+        Conditions: '_writeConditions',
+        Action: '_writeAction'
+    }
@@ -174,8 +174,14 @@ class CapitalizedKeysDict(dict):
     
     
 class SOAPClient(SOAPClientBase):
-    """urllib2 based SOAP Client"""
+    """urllib2 based SOAP Client
+    
+    @cvar DEBUG_LOG_MAX_SIZE: maximum number of characters of each request
+    and response logged at DEBUG level
+    @type DEBUG_LOG_MAX_SIZE: int
+    """
     DEFAULT_HTTP_HEADER = CapitalizedKeysDict({'Content-type': 'text/xml'})
+    DEBUG_LOG_MAX_SIZE = 64 * 1024
     
     def __init__(self):
         super(SOAPClient, self).__init__()
@@ -232,8 +238,18 @@ class SOAPClient(SOAPClientBase):
                               doc="urllib2.OpenerDirector defines the "
                                   "opener(s) for handling requests")
     
-    def send(self, soapRequest):
-        """Make a request to the given URL with a SOAP Request object"""
+    def send(self, soapRequest, parse=True):
+        """Make a request to the given URL with a SOAP Request object
+        
+        @param soapRequest: SOAP request
+        @type soapRequest: SOAPRequest
+        @param parse: set to False to skip parsing the response envelope.  The
+        response is then left to be read from the fileObject attribute of the
+        returned SOAP response
+        @type parse: bool
+        @return: SOAP response
+        @rtype: SOAPResponse
+        """
         
         if not isinstance(soapRequest, SOAPRequest):
             raise TypeError('SOAPClient.send: expecting %r '
@@ -257,7 +273,8 @@ class SOAPClient(SOAPClientBase):
             from ndg.soap.utils.etree import prettyPrint
             log.debug("SOAP Request:")
             log.debug("_"*80)
-            log.debug(prettyPrint(soapRequest.envelope.elem))
+            log.debug(prettyPrint(soapRequest.envelope.elem,
+                                  maxSize=self.__class__.DEBUG_LOG_MAX_SIZE))
 
         soapResponse = SOAPResponse()
         urllib2Request = urllib.request.Request(soapRequest.url) 
@@ -292,6 +309,9 @@ class SOAPClient(SOAPClientBase):
             raise excep
             
         soapResponse.fileObject = response
+        if not parse:
+            return soapResponse
+        
         soapResponse.envelope = self.responseEnvelopeClass()  
         
         try:
@@ -304,6 +324,7 @@ class SOAPClient(SOAPClientBase):
         if logLevel <= logging.DEBUG:
             log.debug("SOAP Response:")
             log.debug("_"*80)
-            log.debug(prettyPrint(soapResponse.envelope.elem))
+            log.debug(prettyPrint(soapResponse.envelope.elem,
+                                  maxSize=self.__class__.DEBUG_LOG_MAX_SIZE))
             
         return soapResponse
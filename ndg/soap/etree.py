@@ -17,9 +17,11 @@ from ndg.saml import Config, importElementTreeAndCElementTree
 # ElementTree helper functions
 import ndg.soap.utils.etree as etree
 from ndg.soap.utils.etree import QName
+from ndg.saml.xml.namespace import defaultNamespaceContext
+from ndg.saml.xml import lxml_backend
 
-from ndg.soap import (SOAPObject, SOAPEnvelopeBase, SOAPHeaderBase, 
-                      SOAPBodyBase, SOAPFaultBase)
+from ndg.soap import (SOAPEnvelopeBase, SOAPHeaderBase, SOAPBodyBase, 
+                      SOAPFaultBase)
 from ndg.soap import SOAPFaultException as SOAPFaultExceptionBase
 
 
@@ -58,7 +60,8 @@ class ETreeSOAPExtensions(object):
         if Config.use_lxml:
             return ElementTree.tostring(elem, encoding=encoding)
         else:
-            return cElementTree.tostring(elem, encoding=encoding)
+            # Apply namespace prefixes once for the whole document
+            return defaultNamespaceContext.tostring(elem, encoding=encoding)
        
     @classmethod
     def _prettyPrint(cls, elem):
@@ -75,6 +78,10 @@ class ETreeSOAPExtensions(object):
         @type source: basestring/file
         @param source: file path to XML file or file object
         """
+        if lxml_backend.USE_LXML_BACKEND:
+            # Parser reused for each message parsed by the calling thread
+            return lxml_backend.parse(source)
+        
         tree = ElementTree.parse(source)
         elem = tree.getroot()
         
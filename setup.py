@@ -39,6 +39,7 @@ setup(
     package_data =          {
         'ndg.saml': [
             'LICENSE',
+            'test/*.ini',
             'test/binding/soap/*.ini',
             'test/binding/soap/localhost.*',
             'test/binding/soap/ca/*.0'
@@ -56,14 +57,19 @@ setup(
                           "PasteDeploy>=2.0.1", 
                           "PasteScript>=2.0.2"],
         'test_http_server': ['waitress', 'gunicorn'],
+        # Needed for the ndg_saml_server script
+        'server': ['gunicorn', 'PasteDeploy>=2.0.1', 'PasteScript>=2.0.2'],
         # Required for the SAML profile to XACML - enables richer functionality
-        # for expressing authorisation queries and decisions.
+        # for expressing authorisation queries and decisions.  Also needed by
+        # the embedded XACML PDP query interface,
+        # ndg.saml.saml2.binding.soap.server.wsgi.xacmlauthzdecision
         'xacml_profile': ['ndg_xacml'],
     },
     entry_points =          {
     'console_scripts': [
         'ndg_saml_client = ndg.saml.utils.command_line_client:'
         'SamlSoapCommandLineClient.main',
+        'ndg_saml_server = ndg.saml.utils.server:SamlServer.main',
         ],
     },
     classifiers =           [